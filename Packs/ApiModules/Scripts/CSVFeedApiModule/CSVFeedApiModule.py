@@ -3,16 +3,19 @@ from CommonServerPython import *
 from CommonServerUserPython import *
 
 ''' IMPORTS '''
+import codecs
 import csv
-import gzip
 import urllib3
-from typing import Optional, Pattern, Dict, Any, Tuple, Union, List
+import zlib
+from typing import Optional, Pattern, Dict, Any, Tuple, Union, List, Iterable, Iterator
 
 # disable insecure warnings
 urllib3.disable_warnings()
 
 # Globals
 DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+STREAM_CHUNK_SIZE = 1024 * 1024
+CREATE_INDICATORS_BATCH_SIZE = 2000
 
 
 class Client(BaseClient):
@@ -207,30 +210,69 @@ class Client(BaseClient):
 
             if skip_first_line:
                 next(csvreader)
-            no_update = get_no_update_value(r, url)
-            results.append({url: {'result': csvreader, 'no_update': no_update}})
+            # the last run is saved by the callers only after the lazily read feed was fully read
+            no_update = get_no_update_value(r, url, save_last_run=False)
+            results.append({url: {'result': csvreader, 'no_update': no_update, 'response': r}})
 
         return results
 
     def get_feed_content_divided_to_lines(self, url, raw_response):
-        """Fetch feed data and divides its content to lines
+        """Fetch feed data and divides its content to lines, lazily while it is downloaded
 
         Args:
             url: Current feed's url.
             raw_response: The raw response from the feed's url.
 
         Returns:
-            List. List of lines from the feed content.
+            Iterator. Iterator over the lines of the feed content.
         """
+        chunks = raw_response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
         if self.feed_url_to_config and self.feed_url_to_config.get(url).get('is_zipped_file'):  # type: ignore
-            response_content = gzip.decompress(raw_response.content)
-        else:
-            response_content = raw_response.content
+            chunks = decompress_gzip_chunks(chunks)
+
+        return decode_lines(chunks, self.encoding)
+
+
+def decompress_gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Decompresses a gzip file (with one or more members) given in chunks, one chunk at a time
+
+    Args:
+        chunks: The chunks of the gzip file.
+
+    Returns:
+        Iterator. Iterator over the decompressed chunks.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        while chunk:
+            yield decompressor.decompress(chunk)
+            chunk = decompressor.unused_data
+            if chunk:
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    yield decompressor.flush()
 
-        return response_content.decode(self.encoding).split('\n')
 
+def decode_lines(chunks: Iterable[bytes], encoding: str) -> Iterator[str]:
+    """Decodes the given chunks and divides them to lines by newlines, equivalent to decoding their concatenation
+    and splitting it, without holding it in memory as a whole
 
-def get_no_update_value(response: requests.models.Response, url: str) -> bool:
+    Args:
+        chunks: The chunks to decode.
+        encoding: The encoding of the chunks.
+
+    Returns:
+        Iterator. Iterator over the decoded lines.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    for chunk in chunks:
+        lines = (pending + decoder.decode(chunk)).split('\n')
+        pending = lines.pop()
+        yield from lines
+    yield pending + decoder.decode(b'', final=True)
+
+
+def get_no_update_value(response: requests.models.Response, url: str, save_last_run: bool = True) -> bool:
     """
     detect if the feed response has been modified according to the headers etag and last_modified.
     For more information, see this:
@@ -239,6 +281,8 @@ def get_no_update_value(response: requests.models.Response, url: str) -> bool:
     Args:
         response: (requests.Response) The feed response.
         url: (str) The feed URL (service).
+        save_last_run: (bool) Whether to save the etag and last_modified headers in the last run.
+            Streamed feeds save them with save_last_run_headers only after the whole response was read.
     Returns:
         boolean with the value for noUpdate argument.
         The value should be False if the response was modified.
@@ -255,15 +299,43 @@ def get_no_update_value(response: requests.models.Response, url: str) -> bool:
                       'createIndicators will be executed with noUpdate=False.')
         return False
 
-    last_run = demisto.getLastRun()
-    last_run[url] = {'last_modified': last_modified, 'etag': etag}
-    demisto.setLastRun(last_run)
+    if save_last_run:
+        save_last_run_headers(response, url)
 
     demisto.debug('New indicators fetched - the Last-Modified value has been updated,'
                   ' createIndicators will be executed with noUpdate=False.')
     return False
 
 
+def save_last_run_headers(response: requests.models.Response, url: str):
+    """
+    Saves the etag and last_modified headers of the feed response in the last run, so the next fetch sends them.
+    Args:
+        response: (requests.Response) The feed response.
+        url: (str) The feed URL (service).
+    """
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if response.status_code == 304 or (not etag and not last_modified):
+        return
+
+    last_run = demisto.getLastRun()
+    last_run[url] = {'last_modified': last_modified, 'etag': etag}
+    demisto.setLastRun(last_run)
+
+
+def save_feeds_last_run(url_to_readers: List[dict]):
+    """
+    Saves the last run of the feeds returned by build_iterator, once their indicators were all read and created.
+    Args:
+        url_to_readers: Items of the result of the client build_iterator.
+    """
+    for url_to_reader in url_to_readers:
+        for url, reader in url_to_reader.items():
+            if reader.get('response') is not None:
+                save_last_run_headers(reader['response'], url)
+
+
 def determine_indicator_type(indicator_type, default_indicator_type, auto_detect, value):
     """
     Detect the indicator type of the given value.
@@ -337,13 +409,87 @@ def create_fields_mapping(raw_json: Dict[str, Any], mapping: Dict[str, Union[Tup
 def fetch_indicators_command(client: Client, default_indicator_type: str, auto_detect: bool, limit: int = 0,
                              create_relationships: bool = False, **kwargs):
     iterator = client.build_iterator(**kwargs)
-    relationships_of_indicator = []
     indicators = []
-    config = client.feed_url_to_config or {}
 
     # set noUpdate flag in createIndicators command True only when all the results from all the urls are True.
     no_update = all([next(iter(item.values())).get('no_update', False) for item in iterator])
 
+    for indicator in iterate_indicators(client, iterator, default_indicator_type, auto_detect, create_relationships):
+        indicators.append(indicator)
+        # exit the loop if we have more indicators than the limit
+        if limit and len(indicators) >= limit:
+            return indicators, no_update
+
+    save_feeds_last_run(iterator)
+    return indicators, no_update
+
+
+def fetch_indicators_in_batches(client: Client, default_indicator_type: str, auto_detect: bool, limit: int = 0,
+                                create_relationships: bool = False, batch_size: int = CREATE_INDICATORS_BATCH_SIZE,
+                                **kwargs) -> Iterator[Tuple[List[dict], bool]]:
+    """Fetches the indicators from the client in batches, so only a single batch is held in memory at a time
+
+    Args:
+        client: The feed client.
+        default_indicator_type: Indicator type which was inserted as a param of the integration by user.
+        auto_detect: True whether auto detection of the indicator type is wanted.
+        limit: The maximal number of indicators to fetch, 0 for no limit.
+        create_relationships: Whether to create the indicators relationships.
+        batch_size: The maximal number of indicators in a batch.
+
+    Returns:
+        Iterator. Iterator over tuples of an indicators batch and the value for the noUpdate argument.
+        The last run of each feed is saved once the batch holding its last indicator was consumed, so a feed
+        which failed while it was read is fully read again by the next fetch.
+    """
+    iterator = client.build_iterator(**kwargs)
+
+    # set noUpdate flag in createIndicators command True only when all the results from all the urls are True.
+    no_update = all([next(iter(item.values())).get('no_update', False) for item in iterator])
+
+    limit = int(limit or 0)
+    count = 0
+    indicators: List[dict] = []
+    # the feeds which were fully read, their last run is saved after their last indicators were consumed
+    read_feeds: List[dict] = []
+    for url_to_reader in iterator:
+        for indicator in iterate_indicators(client, [url_to_reader], default_indicator_type, auto_detect,
+                                            create_relationships):
+            indicators.append(indicator)
+            count += 1
+            if len(indicators) == batch_size:
+                yield indicators, no_update
+                indicators = []
+                save_feeds_last_run(read_feeds)
+                read_feeds = []
+            # exit the loop if we have more indicators than the limit
+            if count == limit:
+                break
+        if limit and count >= limit:
+            break
+        read_feeds.append(url_to_reader)
+    if indicators:
+        yield indicators, no_update
+    save_feeds_last_run(read_feeds)
+
+
+def iterate_indicators(client: Client, iterator: List[dict], default_indicator_type: str, auto_detect: bool,
+                       create_relationships: bool = False) -> Iterator[dict]:
+    """Creates the indicators from the feed readers returned by build_iterator, one row at a time
+
+    Args:
+        client: The feed client.
+        iterator: The result of the client build_iterator.
+        default_indicator_type: Indicator type which was inserted as a param of the integration by user.
+        auto_detect: True whether auto detection of the indicator type is wanted.
+        create_relationships: Whether to create the indicators relationships.
+
+    Returns:
+        Iterator. Iterator over the indicators.
+    """
+    relationships_of_indicator = []
+    config = client.feed_url_to_config or {}
+
     for url_to_reader in iterator:
         for url, reader in url_to_reader.items():
             mapping = config.get(url, {}).get('mapping', {})
@@ -384,12 +530,7 @@ def fetch_indicators_command(client: Client, default_indicator_type: str, auto_d
                     if client.tlp_color:
                         indicator['fields']['trafficlightprotocol'] = client.tlp_color
 
-                    indicators.append(indicator)
-                    # exit the loop if we have more indicators than the limit
-                    if limit and len(indicators) >= limit:
-                        return indicators, no_update
-
-    return indicators, no_update
+                    yield indicator
 
 
 def get_indicators_command(client, args: dict, tags: Optional[List[str]] = None):
@@ -425,22 +566,20 @@ def feed_main(feed_name, params=None, prefix=''):
     }
     try:
         if command == 'fetch-indicators':
-            indicators, no_update = fetch_indicators_command(
+            # check if the version is higher than 6.5.0 so we can use noUpdate parameter
+            use_no_update = is_demisto_version_ge('6.5.0')
+            # we submit the indicators in batches, while the feed is downloaded
+            for b, no_update in fetch_indicators_in_batches(
                 client,
                 params.get('indicator_type'),
                 params.get('auto_detect_type'),
                 params.get('limit'),
                 params.get('create_relationships')
-            )
-
-            # check if the version is higher than 6.5.0 so we can use noUpdate parameter
-            if is_demisto_version_ge('6.5.0'):
-                # we submit the indicators in batches
-                for b in batch(indicators, batch_size=2000):
+            ):
+                if use_no_update:
                     demisto.createIndicators(b, noUpdate=no_update)  # type: ignore
-            else:
-                # call createIndicators without noUpdate arg
-                for b in batch(indicators, batch_size=2000):
+                else:
+                    # call createIndicators without noUpdate arg
                     demisto.createIndicators(b)  # type: ignore
 
         else:
@@ -1,6 +1,7 @@
 import requests_mock
 from CSVFeedApiModule import *
 import io
+import itertools
 import pytest
 
 
@@ -148,7 +149,7 @@ def test_get_feed_content():
             m.get(url, content=feed_url_to_config.get(url).get('content'))
             raw_response = requests.get(url)
 
-            assert client.get_feed_content_divided_to_lines(url, raw_response) == expected_output
+            assert list(client.get_feed_content_divided_to_lines(url, raw_response)) == expected_output
 
 
 @pytest.mark.parametrize('date_string,expected_result', [
@@ -441,3 +442,174 @@ def test_get_no_update_value_without_headers(mocker):
     assert not no_update
     assert demisto.debug.call_args[0][0] == 'Last-Modified and Etag headers are not exists,' \
                                             'createIndicators will be executed with noUpdate=False.'
+
+
+class SyntheticCSVFeed(io.RawIOBase):
+    """A CSV feed body of the form `value,score,description` rows, generated while it is read."""
+
+    def __init__(self, rows_count):
+        self.rows = self.generate(rows_count)
+        self.pending = b''
+
+    @staticmethod
+    def generate(rows_count):
+        for i in range(rows_count):
+            yield b'10.%d.%d.%d,%d,"synthetic, row %d"\n' % (i >> 16 & 255, i >> 8 & 255, i & 255, i % 100, i)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        parts = [self.pending]
+        size = len(self.pending)
+        for row in self.rows:
+            parts.append(row)
+            size += len(row)
+            if size >= len(buffer):
+                break
+        data = b''.join(parts)
+        size = min(len(buffer), len(data))
+        buffer[:size] = data[:size]
+        self.pending = data[size:]
+        return size
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 5, 1024])
+def test_decode_lines(chunk_size):
+    """
+    Given
+    - utf-8 content with multi-byte characters, divided to chunks of different sizes.
+
+    When
+    - Decoding it to lines with decode_lines.
+
+    Then
+    - Ensure the lines are the same as decoding the whole content and splitting it.
+    """
+    content = 'a,b\r\n"ä\nö",ü\n\nlast'.encode('utf-8')
+    chunks = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+    assert list(decode_lines(chunks, 'utf-8')) == content.decode('utf-8').split('\n')
+
+
+def test_decompress_gzip_chunks():
+    """
+    Given
+    - A gzip file with two members, divided to chunks.
+
+    When
+    - Decompressing it with decompress_gzip_chunks.
+
+    Then
+    - Ensure the content of both members is returned.
+    """
+    import gzip
+    content = gzip.compress(b'1.1.1.1\n2.2.2.2\n') + gzip.compress(b'3.3.3.3\n')
+    chunks = [content[i:i + 7] for i in range(0, len(content), 7)]
+    assert b''.join(decompress_gzip_chunks(chunks)) == b'1.1.1.1\n2.2.2.2\n3.3.3.3\n'
+
+
+def test_fetch_indicators_in_batches(mocker):
+    """
+    Given
+    - A synthetic feed of 5,500 rows.
+
+    When
+    - Running the fetch-indicators command.
+
+    Then
+    - Ensure the indicators are created in batches of 2000.
+    """
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch('CSVFeedApiModule.is_demisto_version_ge', return_value=True)
+    create_indicators = mocker.patch.object(demisto, 'createIndicators')
+    params = {'url': 'https://feed.example.com/feed.csv', 'fieldnames': 'value,score,description',
+              'indicator_type': 'IP'}
+
+    with requests_mock.Mocker() as m:
+        m.get(params['url'], body=SyntheticCSVFeed(5500))
+        feed_main('Synthetic Feed', params)
+
+    batches = [call[0][0] for call in create_indicators.call_args_list]
+    assert [len(b) for b in batches] == [2000, 2000, 1500]
+    assert batches[0][0]['value'] == '10.0.0.0'
+    assert batches[0][0]['rawJSON'] == {'value': '10.0.0.0', 'score': '0', 'description': 'synthetic, row 0',
+                                        'type': 'IP'}
+    assert batches[-1][-1]['value'] == '10.0.21.123'
+
+
+def test_fetch_indicators_memory_benchmark(mocker):
+    """
+    Given
+    - Synthetic feeds of 20,000 and 100,000 rows (about 4 MB).
+
+    When
+    - Fetching its indicators in batches.
+
+    Then
+    - Ensure the peak memory used does not depend on the feed size, but only on the batch size.
+    """
+    import tracemalloc
+    mocker.patch('CSVFeedApiModule.STREAM_CHUNK_SIZE', 64 * 1024)
+    client = Client(url='https://feed.example.com/feed.csv', fieldnames='value,score,description')
+    peaks = []
+    for rows_count in (20000, 100000):
+        with requests_mock.Mocker() as m:
+            m.get(client._base_url, body=SyntheticCSVFeed(rows_count))
+            tracemalloc.start()
+            try:
+                count = sum(len(b) for b, _ in fetch_indicators_in_batches(client, 'IP', False, batch_size=500))
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+        assert count == rows_count
+
+    assert peaks[1] < peaks[0] * 1.5
+
+
+class BrokenCSVFeed(SyntheticCSVFeed):
+    """A synthetic CSV feed body whose connection is reset after the given number of rows."""
+
+    def __init__(self, rows_count, broken_after):
+        super().__init__(rows_count)
+        self.rows = self.break_after(self.rows, broken_after)
+
+    @staticmethod
+    def break_after(rows, broken_after):
+        for i, row in enumerate(rows):
+            if i == broken_after:
+                raise ConnectionResetError('Connection reset by peer')
+            yield row
+
+
+@pytest.mark.parametrize('body, completed', [
+    (lambda: SyntheticCSVFeed(1200), True),
+    (lambda: BrokenCSVFeed(1200, broken_after=700), False),
+])
+def test_fetch_indicators_in_batches_last_run(mocker, body, completed):
+    """
+    Given
+    - A feed responding with an ETag header, whose body is fully read or whose connection is reset mid-stream.
+
+    When
+    - Fetching its indicators in batches.
+
+    Then
+    - Ensure the last run is saved only after the last batch of the feed was consumed.
+    - Ensure the last run is not saved if the body failed while it was read, so the next fetch reads it again.
+    """
+    mocker.patch('CSVFeedApiModule.STREAM_CHUNK_SIZE', 1024)
+    mocker.patch.object(demisto, 'getLastRun', return_value={})
+    set_last_run = mocker.patch.object(demisto, 'setLastRun')
+    client = Client(url='https://feed.example.com/feed.csv', fieldnames='value,score,description')
+    with requests_mock.Mocker() as m:
+        m.get(client._base_url, body=body(), headers={'ETag': '"v2"'})
+        batches = fetch_indicators_in_batches(client, 'IP', False, batch_size=500)
+        if completed:
+            assert [len(b) for b, _ in itertools.islice(batches, 3)] == [500, 500, 200]
+            assert not set_last_run.called
+            assert list(batches) == []
+            set_last_run.assert_called_once_with({client._base_url: {'last_modified': None, 'etag': '"v2"'}})
+        else:
+            with pytest.raises(Exception):
+                list(batches)
+            assert not set_last_run.called
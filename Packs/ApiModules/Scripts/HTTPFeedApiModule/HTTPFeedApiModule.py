@@ -5,7 +5,8 @@ from CommonServerUserPython import *
 ''' IMPORTS '''
 import urllib3
 import requests
-from typing import Optional, Pattern, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Pattern, List, Dict, Tuple
 
 # disable insecure warnings
 urllib3.disable_warnings()
@@ -14,6 +15,44 @@ urllib3.disable_warnings()
 TAGS = 'tags'
 TLP_COLOR = 'trafficlightprotocol'
 DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+MAX_CONCURRENT_REQUESTS = 8  # max concurrent requests used for fetching the feed URLs
+
+
+class LineExtractor:
+    """
+    Extracts the indicator and the fields of the feed lines, according to the extraction dictionaries of a feed.
+    The regexes and transform templates are compiled once per feed, rather than once per line.
+
+    :param indicator: the extraction dictionary of the indicator, None to use the text until the first whitespace.
+    :param fields: a list of the fields names and their extraction dictionaries.
+    """
+
+    def __init__(self, indicator: Optional[dict], fields: List[Tuple[str, dict]]):
+        self.indicator: Optional[Tuple[Pattern, str]] = None
+        if indicator:
+            self.indicator = re.compile(indicator['regex']), indicator.get('transform', r'\g<0>')
+        self.fields: List[Tuple[str, Pattern, str]] = [
+            (name, re.compile(fattrs['regex']), fattrs.get('transform', r'\g<0>')) for name, fattrs in fields
+        ]
+
+    def extract(self, line: str) -> Tuple[Optional[str], Dict[str, str]]:
+        """
+        Extracts the indicator and the fields of a stripped, non empty line.
+        :return: the indicator (None if the indicator regex doesn't match the line) and the extracted fields.
+        """
+        fields = {}
+        if self.indicator:
+            indicator_match = self.indicator[0].search(line)
+            if indicator_match is None:
+                return None, fields
+            indicator = indicator_match.expand(self.indicator[1])
+        else:
+            indicator = line.split()[0]
+        for name, regex, transform in self.fields:
+            field_match = regex.search(line)
+            if field_match is not None:
+                fields[name] = field_match.expand(transform)
+        return indicator, fields
 
 
 class Client(BaseClient):
@@ -137,6 +176,7 @@ class Client(BaseClient):
         if custom_fields_mapping is None:
             custom_fields_mapping = {}
         self.custom_fields_mapping = custom_fields_mapping
+        self._line_extractors: Dict[str, LineExtractor] = {}
 
     def get_feed_config(self, fields_json: str = '', indicator_json: str = ''):
         """
@@ -204,39 +244,43 @@ class Client(BaseClient):
 
         if self.username is not None and self.password is not None:
             kwargs['auth'] = (self.username, self.password)
+        urls = self._base_url
+        if not isinstance(urls, list):
+            urls = [urls]
+        last_run = demisto.getLastRun()
+
+        def get_url(url):
+            # Set the If-None-Match and If-Modified-Since headers if we have etag or
+            # last_modified values in the context.
+            headers = dict(kwargs.get('headers') or {})
+            etag = last_run.get(url, {}).get('etag')
+            last_modified = last_run.get(url, {}).get('last_modified')
+            if etag:
+                headers['If-None-Match'] = etag
+
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+            return requests.get(
+                url,
+                **dict(kwargs, headers=headers or None)
+            )
+
         try:
-            urls = self._base_url
             url_to_response_list: List[dict] = []
-            if not isinstance(urls, list):
-                urls = [urls]
-            for url in urls:
-                # Set the If-None-Match and If-Modified-Since headers if we have etag or
-                # last_modified values in the context.
-                last_run = demisto.getLastRun()
-                etag = last_run.get(url, {}).get('etag')
-                last_modified = last_run.get(url, {}).get('last_modified')
-                if etag:
-                    if not kwargs.get('headers'):
-                        kwargs['headers'] = {}
-                    kwargs['headers']['If-None-Match'] = etag
-
-                if last_modified:
-                    if not kwargs.get('headers'):
-                        kwargs['headers'] = {}
-                    kwargs['headers']['If-Modified-Since'] = last_modified
-
-                r = requests.get(
-                    url,
-                    **kwargs
-                )
+            with ThreadPoolExecutor(max_workers=max(1, min(MAX_CONCURRENT_REQUESTS, len(urls)))) as executor:
+                responses = list(executor.map(get_url, urls))
+            for url, r in zip(urls, responses):
                 try:
                     r.raise_for_status()
                 except Exception:
                     LOG(f'{self.feed_name!r} - exception in request:'
                         f' {r.status_code!r} {r.content!r}')
                     raise
-                no_update = get_no_update_value(r, url)
+                no_update = get_no_update_value(r, url, last_run)
                 url_to_response_list.append({url: {'response': r, 'no_update': no_update}})
+            if last_run:
+                demisto.setLastRun(last_run)
         except requests.exceptions.ConnectTimeout as exception:
             err_msg = 'Connection Timeout Error - potential reasons might be that the Server URL parameter' \
                       ' is incorrect or that the Server is not accessible from your host.'
@@ -285,6 +329,19 @@ class Client(BaseClient):
                 results.append({url: {'result': result, 'no_update': res_data.get('no_update')}})
         return results
 
+    def get_line_extractor(self, url: str) -> LineExtractor:
+        """
+        Returns the line extractor of the feed URL, built once from the feed configuration.
+        :param url: The feed URL
+        :return: The line extractor
+        """
+        extractor = self._line_extractors.get(url)
+        if extractor is None:
+            feed_config = self.feed_url_to_config.get(url, {})
+            fields = [field_item for field in feed_config.get('fields', []) for field_item in field.items()]
+            extractor = self._line_extractors[url] = LineExtractor(feed_config.get('indicator'), fields)
+        return extractor
+
     def custom_fields_creator(self, attributes: dict):
         created_custom_fields = {}
         for attribute in attributes.keys():
@@ -297,7 +354,7 @@ class Client(BaseClient):
         return created_custom_fields
 
 
-def get_no_update_value(response: requests.Response, url: str) -> bool:
+def get_no_update_value(response: requests.Response, url: str, last_run: Optional[dict] = None) -> bool:
     """
     detect if the feed response has been modified according to the headers etag and last_modified.
     For more information, see this:
@@ -306,6 +363,8 @@ def get_no_update_value(response: requests.Response, url: str) -> bool:
     Args:
         response: (requests.Response) The feed response.
         url: (str) The feed URL (service).
+        last_run: (dict) The last run to update with the response headers. If not given, the last run
+            is read and set by the function.
     Returns:
         boolean with the value for noUpdate argument.
         The value should be False if the response was modified.
@@ -322,9 +381,12 @@ def get_no_update_value(response: requests.Response, url: str) -> bool:
                       'createIndicators will be executed with noUpdate=False.')
         return False
 
-    last_run = demisto.getLastRun()
-    last_run[url] = {'last_modified': last_modified, 'etag': etag}
-    demisto.setLastRun(last_run)
+    if last_run is None:
+        last_run = demisto.getLastRun()
+        last_run[url] = {'last_modified': last_modified, 'etag': etag}
+        demisto.setLastRun(last_run)
+    else:
+        last_run[url] = {'last_modified': last_modified, 'etag': etag}
 
     demisto.debug('New indicators fetched - the Last-Modified value has been updated,'
                   ' createIndicators will be executed with noUpdate=False.')
@@ -353,55 +415,20 @@ def get_indicator_fields(line, url, feed_tags: list, tlp_color: Optional[str], c
     """
     attributes = None
     value: str = ''
-    indicator = None
-    fields_to_extract = []
     feed_config = client.feed_url_to_config.get(url, {})
-    if feed_config:
-        if 'indicator' in feed_config:
-            indicator = feed_config['indicator']
-            if 'regex' in indicator:
-                indicator['regex'] = re.compile(indicator['regex'])
-            if 'transform' not in indicator:
-                indicator['transform'] = r'\g<0>'
-
-    if 'fields' in feed_config:
-        fields = feed_config['fields']
-        for field in fields:
-            for f, fattrs in field.items():
-                field = {f: {}}
-                if 'regex' in fattrs:
-                    field[f]['regex'] = re.compile(fattrs['regex'])
-                if 'transform' not in fattrs:
-                    field[f]['transform'] = r'\g<0>'
-                else:
-                    field[f]['transform'] = fattrs['transform']
-                fields_to_extract.append(field)
 
     line = line.strip()
     if line:
-        extracted_indicator = line.split()[0]
-        if indicator:
-            extracted_indicator = indicator['regex'].search(line)
-            if extracted_indicator is None:
-                return attributes, value
-            if 'transform' in indicator:
-                extracted_indicator = extracted_indicator.expand(indicator['transform'])
-        attributes = {}
-        for field in fields_to_extract:
-            for f, fattrs in field.items():
-                m = fattrs['regex'].search(line)
-
-                if m is None:
-                    continue
-
-                attributes[f] = m.expand(fattrs['transform'])
-
-                try:
-                    i = int(attributes[f])
-                except Exception:
-                    pass
-                else:
-                    attributes[f] = i
+        extracted_indicator, attributes = client.get_line_extractor(url).extract(line)
+        if extracted_indicator is None:
+            return None, value
+        for f in attributes:
+            try:
+                i = int(attributes[f])
+            except Exception:
+                pass
+            else:
+                attributes[f] = i
         attributes['value'] = value = extracted_indicator
         attributes['type'] = feed_config.get('indicator_type', client.indicator_type)
         attributes['tags'] = feed_tags
@@ -513,3 +513,112 @@ def test_get_no_update_value_without_headers(mocker):
     assert not no_update
     assert demisto.debug.call_args[0][0] == 'Last-Modified and Etag headers are not exists,' \
                                             'createIndicators will be executed with noUpdate=False.'
+
+
+DSHIELD_INDICATOR = {
+    'regex': r'^([0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3})\t([0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3})',
+    'transform': r'\1-\2'
+}
+DSHIELD_FIELDS = [
+    ('dshield_nattacks', {'regex': r'^.*\t.*\t[0-9]+\t([0-9]+)', 'transform': r'\1'}),
+    ('dshield_name', {'regex': r'^.*\t.*\t[0-9]+\t[0-9]+\t([^\t]+)', 'transform': r'\g<1>'}),
+    ('dshield_country', {'regex': r'^.*\t.*\t[0-9]+\t[0-9]+\t[^\t]+\t([A-Z]+)', 'transform': r'country: \1\\1'}),
+    ('dshield_email', {'regex': r'\S+@\S+'}),
+]
+DSHIELD_LINES = [
+    '1.1.1.0\t1.1.1.255\t24\t1234\tSome Org\tUS\tabuse@example.com',
+    '2.2.2.0\t2.2.2.255\t24\t42\tOther Org',
+    '#3.3.3.0 comment line',
+]
+
+
+def test_line_extractor():
+    """
+    Given
+    - Extraction dictionaries of the indicator and fields of a feed.
+
+    When
+    - Extracting lines with the line extractor of the feed.
+
+    Then
+    - Ensure the indicator and the fields are extracted with their transform templates.
+    - Ensure lines which the indicator regex doesn't match are skipped.
+    """
+    from HTTPFeedApiModule import LineExtractor
+    extractor = LineExtractor(DSHIELD_INDICATOR, DSHIELD_FIELDS)
+
+    assert extractor.extract(DSHIELD_LINES[0]) == ('1.1.1.0-1.1.1.255', {
+        'dshield_nattacks': '1234',
+        'dshield_name': 'Some Org',
+        'dshield_country': 'country: US\\1',
+        'dshield_email': 'abuse@example.com',
+    })
+    assert extractor.extract(DSHIELD_LINES[1]) == ('2.2.2.0-2.2.2.255', {
+        'dshield_nattacks': '42',
+        'dshield_name': 'Other Org',
+    })
+    assert extractor.extract(DSHIELD_LINES[2]) == (None, {})
+    assert LineExtractor(None, []).extract('8.8.8.8 some text') == ('8.8.8.8', {})
+
+
+def test_build_iterator_multiple_urls(mocker, requests_mock):
+    """
+    Given
+    - A feed with multiple URLs, one of them with an etag in the last run.
+
+    When
+    - Running build_iterator.
+
+    Then
+    - Ensure all the URLs are fetched, and the results are returned in the order of the URLs.
+    - Ensure the last run is read and set once, and the etag is sent only to its URL.
+    """
+    urls = [f'https://feed.example.com/list{i}.txt' for i in range(10)]
+    mocker.patch.object(demisto, 'getLastRun', return_value={urls[3]: {'etag': 'abc'}})
+    mocker.patch.object(demisto, 'setLastRun')
+    for i, url in enumerate(urls):
+        requests_mock.get(url, text=f'{i}.{i}.{i}.{i}\n', headers={'ETag': str(i)})
+
+    client = Client(url=urls, feed_url_to_config={url: {} for url in urls})
+    results = client.build_iterator()
+
+    assert [list(result[url]['result']) for result, url in zip(results, urls)] == [
+        [f'{i}.{i}.{i}.{i}'] for i in range(10)]
+    assert demisto.getLastRun.call_count == 1
+    assert demisto.setLastRun.call_count == 1
+    assert demisto.setLastRun.call_args[0][0][urls[9]] == {'etag': '9', 'last_modified': None}
+    sent_etags = {request.url: request.headers.get('If-None-Match') for request in requests_mock.request_history}
+    assert sent_etags == {url: 'abc' if url == urls[3] else None for url in urls}
+
+
+def test_fetch_indicators_multiple_urls_benchmark(mocker, requests_mock):
+    """
+    Given
+    - A synthetic feed of 4 URLs with 2,500 lines each.
+
+    When
+    - Fetching the indicators.
+
+    Then
+    - Ensure the indicators of all the URLs are fetched, and count the lines extracted per second.
+    """
+    import time
+    mocker.patch.object(demisto, 'getLastRun', return_value={})
+    urls = [f'https://feed.example.com/block{i}.txt' for i in range(4)]
+    feed_url_to_config = {url: {'indicator_type': 'IP', 'indicator': DSHIELD_INDICATOR,
+                                'fields': [dict([field]) for field in DSHIELD_FIELDS]} for url in urls}
+    for n, url in enumerate(urls):
+        requests_mock.get(url, text='\n'.join(
+            f'{n}.{i % 256}.{i // 256}.0\t{n}.{i % 256}.{i // 256}.255\t24\t{i}\tOrg {i}\tUS\tabuse{i}@example.com'
+            for i in range(2500)))
+
+    client = Client(url=urls, feed_url_to_config=feed_url_to_config)
+    start = time.time()
+    indicators, _ = fetch_indicators_command(client, [], None, 'IP', False)
+    lines_per_second = len(indicators) / (time.time() - start)
+
+    assert len(indicators) == 10000
+    assert [indicator['value'] for indicator in indicators[::2500]] == [
+        f'{n}.0.0.0-{n}.0.0.255' for n in range(4)]
+    assert indicators[0]['rawJSON']['dshield_email'] == 'abuse0@example.com'
+    assert lines_per_second > 0
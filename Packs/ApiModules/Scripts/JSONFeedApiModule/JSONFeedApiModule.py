@@ -3,18 +3,23 @@ from CommonServerPython import *
 ''' IMPORTS '''
 import urllib3
 import jmespath
-from typing import List, Dict, Union, Optional, Callable, Tuple
+from typing import Any, List, Dict, Union, Optional, Callable, Tuple, Iterable, Iterator
 
 # disable insecure warnings
 urllib3.disable_warnings()
 
+STREAM_CHUNK_SIZE = 1024 * 1024
+CREATE_INDICATORS_BATCH_SIZE = 2000
+# extractors of the form `@`, `[*]`, `key`, `key.sub_key` or `key.sub_key[*]` can be applied on the streamed response
+STREAMABLE_EXTRACTOR_REGEX = re.compile(r'^(?:@|@?\[\*\]|[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*(?:\[\*\])?)$')
+
 
 class Client:
     def __init__(self, url: str = '', credentials: dict = None,
                  feed_name_to_config: Dict[str, dict] = None, source_name: str = 'JSON',
                  extractor: str = '', indicator: str = 'indicator',
                  insecure: bool = False, cert_file: str = None, key_file: str = None, headers: Union[dict, str] = None,
-                 tlp_color: Optional[str] = None, data: Union[str, dict] = None, **_):
+                 tlp_color: Optional[str] = None, data: Union[str, dict] = None, stream: bool = False, **_):
         """
         Implements class for miners of JSON feeds over http/https.
         :param url: URL of the feed.
@@ -36,6 +41,10 @@ class Client:
         :param data: Data to post. If not specified will do a GET request. May also be passed as dict as
             supported by requests. If passed as a string will set content-type to
             application/x-www-form-urlencoded if not specified in the headers.
+        :param stream: Whether to parse the feed response incrementally while it is downloaded, instead of loading
+            it to memory as a whole. Applies only to feeds with an extractor of the form `@`, `[*]`, `key`,
+            `key.sub_key` or `key.sub_key[*]`, the others are parsed as a whole. Can be overridden per feed with the
+            `stream` key of the feed config.
 
          Example:
             Example feed config:
@@ -77,6 +86,9 @@ class Client:
         self.cert = (cert_file, key_file) if cert_file and key_file else None
         self.tlp_color = tlp_color
         self.post_data = data
+        self.stream = argToBoolean(stream)
+        # the response of a streamed feed, whose etag and last_modified are saved once the feed was fully read
+        self.pending_last_run_response: Optional[requests.Response] = None
 
         if isinstance(self.post_data, str):
             content_type_header = 'Content-Type'
@@ -106,8 +118,10 @@ class Client:
         else:
             return headers
 
-    def build_iterator(self, feed: dict, **kwargs) -> Tuple[List, bool]:
+    def build_iterator(self, feed: dict, **kwargs) -> Tuple[Iterable, bool]:
         url = feed.get('url', self.url)
+        extractor = feed.get('extractor')
+        stream = feed.get('stream', self.stream) and bool(STREAMABLE_EXTRACTOR_REGEX.match(extractor or '@'))
 
         # Set the If-None-Match and If-Modified-Since headers if we have etag or last_modified values in the context.
         last_run = demisto.getLastRun()
@@ -128,6 +142,7 @@ class Client:
                 auth=self.auth,
                 cert=self.cert,
                 headers=self.headers,
+                stream=stream,
                 **kwargs
             )
         else:
@@ -138,14 +153,23 @@ class Client:
                 auth=self.auth,
                 cert=self.cert,
                 headers=self.headers,
+                stream=stream,
                 **kwargs
             )
 
+        if stream:
+            r.raise_for_status()
+            if r.status_code != 304:
+                r.encoding = r.encoding or 'utf-8'
+                result = stream_json_items(r, extractor)
+                self.pending_last_run_response = r
+            return result, get_no_update_value(r, save_last_run=False)
+
         try:
             r.raise_for_status()
             if r.content:
                 data = r.json()
-                result = jmespath.search(expression=feed.get('extractor'), data=data)
+                result = jmespath.search(expression=extractor, data=data)
 
         except ValueError as VE:
             raise ValueError(f'Could not parse returned data to Json. \n\nError massage: {VE}')
@@ -153,7 +177,7 @@ class Client:
         return result, get_no_update_value(r)
 
 
-def get_no_update_value(response: requests.Response) -> bool:
+def get_no_update_value(response: requests.Response, save_last_run: bool = True) -> bool:
     """
     detect if the feed response has been modified according to the headers etag and last_modified.
     For more information, see this:
@@ -161,6 +185,8 @@ def get_no_update_value(response: requests.Response) -> bool:
     https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/ETag
     Args:
         response: (requests.Response) The feed response.
+        save_last_run: (bool) Whether to save the etag and last_modified of the response in the last run.
+            Streamed feeds save them with save_last_run_headers only after the whole response was read.
     Returns:
         boolean with the value for noUpdate argument.
         The value should be False if the response was modified.
@@ -179,14 +205,139 @@ def get_no_update_value(response: requests.Response) -> bool:
                       'createIndicators will be executed with noUpdate=False.')
         return False
 
+    if save_last_run:
+        save_last_run_headers(response)
+
+    demisto.debug('New indicators fetched - the Last-Modified value has been updated,'
+                  ' createIndicators will be executed with noUpdate=False.')
+    return False
+
+
+def save_last_run_headers(response: requests.Response):
+    """
+    Saves the etag and last_modified headers of the feed response in the last run, so the next fetch sends them.
+    Args:
+        response: (requests.Response) The feed response.
+    """
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if not etag and not last_modified:
+        return
+
     last_run = demisto.getLastRun()
     last_run['last_modified'] = last_modified
     last_run['etag'] = etag
     demisto.setLastRun(last_run)
 
-    demisto.debug('New indicators fetched - the Last-Modified value has been updated,'
-                  ' createIndicators will be executed with noUpdate=False.')
-    return False
+
+class JSONStream:
+    """
+    A buffer over the text chunks of a JSON document, that decodes its values one by one while the document
+    is downloaded, and holds in memory only the part of the document that was not decoded yet.
+    """
+
+    def __init__(self, chunks: Iterable[str]):
+        self.chunks = iter(chunks)
+        self.buffer = ''
+        self.pos = 0
+        self.exhausted = False
+        self.decoder = json.JSONDecoder()
+
+    def _read(self, min_size: int = 1) -> bool:
+        """Reads chunks into the buffer until at least min_size more characters were read.
+        Returns False if the document was exhausted before any character was read."""
+        chunks = [self.buffer[self.pos:]]
+        read = 0
+        for chunk in self.chunks:
+            chunks.append(chunk)
+            read += len(chunk)
+            if read >= min_size:
+                break
+        else:
+            self.exhausted = True
+        self.buffer = ''.join(chunks)
+        self.pos = 0
+        return read > 0
+
+    def peek(self) -> str:
+        """Returns the next non whitespace character, or an empty string at the end of the document."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.exhausted or not self._read():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        """Consumes the next non whitespace character, which must be one of the given characters."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f'Expected one of "{chars}" at position {self.pos} of the JSON stream, got "{char}".')
+        self.pos += 1
+        return char
+
+    def decode_value(self) -> Any:
+        """Decodes the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # a number at the end of the buffer might be continued in the next chunk
+                if end < len(self.buffer) or self.exhausted:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+            # grow the buffer geometrically, so large values are not re-decoded once per chunk
+            self._read(min_size=len(self.buffer) - self.pos)
+
+    def iter_path(self, path: List[str]) -> Iterator[Any]:
+        """Yields the items of the value at the given path of keys, or the value itself if it is not an array."""
+        if path:
+            if self.peek() != '{':
+                self.decode_value()
+                return
+            self.expect('{')
+            if self.peek() == '}':
+                return
+            while True:
+                key = self.decode_value()
+                self.expect(':')
+                if key == path[0]:
+                    yield from self.iter_path(path[1:])
+                    return
+                self.decode_value()
+                if self.expect(',}') == '}':
+                    return
+        elif self.peek() == '[':
+            self.expect('[')
+            if self.peek() == ']':
+                return
+            while True:
+                yield self.decode_value()
+                if self.expect(',]') == ']':
+                    return
+        else:
+            yield from self.decode_value() or []
+
+
+def stream_json_items(response: requests.Response, extractor: Optional[str]) -> Iterator[Any]:
+    """
+    Incrementally parses a streamed JSON response, and yields the items extracted from it one by one.
+    Args:
+        response: (requests.Response) The feed response, requested with stream=True.
+        extractor: (str) The feed extractor, of the form `@`, `[*]`, `key`, `key.sub_key` or `key.sub_key[*]`.
+    Returns:
+        A generator of the extracted items.
+    """
+    path = (extractor or '@').lstrip('@').replace('[*]', '')
+    try:
+        yield from JSONStream(response.iter_content(chunk_size=STREAM_CHUNK_SIZE, decode_unicode=True)).iter_path(
+            path.split('.') if path else [])
+    except ValueError as VE:
+        raise ValueError(f'Could not parse returned data to Json. \n\nError massage: {VE}')
+    finally:
+        response.close()
 
 
 def test_module(client: Client, limit) -> str:
@@ -214,32 +365,13 @@ def fetch_indicators_command(client: Client, indicator_type: str, feedTags: list
     feeds_results = {}
     no_update = False
     for feed_name, feed in client.feed_name_to_config.items():
-        custom_build_iterator = feed.get('custom_build_iterator')
-        if custom_build_iterator:
-            indicators_from_feed = custom_build_iterator(client, feed, limit, **kwargs)
-            if not isinstance(indicators_from_feed, list):
-                raise Exception("Custom function to handle with pagination must return a list type")
-            feeds_results[feed_name] = indicators_from_feed
-        else:
-            feeds_results[feed_name], no_update = client.build_iterator(feed, **kwargs)
+        feeds_results[feed_name], feed_no_update = get_feed_items(client, feed, limit, **kwargs)
+        no_update = no_update if feed_no_update is None else feed_no_update
 
     for service_name, items in feeds_results.items():
-        feed_config = client.feed_name_to_config.get(service_name, {})
-        indicator_field = str(feed_config.get('indicator') if feed_config.get('indicator') else 'indicator')
-        indicator_type = str(feed_config.get('indicator_type', indicator_type))
-        use_prefix_flat = bool(feed_config.get('flat_json_with_prefix', False))
-        mapping_function = feed_config.get('mapping_function', indicator_mapping)
-        handle_indicator_function = feed_config.get('handle_indicator_function', handle_indicator)
-        create_relationships_function = feed_config.get('create_relations_function')
-
-        for item in items:
-            if isinstance(item, str):
-                item = {indicator_field: item}
-
-            indicators.extend(
-                handle_indicator_function(client, item, feed_config, service_name, indicator_type, indicator_field,
-                                          use_prefix_flat, feedTags, auto_detect, mapping_function,
-                                          create_relationships, create_relationships_function))
+        for indicator in iterate_indicators(client, service_name, items, indicator_type, feedTags, auto_detect,
+                                            create_relationships):
+            indicators.append(indicator)
 
             if limit and len(indicators) >= limit:  # We have a limitation only when get-indicators command is
                 # called, and then we return for each service_name "limit" of indicators
@@ -247,6 +379,76 @@ def fetch_indicators_command(client: Client, indicator_type: str, feedTags: list
     return indicators, no_update
 
 
+def fetch_indicators_in_batches(client: Client, indicator_type: str, feedTags: list, auto_detect: bool,
+                                create_relationships: bool = False, batch_size: int = CREATE_INDICATORS_BATCH_SIZE,
+                                **kwargs) -> Iterator[Tuple[List[dict], Optional[bool]]]:
+    """
+    Fetches the indicators from client in batches, so only a single batch is held in memory for streamed feeds.
+    :param client: Client of a JSON Feed
+    :param indicator_type: the default indicator type
+    :param feedTags: the indicator tags
+    :param auto_detect: a boolean indicates if we should automatically detect the indicator_type
+    :param create_relationships: whether to add connected indicators
+    :param batch_size: the maximal number of indicators in a batch
+    :return: a generator of (indicators batch, noUpdate value) tuples, with an empty batch for feeds with no indicators.
+        The noUpdate value is None for feeds that were fetched with a custom_build_iterator.
+    """
+    for feed_name, feed in client.feed_name_to_config.items():
+        items, no_update = get_feed_items(client, feed, **kwargs)
+        indicators: List[dict] = []
+        yielded = False
+        for indicator in iterate_indicators(client, feed_name, items, indicator_type, feedTags, auto_detect,
+                                            create_relationships):
+            indicators.append(indicator)
+            if len(indicators) == batch_size:
+                yield indicators, no_update
+                indicators = []
+                yielded = True
+        if indicators or not yielded:
+            yield indicators, no_update
+
+        # the feed was fully read and its last batch was created, so the next fetch may skip it if it was not modified
+        if client.pending_last_run_response is not None:
+            save_last_run_headers(client.pending_last_run_response)
+            client.pending_last_run_response = None
+
+
+def get_feed_items(client: Client, feed: dict, limit: int = 0, **kwargs) -> Tuple[Iterable, Optional[bool]]:
+    """
+    Gets the items of a single feed, using its custom_build_iterator if configured.
+    :return: the feed items and the noUpdate value, None if the feed was fetched with a custom_build_iterator.
+    """
+    custom_build_iterator = feed.get('custom_build_iterator')
+    if custom_build_iterator:
+        indicators_from_feed = custom_build_iterator(client, feed, limit, **kwargs)
+        if not isinstance(indicators_from_feed, list):
+            raise Exception("Custom function to handle with pagination must return a list type")
+        return indicators_from_feed, None
+    return client.build_iterator(feed, **kwargs)
+
+
+def iterate_indicators(client: Client, service_name: str, items: Iterable, indicator_type: str, feedTags: list,
+                       auto_detect: bool, create_relationships: bool = False) -> Iterator[dict]:
+    """
+    Creates the indicators of the given feed items, one by one.
+    """
+    feed_config = client.feed_name_to_config.get(service_name, {})
+    indicator_field = str(feed_config.get('indicator') if feed_config.get('indicator') else 'indicator')
+    indicator_type = str(feed_config.get('indicator_type', indicator_type))
+    use_prefix_flat = bool(feed_config.get('flat_json_with_prefix', False))
+    mapping_function = feed_config.get('mapping_function', indicator_mapping)
+    handle_indicator_function = feed_config.get('handle_indicator_function', handle_indicator)
+    create_relationships_function = feed_config.get('create_relations_function')
+
+    for item in items:
+        if isinstance(item, str):
+            item = {indicator_field: item}
+
+        yield from handle_indicator_function(client, item, feed_config, service_name, indicator_type, indicator_field,
+                                             use_prefix_flat, feedTags, auto_detect, mapping_function,
+                                             create_relationships, create_relationships_function)
+
+
 def indicator_mapping(mapping: Dict, indicator: Dict, attributes: Dict):
     for map_key in mapping:
         if map_key in attributes:
@@ -387,24 +589,15 @@ def feed_main(params, feed_name, prefix):
 
         elif command == 'fetch-indicators':
             create_relationships = params.get('create_relationships')
-            indicators, no_update = fetch_indicators_command(client, indicator_type, feedTags, auto_detect,
-                                                             create_relationships)
-
             # check if the version is higher than 6.5.0 so we can use noUpdate parameter
-            if is_demisto_version_ge('6.5.0'):
-                if not indicators:
-                    demisto.createIndicators(indicators, noUpdate=no_update)
+            use_no_update = is_demisto_version_ge('6.5.0')
+            for indicators, no_update in fetch_indicators_in_batches(client, indicator_type, feedTags, auto_detect,
+                                                                     create_relationships):
+                if use_no_update:
+                    demisto.createIndicators(indicators, noUpdate=bool(no_update))
                 else:
-                    for b in batch(indicators, batch_size=2000):
-                        demisto.createIndicators(b, noUpdate=no_update)
-
-            else:
-                # call createIndicators without noUpdate arg
-                if not indicators:
+                    # call createIndicators without noUpdate arg
                     demisto.createIndicators(indicators)
-                else:
-                    for b in batch(indicators, batch_size=2000):
-                        demisto.createIndicators(b)
 
         elif command == f'{prefix}get-indicators':
             # dummy command for testing
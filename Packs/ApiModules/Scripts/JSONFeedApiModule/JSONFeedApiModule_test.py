@@ -1,5 +1,7 @@
 from JSONFeedApiModule import Client, fetch_indicators_command, jmespath, get_no_update_value
 from CommonServerPython import *
+import io
+import pytest
 import requests_mock
 import demistomock as demisto
 
@@ -233,3 +235,198 @@ def test_get_no_update_value_without_headers(mocker):
     assert not no_update
     assert demisto.debug.call_args[0][0] == 'Last-Modified and Etag headers are not exists,' \
                                             'createIndicators will be executed with noUpdate=False.'
+
+
+class SyntheticFeed(io.RawIOBase):
+    """A JSON feed body of the form {"meta": {...}, "items": [...]}, generated while it is read."""
+
+    def __init__(self, items_count):
+        self.parts = self.generate(items_count)
+        self.pending = b''
+
+    @staticmethod
+    def generate(items_count):
+        yield b'{"meta": {"count": %d, "tags": ["a", "b"]}, "items": [' % items_count
+        for i in range(items_count):
+            yield b'%s{"indicator": "10.%d.%d.%d", "score": %d, "tags": ["synthetic"]}' % (
+                b',' if i else b'', i >> 16 & 255, i >> 8 & 255, i & 255, i % 100)
+        yield b']}'
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        parts = [self.pending]
+        size = len(self.pending)
+        for part in self.parts:
+            parts.append(part)
+            size += len(part)
+            if size >= len(buffer):
+                break
+        data = b''.join(parts)
+        size = min(len(buffer), len(data))
+        buffer[:size] = data[:size]
+        self.pending = data[size:]
+        return size
+
+
+STREAM_JSON_INPUTS = [
+    ('[1, 22, 333, {"a": [4]}]', '@', [1, 22, 333, {'a': [4]}]),
+    (' [ ] ', '[*]', []),
+    ('{"skip": {"x": [1, 2, "]"]}, "items": ["a", "b"]}', 'items[*]', ['a', 'b']),
+    ('{"data": {"other": 1, "ranges": [{"ip": "1.1.1.1"}, 12345]}}', 'data.ranges', [{'ip': '1.1.1.1'}, 12345]),
+    ('{"data": {"ranges": []}}', 'data.missing', []),
+    ('{"hooks": "a"}', 'hooks', ['a']),
+]
+
+
+@pytest.mark.parametrize('document, extractor, expected', STREAM_JSON_INPUTS)
+def test_stream_json_items(document, extractor, expected):
+    """
+    Given
+    - A JSON document streamed in chunks of 3 characters.
+
+    When
+    - Parsing it incrementally with stream_json_items.
+
+    Then
+    - Ensure the items extracted are the same as the items extracted with jmespath from the whole document.
+    """
+    from JSONFeedApiModule import stream_json_items
+
+    class MockResponse:
+        closed = False
+
+        def iter_content(self, chunk_size, decode_unicode):
+            return (document[i:i + 3] for i in range(0, len(document), 3))
+
+        def close(self):
+            self.closed = True
+
+    response = MockResponse()
+    assert list(stream_json_items(response, extractor)) == expected
+    assert list(jmespath.search(extractor, json.loads(document)) or []) == expected
+    assert response.closed
+
+
+def test_stream_json_items_invalid_json():
+    """
+    Given
+    - A truncated JSON document.
+
+    When
+    - Parsing it incrementally with stream_json_items.
+
+    Then
+    - Ensure a ValueError is raised.
+    """
+    from JSONFeedApiModule import stream_json_items
+
+    class MockResponse:
+        def iter_content(self, chunk_size, decode_unicode):
+            return iter(['{"items": [1, 2'])
+
+        def close(self):
+            pass
+
+    with pytest.raises(ValueError, match='Could not parse returned data to Json'):
+        list(stream_json_items(MockResponse(), 'items'))
+
+
+def test_fetch_indicators_streamed_in_batches(mocker):
+    """
+    Given
+    - A synthetic feed of 30,000 indicators and a client configured to stream it.
+
+    When
+    - Running the fetch-indicators command.
+
+    Then
+    - Ensure the indicators are created in batches of 2000, with the same content as without streaming.
+    """
+    import JSONFeedApiModule
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(JSONFeedApiModule, 'is_demisto_version_ge', return_value=True)
+    create_indicators = mocker.patch.object(demisto, 'createIndicators')
+    params = {'url': 'https://feed.example.com/feed.json', 'extractor': 'items[*]', 'indicator': 'indicator',
+              'indicator_type': 'IP', 'stream': 'true'}
+
+    with requests_mock.Mocker() as m:
+        m.get(params['url'], body=SyntheticFeed(30000))
+        JSONFeedApiModule.feed_main(params, 'Synthetic Feed', 'synthetic')
+
+    batches = [call[0][0] for call in create_indicators.call_args_list]
+    assert [len(b) for b in batches] == [2000] * 15
+    assert batches[0][0]['value'] == '10.0.0.0'
+    assert batches[0][0]['rawJSON'] == {'indicator': '10.0.0.0', 'score': 0, 'tags': ['synthetic']}
+    assert batches[-1][-1]['value'] == '10.0.117.47'
+    assert all(call[1] == {'noUpdate': False} for call in create_indicators.call_args_list)
+
+
+@pytest.mark.parametrize('body, saved', [
+    ('{"items": [{"indicator": "1.1.1.1"}, {"indicator": "2.2.2.2"}]}', True),
+    ('{"items": [{"indicator": "1.1.1.1"}, {"indicator": "2.2.2', False),
+])
+def test_fetch_indicators_streamed_last_run(mocker, body, saved):
+    """
+    Given
+    - A streamed feed response with etag and last_modified headers, whose body is complete or cut in the middle.
+
+    When
+    - Fetching its indicators in batches.
+
+    Then
+    - Ensure the etag and last_modified are saved only after the last batch was handed over, and only if the body
+      was fully read, so a feed which was read partially is fetched again.
+    """
+    from JSONFeedApiModule import fetch_indicators_in_batches
+    mocker.patch.object(demisto, 'getLastRun', return_value={})
+    set_last_run = mocker.patch.object(demisto, 'setLastRun')
+    client = Client(url='https://feed.example.com/feed.json', extractor='items', stream=True)
+    headers = {'ETag': 'd309ab6e51ed310cf869dab0dfd0d34b',  # guardrails-disable-line
+               'Last-Modified': 'Fri, 30 Jul 2021 00:24:13 GMT'}
+
+    with requests_mock.Mocker() as m:
+        m.get('https://feed.example.com/feed.json', text=body, headers=headers)
+        batches = fetch_indicators_in_batches(client, 'IP', [], False, batch_size=1)
+        try:
+            for _ in batches:
+                assert not set_last_run.called
+        except ValueError:
+            pass
+
+    if saved:
+        set_last_run.assert_called_once_with({'etag': headers['ETag'], 'last_modified': headers['Last-Modified']})
+    else:
+        assert not set_last_run.called
+
+
+def test_stream_json_items_memory_benchmark(mocker):
+    """
+    Given
+    - A synthetic feed of 100,000 indicators (about 7 MB).
+
+    When
+    - Fetching its indicators with streaming.
+
+    Then
+    - Ensure the peak memory used while parsing the feed is a small fraction of the feed size.
+    """
+    import tracemalloc
+    import JSONFeedApiModule
+    mocker.patch.object(JSONFeedApiModule, 'STREAM_CHUNK_SIZE', 64 * 1024)
+    feed_size = sum(len(part) for part in SyntheticFeed.generate(100000))
+    client = Client(url='https://feed.example.com/feed.json', extractor='items', stream=True)
+
+    with requests_mock.Mocker() as m:
+        m.get(client.url, body=SyntheticFeed(100000))
+        tracemalloc.start()
+        try:
+            items, _ = client.build_iterator(client.feed_name_to_config['JSON'])
+            count = sum(1 for _ in items)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    assert count == 100000
+    assert peak < feed_size / 10
@@ -9,9 +9,19 @@ import subprocess
 import gevent
 from signal import SIGUSR1
 import requests
+from flask import Response, request
+from werkzeug.http import http_date
 from flask.logging import default_handler
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, Iterator, IO, Optional
+from threading import Lock
+from contextlib import nullcontext
+import glob
+import gzip
+import hashlib
+import mmap
 import os
+import uuid
+import zlib
 import traceback
 from string import Template
 
@@ -42,6 +52,9 @@ NGINX_SSL_CERTS = f'''
     ssl_certificate {NGINX_SSL_CRT_FILE};
     ssl_certificate_key {NGINX_SSL_KEY_FILE};
 '''
+LIST_CACHE_CHUNK_SIZE = 64 * 1024  # size of the chunks of the cached lists, when written and streamed
+LIST_CACHE_ENCODINGS = ['gzip', 'deflate']
+LIST_CACHE_MAX_FILES = 20  # maximal number of cached lists of a path format, e.g. of different request arguments
 NGINX_SERVER_CONF = '''
 server {
 
@@ -243,6 +256,227 @@ def get_params_port(params: Dict = None) -> int:
     return port
 
 
+def remove_files(*paths: str):
+    """Removes the files, ignoring files which don't exist"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class ListCacheFile:
+    """
+    A list served by the long running server, cached in a file which is written once per build, optionally with a
+    gzip compressed copy, and streamed to the clients in chunks.
+    The ETag, Last-Modified and size of the list are computed while the file is written, rather than on every
+    request, so conditional requests of unchanged lists are answered without reading the file.
+
+    :param path: the path of the cache file.
+    """
+    _lock = Lock()
+
+    def __init__(self, path: str):
+        self.path = path
+        self.gzip_path = f'{path}.gz'
+        self.meta_path = f'{path}.meta'
+        self.etag = ''
+        self.size = 0
+        self.key = ''
+        self.mimetype = 'text/plain'
+        self.built = 0.0
+        self.modified = 0.0
+        self.compressed = False
+
+    def write(self, lines: Iterable[str], empty_comment: str = '', key: str = '',
+              mimetype: str = 'text/plain', compress: bool = True) -> 'ListCacheFile':
+        """
+        Writes the lines to the cache file, separated by new lines.
+        The Last-Modified time of the list is kept if the written list is identical to the previous one.
+
+        :param lines: the lines of the list.
+        :param empty_comment: a comment to write if there are no lines, not counted in the list size.
+        :param key: an identifier of the written list, used by the callers to detect if the file is up to date.
+        :param mimetype: the mimetype of the list.
+        :param compress: whether to write the gzip compressed copy, served to clients accepting gzip when streamed.
+        :return: the cache file.
+        """
+        sha1 = hashlib.sha1()  # guardrails-disable-line
+        size = 0
+        tmp_suffix = f'.{uuid.uuid4().hex}.tmp'
+        try:
+            with open(self.path + tmp_suffix, 'wb') as file, \
+                    (gzip.GzipFile(self.gzip_path + tmp_suffix, 'wb', compresslevel=6, mtime=0) if compress
+                     else nullcontext()) as gzip_file:
+
+                def write_chunk(chunk: str):
+                    data = chunk.encode('utf-8')
+                    file.write(data)
+                    if gzip_file:
+                        gzip_file.write(data)
+                    sha1.update(data)
+
+                chunk_lines: List[str] = []
+                chunk_len = 0
+                for line in lines:
+                    chunk_lines.append(str(line))
+                    chunk_len += len(chunk_lines[-1]) + 1
+                    size += 1
+                    if chunk_len >= LIST_CACHE_CHUNK_SIZE:
+                        write_chunk(('\n' if size > len(chunk_lines) else '') + '\n'.join(chunk_lines))
+                        chunk_lines, chunk_len = [], 0
+                if chunk_lines:
+                    write_chunk(('\n' if size > len(chunk_lines) else '') + '\n'.join(chunk_lines))
+                if not size and empty_comment:
+                    write_chunk(empty_comment)
+        except BaseException:
+            # the lines are usually generated while written, so a failed search must not leave the partial files
+            remove_files(self.path + tmp_suffix, self.gzip_path + tmp_suffix)
+            raise
+
+        etag = sha1.hexdigest()
+        previous = ListCacheFile(self.path)
+        with self._lock:
+            previous_loaded = previous._load_meta()
+            os.replace(self.path + tmp_suffix, self.path)
+            if compress:
+                os.replace(self.gzip_path + tmp_suffix, self.gzip_path)
+            else:
+                remove_files(self.gzip_path)
+            self.built = time.time()
+            self.modified = previous.modified if previous_loaded and previous.etag == etag else self.built
+            self.etag, self.size, self.key, self.mimetype = etag, size, key, mimetype
+            self.compressed = compress
+            with open(self.meta_path, 'w') as meta_file:
+                json.dump({'etag': self.etag, 'size': self.size, 'key': self.key, 'mimetype': self.mimetype,
+                           'built': self.built, 'modified': self.modified, 'compressed': self.compressed},
+                          meta_file)
+        return self
+
+    def _load_meta(self) -> bool:
+        try:
+            with open(self.meta_path, 'r') as meta_file:
+                meta = json.load(meta_file)
+        except (OSError, ValueError):
+            return False
+        self.etag, self.size, self.key = meta['etag'], meta['size'], meta.get('key', '')
+        self.mimetype = meta.get('mimetype', 'text/plain')
+        self.built, self.modified = meta.get('built', 0.0), meta.get('modified', 0.0)
+        self.compressed = meta.get('compressed', True)
+        return True
+
+    def load(self) -> bool:
+        """
+        Loads the ETag, Last-Modified, size, key and mimetype of the cache file, and marks it as recently used.
+
+        :return: False if the cache file wasn't written yet.
+        """
+        with self._lock:
+            if not self._load_meta():
+                return False
+            try:
+                os.utime(self.meta_path)
+            except OSError:
+                pass
+            return True
+
+    @classmethod
+    def evict(cls, path_format: str, max_files: int = LIST_CACHE_MAX_FILES) -> List[str]:
+        """
+        Deletes the least recently written or loaded cache files of a path format, keeping up to max_files lists.
+
+        :param path_format: the format of the paths of the cache files, e.g. 'edl_list_{}.txt'.
+        :param max_files: the number of cache files to keep.
+        :return: the paths of the deleted cache files.
+        """
+        def last_used(meta_path: str) -> float:
+            try:
+                return os.path.getmtime(meta_path)
+            except OSError:
+                return 0.0
+
+        with cls._lock:
+            meta_paths = sorted(glob.glob(path_format.format('*') + '.meta'), key=last_used)
+            evicted = [meta_path[:-len('.meta')] for meta_path in meta_paths[:max(len(meta_paths) - max_files, 0)]]
+            for path in evicted:
+                remove_files(path, f'{path}.gz', f'{path}.meta')
+        return evicted
+
+    def is_built_since(self, seconds: float) -> bool:
+        """Returns whether the cache file was written in the last given seconds"""
+        return self.built > time.time() - seconds
+
+    def open(self, encoding: Optional[str] = None) -> IO[bytes]:
+        """Opens the cache file, or its gzip compressed copy if the encoding is gzip"""
+        with self._lock:
+            return open(self.gzip_path if encoding == 'gzip' else self.path, 'rb')
+
+    @staticmethod
+    def iter_chunks(file: IO[bytes], encoding: Optional[str] = None) -> Iterator[bytes]:
+        """
+        Reads the opened cache file in chunks, compressing them on the fly if the encoding is deflate.
+        """
+        with file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                compressor = zlib.compressobj() if encoding == 'deflate' else None
+                for offset in range(0, len(mapped), LIST_CACHE_CHUNK_SIZE):
+                    chunk = mapped[offset:offset + LIST_CACHE_CHUNK_SIZE]
+                    if compressor:
+                        chunk = compressor.compress(chunk)
+                    if chunk:
+                        yield chunk
+                if compressor:
+                    yield compressor.flush()
+
+    def is_not_modified(self) -> bool:
+        """
+        Returns whether the conditional headers of the current request match the cached list.
+        If-None-Match takes precedence over If-Modified-Since, as defined in RFC 7232.
+        """
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(self.etag)
+        if request.if_modified_since and self.modified:
+            return int(self.modified) <= request.if_modified_since.timestamp()
+        return False
+
+    def to_response(self, mimetype: Optional[str] = None, headers: Optional[List[tuple]] = None,
+                    stream: bool = True) -> Response:
+        """
+        Creates a response of the cache file for the current request.
+        A 304 response is returned if the conditional headers of the request match the cached list. Otherwise,
+        the file is streamed in chunks, compressed according to the Accept-Encoding header of the request.
+
+        :param mimetype: the mimetype of the response, defaults to the mimetype of the written list.
+        :param headers: additional headers of the response.
+        :param stream: whether to stream the file, rather than respond with its whole uncompressed content.
+        :return: the response.
+        """
+        headers = list(headers or []) + [
+            ('ETag', f'"{self.etag}"'),
+            ('Last-Modified', http_date(self.modified)),
+        ]
+        if stream:
+            headers.append(('Vary', 'Accept-Encoding'))
+        if self.is_not_modified():
+            return Response(status=304, headers=headers)
+
+        if not stream:
+            with self.open() as file:
+                return Response(file.read(), status=200, mimetype=mimetype or self.mimetype, headers=headers)
+
+        encoding = request.accept_encodings.best_match(
+            [encoding for encoding in LIST_CACHE_ENCODINGS if self.compressed or encoding != 'gzip'])
+        file = self.open(encoding)
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        if encoding != 'deflate':
+            headers.append(('Content-Length', str(os.fstat(file.fileno()).st_size)))
+        return Response(self.iter_chunks(file, encoding), status=200, mimetype=mimetype or self.mimetype,
+                        headers=headers, direct_passthrough=True)
+
+
 def run_long_running(params: Dict = None, is_test: bool = False):
     """
     Start the long running server
@@ -161,3 +161,177 @@ def test_nginx_log_process(nginx_cleanup, mocker: MockerFixture):
     # make sure log was rolled over files should be of size 0
     assert not Path(module.NGINX_SERVER_ACCESS_LOG).stat().st_size
     assert not Path(module.NGINX_SERVER_ERROR_LOG).stat().st_size
+
+
+@pytest.mark.parametrize('lines, empty_comment, expected', [
+    (['1.1.1.1', '2.2.2.2', '3.3.3.3'], '', b'1.1.1.1\n2.2.2.2\n3.3.3.3'),
+    ([f'{i}.example.com' for i in range(20000)], '', '\n'.join(f'{i}.example.com' for i in range(20000)).encode()),
+    ([], '# Empty EDL', b'# Empty EDL'),
+    ([], '', b''),
+])
+def test_list_cache_file_write(tmp_path: Path, lines, empty_comment, expected):
+    """
+    Given
+    - Lines of a list, written in one or more chunks.
+
+    When
+    - Writing the lines to a list cache file.
+
+    Then
+    - Ensure the file holds the lines separated by new lines, and its gzip copy holds the same content.
+    - Ensure the ETag and the size of the list are computed, and are loaded by another instance.
+    """
+    import gzip
+    import hashlib
+    from NGINXApiModule import ListCacheFile
+    path = str(tmp_path / 'list.txt')
+    ListCacheFile(path).write(iter(lines), empty_comment=empty_comment, key='build-1')
+
+    list_cache = ListCacheFile(path)
+    assert list_cache.load()
+    assert (list_cache.etag, list_cache.size, list_cache.key) == (hashlib.sha1(expected).hexdigest(), len(lines),
+                                                                  'build-1')
+    with open(path, 'rb') as f:
+        assert f.read() == expected
+    with gzip.open(f'{path}.gz', 'rb') as f:
+        assert f.read() == expected
+    assert not ListCacheFile(str(tmp_path / 'missing.txt')).load()
+
+
+@pytest.mark.parametrize('accept_encoding, decompress', [
+    ('', lambda data: data),
+    ('gzip, deflate', lambda data: __import__('gzip').decompress(data)),
+    ('deflate', lambda data: __import__('zlib').decompress(data)),
+])
+def test_list_cache_file_response(tmp_path: Path, accept_encoding, decompress):
+    """
+    Given
+    - A list cache file of a large list.
+
+    When
+    - Requesting the list with different Accept-Encoding headers, and with the ETag of the list.
+
+    Then
+    - Ensure the list is streamed in chunks, compressed according to the request.
+    - Ensure a 304 response is returned when the ETag matches.
+    """
+    from flask import Flask
+    from NGINXApiModule import ListCacheFile, LIST_CACHE_CHUNK_SIZE
+    lines = [f'{i}.example.com' for i in range(50000)]
+    list_cache = ListCacheFile(str(tmp_path / 'list.txt')).write(lines)
+    app = Flask('test')
+    app.add_url_rule('/', view_func=lambda: list_cache.to_response(headers=[('X-EDL-Size', str(list_cache.size))]))
+
+    with app.test_client() as client:
+        response = client.get('/', headers={'Accept-Encoding': accept_encoding})
+        chunks = list(response.response)
+        assert response.status_code == 200
+        assert response.headers['ETag'] == f'"{list_cache.etag}"'
+        assert response.headers['X-EDL-Size'] == '50000'
+        assert response.headers.get('Content-Encoding') == (accept_encoding.split(',')[0] or None)
+        assert max(len(chunk) for chunk in chunks) <= LIST_CACHE_CHUNK_SIZE
+        assert decompress(b''.join(chunks)).decode() == '\n'.join(lines)
+
+        response = client.get('/', headers={'Accept-Encoding': accept_encoding,
+                                            'If-None-Match': f'"{list_cache.etag}"'})
+        assert response.status_code == 304
+        assert response.data == b''
+
+
+def test_list_cache_file_conditional_response(tmp_path: Path, mocker: MockerFixture):
+    """
+    Given
+    - A list cache file, rewritten with the same list and then with a changed list.
+
+    When
+    - Requesting the list with If-None-Match and If-Modified-Since headers, streamed and not streamed.
+
+    Then
+    - Ensure the Last-Modified time is kept when the same list is rewritten, and updated when the list changes.
+    - Ensure 304 is returned when the headers match, with If-None-Match taking precedence.
+    """
+    from flask import Flask
+    import NGINXApiModule as module
+    from NGINXApiModule import ListCacheFile
+    path = str(tmp_path / 'list.txt')
+    mocker.patch.object(module.time, 'time', return_value=1000000000.0)
+    list_cache = ListCacheFile(path).write(['1.1.1.1'], mimetype='application/json')
+    mocker.patch.object(module.time, 'time', return_value=1000000100.0)
+    assert ListCacheFile(path).write(['1.1.1.1']).modified == list_cache.modified == 1000000000.0
+    assert list_cache.is_built_since(50) is False
+    app = Flask('test')
+    app.add_url_rule('/', view_func=lambda: list_cache.to_response(stream=False))
+
+    with app.test_client() as client:
+        etag, last_modified = f'"{list_cache.etag}"', 'Sun, 09 Sep 2001 01:46:40 GMT'
+        response = client.get('/')
+        assert (response.status_code, response.data, response.mimetype) == (200, b'1.1.1.1', 'application/json')
+        assert response.headers['Last-Modified'] == last_modified
+        assert client.get('/', headers={'If-None-Match': f'W/{etag}'}).status_code == 304
+        assert client.get('/', headers={'If-Modified-Since': last_modified}).status_code == 304
+        assert client.get('/', headers={'If-None-Match': '"other"', 'If-Modified-Since': last_modified}).status_code \
+            == 200
+
+        list_cache = ListCacheFile(path).write(['2.2.2.2'])
+        assert list_cache.modified == 1000000100.0
+        assert client.get('/', headers={'If-Modified-Since': last_modified}).status_code == 200
+
+
+def test_list_cache_file_write_uncompressed_and_failed(tmp_path: Path):
+    """
+    Given
+    - A list cache file written with a gzip compressed copy.
+
+    When
+    - Writing it again without compression, and then with lines which fail while generated.
+
+    Then
+    - Ensure the gzip copy is deleted and gzip isn't offered to the clients of the uncompressed list.
+    - Ensure the failed write keeps the previous list and leaves no temporary files.
+    """
+    from flask import Flask
+    from NGINXApiModule import ListCacheFile
+    path = str(tmp_path / 'list.txt')
+    ListCacheFile(path).write(['1.1.1.1'])
+    list_cache = ListCacheFile(path).write(['2.2.2.2'], compress=False)
+    assert not Path(f'{path}.gz').exists()
+    app = Flask('test')
+    app.add_url_rule('/', view_func=lambda: list_cache.to_response())
+    with app.test_client() as client:
+        assert client.get('/', headers={'Accept-Encoding': 'gzip'}).headers.get('Content-Encoding') is None
+        assert client.get('/', headers={'Accept-Encoding': 'gzip, deflate'}).headers['Content-Encoding'] == 'deflate'
+
+    def failing_lines():
+        yield '3.3.3.3'
+        raise ValueError('search failed')
+
+    with pytest.raises(ValueError):
+        ListCacheFile(path).write(failing_lines())
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['list.txt', 'list.txt.meta']
+    assert ListCacheFile(path).load()
+    assert Path(path).read_text() == '2.2.2.2'
+
+
+def test_list_cache_file_evict(tmp_path: Path):
+    """
+    Given
+    - List cache files of 4 request arguments, one of them loaded after the others were written.
+
+    When
+    - Evicting the cache files of the path format, keeping up to 2 lists.
+
+    Then
+    - Ensure the files of the least recently written or loaded lists are deleted.
+    """
+    import os
+    from NGINXApiModule import ListCacheFile
+    path_format = str(tmp_path / 'list_{}.txt')
+    for i, signature in enumerate(['a', 'b', 'c', 'd']):
+        ListCacheFile(path_format.format(signature)).write([signature])
+        os.utime(path_format.format(signature) + '.meta', (1000 + i, 1000 + i))
+    assert ListCacheFile(path_format.format('a')).load()
+
+    assert ListCacheFile.evict(path_format, max_files=2) == [path_format.format('b'), path_format.format('c')]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['list_a.txt', 'list_a.txt.gz', 'list_a.txt.meta',
+                                                          'list_d.txt', 'list_d.txt.gz', 'list_d.txt.meta']
+    assert ListCacheFile.evict(path_format, max_files=2) == []
@@ -2,10 +2,10 @@ import demistomock as demisto
 from CommonServerPython import *
 from CommonServerUserPython import *
 
-from typing import Union, Optional, List, Dict, Tuple
+from typing import Union, Optional, List, Dict, Tuple, Iterator
 from requests.sessions import merge_setting, CaseInsensitiveDict
+from concurrent.futures import ThreadPoolExecutor
 import re
-import copy
 import types
 import urllib3
 from taxii2client import v20, v21
@@ -24,20 +24,24 @@ HEADER_USERNAME = "_header:"
 
 ERR_NO_COLL = "No collection is available for this user, please make sure you entered the configuration correctly"
 
-# Pattern Regexes - used to extract indicator type and value
-INDICATOR_OPERATOR_VAL_FORMAT_PATTERN = r"(\w.*?{value}{operator})'(.*?)'"
-INDICATOR_EQUALS_VAL_PATTERN = INDICATOR_OPERATOR_VAL_FORMAT_PATTERN.format(
-    value="value", operator="="
+# STIX 2 pattern tokens - object paths, strings (b/h/t prefixed for binary, hex and timestamp), comparison operators,
+# keywords, numbers and punctuation
+STIX_PATTERN_TOKEN_REGEX = re.compile(
+    r"(?P<path>[a-z0-9_-]+:(?:[\w-]|'(?:[^'\\]|\\.)*'|\.|\[(?:\*|\d+)\])+)"
+    r"|(?P<string>[bht]?'(?:[^'\\]|\\.)*')"
+    r"|(?P<operator>!=|<=|>=|=|<|>)"
+    r"|(?P<word>[A-Za-z]+)"
+    r"|(?P<number>[-+]?\d+(?:\.\d+)?)"
+    r"|(?P<punct>[\[\](),])"
 )
-CIDR_ISSUBSET_VAL_PATTERN = INDICATOR_OPERATOR_VAL_FORMAT_PATTERN.format(
-    value="value", operator="ISSUBSET"
-)
-CIDR_ISUPPERSET_VAL_PATTERN = INDICATOR_OPERATOR_VAL_FORMAT_PATTERN.format(
-    value="value", operator="ISUPPERSET"
-)
-HASHES_EQUALS_VAL_PATTERN = INDICATOR_OPERATOR_VAL_FORMAT_PATTERN.format(
-    value=r"hashes\..*?", operator="="
+# a pattern of a single observation with a single string comparison, the common case which needs no tokenizing
+STIX_SIMPLE_PATTERN_REGEX = re.compile(
+    r"\s*\[\s*([a-z0-9_-]+:(?:[\w-]|'(?:[^'\\]|\\.)*'|\.|\[(?:\*|\d+)\])+)\s*"
+    r"(!=|<=|>=|=|<|>|LIKE|MATCHES|ISSUBSET|ISSUPERSET|ISUPPERSET)\s*'((?:[^'\\]|\\.)*)'\s*\]\s*"
 )
+STIX_PATTERN_STRING_ESCAPE_REGEX = re.compile(r"\\(.)")
+STIX_PATTERN_WORD_OPERATORS = {"IN", "LIKE", "MATCHES", "ISSUBSET", "ISSUPERSET", "ISUPPERSET"}
+STIX_PATTERN_CIDR_OPERATORS = {"ISSUBSET", "ISSUPERSET", "ISUPPERSET"}
 
 TAXII_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
 TAXII_TIME_FORMAT_NO_MS = "%Y-%m-%dT%H:%M:%SZ"
@@ -60,6 +64,88 @@ STIX_2_TYPES_TO_CORTEX_CIDR_TYPES = {
 }
 
 
+def prefetch_iterator(iterator: Iterator) -> Iterator:
+    """
+    Yields the items of an iterator, getting the next item in a background thread while the current one is consumed
+    :param iterator: the iterator to prefetch, it's never advanced concurrently
+    :return: the items of the iterator
+    """
+    end = object()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        next_item = executor.submit(next, iterator, end)
+        while True:
+            item = next_item.result()
+            if item is end:
+                return
+            next_item = executor.submit(next, iterator, end)
+            yield item
+
+
+def parse_stix_pattern(pattern: str) -> List[Tuple[str, str, str]]:
+    """
+    Parses the comparison expressions of a STIX 2 pattern in a single pass over its tokens
+    :param pattern: stix pattern
+    :return: (object path, operator, value) of each comparison expression in the pattern. The operator is prefixed
+     with "NOT " when negated, each value of an IN list is returned as a comparison of its own, and the value of EXISTS
+     is empty. String values are unquoted and unescaped
+    """
+    simple_pattern = STIX_SIMPLE_PATTERN_REGEX.fullmatch(pattern)
+    if simple_pattern:
+        object_path, operator, value = simple_pattern.groups()
+        return [(object_path, operator, STIX_PATTERN_STRING_ESCAPE_REGEX.sub(r"\1", value) if "\\" in value else value)]
+
+    comparisons: List[Tuple[str, str, str]] = []
+    object_path = operator = ""
+    negated = in_list = exists = False
+    for token in STIX_PATTERN_TOKEN_REGEX.finditer(pattern):
+        kind = token.lastgroup
+        text = token.group()
+        if kind == "path":
+            if exists:
+                comparisons.append((text, "EXISTS", ""))
+                exists = False
+            else:
+                object_path, operator, negated = text, "", False
+        elif not object_path:
+            # observation operators and qualifiers
+            exists = text == "EXISTS"
+        elif not operator:
+            if text == "NOT":
+                negated = True
+            elif kind == "operator" or text in STIX_PATTERN_WORD_OPERATORS:
+                operator = f"NOT {text}" if negated else text
+        elif text == "(" and operator.endswith("IN"):
+            in_list = True
+        elif kind in ("string", "number", "word"):
+            if kind == "string" and text[0] == "'":
+                text = STIX_PATTERN_STRING_ESCAPE_REGEX.sub(r"\1", text[1:-1])
+            comparisons.append((object_path, operator, text))
+            if not in_list:
+                object_path = ""
+        elif text == ")" and in_list:
+            in_list = False
+            object_path = ""
+    return comparisons
+
+
+def get_cortex_type(object_path: str, operator: str) -> Optional[str]:
+    """
+    Gets the cortex indicator type of a STIX 2 pattern comparison
+    :param object_path: the object path of the comparison, e.g. ipv4-addr:value or file:hashes.'SHA-256'
+    :param operator: the comparison operator
+    :return: the cortex type, None if the comparison isn't a supported indicator
+    """
+    object_type, _, property_path = object_path.partition(":")
+    property_name = property_path.partition(".")[0]
+    if operator == "=":
+        if property_name == "value":
+            return STIX_2_TYPES_TO_CORTEX_TYPES.get(object_type)
+        return STIX_2_TYPES_TO_CORTEX_TYPES.get(f"{object_type}:{property_name}")
+    if operator in STIX_PATTERN_CIDR_OPERATORS and property_name == "value":
+        return STIX_2_TYPES_TO_CORTEX_CIDR_TYPES.get(object_type)
+    return None
+
+
 class Taxii2FeedClient:
     def __init__(
             self,
@@ -124,14 +210,6 @@ class Taxii2FeedClient:
         self.field_map = field_map if field_map else {}
         self.tags = tags if tags else []
         self.tlp_color = tlp_color
-        self.indicator_regexes = [
-            re.compile(INDICATOR_EQUALS_VAL_PATTERN),
-            re.compile(HASHES_EQUALS_VAL_PATTERN),
-        ]
-        self.cidr_regexes = [
-            re.compile(CIDR_ISSUBSET_VAL_PATTERN),
-            re.compile(CIDR_ISUPPERSET_VAL_PATTERN),
-        ]
 
     def init_server(self, version=TAXII_VER_2_0):
         """
@@ -221,6 +299,18 @@ class Taxii2FeedClient:
         :param limit: max amount of indicators to fetch
         :return: Cortex indicators list
         """
+        indicators: List[Dict[str, str]] = []
+        for indicators_page in self.iter_indicator_pages(limit, **kwargs):
+            indicators.extend(indicators_page)
+        return indicators
+
+    def iter_indicator_pages(self, limit: int = -1, **kwargs) -> Iterator[List[Dict[str, str]]]:
+        """
+        Polls the taxii server and yields the cortex indicators objects page by page, the next page is requested
+        while the current one is parsed
+        :param limit: max amount of indicators to fetch
+        :return: Cortex indicators pages iterator
+        """
         if not isinstance(self.collection_to_fetch, (v20.Collection, v21.Collection)):
             raise DemistoException(
                 "Could not find a collection to fetch from. "
@@ -231,10 +321,9 @@ class Taxii2FeedClient:
 
         page_size = self.get_page_size(limit, limit)
         if page_size <= 0:
-            return []
+            return
         envelope = self.poll_collection(page_size, **kwargs)
-        indicators = self.extract_indicators_from_envelope_and_parse(envelope, limit)
-        return indicators
+        yield from self.iter_parsed_envelope_pages(envelope, limit)
 
     def extract_indicators_from_envelope_and_parse(
             self, envelope: Union[types.GeneratorType, Dict[str, str]], limit: int = -1
@@ -246,8 +335,46 @@ class Taxii2FeedClient:
         :param limit: max amount of indicators to fetch
         :return: Cortex indicators list
         """
-        indicators = []
+        indicators: List[Dict[str, str]] = []
+        for indicators_page in self.iter_parsed_envelope_pages(envelope, limit):
+            indicators.extend(indicators_page)
+        return indicators
+
+    def iter_parsed_envelope_pages(
+            self, envelope: Union[types.GeneratorType, Dict[str, str]], limit: int = -1
+    ) -> Iterator[List[Dict[str, str]]]:
+        """
+        Extract indicators from an 2.0 envelope generator, or 2.1 envelope (which then polls and repeats process)
+        and yields them page by page as cortex indicators
+        :param envelope: envelope containing stix objects
+        :param limit: max amount of indicators to fetch
+        :return: Cortex indicators pages iterator
+        """
+        indicators_cnt = 0
         obj_cnt = 0
+        for stix_objects in prefetch_iterator(self.iter_envelope_objects(envelope, limit)):
+            obj_cnt += len(stix_objects)
+            indicators = self.parse_indicators_list(self.extract_indicators_from_stix_objects(stix_objects))
+            if limit > -1:
+                indicators = indicators[:limit - indicators_cnt]
+            indicators_cnt += len(indicators)
+            yield indicators
+            if limit > -1 and indicators_cnt >= limit:
+                break
+        demisto.debug(
+            f"TAXII 2 Feed has extracted {indicators_cnt} indicators / {obj_cnt} stix objects"
+        )
+
+    def iter_envelope_objects(
+            self, envelope: Union[types.GeneratorType, Dict[str, str]], limit: int = -1
+    ) -> Iterator[List[Dict[str, str]]]:
+        """
+        Yields the stix objects of an 2.0 envelope generator, or 2.1 envelope (which then polls and repeats process)
+        page by page
+        :param envelope: envelope containing stix objects
+        :param limit: max amount of indicators to fetch
+        :return: stix objects pages iterator
+        """
         # TAXII 2.0
         if isinstance(envelope, types.GeneratorType):
             for sub_envelope in envelope:
@@ -255,50 +382,21 @@ class Taxii2FeedClient:
                 if not stix_objects:
                     # no fetched objects
                     break
-                obj_cnt += len(stix_objects)
-                indicators.extend(
-                    self.parse_indicators_list(
-                        self.extract_indicators_from_stix_objects(stix_objects)
-                    )
-                )
-                if 0 < limit <= len(indicators):
-                    break
+                yield stix_objects
         # TAXII 2.1
         elif isinstance(envelope, Dict):
-            cur_limit = limit
-            stix_objects = envelope.get("objects")
-            obj_cnt += len(stix_objects)
-            indicators_list = self.extract_indicators_from_stix_objects(stix_objects)
-            indicators = self.parse_indicators_list(indicators_list)
+            yield envelope.get("objects") or []
+            page_size = self.get_page_size(limit, limit)
             while envelope.get("more", False):
-                page_size = self.get_page_size(limit, cur_limit)
                 envelope = self.collection_to_fetch.get_objects(
                     limit=page_size, next=envelope.get("next", "")
                 )
-                if isinstance(envelope, Dict):
-                    stix_objects = envelope.get("objects")
-                    obj_cnt += len(stix_objects)
-                    extracted_iocs = self.extract_indicators_from_stix_objects(
-                        stix_objects
-                    )
-                    parsed_iocs = self.parse_indicators_list(extracted_iocs)
-                    indicators.extend(parsed_iocs)
-
-                    if limit > -1:
-                        cur_limit -= len(envelope)  # type: ignore
-                        if cur_limit < 0:
-                            break
-                else:
+                if not isinstance(envelope, Dict):
                     raise DemistoException(
                         "Error: TAXII 2 client received the following response while requesting "
                         f"indicators: {str(envelope)}\n\nExpected output is json"
                     )
-        demisto.debug(
-            f"TAXII 2 Feed has extracted {len(indicators)} indicators / {obj_cnt} stix objects"
-        )
-        if limit > -1:
-            return indicators[:limit]
-        return indicators
+                yield envelope.get("objects") or []
 
     def poll_collection(
             self, page_size: int, **kwargs
@@ -352,20 +450,22 @@ class Taxii2FeedClient:
         """
         indicators = []
         if indicators_objs:
+            # the latest modified time is kept parsed while going over the page
+            last_datetime = None
+            if self.last_fetched_indicator__modified is not None:
+                last_datetime = self.stix_time_to_datetime(self.last_fetched_indicator__modified)
             for indicator_obj in indicators_objs:
                 indicators.extend(self.parse_single_indicator(indicator_obj))
                 indicator_modified_str = indicator_obj.get("modified")
                 if self.last_fetched_indicator__modified is None:
                     self.last_fetched_indicator__modified = indicator_modified_str  # type: ignore[assignment]
-                else:
-                    last_datetime = self.stix_time_to_datetime(
-                        self.last_fetched_indicator__modified
-                    )
-                    indicator_created_datetime = self.stix_time_to_datetime(
-                        indicator_modified_str
-                    )
-                    if indicator_created_datetime > last_datetime:
-                        self.last_fetched_indicator__modified = indicator_modified_str
+                    continue
+                indicator_modified_datetime = self.stix_time_to_datetime(indicator_modified_str)
+                if last_datetime is None:
+                    last_datetime = self.stix_time_to_datetime(self.last_fetched_indicator__modified)
+                if indicator_modified_datetime > last_datetime:
+                    self.last_fetched_indicator__modified = indicator_modified_str
+                    last_datetime = indicator_modified_datetime
         return indicators
 
     def parse_single_indicator(
@@ -380,67 +480,15 @@ class Taxii2FeedClient:
         pattern = indicator_obj.get("pattern")
         indicators = []
         if pattern:
-            # this is done in case the server doesn't properly space the operator,
-            # supported indicators have no spaces, so this action shouldn't affect extracted values
-            trimmed_pattern = pattern.replace(" ", "")
-
-            indicator_groups = self.extract_indicator_groups_from_pattern(
-                trimmed_pattern, self.indicator_regexes
-            )
-            indicators.extend(
-                self.get_indicators_from_indicator_groups(
-                    indicator_groups,
-                    indicator_obj,
-                    STIX_2_TYPES_TO_CORTEX_TYPES,
-                    field_map,
-                )
-            )
+            comparisons = parse_stix_pattern(pattern)
+            if self.skip_complex_mode and len(comparisons) > 1:
+                # the pattern relates multiple observations or values - a complex indicator
+                return []
+            for object_path, operator, value in comparisons:
+                type_ = get_cortex_type(object_path, operator)
+                if type_:
+                    indicators.append(self.create_indicator(indicator_obj, type_, value, field_map))
 
-            cidr_groups = self.extract_indicator_groups_from_pattern(
-                trimmed_pattern, self.cidr_regexes
-            )
-            indicators.extend(
-                self.get_indicators_from_indicator_groups(
-                    cidr_groups,
-                    indicator_obj,
-                    STIX_2_TYPES_TO_CORTEX_CIDR_TYPES,
-                    field_map,
-                )
-            )
-
-        return indicators
-
-    def get_indicators_from_indicator_groups(
-            self,
-            indicator_groups: List[Tuple[str, str]],
-            indicator_obj: Dict[str, str],
-            indicator_types: Dict[str, str],
-            field_map: Dict[str, str],
-    ) -> List[Dict[str, str]]:
-        """
-        Get indicators from indicator regex groups
-        :param indicator_groups: caught regex group in pattern of: [`type`, `indicator`]
-        :param indicator_obj: taxii indicator object
-        :param indicator_types: supported indicator types -> cortex types
-        :param field_map: map used to create fields entry ({field_name: field_value})
-        :return: Indicators list
-        """
-        indicators = []
-        if indicator_groups:
-            for term in indicator_groups:
-                for taxii_type in indicator_types.keys():
-                    # term should be list with 2 argument parsed with regex - [`type`, `indicator`]
-                    if len(term) == 2 and taxii_type in term[0]:
-                        type_ = indicator_types[taxii_type]
-                        value = term[1]
-                        indicator = self.create_indicator(
-                            indicator_obj, type_, value, field_map
-                        )
-                        indicators.append(indicator)
-                        break
-        if self.skip_complex_mode and len(indicators) > 1:
-            # we managed to pull more than a single indicator - indicating complex relationship
-            return []
         return indicators
 
     def create_indicator(self, indicator_obj, type_, value, field_map):
@@ -452,7 +500,9 @@ class Taxii2FeedClient:
         :param field_map: field map used for mapping fields ({field_name: field_value})
         :return: Cortex indicator
         """
-        ioc_obj_copy = copy.deepcopy(indicator_obj)
+        # the rawJSON of all the indicators extracted from a stix indicator share its nested objects, which are
+        # never modified, rather than copying them per indicator
+        ioc_obj_copy = dict(indicator_obj)
         ioc_obj_copy["value"] = value
         ioc_obj_copy["type"] = type_
         indicator = {
@@ -491,23 +541,6 @@ class Taxii2FeedClient:
         indicator["fields"] = fields
         return indicator
 
-    @staticmethod
-    def extract_indicator_groups_from_pattern(
-            pattern: str, regexes: List
-    ) -> List[Tuple[str, str]]:
-        """
-        Extracts indicator [`type`, `indicator`] groups from pattern
-        :param pattern: stix pattern
-        :param regexes: regexes to run to pattern
-        :return: extracted indicators list from pattern
-        """
-        groups: List[Tuple[str, str]] = []
-        for regex in regexes:
-            find_result = regex.findall(pattern)
-            if find_result:
-                groups.extend(find_result)
-        return groups
-
     @staticmethod
     def stix_time_to_datetime(s_time):
         """
@@ -515,6 +548,13 @@ class Taxii2FeedClient:
         :param s_time: time in string format
         :return: datetime
         """
+        # fast path for the common millisecond / microsecond precision, strptime is much slower
+        if len(s_time) in (24, 27) and s_time[10] == "T" and s_time[19] == "." and s_time[-1] == "Z" \
+                and s_time[20:-1].isdigit():
+            try:
+                return datetime.fromisoformat(s_time[:-1])
+            except ValueError:
+                pass
         try:
             return datetime.strptime(s_time, TAXII_TIME_FORMAT)
         except ValueError:
@@ -320,3 +320,138 @@ class TestExtractIndicatorsAndParse:
 
         assert len(actual) == 14
         assert actual == expected
+
+    def test_21_pages(self, mocker):
+        """
+        Scenario: Test 21 envelope extract of multiple pages
+
+        Given:
+        - Envelope with 19 STIX2 objects - out of them 17 are iocs, which has another page of the same objects
+
+        When:
+        - iter_parsed_envelope_pages is called with and without a limit
+
+        Then:
+        - Extract and parse the indicators page by page, requesting the next page with the envelope next value
+        - Stop extracting once the limit is reached
+        - Keep the latest modified time of the indicators
+        """
+        mock_client = Taxii2FeedClient(url='', collection_to_fetch=None, proxies=[], verify=False, tlp_color='GREEN')
+        mock_client.collection_to_fetch = mocker.MagicMock()
+        mock_client.collection_to_fetch.get_objects.return_value = STIX_ENVELOPE_17_IOCS_19_OBJS
+        envelope = dict(STIX_ENVELOPE_17_IOCS_19_OBJS, more=True, next='2')
+
+        pages = list(mock_client.iter_parsed_envelope_pages(envelope))
+
+        assert pages == [CORTEX_17_IOCS_19_OBJS, CORTEX_17_IOCS_19_OBJS]
+        mock_client.collection_to_fetch.get_objects.assert_called_once_with(limit=100, next='2')
+        assert mock_client.last_fetched_indicator__modified == max(
+            obj['modified'] for obj in STIX_ENVELOPE_17_IOCS_19_OBJS['objects'] if obj['type'] == 'indicator')
+
+        pages = list(mock_client.iter_parsed_envelope_pages(envelope, limit=10))
+
+        assert pages == [CORTEX_17_IOCS_19_OBJS[:10]]
+
+    def test_create_indicator_shares_raw_json(self):
+        """
+        Scenario: Test creating the indicators of a complex stix indicator
+
+        Given:
+        - A stix indicator with a pattern of two indicators
+
+        When:
+        - create_indicator is called for each of the indicators
+
+        Then:
+        - Each indicator has its own value and type in its rawJSON
+        - The stix indicator is not modified
+        """
+        mock_client = Taxii2FeedClient(url='', collection_to_fetch='', proxies=[], verify=False)
+        indicator_obj = {'type': 'indicator', 'pattern': '', 'labels': ['label'], 'modified': '2021-01-01T00:00:00Z'}
+
+        ip = mock_client.create_indicator(indicator_obj, 'IP', '1.1.1.1', {})
+        domain = mock_client.create_indicator(indicator_obj, 'Domain', 'example.com', {})
+
+        assert ip['rawJSON']['value'] == '1.1.1.1'
+        assert domain['rawJSON']['value'] == 'example.com'
+        assert domain['rawJSON']['type'] == 'Domain'
+        assert indicator_obj['type'] == 'indicator'
+        assert 'value' not in indicator_obj
+
+
+@pytest.mark.parametrize('pattern, expected', [
+    ("[ipv4-addr:value = '1.1.1.1']", [('ipv4-addr:value', '=', '1.1.1.1')]),
+    ("[file:hashes.'SHA-256' = 'abc']", [("file:hashes.'SHA-256'", '=', 'abc')]),
+    ("[url:value = 'http://x.com/it\\'s a path']", [('url:value', '=', "http://x.com/it's a path")]),
+    ("[ipv4-addr:value ISSUBSET '10.0.0.0/8']", [('ipv4-addr:value', 'ISSUBSET', '10.0.0.0/8')]),
+    ("[file:hashes.MD5 = 'aa' OR file:hashes.'SHA-1' = 'bb']",
+     [('file:hashes.MD5', '=', 'aa'), ("file:hashes.'SHA-1'", '=', 'bb')]),
+    ("([domain-name:value = 'a.com'] FOLLOWEDBY [url:value NOT LIKE '%.exe']) WITHIN 300 SECONDS",
+     [('domain-name:value', '=', 'a.com'), ('url:value', 'NOT LIKE', '%.exe')]),
+    ("[network-traffic:dst_port = 443 AND network-traffic:dst_ref.value IN ('1.1.1.1', '2.2.2.2')]",
+     [('network-traffic:dst_port', '=', '443'), ('network-traffic:dst_ref.value', 'IN', '1.1.1.1'),
+      ('network-traffic:dst_ref.value', 'IN', '2.2.2.2')]),
+    ("[file:extensions.'windows-pebinary-ext'.sections[*].entropy > 7.0 AND EXISTS file:name]",
+     [("file:extensions.'windows-pebinary-ext'.sections[*].entropy", '>', '7.0'), ('file:name', 'EXISTS', '')]),
+    ("[file:created = t'2021-01-01T00:00:00Z'] START t'2021-01-01T00:00:00Z' STOP t'2021-02-01T00:00:00Z'",
+     [('file:created', '=', "t'2021-01-01T00:00:00Z'")]),
+])
+def test_parse_stix_pattern(pattern, expected):
+    """
+    Given:
+    - STIX 2 patterns - simple, escaped, compound, with observation operators, qualifiers, lists and object paths
+     with quoted and indexed components
+
+    When:
+    - parse_stix_pattern is called
+
+    Then:
+    - Ensure every comparison expression is returned with its object path, operator and value
+    """
+    from TAXII2ApiModule import parse_stix_pattern
+    assert parse_stix_pattern(pattern) == expected
+
+
+@pytest.mark.parametrize('object_path, operator, expected', [
+    ('ipv4-addr:value', '=', 'IP'),
+    ('ipv4-addr:value', 'ISSUBSET', 'CIDR'),
+    ('ipv6-addr:value', 'ISSUPERSET', 'IPv6CIDR'),
+    ('domain-name:value', '=', 'Domain'),
+    ("file:hashes.'SHA-256'", '=', 'File'),
+    ('ipv4-addr:value', '!=', None),
+    ('email-addr:value', '=', None),
+    ('network-traffic:dst_ref.value', '=', None),
+])
+def test_get_cortex_type(object_path, operator, expected):
+    """
+    Given:
+    - STIX 2 pattern comparisons
+
+    When:
+    - get_cortex_type is called
+
+    Then:
+    - Ensure the supported comparisons are mapped to their cortex types, and the others are not
+    """
+    from TAXII2ApiModule import get_cortex_type
+    assert get_cortex_type(object_path, operator) == expected
+
+
+@pytest.mark.parametrize('skip_complex_mode, expected', [(False, ['1.1.1.1']), (True, [])])
+def test_parse_single_indicator_complex_with_unsupported_comparison(skip_complex_mode, expected):
+    """
+    Given:
+    - A STIX indicator of an IP and a port, of which only the IP is a supported indicator
+
+    When:
+    - parse_single_indicator is called with and without skip_complex_mode
+
+    Then:
+    - Ensure the IP is extracted only when complex indicators are not skipped
+    """
+    mock_client = Taxii2FeedClient(url='', collection_to_fetch='', proxies=[], verify=False,
+                                   skip_complex_mode=skip_complex_mode)
+    indicator_obj = {'type': 'indicator', 'modified': '2021-01-01T00:00:00Z',
+                     'pattern': "[ipv4-addr:value = '1.1.1.1' AND network-traffic:dst_port = 443]"}
+
+    assert [ioc['value'] for ioc in mock_client.parse_single_indicator(indicator_obj)] == expected
@@ -20,7 +20,7 @@ from collections import OrderedDict
 from datetime import datetime, timedelta
 from abc import abstractmethod
 from distutils.version import LooseVersion
-from threading import Lock
+from threading import BoundedSemaphore, Condition, Lock, local as thread_local
 
 import demistomock as demisto
 import warnings
@@ -51,6 +51,12 @@ _warnings_handler = WarningsHandler()
 logging.raiseExceptions = False
 
 # imports something that can be missed from docker image
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except Exception:
+    if sys.version_info[0] < 3:
+        sys.exc_clear()
+
 try:
     import requests
     from requests.adapters import HTTPAdapter
@@ -528,72 +534,188 @@ def get_schedule_metadata(context):
     return schedule_metadata
 
 
-def auto_detect_indicator_type(indicator_value):
+class IndicatorTypeDetector(object):
     """
-      Infer the type of the indicator.
+      Infers the types of indicators. The checks run in the same order as in ``auto_detect_indicator_type``,
+      but a check only runs when the characters of the value can match it.
+      The public suffix extractor is created once, and the types of recently seen values are kept in an LRU cache.
 
-      :type indicator_value: ``str``
-      :param indicator_value: The indicator whose type we want to check. (required)
+      :type cache_size: ``int``
+      :param cache_size: The maximal number of values whose types are kept in the cache.
 
-      :return: The type of the indicator.
-      :rtype: ``str``
+      :return: No data returned
+      :rtype: ``None``
     """
-    try:
-        import tldextract
-    except Exception:
-        raise Exception("Missing tldextract module, In order to use the auto detect function please use a docker"
-                        " image with it installed such as: demisto/jmespath")
+    IPV4_CHECK = 'ipv4'
+    IPV6_CHECK = 'ipv6'
+    HASH_CHECK = 'hash'
+    URL_CHECK = 'url'
+    EMAIL_CHECK = 'email'
+    CVE_CHECK = 'cve'
+
+    HEX_DIGITS = frozenset('0123456789abcdefABCDEF')
+    URL_FIRST_CHARACTERS = frozenset('hfw')
+    CVE_FIRST_CHARACTERS = frozenset('cC')
+
+    def __init__(self, cache_size=10000):
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # type: OrderedDict
+        self.cache_lock = Lock()
+        self.tldextract = None
+        self.tld_extractor = None
+        self.checks = [
+            (self.IPV4_CHECK, re.compile(ipv4cidrRegex), FeedIndicatorType.CIDR),
+            (self.IPV6_CHECK, re.compile(ipv6cidrRegex), FeedIndicatorType.IPv6CIDR),
+            (self.IPV4_CHECK, re.compile(ipv4Regex), FeedIndicatorType.IP),
+            (self.IPV6_CHECK, re.compile(ipv6Regex), FeedIndicatorType.IPv6),
+            (self.HASH_CHECK, sha256Regex, FeedIndicatorType.File),
+            (self.URL_CHECK, re.compile(urlRegex), FeedIndicatorType.URL),
+            (self.HASH_CHECK, md5Regex, FeedIndicatorType.File),
+            (self.HASH_CHECK, sha1Regex, FeedIndicatorType.File),
+            (self.EMAIL_CHECK, re.compile(emailRegex), FeedIndicatorType.Email),
+            (self.CVE_CHECK, re.compile(cveRegex), FeedIndicatorType.CVE),
+            (self.HASH_CHECK, sha512Regex, FeedIndicatorType.File),
+        ]
+
+    def get_enabled_checks(self, indicator_value):
+        """
+          Returns the checks which can match the value, based on its first character and the characters it contains.
 
-    if re.match(ipv4cidrRegex, indicator_value):
-        return FeedIndicatorType.CIDR
+          :type indicator_value: ``str``
+          :param indicator_value: The indicator value.
 
-    if re.match(ipv6cidrRegex, indicator_value):
-        return FeedIndicatorType.IPv6CIDR
+          :return: The names of the checks which can match the value.
+          :rtype: ``set``
+        """
+        first_character = indicator_value[:1]
+        enabled_checks = set()
+        if first_character.isdigit():
+            enabled_checks.add(self.IPV4_CHECK)
+        if ':' in indicator_value:
+            enabled_checks.add(self.IPV6_CHECK)
+        if first_character in self.HEX_DIGITS and len(indicator_value) >= 32:
+            enabled_checks.add(self.HASH_CHECK)
+        if first_character in self.URL_FIRST_CHARACTERS:
+            enabled_checks.add(self.URL_CHECK)
+        if '@' in indicator_value:
+            enabled_checks.add(self.EMAIL_CHECK)
+        if first_character in self.CVE_FIRST_CHARACTERS:
+            enabled_checks.add(self.CVE_CHECK)
+        return enabled_checks
+
+    def get_tld_extractor(self):
+        """
+          Returns the public suffix extractor, creating it on the first call.
 
-    if re.match(ipv4Regex, indicator_value):
-        return FeedIndicatorType.IP
+          :return: The extractor.
+          :rtype: ``tldextract.TLDExtract``
+        """
+        if self.tld_extractor is None:
+            if LooseVersion(self.tldextract.__version__) < '3.0.0':
+                self.tld_extractor = self.tldextract.TLDExtract(cache_file=False, suffix_list_urls=None)
+            else:
+                self.tld_extractor = self.tldextract.TLDExtract(cache_dir=False, suffix_list_urls=None)
+        return self.tld_extractor
 
-    if re.match(ipv6Regex, indicator_value):
-        return FeedIndicatorType.IPv6
+    def detect_uncached(self, indicator_value):
+        """
+          Infer the type of the indicator without using the cache.
 
-    if re.match(sha256Regex, indicator_value):
-        return FeedIndicatorType.File
+          :type indicator_value: ``str``
+          :param indicator_value: The indicator whose type we want to check. (required)
 
-    if re.match(urlRegex, indicator_value):
-        return FeedIndicatorType.URL
+          :return: The type of the indicator.
+          :rtype: ``str``
+        """
+        enabled_checks = self.get_enabled_checks(indicator_value)
+        for check, pattern, indicator_type in self.checks:
+            if check in enabled_checks and pattern.match(indicator_value):
+                return indicator_type
 
-    if re.match(md5Regex, indicator_value):
-        return FeedIndicatorType.File
+        try:
+            if self.get_tld_extractor()(indicator_value).suffix:
+                if '*' in indicator_value:
+                    return FeedIndicatorType.DomainGlob
+                return FeedIndicatorType.Domain
 
-    if re.match(sha1Regex, indicator_value):
-        return FeedIndicatorType.File
+        except Exception:
+            demisto.debug('tldextract failed to detect indicator type. indicator value: {}'.format(indicator_value))
 
-    if re.match(emailRegex, indicator_value):
-        return FeedIndicatorType.Email
+        demisto.debug('Failed to detect indicator type. Indicator value: {}'.format(indicator_value))
+        return None
 
-    if re.match(cveRegex, indicator_value):
-        return FeedIndicatorType.CVE
+    def detect(self, indicator_value):
+        """
+          Infer the type of the indicator.
 
-    if re.match(sha512Regex, indicator_value):
-        return FeedIndicatorType.File
+          :type indicator_value: ``str``
+          :param indicator_value: The indicator whose type we want to check. (required)
 
-    try:
-        tldextract_version = tldextract.__version__
-        if LooseVersion(tldextract_version) < '3.0.0':
-            no_cache_extract = tldextract.TLDExtract(cache_file=False, suffix_list_urls=None)
-        else:
-            no_cache_extract = tldextract.TLDExtract(cache_dir=False, suffix_list_urls=None)
+          :return: The type of the indicator.
+          :rtype: ``str``
+        """
+        if self.tldextract is None:
+            try:
+                import tldextract
+            except Exception:
+                raise Exception("Missing tldextract module, In order to use the auto detect function please use a docker"
+                                " image with it installed such as: demisto/jmespath")
+            self.tldextract = tldextract
+
+        # the detector is shared between threads, so the LRU lookup and update must not interleave
+        with self.cache_lock:
+            if indicator_value in self.cache:
+                self.cache[indicator_value] = indicator_type = self.cache.pop(indicator_value)
+                return indicator_type
+
+        indicator_type = self.detect_uncached(indicator_value)
+        with self.cache_lock:
+            self.cache[indicator_value] = indicator_type
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return indicator_type
 
-        if no_cache_extract(indicator_value).suffix:
-            if '*' in indicator_value:
-                return FeedIndicatorType.DomainGlob
-            return FeedIndicatorType.Domain
+    def detect_batch(self, indicator_values):
+        """
+          Infer the types of several indicators. Each distinct value is checked once.
 
-    except Exception:
-        demisto.debug('tldextract failed to detect indicator type. indicator value: {}'.format(indicator_value))
+          :type indicator_values: ``list``
+          :param indicator_values: The indicators whose types we want to check. (required)
 
-    demisto.debug('Failed to detect indicator type. Indicator value: {}'.format(indicator_value))
-    return None
+          :return: The types of the indicators, in the order of the values.
+          :rtype: ``list``
+        """
+        indicator_types = {}  # type: dict
+        for indicator_value in indicator_values:
+            if indicator_value not in indicator_types:
+                indicator_types[indicator_value] = self.detect(indicator_value)
+        return [indicator_types[indicator_value] for indicator_value in indicator_values]
+
+
+def auto_detect_indicator_type(indicator_value):
+    """
+      Infer the type of the indicator.
+
+      :type indicator_value: ``str``
+      :param indicator_value: The indicator whose type we want to check. (required)
+
+      :return: The type of the indicator.
+      :rtype: ``str``
+    """
+    return indicator_type_detector.detect(indicator_value)
+
+
+def auto_detect_indicator_types(indicator_values):
+    """
+      Infer the types of a list of indicators at once.
+
+      :type indicator_values: ``list``
+      :param indicator_values: The indicators whose types we want to check. (required)
+
+      :return: The types of the indicators, in the order of the values.
+      :rtype: ``list``
+    """
+    return indicator_type_detector.detect_batch(indicator_values)
 
 
 def add_http_prefix_if_missing(address=''):
@@ -700,6 +822,24 @@ def skip_cert_verification():
             del os.environ[k]
 
 
+def get_url_host_prefix(url):
+    """
+        Returns the scheme and host part of a url, used as the key of the connection it is sent over.
+
+        Example:
+        "https://google.com/api?q=1"  => "https://google.com"
+        "https://google.com:8443/"    => "https://google.com:8443"
+
+        :type url: ``string``
+        :param url: URL string (required)
+
+        :return: The scheme and host of the url.
+        :rtype: ``string``
+    """
+    match = re.match(r'^[a-zA-Z][a-zA-Z0-9+.-]*://[^/?#]*', url)
+    return match.group(0) if match else url
+
+
 def urljoin(url, suffix=""):
     """
         Will join url and its suffix
@@ -1774,8 +1914,29 @@ def create_clickable_url(url):
     return '[{}]({})'.format(url, url)
 
 
+def _format_table_cell(cell):
+    """
+       Formats the content of a markdown table cell as formatCell does, without converting plain numbers to JSON.
+
+       :type cell: ``Any``
+       :param cell: The cell content
+
+       :return: The formatted cell content as a string
+       :rtype: ``str``
+    """
+    if cell is None:
+        return ''
+    if isinstance(cell, STRING_TYPES):
+        return cell
+    if type(cell) is int:
+        return str(cell)
+    if type(cell) is float and float('-inf') < cell < float('inf'):
+        return repr(cell)
+    return formatCell(cell, False)
+
+
 def tableToMarkdown(name, t, headers=None, headerTransform=None, removeNull=False, metadata=None, url_keys=None,
-                    date_fields=None):
+                    date_fields=None, max_rows=None, max_cell_len=None):
     """
        Converts a demisto table in JSON form to a Markdown table
 
@@ -1804,6 +1965,13 @@ def tableToMarkdown(name, t, headers=None, headerTransform=None, removeNull=Fals
        :type date_fields: ``list``
        :param date_fields: A list of date fields to format the value to human-readable output.
 
+       :type max_rows: ``int``
+       :param max_rows: The maximal number of rows to present. When the table has more rows, the rest are omitted
+            and a footer with their number is added. Empty columns are detected in the presented rows only.
+
+       :type max_cell_len: ``int``
+       :param max_cell_len: The maximal length of the content of a cell. Longer contents are cut and end with '...'.
+
        :return: A string representation of the markdown table
        :rtype: ``str``
     """
@@ -1811,16 +1979,16 @@ def tableToMarkdown(name, t, headers=None, headerTransform=None, removeNull=Fals
     if url_keys:
         t = url_to_clickable_markdown(t, url_keys)
 
-    mdResult = ''
+    md_lines = []  # type: list
     if name:
-        mdResult = '### ' + name + '\n'
+        md_lines.append('### ' + name + '\n')
 
     if metadata:
-        mdResult += metadata + '\n'
+        md_lines.append(metadata + '\n')
 
     if not t or len(t) == 0:
-        mdResult += '**No entries.**\n'
-        return mdResult
+        md_lines.append('**No entries.**\n')
+        return ''.join(md_lines)
 
     if not headers and isinstance(t, dict) and len(t.keys()) == 1:
         # in case of a single key, create a column table where each element is in a different row.
@@ -1847,52 +2015,56 @@ def tableToMarkdown(name, t, headers=None, headerTransform=None, removeNull=Fals
         headers = list(t[0].keys())
         headers.sort()
 
+    omitted_rows = 0
+    if max_rows is not None and len(t) > max_rows:
+        omitted_rows = len(t) - max_rows
+        t = t[:max_rows]
+
     if removeNull:
-        headers_aux = headers[:]
-        for header in headers:
-            if all(obj.get(header) in ('', None, [], {}) for obj in t):
-                headers_aux.remove(header)
-        headers = headers_aux
+        # a single pass over the rows, which stops once every column has a value
+        null_headers = set(headers)
+        for obj in t:
+            for header in [header for header in null_headers if obj.get(header) not in ('', None, [], {})]:
+                null_headers.remove(header)
+            if not null_headers:
+                break
+        headers = [header for header in headers if header not in null_headers]
 
     if t and len(headers) > 0:
-        newHeaders = []
         if headerTransform is None:  # noqa
             def headerTransform(s): return stringEscapeMD(s, True, True)  # noqa
-        for header in headers:
-            newHeaders.append(headerTransform(header))
-        mdResult += '|'
-        if len(newHeaders) == 1:
-            mdResult += newHeaders[0]
-        else:
-            mdResult += '|'.join(newHeaders)
-        mdResult += '|\n'
-        sep = '---'
-        mdResult += '|' + '|'.join([sep] * len(headers)) + '|\n'
+        md_lines.append('|' + '|'.join([headerTransform(header) for header in headers]) + '|\n')
+        md_lines.append('|' + '|'.join(['---'] * len(headers)) + '|\n')
         for entry in t:
-            entry_copy = entry.copy()
             if date_fields:
+                entry = entry.copy()
                 for field in date_fields:
                     try:
-                        entry_copy[field] = datetime.fromtimestamp(int(entry_copy[field]) / 1000).strftime('%Y-%m-%d %H:%M:%S')
+                        entry[field] = datetime.fromtimestamp(int(entry[field]) / 1000).strftime('%Y-%m-%d %H:%M:%S')
                     except Exception:
                         pass
 
-            vals = [stringEscapeMD((formatCell(entry_copy.get(h, ''), False) if entry_copy.get(h) is not None else ''),
-                                   True, True) for h in headers]
+            cells = [_format_table_cell(entry.get(h)) for h in headers]
+            if max_cell_len is not None:
+                cells = [cell[:max_cell_len] + '...' if len(cell) > max_cell_len else cell for cell in cells]
+            # only cells with pipes or line breaks have something to escape
+            vals = [stringEscapeMD(cell, True, True) if '|' in cell or '\n' in cell or '\r' in cell else cell
+                    for cell in cells]
 
             # this pipe is optional
-            mdResult += '| '
             try:
-                mdResult += ' | '.join(vals)
+                md_lines.append('| ' + ' | '.join(vals) + ' |\n')
             except UnicodeDecodeError:
                 vals = [str(v) for v in vals]
-                mdResult += ' | '.join(vals)
-            mdResult += ' |\n'
+                md_lines.append('| ' + ' | '.join(vals) + ' |\n')
 
     else:
-        mdResult += '**No entries.**\n'
+        md_lines.append('**No entries.**\n')
 
-    return mdResult
+    if omitted_rows:
+        md_lines.append('\n**Truncated, {} more {}.**\n'.format(omitted_rows, 'row' if omitted_rows == 1 else 'rows'))
+
+    return ''.join(md_lines)
 
 
 tblToMd = tableToMarkdown
@@ -5918,6 +6090,178 @@ class CommandResults:
         return return_entry
 
 
+class ResultSink(object):
+    """
+    Sends the entries of CommandResults to the War Room. The default sink sends each entry as is with demisto.results.
+    Use set_result_sink to replace the sink used by return_results.
+
+    :return: None
+    :rtype: ``None``
+    """
+
+    def send(self, results):
+        """
+        Sends the entry of the given results.
+
+        :type results: ``CommandResults``
+        :param results: The results to send.
+
+        :return: None
+        :rtype: ``None``
+        """
+        demisto.results(results.to_context())
+
+
+class FileResultSink(ResultSink):
+    """
+    A sink which keeps large raw responses out of the entries. When the raw response of the results is longer than
+    max_inline_size once serialized, it is written to a file entry chunk by chunk while it is being serialized, and the
+    entry holds a short summary instead. The context outputs and the human readable stay in the entry. When the raw
+    response is the same as the outputs, it is not written at all, as the outputs already hold it.
+
+    :type max_inline_size: ``int``
+    :param max_inline_size: The maximal length of a serialized raw response which is kept in the entry.
+
+    :type file_name: ``str``
+    :param file_name: The name of the file entries. Default is '<outputs prefix>_raw_response.json'.
+
+    :return: None
+    :rtype: ``None``
+    """
+
+    def __init__(self, max_inline_size=1024 * 1024, file_name=None):
+        self.max_inline_size = max_inline_size
+        self.file_name = file_name
+        self.encoder = json.JSONEncoder(ensure_ascii=False, default=str)
+
+    def iter_chunks(self, raw_response, depth=0):
+        """
+        Serializes the raw response chunk by chunk, as json.dumps does. The lists and dicts of the first two levels,
+        which usually wrap the items of the response, and the ones with more than 64 items are serialized item by item.
+        The others are serialized at once.
+
+        :type raw_response: ``Any``
+        :param raw_response: The raw response.
+
+        :type depth: ``int``
+        :param depth: The level of the raw response in the whole raw response.
+
+        :return: The chunks of the serialized raw response.
+        :rtype: ``iterator``
+        """
+        if isinstance(raw_response, (dict, list)) and (depth < 2 or len(raw_response) > 64):
+            is_dict = isinstance(raw_response, dict)
+            yield '{' if is_dict else '['
+            for i, item in enumerate(raw_response.items() if is_dict else raw_response):
+                if i:
+                    yield ', '
+                if is_dict:
+                    # serializing the key within a dict converts it to a string as json.dumps does
+                    yield self.encoder.encode({item[0]: None})[1:-len('null}')]
+                    item = item[1]
+                for chunk in self.iter_chunks(item, depth + 1):
+                    yield chunk
+            yield '}' if is_dict else ']'
+        else:
+            yield self.encoder.encode(raw_response)
+
+    def exceeds_max_inline_size(self, chunks):
+        """
+        Consumes the chunks until their total length exceeds max_inline_size.
+
+        :type chunks: ``iterator``
+        :param chunks: The chunks of the serialized raw response.
+
+        :return: The consumed chunks, and whether their length exceeds max_inline_size.
+        :rtype: ``tuple``
+        """
+        consumed = []  # type: list
+        size = 0
+        for chunk in chunks:
+            consumed.append(chunk)
+            size += len(chunk)
+            if size > self.max_inline_size:
+                return consumed, True
+        return consumed, False
+
+    def write_file(self, file_name, chunks):
+        """
+        Writes the chunks to a file entry, as fileResult does.
+
+        :type file_name: ``str``
+        :param file_name: The name of the file entry.
+
+        :type chunks: ``iterable``
+        :param chunks: The chunks to write.
+
+        :return: The file entry and the number of written characters.
+        :rtype: ``tuple``
+        """
+        temp = demisto.uniqueFile()
+        size = 0
+        with open(demisto.investigation()['id'] + '_' + temp, 'wb') as f:
+            for chunk in chunks:
+                size += len(chunk)
+                f.write(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+        file_entry = {'Contents': '', 'ContentsFormat': formats['text'], 'Type': entryTypes['file'], 'File': file_name,
+                      'FileID': temp}
+        return file_entry, size
+
+    def send(self, results):
+        """
+        Sends the entry of the given results, and the file entry of its raw response when it is too large.
+
+        :type results: ``CommandResults``
+        :param results: The results to send.
+
+        :return: None
+        :rtype: ``None``
+        """
+        entry = results.to_context()
+        raw_response = entry['Contents']
+        if raw_response is None:
+            demisto.results(entry)
+            return
+
+        is_text = isinstance(raw_response, STRING_TYPES)
+        chunks = iter([raw_response]) if is_text else self.iter_chunks(raw_response)
+        consumed, exceeds = self.exceeds_max_inline_size(chunks)
+        if not exceeds:
+            demisto.results(entry)
+            return
+
+        if raw_response is results.outputs or raw_response == results.outputs:
+            entry['Contents'] = 'The raw response is the same as the context outputs of the command.'
+            entry['ContentsFormat'] = EntryFormat.TEXT
+            demisto.results(entry)
+            return
+
+        file_name = self.file_name or '{}_raw_response.{}'.format(
+            results.outputs_prefix or 'command', 'txt' if is_text else 'json')
+        file_entry, size = self.write_file(file_name, (chunk for part in (consumed, chunks) for chunk in part))
+        entry['Contents'] = 'The raw response ({} characters) was saved to the file {}.'.format(size, file_name)
+        entry['ContentsFormat'] = EntryFormat.TEXT
+        demisto.results(entry)
+        demisto.results(file_entry)
+
+
+_result_sink = ResultSink()
+
+
+def set_result_sink(sink):
+    """
+    Sets the sink used by return_results to send the entries of CommandResults.
+
+    :type sink: ``ResultSink``
+    :param sink: The sink, e.g. FileResultSink(max_inline_size=10 * 1024 * 1024).
+
+    :return: None
+    :rtype: ``None``
+    """
+    global _result_sink
+    _result_sink = sink
+
+
 def return_results(results):
     """
     This function wraps the demisto.results(), supports.
@@ -5946,7 +6290,7 @@ def return_results(results):
             demisto.results(result_list)
 
     elif isinstance(results, CommandResults):
-        demisto.results(results.to_context())
+        _result_sink.send(results)
 
     elif isinstance(results, BaseWidget):
         demisto.results(results.to_display())
@@ -6254,6 +6598,9 @@ sha512Regex = re.compile(r'\b[0-9a-fA-F]{128}\b', regexFlags)
 
 pascalRegex = re.compile('([A-Z]?[a-z]+)')
 
+# The detector used by auto_detect_indicator_type, shared by all the calls in the process.
+indicator_type_detector = IndicatorTypeDetector()
+
 
 # ############################## REGEX FORMATTING end ###############################
 
@@ -6914,8 +7261,240 @@ H || val.SSDeep && val.SSDeep == obj.SSDeep)': {'Malicious': {'Vendor': 'Vendor'
                                .format(indicator_type, INDICATOR_TYPE_TO_CONTEXT_KEY.keys()))
 
 
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_MAX_TRANSPORT_ADAPTERS = 32
+DEFAULT_BATCH_MAX_WORKERS = 10
+
+DEFAULT_THROTTLE_BACKOFF = 1
+RATE_LIMIT_STATUS_CODES = (429,)
+
+
+def parse_rate_limit_headers(headers, now=None):
+    """
+    Parses the rate limit headers of an HTTP response into the number of seconds to wait before the next request.
+    Supports the ``Retry-After`` header (in seconds or as an HTTP date) and the
+    ``X-RateLimit-Remaining``/``X-RateLimit-Reset`` headers (the reset as an epoch time or in seconds).
+
+    :type headers: ``dict``
+    :param headers: The response headers.
+
+    :type now: ``float``
+    :param now: The current epoch time. If None, will use time.time().
+
+    :return: The number of seconds to wait, or None if the headers don't require waiting.
+    :rtype: ``float``
+    """
+    now = now or time.time()
+    headers = {str(key).lower(): value for key, value in (headers or {}).items()}
+    retry_after = headers.get('retry-after')
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            from email.utils import mktime_tz, parsedate_tz
+            retry_at = parsedate_tz(retry_after)
+            if retry_at:
+                return max(0.0, mktime_tz(retry_at) - now)
+
+    remaining = headers.get('x-ratelimit-remaining', headers.get('ratelimit-remaining'))
+    reset = headers.get('x-ratelimit-reset', headers.get('ratelimit-reset'))
+    try:
+        if remaining is None or reset is None or float(remaining) > 0:
+            return None
+        reset = float(reset)
+    except ValueError:
+        return None
+    # the reset is either an epoch time or the number of seconds until the window resets
+    return max(0.0, reset - now if reset > now / 2 else reset)
+
+
+class RateLimitThrottler(object):
+    """
+    Throttles the requests of a client against a rate limited API.
+    Combines a token bucket (the sustained request rate), the rate limit headers of the responses
+    (``Retry-After``/``X-RateLimit-*``) and an adaptive concurrency limit, that is halved whenever
+    the API throttles a request and ramps back up additively on successful responses.
+
+    :type rate: ``float``
+    :param rate: The number of requests per second allowed by the API. If None, only the rate limit
+        headers and the concurrency limit are applied.
+
+    :type capacity: ``int``
+    :param capacity: The maximum number of requests that can be sent in a burst. If None, equals to the rate.
+
+    :type max_concurrency: ``int``
+    :param max_concurrency: The maximum number of requests in flight at the same time.
+
+    :type min_concurrency: ``int``
+    :param min_concurrency: The number of requests in flight the concurrency limit never goes below.
+
+    :type max_throttle_retries: ``int``
+    :param max_throttle_retries: How many times to resend a request that was throttled by the API.
+
+    :type context_key: ``str``
+    :param context_key: The integration context key to persist the throttler state in, so it is kept
+        between executions of the integration instance. If None, the state is not persisted.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+
+    def __init__(self, rate=None, capacity=None, max_concurrency=DEFAULT_BATCH_MAX_WORKERS, min_concurrency=1,
+                 max_throttle_retries=3, context_key=None):
+        self.rate = float(rate) if rate else None
+        self.capacity = float(capacity or max(1.0, self.rate or 1.0))
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_throttle_retries = max_throttle_retries
+        self.context_key = context_key
+        self.tokens = self.capacity
+        self.updated_at = time.time()
+        self.blocked_until = 0.0
+        self.concurrency = float(max_concurrency)
+        self.in_flight = 0
+        self.counters = {'requests': 0, 'throttled': 0, 'retried': 0, 'waited_seconds': 0.0}
+        self._condition = Condition()
+        if context_key:
+            self.load_state()
+
+    def acquire(self):
+        """
+        Waits for a free concurrency slot and a token, and for the API throttling period to pass.
+
+        :return: No data returned
+        :rtype: ``None``
+        """
+        with self._condition:
+            while self.in_flight >= max(self.min_concurrency, int(self.concurrency)):
+                self._condition.wait()
+            self.in_flight += 1
+            self.counters['requests'] += 1
+            now = time.time()
+            wait = max(0.0, self.blocked_until - now)
+            if self.rate:
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate) - 1
+                self.updated_at = now
+                if self.tokens < 0:
+                    wait = max(wait, -self.tokens / self.rate)
+            self.counters['waited_seconds'] += wait
+        if wait:
+            time.sleep(wait)
+
+    def release(self, response=None):
+        """
+        Frees the concurrency slot taken by ``acquire`` and adapts to the response of the request.
+
+        :type response: ``requests.Response``
+        :param response: The response of the request. None if the request failed.
+
+        :return: Whether the request was throttled by the API.
+        :rtype: ``bool``
+        """
+        wait = None
+        throttled = False
+        if response is not None:
+            wait = parse_rate_limit_headers(response.headers)
+            throttled = response.status_code in RATE_LIMIT_STATUS_CODES
+        with self._condition:
+            self.in_flight -= 1
+            if throttled or wait is not None:
+                wait = DEFAULT_THROTTLE_BACKOFF if wait is None else wait
+                self.blocked_until = max(self.blocked_until, time.time() + wait)
+                self.tokens = min(self.tokens, 0.0)
+                if throttled:
+                    self.counters['throttled'] += 1
+                    self.concurrency = max(float(self.min_concurrency), self.concurrency / 2)
+            elif response is not None:
+                self.concurrency = min(float(self.max_concurrency), self.concurrency + 1 / self.concurrency)
+            self._condition.notify_all()
+        if throttled:
+            demisto.debug('Request was throttled by the API, waiting {} seconds. Throttler counters: {}'
+                          .format(wait, self.counters))
+        return throttled
+
+    def to_dict(self):
+        """
+        Returns the state of the throttler.
+
+        :return: The throttler state.
+        :rtype: ``dict``
+        """
+        return {
+            'tokens': self.tokens,
+            'updated_at': self.updated_at,
+            'blocked_until': self.blocked_until,
+            'concurrency': self.concurrency,
+            'counters': self.counters,
+        }
+
+    def load_state(self):
+        """
+        Loads the state of the throttler from the integration context.
+
+        :return: No data returned
+        :rtype: ``None``
+        """
+        state = json.loads(get_integration_context().get(self.context_key) or '{}')
+        self.tokens = min(self.capacity, state.get('tokens', self.tokens))
+        self.updated_at = state.get('updated_at', self.updated_at)
+        self.blocked_until = state.get('blocked_until', self.blocked_until)
+        self.concurrency = min(float(self.max_concurrency), state.get('concurrency', self.concurrency))
+        self.counters.update(state.get('counters', {}))
+
+    def save_state(self):
+        """
+        Saves the state of the throttler to the integration context.
+
+        :return: No data returned
+        :rtype: ``None``
+        """
+        set_to_integration_context_with_retries({self.context_key: self.to_dict()})
+
+
 # Will add only if 'requests' module imported
 if 'requests' in sys.modules:
+    class AdapterSelectingSession(requests.Session):
+        """
+        A requests session which can send a request over a given transport adapter, rather than the adapter
+        mounted on its URL. The adapter is selected per thread, so concurrent requests of the session may use
+        different adapters (e.g. different retry policies) for the same host without re-mounting them.
+        """
+
+        def __init__(self):
+            super(AdapterSelectingSession, self).__init__()
+            self._selected_adapter = thread_local()
+
+        def get_adapter(self, url):
+            selected = getattr(self._selected_adapter, 'value', None)
+            if selected and get_url_host_prefix(url).lower() == selected[0]:
+                return selected[1]
+            return super(AdapterSelectingSession, self).get_adapter(url)
+
+        def request_over_adapter(self, adapter, method, url, **kwargs):
+            """
+            Sends a request of the session over the given transport adapter.
+            Redirects to other hosts are sent over the adapters mounted on them.
+
+            :type adapter: ``requests.adapters.BaseAdapter``
+            :param adapter: The transport adapter to send the request over.
+
+            :type method: ``str``
+            :param method: The HTTP method, for example: GET, POST, and so on.
+
+            :type url: ``str``
+            :param url: The URL of the request.
+
+            :return: The response of the request.
+            :rtype: ``requests.Response``
+            """
+            previous = getattr(self._selected_adapter, 'value', None)
+            self._selected_adapter.value = (get_url_host_prefix(url).lower(), adapter)
+            try:
+                return self.request(method, url, **kwargs)
+            finally:
+                self._selected_adapter.value = previous
+
     class BaseClient(object):
         """Client to use in integrations with powerful _http_request
         :type base_url: ``str``
@@ -6942,17 +7521,45 @@ if 'requests' in sys.modules:
             The request authorization, for example: (username, password).
             Can be None.
 
+        :type pool_connections: ``int``
+        :param pool_connections: The number of connection pools to cache per transport adapter.
+            If None, will use the requests default.
+
+        :type pool_maxsize: ``int``
+        :param pool_maxsize: The maximum number of connections to keep alive in each pool.
+            If None, will use the requests default.
+
+        :type adapter_factory: ``callable``
+        :param adapter_factory: A callable that receives the ``max_retries``, ``pool_connections`` and
+            ``pool_maxsize`` keyword arguments and returns a requests transport adapter.
+            Can be used to plug in an alternative (e.g. HTTP/2 capable) transport.
+            If None, will use ``requests.adapters.HTTPAdapter``.
+
+        :type throttler: ``RateLimitThrottler``
+        :param throttler: A throttler to pace the requests by the rate limit of the API, and to resend
+            requests that were throttled by it. If None, requests are not throttled.
+
         :return: No data returned
         :rtype: ``None``
         """
 
-        def __init__(self, base_url, verify=True, proxy=False, ok_codes=tuple(), headers=None, auth=None):
+        def __init__(self, base_url, verify=True, proxy=False, ok_codes=tuple(), headers=None, auth=None,
+                     pool_connections=None, pool_maxsize=None, adapter_factory=None, throttler=None):
             self._base_url = base_url
             self._verify = verify
             self._ok_codes = ok_codes
             self._headers = headers
             self._auth = auth
-            self._session = requests.Session()
+            self._pool_connections = pool_connections or DEFAULT_POOL_CONNECTIONS
+            self._pool_maxsize = pool_maxsize or DEFAULT_POOL_MAXSIZE
+            self._adapter_factory = adapter_factory or HTTPAdapter
+            self._adapters = OrderedDict()  # type: OrderedDict
+            self._adapters_lock = Lock()
+            self._throttler = throttler
+            self._session = AdapterSelectingSession()
+            # requests without retries are sent over the adapters mounted on the session, as in previous versions
+            for prefix in ('http://', 'https://'):
+                self._session.mount(prefix, self._get_transport_adapter(prefix))
             if proxy:
                 ensure_proxy_has_http_prefix()
             else:
@@ -6964,19 +7571,100 @@ if 'requests' in sys.modules:
         def __del__(self):
             try:
                 self._session.close()
+                for adapter in self._adapters.values():
+                    adapter.close()
             except AttributeError:
                 # we ignore exceptions raised due to session not used by the client and hence do not exist in __del__
                 pass
             except Exception:  # noqa
                 demisto.debug('failed to close BaseClient session with the following error:\n{}'.format(traceback.format_exc()))
 
+        def _get_transport_adapter(self, prefix, retry_kwargs=None):
+            """
+            Returns the transport adapter for the given URL prefix and retry policy.
+            Adapters are created once per (retry policy, host) key and cached, so the connections
+            in their pools are kept alive and reused across requests. Up to DEFAULT_MAX_TRANSPORT_ADAPTERS
+            adapters are cached, the least recently used are dropped.
+
+            :type prefix: ``str``
+            :param prefix: The host prefix the adapter is used for, for example: https://example.com
+
+            :type retry_kwargs: ``dict``
+            :param retry_kwargs: The keyword arguments of the ``urllib3.util.Retry`` policy.
+                If empty, the adapter will fail on the first time.
+
+            :return: The transport adapter.
+            :rtype: ``requests.adapters.BaseAdapter``
+            """
+            retry_kwargs = retry_kwargs or {}
+            key = (prefix.lower(), tuple(sorted(
+                (name, tuple(sorted(value)) if isinstance(value, (list, set, frozenset, tuple)) else value)
+                for name, value in retry_kwargs.items()
+            )))
+            with self._adapters_lock:
+                adapter = self._adapters.pop(key, None)
+                if adapter is None:
+                    adapter = self._adapter_factory(
+                        max_retries=Retry(**retry_kwargs) if retry_kwargs else 0,
+                        pool_connections=self._pool_connections,
+                        pool_maxsize=self._pool_maxsize
+                    )
+                self._adapters[key] = adapter
+                while len(self._adapters) > DEFAULT_MAX_TRANSPORT_ADAPTERS:
+                    # not closed, as the dropped adapter may still be mounted or sending requests
+                    self._adapters.popitem(last=False)
+            return adapter
+
+        def _mount_transport_adapter(self, prefix, adapter):
+            """
+            Mounts the given transport adapter on the session, unless it is already the one mounted on the prefix.
+
+            :type prefix: ``str``
+            :param prefix: The URL prefix to mount the adapter on.
+
+            :type adapter: ``requests.adapters.BaseAdapter``
+            :param adapter: The transport adapter to mount.
+
+            :return: No data returned
+            :rtype: ``None``
+            """
+            with self._adapters_lock:
+                if self._session.adapters.get(prefix) is not adapter:
+                    self._session.mount(prefix, adapter)
+
+        @staticmethod
+        def _get_retry_kwargs(retries=0, status_list_to_retry=None, backoff_factor=5, raise_on_redirect=False,
+                              raise_on_status=False):
+            """
+            Returns the keyword arguments of the ``urllib3.util.Retry`` policy of the retry arguments of
+            ``_implement_retry``. Empty if retries = 0, so the request will fail on the first time.
+
+            :return: The keyword arguments of the retry policy.
+            :rtype: ``dict``
+            """
+            if not retries:
+                return {}
+            method_whitelist = "allowed_methods" if hasattr(Retry.DEFAULT, "allowed_methods") else "method_whitelist"
+            return {
+                'total': retries,
+                'read': retries,
+                'connect': retries,
+                'backoff_factor': backoff_factor,
+                'status': retries,
+                'status_forcelist': status_list_to_retry,
+                'raise_on_status': raise_on_status,
+                'raise_on_redirect': raise_on_redirect,
+                method_whitelist: frozenset(['GET', 'POST', 'PUT'])
+            }
+
         def _implement_retry(self, retries=0,
                              status_list_to_retry=None,
                              backoff_factor=5,
                              raise_on_redirect=False,
-                             raise_on_status=False):
+                             raise_on_status=False,
+                             url=None):
             """
-            Implements the retry mechanism.
+            Implements the retry mechanism, by mounting an adapter with the retry policy on the session.
             In the default case where retries = 0 the request will fail on the first time
 
             :type retries: ``int``
@@ -7011,26 +7699,19 @@ if 'requests' in sys.modules:
                 whether we should raise an exception, or return a response,
                 if status falls in ``status_forcelist`` range and retries have
                 been exhausted.
+
+            :type url ``str``
+            :param url: A URL of the host to apply the retry policy to.
+                If None, will be applied to all the http:// and https:// requests of the session.
             """
             try:
-                method_whitelist = "allowed_methods" if hasattr(Retry.DEFAULT, "allowed_methods") else "method_whitelist"
-                whitelist_kawargs = {
-                    method_whitelist: frozenset(['GET', 'POST', 'PUT'])
-                }
-                retry = Retry(
-                    total=retries,
-                    read=retries,
-                    connect=retries,
-                    backoff_factor=backoff_factor,
-                    status=retries,
-                    status_forcelist=status_list_to_retry,
-                    raise_on_status=raise_on_status,
-                    raise_on_redirect=raise_on_redirect,
-                    **whitelist_kawargs
-                )
-                adapter = HTTPAdapter(max_retries=retry)
-                self._session.mount('http://', adapter)
-                self._session.mount('https://', adapter)
+                retry_kwargs = self._get_retry_kwargs(retries, status_list_to_retry, backoff_factor, raise_on_redirect,
+                                                      raise_on_status)
+                host = get_url_host_prefix(url) if url else None
+                # the trailing slash keeps the adapter of a host from matching other hosts sharing its prefix
+                mounts = [(host, host + '/')] if host else [('http://', 'http://'), ('https://', 'https://')]
+                for key_prefix, mount_prefix in mounts:
+                    self._mount_transport_adapter(mount_prefix, self._get_transport_adapter(key_prefix, retry_kwargs))
             except NameError:
                 pass
 
@@ -7140,12 +7821,15 @@ if 'requests' in sys.modules:
                 address = full_url if full_url else urljoin(self._base_url, url_suffix)
                 headers = headers if headers else self._headers
                 auth = auth if auth else self._auth
-                if retries:
-                    self._implement_retry(retries, status_list_to_retry, backoff_factor, raise_on_redirect, raise_on_status)
+                # the retry policy is applied per request, rather than mounted on the session shared by all threads
+                adapter = self._get_transport_adapter(get_url_host_prefix(address), self._get_retry_kwargs(
+                    retries, status_list_to_retry, backoff_factor, raise_on_redirect, raise_on_status)) \
+                    if retries else None
                 # Execute
-                res = self._session.request(
+                res = self._send_request(
                     method,
                     address,
+                    adapter=adapter,
                     verify=self._verify,
                     params=params,
                     data=data,
@@ -7226,6 +7910,111 @@ if 'requests' in sys.modules:
                 err_msg = 'Max Retries Error- Request attempts with {} retries failed. \n{}'.format(retries, reason)
                 raise DemistoException(err_msg, exception)
 
+        def _send_request(self, method, address, adapter=None, **kwargs):
+            """
+            Sends the request over the client session, paced by the client throttler if one is set.
+            Requests that were throttled by the API are resent, up to the throttler max_throttle_retries.
+
+            :type method: ``str``
+            :param method: The HTTP method, for example: GET, POST, and so on.
+
+            :type address: ``str``
+            :param address: The URL of the request.
+
+            :type adapter: ``requests.adapters.BaseAdapter``
+            :param adapter: The transport adapter to send the request over.
+                If None, will use the adapter mounted on the session.
+
+            :return: The response of the request.
+            :rtype: ``requests.Response``
+            """
+            if not self._throttler:
+                return self._session_request(method, address, adapter, **kwargs)
+
+            attempt = 0
+            while True:
+                self._throttler.acquire()
+                res = None
+                try:
+                    res = self._session_request(method, address, adapter, **kwargs)
+                finally:
+                    throttled = self._throttler.release(res)
+                if not throttled or attempt >= self._throttler.max_throttle_retries:
+                    return res
+                attempt += 1
+                self._throttler.counters['retried'] += 1
+
+        def _session_request(self, method, address, adapter=None, **kwargs):
+            """Sends a single request over the client session, and over the given transport adapter if not None"""
+            if adapter is None:
+                return self._session.request(method, address, **kwargs)
+            if not isinstance(self._session, AdapterSelectingSession):
+                # the session was replaced by the integration, so the adapter can only be mounted on it
+                self._mount_transport_adapter(get_url_host_prefix(address) + '/', adapter)
+                return self._session.request(method, address, **kwargs)
+            return self._session.request_over_adapter(adapter, method, address, **kwargs)
+
+        def _http_request_many(self, requests_specs, max_workers=DEFAULT_BATCH_MAX_WORKERS, max_per_host=None,
+                               return_exceptions=True):
+            """Sends a batch of requests concurrently over the client session, using a bounded thread pool.
+
+            Example:
+            >>> client._http_request_many([
+            ...     {'method': 'GET', 'url_suffix': 'assets/1'},
+            ...     {'method': 'GET', 'url_suffix': 'assets/2', 'retries': 3},
+            ... ])
+            [{'id': 1}, DemistoException('Error in API call [404] - Not Found')]
+
+            :type requests_specs: ``list``
+            :param requests_specs: A list of dicts, each one holds the keyword arguments of a single
+                ``_http_request`` call, for example: {'method': 'GET', 'url_suffix': 'assets/1'}.
+
+            :type max_workers: ``int``
+            :param max_workers: The maximum number of requests to send at the same time.
+
+            :type max_per_host: ``int``
+            :param max_per_host: The maximum number of requests to send to a single host at the same time.
+                If None, will use the pool_maxsize of the client, so no connection is discarded.
+
+            :type return_exceptions: ``bool``
+            :param return_exceptions: Whether to put the exception raised by a failed request in its place
+                in the results list. If False, the first exception (by order of the specs) will be raised
+                after all the requests are done.
+
+            :return: The results of the requests, in the same order as ``requests_specs``.
+            :rtype: ``list``
+            """
+            requests_specs = list(requests_specs)
+            max_per_host = max_per_host or self._pool_maxsize
+            host_semaphores = {}  # type: dict
+            for spec in requests_specs:
+                address = spec.get('full_url') or urljoin(self._base_url, spec.get('url_suffix', ''))
+                host = get_url_host_prefix(address)
+                if host not in host_semaphores:
+                    host_semaphores[host] = BoundedSemaphore(max_per_host)
+
+            def send(spec):
+                address = spec.get('full_url') or urljoin(self._base_url, spec.get('url_suffix', ''))
+                with host_semaphores[get_url_host_prefix(address)]:
+                    try:
+                        return self._http_request(**spec)
+                    except Exception as exception:  # noqa: disable=broad-except
+                        return exception
+
+            if 'ThreadPoolExecutor' in globals() and len(requests_specs) > 1:
+                # the requests (and the throttler) may log from the worker threads, which calls the server
+                support_multithreading()
+                with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(requests_specs)))) as executor:
+                    results = list(executor.map(send, requests_specs))
+            else:
+                results = [send(spec) for spec in requests_specs]
+
+            if not return_exceptions:
+                for result in results:
+                    if isinstance(result, Exception):
+                        raise result
+            return results
+
         def _is_status_code_valid(self, response, ok_codes=None):
             """If the status code is OK, return 'True'.
 
@@ -8157,12 +8946,19 @@ def set_feed_last_run(last_run_indicators):
 
 def support_multithreading():
     """Adds lock on the calls to the Cortex XSOAR server from the Demisto object to support integration which use multithreading.
+    No lock is added when the server channel tags the calls with a request ID, as several calls can then be in flight.
+    Calling it again once the lock was added has no effect.
 
     :return: No data returned
     :rtype: ``None``
     """
     global demisto
-    prev_do = demisto._Demisto__do  # type: ignore[attr-defined]
+    if getattr(demisto, 'supportsConcurrentCalls', lambda: False)():
+        return
+    prev_do = getattr(demisto, '_Demisto__do', None)
+    if prev_do is None or getattr(prev_do, 'is_locked', False):
+        # there is no server channel to lock (e.g. demistomock in unit tests), or it is already locked
+        return
     demisto.lock = Lock()  # type: ignore[attr-defined]
 
     def locked_do(cmd):
@@ -8174,6 +8970,7 @@ def support_multithreading():
         finally:
             demisto.lock.release()  # type: ignore[attr-defined]
 
+    locked_do.is_locked = True  # type: ignore[attr-defined]
     demisto._Demisto__do = locked_do  # type: ignore[attr-defined]
 
 
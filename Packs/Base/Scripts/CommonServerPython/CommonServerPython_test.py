@@ -16,8 +16,9 @@ from CommonServerPython import xml2json, json2xml, entryTypes, formats, tableToM
     IntegrationLogger, parse_date_string, IS_PY3, DebugLogger, b64_encode, parse_date_range, return_outputs, \
     argToBoolean, ipv4Regex, ipv4cidrRegex, ipv6cidrRegex, ipv6Regex, batch, FeedIndicatorType, \
     encode_string_results, safe_load_json, remove_empty_elements, aws_table_to_markdown, is_demisto_version_ge, \
-    appendContext, auto_detect_indicator_type, handle_proxy, get_demisto_version_as_str, get_x_content_info_headers, \
-    url_to_clickable_markdown, WarningsHandler, DemistoException, SmartGetDict
+    appendContext, auto_detect_indicator_type, auto_detect_indicator_types, IndicatorTypeDetector, handle_proxy, \
+    get_demisto_version_as_str, get_x_content_info_headers, \
+    url_to_clickable_markdown, WarningsHandler, DemistoException, SmartGetDict, formatCell
 import CommonServerPython
 
 try:
@@ -428,6 +429,68 @@ class TestTableToMarkdown:
 '''
         assert table_all_none2 == expected_table_all_none2
 
+    @staticmethod
+    def test_max_rows():
+        """
+        Given:
+          - list of objects, where only the last one has a value in the third column.
+        When:
+          - calling tableToMarkdown with max_rows smaller than the number of objects and removeNull=true.
+        Then:
+          - return a table with the first rows only, without the column which is empty in them,
+            and a footer with the number of omitted rows.
+        """
+        data = copy.deepcopy(DATA)
+        for d in data[:-1]:
+            d['header_3'] = None
+        table = tableToMarkdown('tableToMarkdown test with max_rows', data, removeNull=True, max_rows=2)
+        expected_table = (
+            '### tableToMarkdown test with max_rows\n'
+            '|header_1|header_2|\n'
+            '|---|---|\n'
+            '| a1 | b1 |\n'
+            '| a2 | b2 |\n'
+            '\n'
+            '**Truncated, 1 more row.**\n'
+        )
+        assert table == expected_table
+        assert tableToMarkdown('tableToMarkdown test with max_rows', DATA, max_rows=3) == tableToMarkdown(
+            'tableToMarkdown test with max_rows', DATA)
+
+    @staticmethod
+    def test_max_cell_len():
+        """
+        Given:
+          - list of objects with long values, containing new lines and the "|" sign.
+        When:
+          - calling tableToMarkdown with max_cell_len.
+        Then:
+          - return a table with the values cut before they are escaped.
+        """
+        data = [{'a': 'x|y\nz' * 3, 'b': [1, 2], 'c': 'short'}]
+        table = tableToMarkdown('tableToMarkdown test with max_cell_len', data, max_cell_len=5)
+        expected_table = (
+            '### tableToMarkdown test with max_cell_len\n'
+            '|a|b|c|\n'
+            '|---|---|---|\n'
+            '| x\\|y<br>z... | 1,<br>2 | short |\n'
+        )
+        assert table == expected_table
+
+    @pytest.mark.parametrize('value', [0, -12, 10 ** 20, 1.5, -0.0, 1e300, 1e-07, float('nan'), float('inf'), True])
+    @staticmethod
+    def test_numbers(value):
+        """
+        Given:
+          - an object with a number value.
+        When:
+          - calling tableToMarkdown.
+        Then:
+          - the number is presented as formatCell presents it.
+        """
+        table = tableToMarkdown('tableToMarkdown test with numbers', {'a': value, 'b': 'c'})
+        assert table.splitlines()[-1] == '| {} | c |'.format(formatCell(value, False))
+
     @staticmethod
     def test_header_not_on_first_object():
         """
@@ -2621,6 +2684,359 @@ class TestBaseClient:
         response.status_code = 400
         assert not self.client._is_status_code_valid(response)
 
+    @pytest.fixture
+    def stub_http_server(self):
+        """
+        A local keep-alive HTTP server that records the client port of every request it serves,
+        so the tests can tell how many connections were opened.
+        """
+        import threading
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+
+        client_ports = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                client_ports.append(self.client_address[1])
+                body = json.dumps({'status': 'ok'}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        yield 'http://127.0.0.1:{}/'.format(server.server_port), client_ports
+        server.shutdown()
+        server.server_close()
+
+    @pytest.mark.skipif(not IS_PY3, reason='test not supported in py2')
+    def test_http_request_reuses_pooled_connection(self, stub_http_server):
+        """
+            Given
+            - A base client and a local keep-alive HTTP server
+
+            When
+            - Making several http requests with retries configured
+
+            Then
+            - Ensure all the requests were sent over a single pooled connection
+        """
+        from CommonServerPython import BaseClient
+        url, client_ports = stub_http_server
+        client = BaseClient(url, proxy=False)
+        for _ in range(5):
+            assert client._http_request('get', 'event', retries=2, status_list_to_retry=[429]) == self.text
+        assert len(client_ports) == 5
+        assert len(set(client_ports)) == 1
+
+    def test_transport_adapter_cached_per_host_and_retry_policy(self):
+        """
+            Given
+            - A base client with custom pool sizes
+
+            When
+            - Getting transport adapters for different hosts and retry policies
+
+            Then
+            - Ensure adapters are created once per (host, retry policy) and use the configured pool sizes
+        """
+        from CommonServerPython import BaseClient
+        client = BaseClient('http://example.com/api/v2/', pool_connections=3, pool_maxsize=20)
+        adapter = client._get_transport_adapter('http://example.com', {'total': 3, 'status_forcelist': [500, 429]})
+        assert adapter is client._get_transport_adapter('http://example.com', {'total': 3, 'status_forcelist': [429, 500]})
+        assert adapter is not client._get_transport_adapter('http://example.com', {'total': 1})
+        assert adapter is not client._get_transport_adapter('http://other.com', {'total': 3, 'status_forcelist': [500, 429]})
+        assert adapter.max_retries.total == 3
+        assert adapter._pool_connections == 3
+        assert adapter._pool_maxsize == 20
+
+    def test_http_request_selects_cached_adapter(self, requests_mock):
+        """
+            Given
+            - A base client with a custom adapter factory
+
+            When
+            - Making http requests with and without retries
+
+            Then
+            - Ensure the adapters are built by the factory once, and the session mounts are not changed
+        """
+        from CommonServerPython import BaseClient
+        from requests.adapters import HTTPAdapter
+        created = []
+
+        def adapter_factory(**kwargs):
+            created.append(kwargs)
+            return HTTPAdapter(**kwargs)
+
+        requests_mock.get('http://example.com/api/v2/event', text=json.dumps(self.text))
+        client = BaseClient('http://example.com/api/v2/', adapter_factory=adapter_factory)
+        for _ in range(3):
+            client._http_request('get', 'event')
+            client._http_request('get', 'event', retries=3)
+        # the http:// and https:// adapters of the requests without retries, and the adapter of the retry policy
+        assert len(created) == 3
+        assert [kwargs['max_retries'] for kwargs in created[:2]] == [0, 0]
+        assert created[2]['max_retries'].total == 3
+        assert list(client._session.adapters) == ['https://', 'http://']
+
+    def test_adapter_selecting_session(self, mocker):
+        """
+            Given
+            - An adapter selecting session
+
+            When
+            - Sending a request over a selected adapter, which is redirected to another host
+
+            Then
+            - Ensure the selected adapter is used only for the host of the request and only while it is sent
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+        from CommonServerPython import AdapterSelectingSession
+        session = AdapterSelectingSession()
+        adapter = HTTPAdapter()
+        mocker.patch.object(requests.Session, 'request', side_effect=lambda method, url, **kwargs: (
+            session.get_adapter(url + 'redirect'), session.get_adapter('https://example.com.other/redirect')))
+
+        used, redirect_used = session.request_over_adapter(adapter, 'GET', 'https://EXAMPLE.com/api')
+
+        assert used is adapter
+        assert redirect_used is session.adapters['https://']
+        assert session.get_adapter('https://example.com/api') is session.adapters['https://']
+
+    def test_implement_retry_mounts_host_prefix(self):
+        """
+            Given
+            - A base client
+
+            When
+            - Implementing a retry policy for a single host
+
+            Then
+            - Ensure the adapter is mounted on the host with a trailing slash, so it is not used for other hosts
+        """
+        from CommonServerPython import BaseClient
+        client = BaseClient('http://example.com/api/v2/')
+        client._implement_retry(retries=3, url='http://example.com/api/v2/event')
+        assert client._session.get_adapter('http://example.com/api/v2/event').max_retries.total == 3
+        assert client._session.get_adapter('http://example.com.other/api').max_retries.total == 0
+        assert client._session.get_adapter('http://example.com:8443/api').max_retries.total == 0
+
+    def test_transport_adapters_cache_is_capped(self, mocker):
+        """
+            Given
+            - A base client with a cap of 3 cached transport adapters
+
+            When
+            - Getting the adapters of more hosts than the cap
+
+            Then
+            - Ensure the least recently used adapters are dropped from the cache
+        """
+        import CommonServerPython
+        from CommonServerPython import BaseClient
+        mocker.patch.object(CommonServerPython, 'DEFAULT_MAX_TRANSPORT_ADAPTERS', 3)
+        client = BaseClient('http://example.com/api/v2/')
+        first = client._get_transport_adapter('http://first.com', {'total': 3})
+        client._get_transport_adapter('http://second.com', {'total': 3})
+        assert client._get_transport_adapter('http://first.com', {'total': 3}) is first
+        client._get_transport_adapter('http://third.com', {'total': 3})
+        assert [key[0] for key in client._adapters] == ['http://second.com', 'http://first.com', 'http://third.com']
+
+    def test_http_request_many_ordered_results_and_errors(self, mocker, requests_mock):
+        """
+            Given
+            - A batch of request specs, one of them for a failing endpoint
+
+            When
+            - Sending the batch with _http_request_many
+
+            Then
+            - Ensure the calls to the server are locked, as the requests are sent from worker threads
+            - Ensure the results are returned in the order of the specs and the failure is captured in its place
+        """
+        from CommonServerPython import DemistoException
+        mocker.patch.object(CommonServerPython, 'support_multithreading')
+        for i in range(10):
+            requests_mock.get('http://example.com/api/v2/asset/{}'.format(i), json={'id': i})
+        requests_mock.get('http://example.com/api/v2/asset/bad', status_code=404)
+        specs = [{'method': 'GET', 'url_suffix': 'asset/{}'.format(i)} for i in range(10)]
+        specs.insert(3, {'method': 'GET', 'url_suffix': 'asset/bad'})
+
+        results = self.client._http_request_many(specs, max_workers=4)
+
+        assert CommonServerPython.support_multithreading.called
+        assert isinstance(results[3], DemistoException)
+        assert [result['id'] for result in results[:3] + results[4:]] == list(range(10))
+        with raises(DemistoException, match='404'):
+            self.client._http_request_many(specs, return_exceptions=False)
+
+    def test_http_request_many_per_host_cap(self, requests_mock):
+        """
+            Given
+            - A batch of request specs to a single host
+
+            When
+            - Sending the batch with a per host cap lower than the number of workers
+
+            Then
+            - Ensure no more than the cap of requests are in flight at the same time
+        """
+        import threading
+        import time
+        lock = threading.Lock()
+        in_flight = {'current': 0, 'max': 0}
+
+        def callback(request, context):
+            with lock:
+                in_flight['current'] += 1
+                in_flight['max'] = max(in_flight['max'], in_flight['current'])
+            time.sleep(0.01)
+            with lock:
+                in_flight['current'] -= 1
+            return {'status': 'ok'}
+
+        requests_mock.get('http://example.com/api/v2/event', json=callback)
+        results = self.client._http_request_many([{'method': 'GET', 'url_suffix': 'event'}] * 20,
+                                                 max_workers=10, max_per_host=2)
+        assert results == [{'status': 'ok'}] * 20
+        assert in_flight['max'] <= 2
+
+    def test_http_request_many_different_retry_policies(self, mocker, requests_mock):
+        """
+            Given
+            - A batch of request specs to a single host with different retry policies
+
+            When
+            - Sending the batch with _http_request_many
+
+            Then
+            - Ensure each request is sent over the adapter of its retry policy, without mounting it on the session
+        """
+        import CommonServerPython
+        mocker.patch.object(CommonServerPython, 'support_multithreading')
+        requests_mock.get('http://example.com/api/v2/event', json={'status': 'ok'})
+        send_request = mocker.spy(self.client, '_send_request')
+        specs = [{'method': 'GET', 'url_suffix': 'event', 'retries': i % 3} for i in range(12)]
+        mounts = dict(self.client._session.adapters)
+
+        assert self.client._http_request_many(specs, max_workers=4) == [{'status': 'ok'}] * 12
+
+        assert dict(self.client._session.adapters) == mounts
+        retries = sorted(call.kwargs['adapter'].max_retries.total if call.kwargs['adapter'] else 0
+                         for call in send_request.call_args_list)
+        assert retries == [0] * 4 + [1] * 4 + [2] * 4
+
+    def test_http_request_throttled_is_resent(self, requests_mock):
+        """
+            Given
+            - A base client with a throttler
+
+            When
+            - The API throttles the first request with a 429 and a Retry-After header
+
+            Then
+            - Ensure the request is resent, the concurrency limit is lowered and the counters are updated
+        """
+        from CommonServerPython import BaseClient, RateLimitThrottler
+        requests_mock.get('http://example.com/api/v2/event', [
+            {'status_code': 429, 'headers': {'Retry-After': '0'}},
+            {'json': self.text},
+        ])
+        throttler = RateLimitThrottler(max_concurrency=4)
+        client = BaseClient('http://example.com/api/v2/', throttler=throttler)
+
+        assert client._http_request('get', 'event') == self.text
+        assert requests_mock.call_count == 2
+        assert throttler.counters['throttled'] == 1
+        assert throttler.counters['retried'] == 1
+        assert 2 <= throttler.concurrency < 4
+        assert throttler.in_flight == 0
+
+
+RATE_LIMIT_HEADERS_INPUTS = [
+    ({}, None),
+    ({'Retry-After': '30'}, 30),
+    ({'retry-after': 'Thu, 01 Jan 1970 00:16:50 GMT'}, 10),
+    ({'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '1060'}, 60),
+    ({'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '5'}, 5),
+    ({'X-RateLimit-Remaining': '7', 'X-RateLimit-Reset': '1060'}, None),
+]
+
+
+@pytest.mark.parametrize('headers, expected', RATE_LIMIT_HEADERS_INPUTS)
+def test_parse_rate_limit_headers(headers, expected):
+    """
+        Given
+        - Response headers with and without rate limit headers
+
+        When
+        - Parsing them with parse_rate_limit_headers
+
+        Then
+        - Ensure the number of seconds to wait is returned, or None if no waiting is required
+    """
+    from CommonServerPython import parse_rate_limit_headers
+    assert parse_rate_limit_headers(headers, now=1000) == expected
+
+
+def test_rate_limit_throttler_token_bucket(mocker):
+    """
+        Given
+        - A throttler with a rate of 2 requests per second and a burst capacity of 2
+
+        When
+        - Acquiring 4 requests at the same moment
+
+        Then
+        - Ensure the burst is sent right away and the rest wait for the bucket to refill
+    """
+    from CommonServerPython import RateLimitThrottler
+    mocker.patch.object(CommonServerPython.time, 'time', return_value=1000)
+    sleep = mocker.patch.object(CommonServerPython.time, 'sleep')
+    throttler = RateLimitThrottler(rate=2, capacity=2)
+    for _ in range(4):
+        throttler.acquire()
+        throttler.release()
+    assert [call[0][0] for call in sleep.call_args_list] == [0.5, 1.0]
+    assert throttler.counters['waited_seconds'] == 1.5
+
+
+def test_rate_limit_throttler_state_persistence(mocker):
+    """
+        Given
+        - A throttler persisted in the integration context
+
+        When
+        - Saving its state and creating a new throttler with the same context key
+
+        Then
+        - Ensure the new throttler continues from the saved state
+    """
+    from CommonServerPython import RateLimitThrottler
+    integration_context = {}
+    mocker.patch.object(demisto, 'getIntegrationContext', side_effect=lambda: integration_context)
+    mocker.patch.object(demisto, 'setIntegrationContext', side_effect=integration_context.update)
+    mocker.patch.object(CommonServerPython, 'is_versioned_context_available', return_value=False)
+    throttler = RateLimitThrottler(rate=1, context_key='throttler')
+    throttler.blocked_until = 2000
+    throttler.counters['throttled'] = 3
+    throttler.save_state()
+
+    restored = RateLimitThrottler(rate=1, context_key='throttler')
+    assert restored.blocked_until == 2000
+    assert restored.counters['throttled'] == 3
+
 
 def test_parse_date_string():
     # test unconverted data remains: Z
@@ -3154,6 +3570,118 @@ def test_auto_detect_indicator_type(indicator_value, indicatory_type):
                              " use a docker image with it installed such as: demisto/jmespath"
 
 
+@pytest.fixture()
+def indicator_type_detector(mocker):
+    """
+    Replace the detector shared by the process with a new one, so cached values and extractors do not leak between tests
+    """
+    detector = IndicatorTypeDetector()
+    mocker.patch.object(CommonServerPython, 'indicator_type_detector', detector)
+    return detector
+
+
+def test_auto_detect_indicator_types(mocker, indicator_type_detector):
+    """
+        Given
+            - Indicator values, some of them repeated
+
+        When
+            - Detecting the types of all the values at once.
+
+        Then
+            - The types are the same as the ones detected one by one, and each distinct value is checked once.
+    """
+    pytest.importorskip('tldextract')
+    values = [value for value, _ in INDICATOR_VALUE_AND_TYPE]
+    detect_uncached = mocker.spy(indicator_type_detector, 'detect_uncached')
+
+    assert auto_detect_indicator_types(values + values) == [auto_detect_indicator_type(value) for value in values] * 2
+    assert detect_uncached.call_count == len(set(values))
+
+
+@pytest.mark.parametrize('indicator_value', [
+    '1.1.1.1', '1.1.1.1/24', '1[.]1[.]1[.]1/24', '1.1.1.1/33', '256.1.1.1', '1.1.1', '::1', 'fe80::1/64', '1::',
+    '2001:db8::/32', 'CVE-2020-1234', 'cve-2020-12345', 'cve-2020-0', 'www.test.com', 'www[.]test[.]com',
+    'ftp.test.com', 'hxxps://test.com/a?b=c', 'HTTP://test.com', '3' * 32, 'A' * 40, 'b' * 64, 'c' * 128, 'g' * 32,
+    '3' * 33, 'a@b.c', '@b.c', 'test', 'test.com', '*.test.com', '', ' 1.1.1.1', '-abc',
+])
+def test_indicator_type_detector_checks(indicator_type_detector, indicator_value):
+    """
+        Given
+            - An indicator value
+
+        When
+            - Detecting its type, with the checks which cannot match the value skipped.
+
+        Then
+            - The type is the one of the first pattern matching the value, as when all the patterns are tried in order.
+    """
+    pytest.importorskip('tldextract')
+    patterns = [
+        (ipv4cidrRegex, 'CIDR'), (ipv6cidrRegex, 'IPv6CIDR'), (ipv4Regex, 'IP'), (ipv6Regex, 'IPv6'),
+        (CommonServerPython.sha256Regex, 'File'), (CommonServerPython.urlRegex, 'URL'),
+        (CommonServerPython.md5Regex, 'File'), (CommonServerPython.sha1Regex, 'File'),
+        (CommonServerPython.emailRegex, 'Email'), (CommonServerPython.cveRegex, 'CVE'),
+        (CommonServerPython.sha512Regex, 'File'),
+    ]
+    expected_type = next((indicator_type for pattern, indicator_type in patterns
+                          if re.match(pattern, indicator_value)), None)
+
+    indicator_type = indicator_type_detector.detect(indicator_value)
+
+    if expected_type:
+        assert indicator_type == expected_type
+    else:
+        assert indicator_type in ('Domain', 'DomainGlob', None)
+
+
+def test_indicator_type_detector_cache(mocker):
+    """
+        Given
+            - A detector whose cache holds two values
+
+        When
+            - Detecting the types of three values, and then the first two again.
+
+        Then
+            - The least recently used value is evicted from the cache and checked again.
+    """
+    pytest.importorskip('tldextract')
+    detector = IndicatorTypeDetector(cache_size=2)
+    detect_uncached = mocker.spy(detector, 'detect_uncached')
+
+    for value in ['1.1.1.1', 'test@test.com', '1.1.1.1', 'http://test.com', '1.1.1.1', 'test@test.com']:
+        detector.detect(value)
+
+    assert [call[0][0] for call in detect_uncached.call_args_list] == [
+        '1.1.1.1', 'test@test.com', 'http://test.com', 'test@test.com']
+    assert list(detector.cache) == ['1.1.1.1', 'test@test.com']
+
+
+def test_indicator_type_detector_cache_concurrent():
+    """
+        Given
+            - An IndicatorTypeDetector with a small cache shared between threads.
+
+        When
+            - Detecting the same values from several threads, forcing constant evictions.
+
+        Then
+            - No thread fails on a key evicted by another one and the results stay correct.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    pytest.importorskip('tldextract')
+    detector = IndicatorTypeDetector(cache_size=2)
+    values = ['1.1.1.1', 'test@test.com', 'http://test.com'] * 200
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(detector.detect, values))
+
+    assert results == [FeedIndicatorType.IP, FeedIndicatorType.Email, FeedIndicatorType.URL] * 200
+    assert len(detector.cache) <= 2
+
+
+@pytest.mark.usefixtures('indicator_type_detector')
 def test_auto_detect_indicator_type_tldextract(mocker):
     """
         Given
@@ -3702,6 +4230,69 @@ def test_return_results_mixed_results(mocker):
     assert demisto_results_mock.call_args_list[1][0][0] == mock_demisto_results_entry
 
 
+@pytest.mark.parametrize('raw_response, file_name', [
+    ({'events': [{'id': i, 'name': u'event \u05e2'} for i in range(100)]}, 'Mock_raw_response.json'),
+    ('x' * 2000, 'Mock_raw_response.txt'),
+])
+def test_return_results_file_result_sink(mocker, monkeypatch, tmp_path, raw_response, file_name):
+    """
+    Given:
+      - A FileResultSink set as the result sink.
+      - CommandResults whose raw response is longer than the maximal inline size.
+    When:
+      - Calling return_results()
+    Then:
+      - The raw response is written to a file entry, and the entry keeps the outputs and a summary of the raw response.
+    """
+    from CommonServerPython import CommandResults, FileResultSink, return_results, set_result_sink
+    monkeypatch.chdir(tmp_path)
+    mocker.patch.object(demisto, 'uniqueFile', return_value='raw_response')
+    mocker.patch.object(demisto, 'investigation', return_value={'id': '1'})
+    mocker.patch.object(CommonServerPython, '_result_sink', CommonServerPython._result_sink)
+    demisto_results_mock = mocker.patch.object(demisto, 'results')
+    set_result_sink(FileResultSink(max_inline_size=1000))
+
+    return_results(CommandResults(outputs_prefix='Mock', outputs={'count': 100}, raw_response=raw_response))
+
+    entry, file_entry = [call[0][0] for call in demisto_results_mock.call_args_list]
+    expected_contents = raw_response if isinstance(raw_response, str) else json.dumps(raw_response, ensure_ascii=False)
+    assert entry['EntryContext'] == {'Mock': {'count': 100}}
+    assert entry['Contents'] == 'The raw response ({} characters) was saved to the file {}.'.format(
+        len(expected_contents), file_name)
+    assert file_entry['File'] == file_name
+    assert file_entry['FileID'] == 'raw_response'
+    with open('1_raw_response', 'rb') as f:
+        assert f.read() == expected_contents.encode('utf-8')
+
+
+@pytest.mark.parametrize('outputs, expected_contents', [
+    ({'count': 1}, {'count': 1}),
+    ([{'id': i} for i in range(100)], 'The raw response is the same as the context outputs of the command.'),
+])
+def test_return_results_file_result_sink_inline(mocker, outputs, expected_contents):
+    """
+    Given:
+      - A FileResultSink set as the result sink.
+      - CommandResults without raw response, whose outputs are shorter or longer than the maximal inline size.
+    When:
+      - Calling return_results()
+    Then:
+      - No file entry is created, and the outputs are not duplicated in the entry contents when they are long.
+    """
+    from CommonServerPython import CommandResults, FileResultSink, return_results, set_result_sink
+    mocker.patch.object(CommonServerPython, '_result_sink', CommonServerPython._result_sink)
+    unique_file_mock = mocker.patch.object(demisto, 'uniqueFile')
+    demisto_results_mock = mocker.patch.object(demisto, 'results')
+    set_result_sink(FileResultSink(max_inline_size=100))
+
+    return_results(CommandResults(outputs_prefix='Mock', outputs=outputs))
+
+    assert demisto_results_mock.call_count == 1
+    assert demisto_results_mock.call_args[0][0]['Contents'] == expected_contents
+    assert demisto_results_mock.call_args[0][0]['EntryContext'] == {'Mock': outputs}
+    assert not unique_file_mock.called
+
+
 class TestExecuteCommand:
     @staticmethod
     def test_sanity(mocker):
@@ -5685,3 +6276,31 @@ def test_get_tenant_name(mocker, demistoUrls, expected_result):
 
     result = get_tenant_account_name()
     assert result == expected_result
+
+
+@pytest.mark.parametrize('supports_concurrent_calls, is_locked', [(False, True), (True, False)])
+def test_support_multithreading(mocker, supports_concurrent_calls, is_locked):
+    """
+        Given
+        - A server channel which does or does not support concurrent calls
+        When
+        - Calling support_multithreading twice
+        Then
+        - The calls to the server are locked only if the channel does not support concurrent calls, and only once
+    """
+    from CommonServerPython import support_multithreading
+    do = mocker.MagicMock(spec=lambda cmd: None, return_value='response')
+    mocker.patch.object(demisto, '_Demisto__do', do, create=True)
+    mocker.patch.object(demisto, 'supportsConcurrentCalls', return_value=supports_concurrent_calls, create=True)
+    mocker.patch.object(demisto, 'lock', None, create=True)
+
+    support_multithreading()
+
+    assert (demisto._Demisto__do is not do) == is_locked
+    locked_do = demisto._Demisto__do
+
+    support_multithreading()
+
+    assert demisto._Demisto__do is locked_do
+    assert demisto._Demisto__do({'type': 'executeCommand'}) == 'response'
+    do.assert_called_once_with({'type': 'executeCommand'})
@@ -4,12 +4,17 @@ from CommonServerUserPython import *
 import warnings
 import numpy as np
 import re
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer, TfidfTransformer
 from sklearn.base import BaseEstimator, TransformerMixin
 import json
+import base64
+import pickle
+import zlib
 import pandas as pd
+from collections import Counter
+from scipy.sparse import csr_matrix
 from scipy.spatial.distance import cdist
-from typing import List, Dict, Union
+from typing import List, Dict, Union, Optional
 
 warnings.simplefilter("ignore")
 
@@ -58,6 +63,12 @@ REGEX_IP = re.compile(
     r'(([0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\.){3}([0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])')
 REPLACE_COMMAND_LINE = {"=": " = ", "\\": "/", "[": "", "]": "", '"': "", "'": "", }
 
+FEATURE_STORE_MODEL_NAME = 'DBotFindSimilarIncidents_feature_store'
+FEATURE_STORE_VERSION = 2
+FEATURE_STORE_MAX_INCIDENTS = 10000
+FEATURE_STORE_MAX_VOCABULARY = 2000000
+COLUMN_MODIFIED = 'modified'
+
 
 def keep_high_level_field(incidents_field: List[str]) -> List[str]:
     """
@@ -225,6 +236,20 @@ def euclidian_similarity_capped(x: np.ndarray, y: np.ndarray) -> np.ndarray:
     return np.maximum(1 - cdist(x, y)[:, 0], 0)
 
 
+def sparse_euclidian_similarity_capped(x: csr_matrix, y: csr_matrix) -> np.ndarray:
+    """
+    Same as euclidian_similarity_capped for sparse matrices, computed with a single sparse matrix-vector product
+    :param x: sparse matrix n*m
+    :param y: sparse matrix 1*m
+    :return: np.array of ditance 1*n
+    """
+    x_square_norms = np.asarray(x.multiply(x).sum(axis=1)).ravel()
+    y_square_norm = y.multiply(y).sum()
+    dot_products = (x @ y.T).toarray().ravel()
+    square_distances = np.maximum(x_square_norms + y_square_norm - 2 * dot_products, 0)
+    return np.maximum(1 - np.sqrt(square_distances), 0)
+
+
 def identity(X, y):  # type: ignore
     """
     Return np.nan if value is different and 1 if value is the same
@@ -237,25 +262,175 @@ def identity(X, y):  # type: ignore
     return z
 
 
+class IncidentFeatureStore:
+    """
+    Per field cache of the n-grams counts of the incidents, keyed by incident id and modified time.
+    Counts are indexed on a vocabulary shared by all the incidents of the field and only the incidents that are new
+    or modified since the last run are normalized and analyzed again.
+    """
+
+    def __init__(self, fields: Optional[Dict] = None):
+        """
+        :param fields: Dict of the field stores - {key: {'vocabulary': {ngram: index}, 'entries': {id: entry}}}
+        """
+        self.fields = fields or {}
+        self.updated = False
+
+    def get_field_store(self, key: str) -> Dict:
+        """
+        Return the store of a field, reset it if its vocabulary grew too big
+        :param key: key of the field store
+        :return: field store
+        """
+        field_store = self.fields.get(key)
+        if not field_store or len(field_store['vocabulary']) > FEATURE_STORE_MAX_VOCABULARY:
+            field_store = self.fields[key] = {'vocabulary': {}, 'entries': {}}
+        return field_store
+
+    def count(self, key: str, incidents_ids, modified_times, values, normalize_function, analyzer,
+              vocabulary: Dict[str, int]) -> csr_matrix:
+        """
+        Count the n-grams of vocabulary in each value, using the cached counts of the unmodified incidents
+        :param key: key of the field store
+        :param incidents_ids: ids of the incidents
+        :param modified_times: modified time of the incidents
+        :param values: raw value of the field for each incident
+        :param normalize_function: Normalize function to apply on the value before the analysis
+        :param analyzer: function that returns the n-grams of a normalized value
+        :param vocabulary: vocabulary of the current incident {ngram: column}
+        :return: sparse matrix of counts n_incidents * len(vocabulary)
+        """
+        field_store = self.get_field_store(key)
+        store_vocabulary = field_store['vocabulary']
+        entries = field_store['entries']
+        rows_indices, rows_counts = [], []
+        for incident_id, modified, value in zip(incidents_ids, modified_times, values):
+            cacheable = isinstance(modified, str) and bool(modified)
+            entry = entries.pop(incident_id, None)
+            if not entry or not cacheable or entry[0] != modified:
+                if normalize_function:
+                    value = normalize_function(value)
+                ngrams = Counter(analyzer(value))
+                # int32 halves the size of the saved store, the vocabulary is bounded by FEATURE_STORE_MAX_VOCABULARY
+                indices = np.fromiter((store_vocabulary.setdefault(ngram, len(store_vocabulary)) for ngram in ngrams),
+                                      dtype=np.int32, count=len(ngrams))
+                counts = np.fromiter(ngrams.values(), dtype=np.int32, count=len(ngrams))
+                entry = (modified, indices, counts)
+                self.updated = True
+            if cacheable:
+                # re-inserted last so that the least recently used incidents are evicted first
+                entries[incident_id] = entry
+            rows_indices.append(entry[1])
+            rows_counts.append(entry[2])
+        while len(entries) > FEATURE_STORE_MAX_INCIDENTS:
+            entries.pop(next(iter(entries)))
+        return self.project(rows_indices, rows_counts, store_vocabulary, vocabulary)
+
+    @staticmethod
+    def project(rows_indices: List[np.ndarray], rows_counts: List[np.ndarray], store_vocabulary: Dict[str, int],
+                vocabulary: Dict[str, int]) -> csr_matrix:
+        """
+        Build the sparse counts matrix of the rows restricted to the columns of vocabulary
+        :param rows_indices: for each row, indices of its n-grams in store_vocabulary
+        :param rows_counts: for each row, counts of its n-grams
+        :param store_vocabulary: vocabulary of the field store {ngram: index}
+        :param vocabulary: vocabulary of the output matrix {ngram: column}
+        :return: sparse matrix of counts len(rows_indices) * len(vocabulary)
+        """
+        columns = np.full(len(store_vocabulary), -1, dtype=np.int64)
+        for ngram, column in vocabulary.items():
+            store_index = store_vocabulary.get(ngram)
+            if store_index is not None:
+                columns[store_index] = column
+        rows_length = [len(indices) for indices in rows_indices]
+        rows = np.repeat(np.arange(len(rows_indices)), rows_length)
+        indices = np.concatenate(rows_indices) if rows_indices else np.zeros(0, dtype=np.int32)
+        counts = np.concatenate(rows_counts) if rows_counts else np.zeros(0, dtype=np.int32)
+        columns = columns[indices]
+        mask = columns >= 0
+        return csr_matrix((counts[mask], (rows[mask], columns[mask])), shape=(len(rows_indices), len(vocabulary)))
+
+
+def load_feature_store(model_name: str) -> IncidentFeatureStore:
+    """
+    Load the feature store saved as a ML model, return an empty store if it does not exist or is not readable
+    :param model_name: model_name
+    :return: IncidentFeatureStore
+    """
+    res = demisto.executeCommand('getMLModel', {'modelName': model_name})
+    if not res or is_error(res):
+        return IncidentFeatureStore()
+    try:
+        model_data = zlib.decompress(base64.b64decode(res[0]['Contents']['modelData']))
+        data = pickle.loads(model_data)  # guardrails-disable-line
+    except Exception as e:
+        demisto.debug('Could not load the feature store {}: {}'.format(model_name, str(e)))
+        return IncidentFeatureStore()
+    if not isinstance(data, dict) or data.get('version') != FEATURE_STORE_VERSION:
+        return IncidentFeatureStore()
+    return IncidentFeatureStore(data['fields'])
+
+
+def save_feature_store(feature_store: IncidentFeatureStore, model_name: str) -> None:
+    """
+    Save the feature store as a zlib compressed hidden ML model if it was updated during this run
+    :param feature_store: IncidentFeatureStore
+    :param model_name: model_name
+    :return: None
+    """
+    if not feature_store.updated:
+        return
+    data = {'version': FEATURE_STORE_VERSION, 'fields': feature_store.fields}
+    pickled_data = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)  # guardrails-disable-line
+    model_data = base64.b64encode(zlib.compress(pickled_data, 1)).decode('utf-8')
+    res = demisto.executeCommand('createMLModel', {'modelData': model_data,
+                                                   'modelName': model_name,
+                                                   'modelOverride': True,
+                                                   'modelHidden': True})
+    if is_error(res):
+        demisto.debug('Could not save the feature store {}: {}'.format(model_name, get_error(res)))
+
+
 class Tfidf(BaseEstimator, TransformerMixin):
     """
     TFIDF transformer
     """
 
-    def __init__(self, incident_field: str, tfidf_params: dict, normalize_function, current_incident):
+    def __init__(self, incident_field: str, tfidf_params: dict, normalize_function, current_incident,
+                 feature_store: Optional[IncidentFeatureStore] = None):
         """
         :param incident_field: incident on which we want to use the transformer
         :param tfidf_params: parameters of TFIDF
         :param normalize_function: Normalize function to apply on each sample of the corpus before the vectorization
         :param current_incident: current incident
+        :param feature_store: IncidentFeatureStore used to count the n-grams of the fitted incidents
         """
         self.incident_field = incident_field
         self.params = tfidf_params
         self.normalize_function = normalize_function
+        self.feature_store = feature_store
         if self.normalize_function:
             current_incident = current_incident[self.incident_field].apply(self.normalize_function)
         self.vocabulary = TfidfVectorizer(**self.params, use_idf=False).fit(current_incident).vocabulary_
-        self.vec = TfidfVectorizer(**self.params, vocabulary=self.vocabulary)
+        self.vec = CountVectorizer(**self.params, vocabulary=self.vocabulary)
+        self.tfidf = TfidfTransformer()
+
+    def count(self, x, use_feature_store: bool = False) -> csr_matrix:
+        """
+        Count the n-grams of the vocabulary in each sample of x
+        :param x: DataFrame
+        :param use_feature_store: If the counts of the incidents of x can be read and written in the feature store
+        :return: sparse matrix of counts
+        """
+        if use_feature_store and self.feature_store is not None and COLUMN_MODIFIED in x.columns:
+            key = '%s:%s:%s' % (getattr(self.normalize_function, '__name__', None), self.params, self.incident_field)
+            return self.feature_store.count(key, x.index, x[COLUMN_MODIFIED], x[self.incident_field],
+                                            self.normalize_function, self.vec.build_analyzer(), self.vocabulary)
+        if self.normalize_function:
+            x = x[self.incident_field].apply(self.normalize_function)
+        else:
+            x = x[self.incident_field]
+        return self.vec.transform(x)
 
     def fit(self, x):
         """
@@ -263,22 +438,25 @@ class Tfidf(BaseEstimator, TransformerMixin):
         :param x: incident on which we want to fit the transfomer
         :return: self
         """
-        if self.normalize_function:
-            x = x[self.incident_field].apply(self.normalize_function)
-        self.vec.fit(x)
+        self.tfidf.fit(self.count(x, use_feature_store=True))
         return self
 
+    def fit_transform(self, x, y=None):
+        """
+        Fit TFIDF transformer and transform x, counting x only once
+        :param x: incident on which we want to fit the transfomer
+        :return: sparse matrix
+        """
+        counts = self.count(x, use_feature_store=True)
+        return self.tfidf.fit(counts).transform(counts)
+
     def transform(self, x):
         """
         Transform x with the trained vectorizer
         :param x: DataFrame or np.array
-        :return:
+        :return: sparse matrix
         """
-        if self.normalize_function:
-            x = x[self.incident_field].apply(self.normalize_function)
-        else:
-            x = x[self.incident_field]
-        return self.vec.transform(x).toarray()
+        return self.tfidf.transform(self.count(x))
 
 
 class Identity(BaseEstimator, TransformerMixin):
@@ -286,7 +464,7 @@ class Identity(BaseEstimator, TransformerMixin):
     Identity transformer for Categorical field
     """
 
-    def __init__(self, feature_names, identity_params, normalize_function, x=None):
+    def __init__(self, feature_names, identity_params, normalize_function, x=None, feature_store=None):
         self.feature_names = feature_names
         self.normalize_function = normalize_function
         self.identity_params = identity_params
@@ -305,7 +483,7 @@ TRANSFORMATION = {
     'commandline': {'transformer': Tfidf,
                     'normalize': normalize_command_line,
                     'params': {'analyzer': 'char', 'max_features': 2000, 'ngram_range': (2, 5)},
-                    'scoring_function': euclidian_similarity_capped
+                    'scoring_function': sparse_euclidian_similarity_capped
                     },
     'potentialMatch': {'transformer': Identity,
                        'normalize': None,
@@ -315,7 +493,7 @@ TRANSFORMATION = {
     'json': {'transformer': Tfidf,
              'normalize': normalize_json,
              'params': {'analyzer': 'char', 'max_features': 10000, 'ngram_range': (2, 5)},
-             'scoring_function': euclidian_similarity_capped
+             'scoring_function': sparse_euclidian_similarity_capped
              }
 }
 
@@ -325,19 +503,22 @@ class Transformer():
     Class for Transformer
     """
 
-    def __init__(self, p_transformer_type, field, p_incidents_df, p_incident_to_match, p_params):
+    def __init__(self, p_transformer_type, field, p_incidents_df, p_incident_to_match, p_params,
+                 p_feature_store=None):
         """
         :param p_transformer_type: One of the key value of TRANSFORMATION dict
         :param field: incident field used in this transformation
         :param p_incidents_df: DataFrame of incident (should contains one columns which same name than incident_field)
         :param p_incident_to_match: DataFrame of the current incident
         :param p_params: Dictionary of all the transformation - TRANSFORMATION
+        :param p_feature_store: IncidentFeatureStore shared by the transformers, None to not use any
         """
         self.transformer_type = p_transformer_type
         self.field = field
         self.incident_to_match = p_incident_to_match
         self.incidents_df = p_incidents_df
         self.params = p_params
+        self.feature_store = p_feature_store
 
     def fit_transform(self):
         """
@@ -346,7 +527,7 @@ class Transformer():
         """
         transformation = self.params[self.transformer_type]
         transformer = transformation['transformer'](self.field, transformation['params'], transformation['normalize'],
-                                                    self.incident_to_match)
+                                                    self.incident_to_match, feature_store=self.feature_store)
         x_vect = transformer.fit_transform(self.incidents_df)
         incident_vect = transformer.transform(self.incident_to_match)
 
@@ -364,11 +545,13 @@ class Transformer():
 
 
 class Model:
-    def __init__(self, p_transformation):
+    def __init__(self, p_transformation, p_feature_store=None):
         """
         :param p_transformation: Dict with the transformers parameters - TRANSFORMATION
+        :param p_feature_store: IncidentFeatureStore used to vectorize the incidents, None to not use any
         """
         self.transformation = p_transformation
+        self.feature_store = p_feature_store
 
     def init_prediction(self, p_incident_to_match, p_incidents_df, p_field_for_command_line=[],
                         p_field_for_potential_exact_match=[], p_field_for_display_fields_incidents=[],
@@ -436,13 +619,16 @@ class Model:
         :return:
         """
         for field in self.field_for_command_line:
-            t = Transformer('commandline', field, self.incidents_df, self.incident_to_match, self.transformation)
+            t = Transformer('commandline', field, self.incidents_df, self.incident_to_match, self.transformation,
+                            self.feature_store)
             t.get_score()
         for field in self.field_for_potential_exact_match:
-            t = Transformer('potentialMatch', field, self.incidents_df, self.incident_to_match, self.transformation)
+            t = Transformer('potentialMatch', field, self.incidents_df, self.incident_to_match, self.transformation,
+                            self.feature_store)
             t.get_score()
         for field in self.field_for_json:
-            t = Transformer('json', field, self.incidents_df, self.incident_to_match, self.transformation)
+            t = Transformer('json', field, self.incidents_df, self.incident_to_match, self.transformation,
+                            self.feature_store)
             t.get_score()
 
     def compute_final_score(self):
@@ -632,10 +818,11 @@ def get_args():  # type: ignore
     show_actual_incident = demisto.args().get('showCurrentIncident')
     incident_id = demisto.args().get('incidentId')
     include_indicators_similarity = demisto.args().get('includeIndicatorsSimilarity')
+    use_feature_store = demisto.args().get('useFeatureStore', 'False')
 
     return similar_text_field, similar_json_field, similar_categorical_field, exact_match_fields, display_fields, \
         from_date, to_date, show_similarity, confidence, max_incidents, query, aggregate, limit, \
-        show_actual_incident, incident_id, include_indicators_similarity
+        show_actual_incident, incident_id, include_indicators_similarity, use_feature_store
 
 
 def load_current_incident(incident_id: str, populate_fields: List[str], from_date: str, to_date: str):
@@ -878,13 +1065,15 @@ def prepare_current_incident(incident_df: pd.DataFrame, display_fields: List[str
 def main():
     similar_text_field, similar_json_field, similar_categorical_field, exact_match_fields, display_fields, from_date, \
         to_date, show_distance, confidence, max_incidents, query, aggregate, limit, show_actual_incident, \
-        incident_id, include_indicators_similarity = get_args()
+        incident_id, include_indicators_similarity, use_feature_store = get_args()
 
     global_msg = ""
 
     populate_fields = similar_text_field + similar_json_field + similar_categorical_field + exact_match_fields \
         + display_fields + ['id']
     populate_high_level_fields = keep_high_level_field(populate_fields)
+    if use_feature_store == 'True' and COLUMN_MODIFIED not in populate_high_level_fields:
+        populate_high_level_fields.append(COLUMN_MODIFIED)
 
     incident, incident_id = load_current_incident(incident_id, populate_high_level_fields, from_date, to_date)
     if not incident:
@@ -922,10 +1111,13 @@ def main():
     incident_df = fill_nested_fields(incident_df, incident, similar_text_field, similar_categorical_field)
 
     # Model prediction
-    model = Model(p_transformation=TRANSFORMATION)
+    feature_store = load_feature_store(FEATURE_STORE_MODEL_NAME) if use_feature_store == 'True' else None
+    model = Model(p_transformation=TRANSFORMATION, p_feature_store=feature_store)
     model.init_prediction(incident_df, incidents_df, similar_text_field,
                           similar_categorical_field, display_fields, similar_json_field)
     similar_incidents, fields_used = model.predict()
+    if feature_store is not None:
+        save_feature_store(feature_store, FEATURE_STORE_MODEL_NAME)
 
     if len(fields_used) == 0:
         global_msg += "%s \n" % MESSAGE_NO_FIELDS_USED
@@ -4,7 +4,9 @@ from DBotFindSimilarIncidents import normalize_command_line, main, demisto, keep
     preprocess_incidents_field, PREFIXES_TO_REMOVE, check_list_of_dict, REGEX_IP, match_one_regex, \
     SIMILARITY_COLUNM_NAME_INDICATOR, SIMILARITY_COLUNM_NAME, euclidian_similarity_capped, find_incorrect_fields, \
     MESSAGE_NO_INCIDENT_FETCHED, MESSAGE_INCORRECT_FIELD, MESSAGE_WARNING_TRUNCATED, COLUMN_ID, COLUMN_TIME, \
-    TAG_SCRIPT_INDICATORS
+    TAG_SCRIPT_INDICATORS, sparse_euclidian_similarity_capped, IncidentFeatureStore, Tfidf, TRANSFORMATION, \
+    FEATURE_STORE_MODEL_NAME
+from scipy.sparse import csr_matrix
 
 import json
 import numpy as np
@@ -95,6 +97,109 @@ def test_euclidian_similarity_capped():
     assert distance[1] > 0
 
 
+def test_sparse_euclidian_similarity_capped():
+    x = np.array([[0.6, 0.8, 0], [0, 0, 1], [0, 0, 0], [0.6, 0.8, 0]])
+    y = np.array([[0.6, 0, 0.8]])
+    distance = sparse_euclidian_similarity_capped(csr_matrix(x), csr_matrix(y))
+    assert np.allclose(distance, euclidian_similarity_capped(x, y))
+
+
+def test_tfidf_with_feature_store():
+    """
+    Given: incidents vectorized with a feature store on a first run
+    When: running again with one incident modified and a new current incident
+    Then: the scores are the same than without the feature store and only the modified incident is normalized again
+    """
+    incidents = pd.DataFrame([{'id': str(i), 'modified': 'modified_1', 'commandline': command} for i, command in
+                              enumerate(['powershell IP=1.1.1.1', 'cmd /c whoami', 'powershell -enc abc'])])
+    incidents.index = incidents.id
+    params = TRANSFORMATION['commandline']
+    feature_store = IncidentFeatureStore()
+
+    def get_scores(current_command, use_feature_store):
+        current_incident = pd.DataFrame([{'id': '123', 'commandline': current_command}])
+        transformer = Tfidf('commandline', params['params'], normalize_spy, current_incident,
+                            feature_store=feature_store if use_feature_store else None)
+        x_vect = transformer.fit_transform(incidents)
+        return params['scoring_function'](x_vect, transformer.transform(current_incident))
+
+    normalized = []
+
+    def normalize_spy(command):
+        normalized.append(command)
+        return params['normalize'](command)
+
+    assert np.allclose(get_scores('powershell IP=2.2.2.2', True), get_scores('powershell IP=2.2.2.2', False))
+    assert feature_store.updated
+
+    incidents.loc['1', 'modified'] = 'modified_2'
+    incidents.loc['1', 'commandline'] = 'powershell whoami'
+    normalized.clear()
+    assert np.allclose(get_scores('cmd /c whoami', True), get_scores('cmd /c whoami', False))
+    assert normalized[:2] == ['cmd /c whoami', 'powershell whoami']
+
+
+def test_feature_store_eviction(mocker):
+    mocker.patch('DBotFindSimilarIncidents.FEATURE_STORE_MAX_INCIDENTS', 2)
+    feature_store = IncidentFeatureStore()
+    counts = feature_store.count('key', ['1', '2', '3'], ['m', 'm', np.nan], ['ab', 'bc', 'cd'], None,
+                                 lambda value: [value], {'bc': 0, 'cd': 1})
+    assert counts.toarray().tolist() == [[0, 0], [1, 0], [0, 1]]
+    assert list(feature_store.fields['key']['entries']) == ['1', '2']
+    feature_store.count('key', ['4', '1'], ['m', 'm'], ['de', 'ab'], None, lambda value: [value], {})
+    assert list(feature_store.fields['key']['entries']) == ['4', '1']
+
+
+def test_main_feature_store(mocker):
+    """
+    Given: the feature store saved as a ML model by a first run
+    When: running again on the same incidents
+    Then: the similarity is the same and the feature store is not saved again
+    """
+    global SIMILAR_INDICATORS, FETCHED_INCIDENT, CURRENT_INCIDENT
+    FETCHED_INCIDENT = [dict(incident, modified='2021-01-30T00:00:00Z') for incident in FETCHED_INCIDENT_NOT_EMPTY]
+    CURRENT_INCIDENT = CURRENT_INCIDENT_NOT_EMPTY
+    SIMILAR_INDICATORS = SIMILAR_INDICATORS_EMPTY
+    models = {}
+
+    def execute_command_with_models(command, args):
+        if command == 'getMLModel':
+            if args['modelName'] not in models:
+                return [{'Type': 4, 'Contents': 'Model not found'}]
+            return [{'Type': 1, 'Contents': {'modelData': models[args['modelName']]}}]
+        if command == 'createMLModel':
+            models[args['modelName']] = args['modelData']
+            return [{'Type': 1, 'Contents': 'done'}]
+        return executeCommand(command, args)
+
+    mocker.patch.object(demisto, 'args',
+                        return_value={
+                            'incidentId': 12345,
+                            'similarTextField': 'commandline',
+                            'similarCategoricalField': '',
+                            'similarJsonField': 'CustomFields',
+                            'limit': 10000,
+                            'fieldExactMatch': '',
+                            'fieldsToDisplay': '',
+                            'showIncidentSimilarityForAllFields': True,
+                            'minimunIncidentSimilarity': 0,
+                            'maxIncidentsToDisplay': 100,
+                            'query': '',
+                            'aggreagateIncidentsDifferentDate': 'False',
+                            'includeIndicatorsSimilarity': 'False',
+                            'useFeatureStore': 'True'
+                        })
+    mocker.patch.object(demisto, 'dt', return_value=None)
+    execute_command = mocker.patch.object(demisto, 'executeCommand', side_effect=execute_command_with_models)
+    first_res, _ = main()
+    assert FEATURE_STORE_MODEL_NAME in models
+    execute_command.reset_mock()
+    second_res, _ = main()
+    assert 'createMLModel' not in [call.args[0] for call in execute_command.call_args_list]
+    pd.testing.assert_frame_equal(first_res, second_res)
+    assert first_res.loc['1', 'similarity commandline'] == 1.0
+
+
 @pytest.mark.filterwarnings("ignore::pandas.core.common.SettingWithCopyWarning", "ignore::UserWarning")
 def test_main_regular(mocker):
     global SIMILAR_INDICATORS, FETCHED_INCIDENT, CURRENT_INCIDENT
@@ -1,12 +1,25 @@
 # type: ignore
+import base64
+import pickle
+from functools import lru_cache
 import dateutil.parser
-from sklearn.feature_extraction.text import TfidfVectorizer
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
 from sklearn.metrics.pairwise import linear_kernel
 from six import string_types
 from CommonServerPython import *
 
 INCIDENT_TEXT_FIELD = 'incident_text_for_tfidf'
 
+INDEX_MODEL_NAME_PREFIX = 'FindSimilarIncidentsByText_index_'
+INDEX_VERSION = 1
+INDEX_N_FEATURES = 2 ** 14
+INDEX_N_BANDS = 20
+INDEX_BAND_BITS = 12
+INDEX_SEED = 0
+INDEX_MAX_INCIDENTS = 100000
+INDEX_UPDATE_LIMIT = 10000
+
 
 def parse_datetime(datetime_str):
     return dateutil.parser.parse(datetime_str)
@@ -42,7 +55,7 @@ def add_text_to_incident(incident, text_fields):
 
 
 def get_incidents_by_time(incident_time, incident_type, incident_id, hours_time_frame, ignore_closed,
-                          max_number_of_results, time_field):
+                          max_number_of_results, time_field, incidents_ids=None):
     incident_time = parse_datetime(incident_time)
     max_date = incident_time + timedelta(hours=hours_time_frame)
     min_date = incident_time - timedelta(hours=hours_time_frame)
@@ -55,6 +68,9 @@ def get_incidents_by_time(incident_time, incident_type, incident_id, hours_time_
     if incident_id:
         query += ' and -id:%s' % incident_id
 
+    if incidents_ids:
+        query += ' and id:(%s)' % ' '.join(str(x) for x in incidents_ids)
+
     args = {'query': query, 'size': max_number_of_results, 'sort': '%s.desc' % time_field}
     if time_field == "created":
         args['from'] = min_date.isoformat()
@@ -72,6 +88,213 @@ def get_incidents_by_time(incident_time, incident_type, incident_id, hours_time_
     return incident_list
 
 
+@lru_cache(maxsize=1)
+def get_random_hyperplanes():
+    return np.random.RandomState(INDEX_SEED).standard_normal(
+        (INDEX_N_FEATURES, INDEX_N_BANDS * INDEX_BAND_BITS)).astype(np.float32)
+
+
+def get_text_signatures(texts):
+    """
+    Random hyperplanes signatures of the hashed term frequencies of the texts - two texts share a bit with probability
+    1 - angle / pi, so close texts (cosine) share every bit of at least one band with high probability.
+    """
+    vect = HashingVectorizer(n_features=INDEX_N_FEATURES, stop_words='english', alternate_sign=False, norm='l2')
+    return np.asarray(vect.transform(texts) @ get_random_hyperplanes()) > 0
+
+
+def get_bands_keys(signatures):
+    return signatures.reshape(-1, INDEX_N_BANDS, INDEX_BAND_BITS).dot(1 << np.arange(INDEX_BAND_BITS))
+
+
+class SimilarTextIndex(object):
+    """
+    Approximate nearest neighbours index of the incidents texts, with random projections LSH.
+    Incidents are bucketed by each band of their signature, a query only ranks the incidents sharing a bucket with it.
+    """
+
+    def __init__(self, text_fields, time_field, data=None):
+        self.text_fields = sorted(text_fields)
+        self.time_field = time_field
+        data = data or {}
+        # period of creation time of the indexed incidents
+        self.indexed_from = data.get('indexed_from')
+        self.indexed_to = data.get('indexed_to')
+        # incident id -> (timestamp of the time field, packed signature)
+        self.entries = data.get('entries', {})
+        self.buckets = data.get('buckets') or [{} for _ in range(INDEX_N_BANDS)]
+        self.updated = False
+
+    def to_dict(self):
+        return {'version': INDEX_VERSION, 'text_fields': self.text_fields, 'time_field': self.time_field,
+                'indexed_from': self.indexed_from, 'indexed_to': self.indexed_to, 'entries': self.entries,
+                'buckets': self.buckets}
+
+    def add(self, incidents_ids, timestamps, texts):
+        if not incidents_ids:
+            return
+        signatures = get_text_signatures(texts)
+        for incident_id, timestamp, signature, keys in zip(incidents_ids, timestamps, signatures,
+                                                           get_bands_keys(signatures)):
+            entry = (timestamp, np.packbits(signature).tobytes())
+            if self.entries.get(incident_id) == entry:
+                continue
+            self.remove(incident_id)
+            self.entries[incident_id] = entry
+            for band, key in enumerate(keys):
+                self.buckets[band].setdefault(int(key), set()).add(incident_id)
+            self.updated = True
+        if len(self.entries) > INDEX_MAX_INCIDENTS:
+            oldest = sorted(self.entries, key=lambda x: self.entries[x][0] or 0)
+            for incident_id in oldest[:len(self.entries) - INDEX_MAX_INCIDENTS]:
+                self.remove(incident_id)
+
+    def remove(self, incident_id):
+        entry = self.entries.pop(incident_id, None)
+        if not entry:
+            return
+        signature = np.unpackbits(np.frombuffer(entry[1], dtype=np.uint8))
+        for band, key in enumerate(get_bands_keys(signature)[0]):
+            bucket = self.buckets[band].get(int(key))
+            if bucket:
+                bucket.discard(incident_id)
+                if not bucket:
+                    del self.buckets[band][int(key)]
+        self.updated = True
+
+    def query(self, text, size, min_timestamp=None, max_timestamp=None, exclude_id=None):
+        """
+        Return the ids of the (at most) size incidents which signatures are the closest to the text signature
+        """
+        signature = get_text_signatures([text])
+        candidates = set()
+        for band, key in enumerate(get_bands_keys(signature)[0]):
+            candidates.update(self.buckets[band].get(int(key), ()))
+        candidates.discard(exclude_id)
+        if min_timestamp is not None and self.time_field != 'modified':
+            # the modified time of an incident changes after it has been indexed
+            candidates = [x for x in candidates if self.entries[x][0] is None
+                          or min_timestamp <= self.entries[x][0] <= max_timestamp]
+        candidates = list(candidates)
+        if not candidates:
+            return []
+        candidates_signatures = np.frombuffer(b''.join(self.entries[x][1] for x in candidates), dtype=np.uint8)
+        candidates_signatures = candidates_signatures.reshape(len(candidates), -1)
+        distances = np.unpackbits(candidates_signatures ^ np.packbits(signature[0]), axis=1).sum(axis=1)
+        return [candidates[i] for i in np.argsort(distances, kind='stable')[:size]]
+
+
+def get_timestamp(incident, time_field):
+    try:
+        return parse_datetime(incident[time_field]).timestamp()
+    except Exception:
+        return None
+
+
+def get_index_model_name(incident_type):
+    return INDEX_MODEL_NAME_PREFIX + re.sub(r'\W+', '_', incident_type)
+
+
+def load_index(model_name, text_fields, time_field):
+    res = demisto.executeCommand('getMLModel', {'modelName': model_name})
+    if res and not is_error(res):
+        try:
+            data = pickle.loads(base64.b64decode(res[0]['Contents']['modelData']))  # guardrails-disable-line
+            if data.get('version') == INDEX_VERSION and data.get('text_fields') == sorted(text_fields) \
+                    and data.get('time_field') == time_field:
+                return SimilarTextIndex(text_fields, time_field, data)
+        except Exception as e:
+            demisto.debug('Could not load the index {}: {}'.format(model_name, str(e)))
+    return SimilarTextIndex(text_fields, time_field)
+
+
+def save_index(index, model_name):
+    if not index.updated:
+        return
+    model_data = base64.b64encode(pickle.dumps(index.to_dict())).decode('utf-8')  # guardrails-disable-line
+    res = demisto.executeCommand('createMLModel', {'modelData': model_data,
+                                                   'modelName': model_name,
+                                                   'modelOverride': True,
+                                                   'modelHidden': True})
+    if is_error(res):
+        demisto.debug('Could not save the index {}: {}'.format(model_name, get_error(res)))
+
+
+def get_incidents_to_index(incident_type, from_date, to_date=None):
+    """
+    Yield the incidents created in the period in pages of at most INDEX_UPDATE_LIMIT incidents, newest first.
+    GetIncidentsByQuery returns the newest incidents of the period, so a full page ends the period of the next page at
+    the creation time of its oldest incident
+    """
+    while True:
+        args = {'incidentTypes': incident_type, 'timeField': 'created', 'fromDate': from_date,
+                'limit': INDEX_UPDATE_LIMIT}
+        if to_date:
+            args['toDate'] = to_date
+        res = demisto.executeCommand('GetIncidentsByQuery', args)
+        if is_error(res):
+            return_error(res)
+        incidents = json.loads(res[0]['Contents']) if len(res) > 0 else []
+        yield incidents
+        oldest = min((incident['created'] for incident in incidents if incident.get('created')), default=None)
+        if len(incidents) < INDEX_UPDATE_LIMIT or not oldest or (to_date and oldest >= to_date):
+            return
+        demisto.debug('Indexing the incidents created from {} to {}'.format(from_date, oldest))
+        to_date = oldest
+
+
+def update_index(index, incident_type, min_date):
+    """
+    Index the incidents created since the last update, and the ones created before the indexed period if min_date is
+    older than it
+    """
+    min_date = min_date.isoformat()
+    periods = []
+    if not index.indexed_from:
+        periods.append((min_date, None))
+    else:
+        if min_date < index.indexed_from:
+            periods.append((min_date, index.indexed_from))
+        periods.append((index.indexed_to, None))
+    for from_date, to_date in periods:
+        for incidents in get_incidents_to_index(incident_type, from_date, to_date):
+            incidents_ids, timestamps, texts = [], [], []
+            for incident in incidents:
+                text = get_texts_from_incident(incident, index.text_fields)
+                if text:
+                    incidents_ids.append(incident['id'])
+                    timestamps.append(get_timestamp(incident, index.time_field))
+                    texts.append(text)
+                if incident.get('created') and incident['created'] > (index.indexed_to or ''):
+                    index.indexed_to = incident['created']
+            index.add(incidents_ids, timestamps, texts)
+    if not index.indexed_from or min_date < index.indexed_from:
+        index.indexed_from = min_date
+        index.indexed_to = index.indexed_to or min_date
+        index.updated = True
+
+
+def get_incidents_by_index(incident, incident_text, text_fields, hours_time_frame, ignore_closed,
+                           max_number_of_results, time_field):
+    """
+    Return the max_number_of_results incidents of the time frame that are the closest to incident_text in the index,
+    updating the index with the new incidents first
+    """
+    incident_time = parse_datetime(incident[time_field])
+    min_date = incident_time - timedelta(hours=hours_time_frame)
+    max_date = incident_time + timedelta(hours=hours_time_frame)
+    model_name = get_index_model_name(incident['type'])
+    index = load_index(model_name, text_fields, time_field)
+    update_index(index, incident['type'], min_date)
+    incidents_ids = index.query(incident_text, max_number_of_results, min_date.timestamp(), max_date.timestamp(),
+                                exclude_id=incident['id'])
+    save_index(index, model_name)
+    if not incidents_ids:
+        return []
+    return get_incidents_by_time(incident[time_field], incident['type'], incident['id'], hours_time_frame,
+                                 ignore_closed, max_number_of_results, time_field, incidents_ids)
+
+
 def incident_to_record(incident, time_field):
     def parse_time(date_time_str):
         try:
@@ -117,6 +340,7 @@ def main():
     MAX_CANDIDATES_IN_LIST = int(demisto.args()['maxResults'])
     TIME_FIELD = demisto.args()['timeField']
     PRE_PROCESS_TEXT = demisto.args()['preProcessText'] == 'true'
+    USE_INDEX = demisto.args().get('useIndex') == 'yes'
 
     incident = demisto.incidents()[0]
     incident_text = get_texts_from_incident(incident, TEXT_FIELDS)
@@ -125,8 +349,12 @@ def main():
         sys.exit(0)
 
     # get initial candidates list
-    candidates = get_incidents_by_time(incident[TIME_FIELD], incident['type'], incident['id'], HOURS_TIME_FRAME,
-                                       IGNORE_CLOSED, INCIDENT_QUERY_SIZE, TIME_FIELD)
+    if USE_INDEX:
+        candidates = get_incidents_by_index(incident, incident_text, TEXT_FIELDS, HOURS_TIME_FRAME, IGNORE_CLOSED,
+                                            INCIDENT_QUERY_SIZE, TIME_FIELD)
+    else:
+        candidates = get_incidents_by_time(incident[TIME_FIELD], incident['type'], incident['id'], HOURS_TIME_FRAME,
+                                           IGNORE_CLOSED, INCIDENT_QUERY_SIZE, TIME_FIELD)
 
     # filter candidates with minimum length constraint
     for candidate in candidates:
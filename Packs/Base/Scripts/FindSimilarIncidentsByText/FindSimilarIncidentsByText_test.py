@@ -1,7 +1,8 @@
 import json
+import re
 
 from CommonServerPython import *
-from FindSimilarIncidentsByText import main
+from FindSimilarIncidentsByText import main, SimilarTextIndex, get_index_model_name, update_index
 import random
 
 nouns = ['people', 'history', 'way', 'art', 'world', 'information', 'map', 'two', 'family', 'government', 'health',
@@ -235,3 +236,94 @@ def test_similar_context_with_pre_process(mocker):
     assert len(result['EntryContext']['similarIncidentList']) == 1
     assert result['EntryContext']['similarIncidentList'][0]['rawId'] == 2
     assert float(result['EntryContext']['similarIncident']['similarity']) > 0.9
+
+
+def test_similar_text_index():
+    index = SimilarTextIndex({'name', 'details'}, 'created')
+    texts = [" ".join([nouns[random.randrange(0, len(nouns))] for i in range(50)]) for _ in range(200)]
+    index.add(list(range(200)), [float(i) for i in range(200)], texts)
+    near_duplicate = texts[42].replace(texts[42].split()[0], 'phishing', 1)
+    assert index.query(near_duplicate, 1) == [42]
+    assert 42 not in index.query(near_duplicate, 5, min_timestamp=100, max_timestamp=200)
+    assert 42 not in index.query(near_duplicate, 5, exclude_id=42)
+
+    index.updated = False
+    index.add([42], [42.0], [texts[42]])
+    assert not index.updated
+    index.remove(42)
+    assert 42 not in index.query(near_duplicate, 200)
+    assert all(42 not in bucket for band in index.buckets for bucket in band.values())
+
+
+def test_similar_context_with_index(mocker):
+    """
+    Given: no index stored for the incident type
+    When: running twice with useIndex
+    Then: the index is built with the incidents of the time frame, the candidates are compared with TF-IDF and the
+        index is saved only when it changed
+    """
+    args = dict(default_args)
+    args.update({'useIndex': 'yes'})
+    models = {}
+    queries = []
+
+    def execute_command_with_index(command, args=None):
+        if command == 'getMLModel':
+            if args['modelName'] not in models:
+                return [{'Type': entryTypes['error'], 'Contents': 'Model not found'}]
+            return [{'Type': entryTypes['note'], 'Contents': {'modelData': models[args['modelName']]}}]
+        if command == 'createMLModel':
+            models[args['modelName']] = args['modelData']
+            return [{'Type': entryTypes['note'], 'Contents': 'done'}]
+        if command == 'GetIncidentsByQuery':
+            queries.append(args)
+            incidents = [incident1_dup, incident3, incident4]
+            if 'query' in args:
+                ids = re.search(r' id:\((.*)\)', args['query']).group(1).split()
+                incidents = [x for x in incidents if str(x['id']) in ids]
+            return [{'Contents': json.dumps(incidents), 'Type': 'note'}]
+        return execute_command(command, args)
+
+    mocker.patch.object(demisto, 'args', return_value=args)
+    mocker.patch.object(demisto, 'incidents', return_value=[incident1])
+    execute_command_mock = mocker.patch.object(demisto, 'executeCommand', side_effect=execute_command_with_index)
+
+    result = main()
+    assert queries[0] == {'incidentTypes': 'Phishing', 'timeField': 'created', 'fromDate': '2018-12-31T19:00:00',
+                          'limit': 10000}
+    assert 'id:(' in queries[1]['query']
+    assert result['EntryContext']['similarIncidentList'][0]['rawId'] == 2
+    assert get_index_model_name('Phishing') in models
+
+    execute_command_mock.reset_mock()
+    result = main()
+    assert result['EntryContext']['similarIncidentList'][0]['rawId'] == 2
+    assert 'createMLModel' not in [call.args[0] for call in execute_command_mock.call_args_list]
+
+
+def test_update_index_pages_through_period(mocker):
+    """
+    Given: more incidents created in the time frame than the limit of a single GetIncidentsByQuery call
+    When: building the index
+    Then: the period is paged through from the newest incidents to the oldest, and all the incidents are indexed
+    """
+    import FindSimilarIncidentsByText
+    mocker.patch.object(FindSimilarIncidentsByText, 'INDEX_UPDATE_LIMIT', 3)
+    incidents = [{'id': i, 'created': '2019-01-01T00:{:02d}:00Z'.format(i), 'name': 'incident {}'.format(i),
+                  'details': ' '.join(nouns[i * 5:i * 5 + 5])} for i in range(8)]
+    queries = []
+
+    def get_incidents_by_query(command, args):
+        queries.append(dict(args))
+        period = [x for x in incidents if x['created'] >= args['fromDate']
+                  and ('toDate' not in args or x['created'] < args['toDate'])]
+        return [{'Contents': json.dumps(sorted(period, key=lambda x: x['created'], reverse=True)[:args['limit']]),
+                 'Type': 'note'}]
+
+    mocker.patch.object(demisto, 'executeCommand', side_effect=get_incidents_by_query)
+    index = SimilarTextIndex({'name', 'details'}, 'created')
+    update_index(index, 'Phishing', datetime(2019, 1, 1))
+
+    assert [query.get('toDate') for query in queries] == [None, '2019-01-01T00:05:00Z', '2019-01-01T00:02:00Z']
+    assert sorted(index.entries) == list(range(8))
+    assert (index.indexed_from, index.indexed_to) == ('2019-01-01T00:00:00', '2019-01-01T00:07:00Z')
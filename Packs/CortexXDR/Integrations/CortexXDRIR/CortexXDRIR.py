@@ -23,6 +23,9 @@ INTEGRATION_CONTEXT_BRAND = 'PaloAltoNetworksXDR'
 XDR_INCIDENT_TYPE_NAME = 'Cortex XDR Incident'
 INTEGRATION_NAME = 'Cortex XDR - IR'
 
+MAX_INCIDENTS_PAGE_SIZE = 100  # the maximum number of incidents the API returns in a single request
+DEFAULT_EXTRA_DATA_WORKERS = 5  # the number of incidents extra data requests sent at the same time
+
 XDR_INCIDENT_FIELDS = {
     "status": {"description": "Current status of the incident: \"new\",\"under_"
                               "investigation\",\"resolved_threat_handled\",\"resolved_known_issue\","
@@ -229,9 +232,18 @@ def clear_trailing_whitespace(res):
 
 class Client(BaseClient):
 
-    def __init__(self, base_url: str, headers: dict, timeout: int = 120, proxy: bool = False, verify: bool = False):
+    def __init__(self, base_url: str, headers: dict, timeout: int = 120, proxy: bool = False, verify: bool = False,
+                 extra_data_workers: int = DEFAULT_EXTRA_DATA_WORKERS, rate_limit: Optional[float] = None):
+        """
+        :param extra_data_workers: The number of incidents extra data requests to send at the same time
+        :param rate_limit: The maximum number of API requests per second, not limited if None
+        """
         self.timeout = timeout
-        super().__init__(base_url=base_url, headers=headers, proxy=proxy, verify=verify)
+        self.extra_data_workers = extra_data_workers
+        # the incidents extra data fetched by this execution, see 'prefetch_incidents_extra_data'
+        self.extra_data_cache: Dict[str, Any] = {}
+        throttler = RateLimitThrottler(rate=rate_limit, max_concurrency=extra_data_workers) if rate_limit else None
+        super().__init__(base_url=base_url, headers=headers, proxy=proxy, verify=verify, throttler=throttler)
 
     def test_module(self, first_fetch_time):
         """
@@ -360,22 +372,36 @@ class Client(BaseClient):
         :param alerts_limit: Maximum number alerts to get
         :return:
         """
-        request_data = {
-            'incident_id': incident_id,
-            'alerts_limit': alerts_limit,
-        }
-
-        reply = self._http_request(
-            method='POST',
-            url_suffix='/incidents/get_incident_extra_data/',
-            json_data={'request_data': request_data},
-            timeout=self.timeout
-        )
+        reply = self._http_request(**self.incident_extra_data_request(incident_id, alerts_limit))
 
         incident = reply.get('reply')
 
         return incident
 
+    def get_incidents_extra_data(self, incident_ids, alerts_limit=1000):
+        """
+        Returns the extra data of several incidents, requested concurrently by up to extra_data_workers requests
+
+        :param incident_ids: The ids of the incidents
+        :param alerts_limit: Maximum number alerts to get for each incident
+        :return: A list with the extra data of each incident, or the exception raised when requesting it
+        """
+        replies = self._http_request_many([self.incident_extra_data_request(incident_id, alerts_limit)
+                                           for incident_id in incident_ids], max_workers=self.extra_data_workers)
+        return [reply if isinstance(reply, Exception) else reply.get('reply') for reply in replies]
+
+    def incident_extra_data_request(self, incident_id, alerts_limit):
+        request_data = {
+            'incident_id': incident_id,
+            'alerts_limit': alerts_limit,
+        }
+        return {
+            'method': 'POST',
+            'url_suffix': '/incidents/get_incident_extra_data/',
+            'json_data': {'request_data': request_data},
+            'timeout': self.timeout
+        }
+
     def update_incident(self, incident_id, assigned_user_mail, assigned_user_pretty_name, status, severity,
                         resolve_comment, unassign_user):
         update_data = {}
@@ -1387,7 +1413,9 @@ class Client(BaseClient):
             incident_id = incident.get('incident_id')
             modified_incidents_context[incident_id] = incident.get('modification_time')
 
-        set_integration_context({'modified_incidents': modified_incidents_context})
+        integration_context = get_integration_context()
+        integration_context['modified_incidents'] = modified_incidents_context
+        set_integration_context(integration_context)
 
     def get_endpoints_by_status(self, status, last_seen_gte=None, last_seen_lte=None):
         filters = []
@@ -1692,6 +1720,50 @@ def get_last_mirrored_in_time(args):
     return last_mirrored_in_timestamp
 
 
+def prefetch_incidents_extra_data(client, incident_ids, alerts_limit=1000):
+    """
+    Fetches the extra data of the incidents concurrently, so it is taken from the client extra data cache later on.
+    The extra data is only kept in memory for the current execution, as it can hold up to alerts_limit alerts
+    for each incident.
+
+    :param client: The XDR client
+    :param incident_ids: The ids of the incidents
+    :param alerts_limit: Maximum number alerts to get for each incident
+    """
+    incident_ids = [str(incident_id) for incident_id in incident_ids if str(incident_id) not in client.extra_data_cache]
+    if not incident_ids:
+        return
+
+    demisto.debug(f"Performing extra-data requests on incidents: {incident_ids}")
+    for incident_id, reply in zip(incident_ids, client.get_incidents_extra_data(incident_ids, alerts_limit)):
+        if isinstance(reply, Exception):
+            # raised when the incident extra data is taken from the cache, as the extra data request would have
+            client.extra_data_cache[incident_id] = reply
+        else:
+            client.extra_data_cache[incident_id] = {'alerts_limit': alerts_limit, 'reply': reply}
+
+
+def get_cached_incident_extra_data(client, incident_id, alerts_limit):
+    """
+    Returns the extra data of an incident. The extra data prefetched by this execution is used if it holds enough
+    alerts.
+
+    :param client: The XDR client
+    :param incident_id: The id of the incident
+    :param alerts_limit: Maximum number alerts to get
+    :return: The extra data of the incident
+    """
+    cache_entry = client.extra_data_cache.get(str(incident_id))
+    if isinstance(cache_entry, Exception):
+        raise cache_entry
+    if cache_entry and cache_entry.get('alerts_limit', 0) >= alerts_limit:
+        demisto.debug(f"Using cached extra-data of incident: {incident_id}")
+        return copy.deepcopy(cache_entry.get('reply'))
+
+    demisto.debug(f"Performing extra-data request on incident: {incident_id}")
+    return client.get_incident_extra_data(incident_id, alerts_limit)
+
+
 def get_incident_extra_data_command(client, args):
     incident_id = args.get('incident_id')
     alerts_limit = int(args.get('alerts_limit', 1000))
@@ -1707,8 +1779,7 @@ def get_incident_extra_data_command(client, args):
         else:  # the incident was not modified
             return "The incident was not modified in XDR since the last mirror in.", {}, {}
 
-    demisto.debug(f"Performing extra-data request on incident: {incident_id}")
-    raw_incident = client.get_incident_extra_data(incident_id, alerts_limit)
+    raw_incident = get_cached_incident_extra_data(client, incident_id, alerts_limit)
 
     incident = raw_incident.get('incident')
     incident_id = incident.get('incident_id')
@@ -2929,6 +3000,28 @@ def update_remote_system_command(client, args):
         return remote_args.remote_incident_id
 
 
+def get_incidents_pages(client, max_fetch, **kwargs):
+    """
+    Returns up to max_fetch incidents, by requesting pages of up to MAX_INCIDENTS_PAGE_SIZE incidents.
+
+    :param client: The XDR client
+    :param max_fetch: The maximum number of incidents to return
+    :param kwargs: The filters and sort of the incidents, see 'Client.get_incidents'
+    :return: The incidents
+    """
+    page_size = min(max_fetch, MAX_INCIDENTS_PAGE_SIZE)
+    raw_incidents: list = []
+    page_number = 0
+    while len(raw_incidents) < max_fetch:
+        page = client.get_incidents(page_number=page_number, limit=page_size, **kwargs)
+        raw_incidents += page
+        if len(page) < page_size:
+            break
+        page_number += 1
+
+    return raw_incidents[:max_fetch]
+
+
 def fetch_incidents(client, first_fetch_time, integration_instance, last_run: dict = None, max_fetch: int = 10,
                     statuses: List = []):
     # Get the last fetch time, if exists
@@ -2947,16 +3040,20 @@ def fetch_incidents(client, first_fetch_time, integration_instance, last_run: di
         if statuses:
             raw_incidents = []
             for status in statuses:
-                raw_incidents += client.get_incidents(gte_creation_time_milliseconds=last_fetch, status=status,
-                                                      limit=max_fetch, sort_by_creation_time='asc')
+                raw_incidents += get_incidents_pages(client, max_fetch, gte_creation_time_milliseconds=last_fetch,
+                                                     status=status, sort_by_creation_time='asc')
             raw_incidents = sorted(raw_incidents, key=lambda inc: inc['creation_time'])
         else:
-            raw_incidents = client.get_incidents(gte_creation_time_milliseconds=last_fetch, limit=max_fetch,
-                                                 sort_by_creation_time='asc')
+            raw_incidents = get_incidents_pages(client, max_fetch, gte_creation_time_milliseconds=last_fetch,
+                                                sort_by_creation_time='asc')
 
     # save the last 100 modified incidents to the integration context - for mirroring purposes
     client.save_modified_incidents_to_integration_context()
 
+    # the extra data of the incidents is requested concurrently, and then taken from the client cache one by one
+    prefetch_incidents_extra_data(client, [raw_incident.get('incident_id')
+                                           for raw_incident in raw_incidents[:max_fetch]])
+
     # maintain a list of non created incidents in a case of a rate limit exception
     non_created_incidents: list = raw_incidents.copy()
     next_run = dict()
@@ -3578,6 +3675,17 @@ def main():
     except ValueError as e:
         demisto.debug(f'Failed casting max fetch parameter to int, falling back to 10 - {e}')
         max_fetch = 10
+    try:
+        extra_data_workers = int(demisto.params().get('extra_data_workers') or DEFAULT_EXTRA_DATA_WORKERS)
+    except ValueError as e:
+        demisto.debug(f'Failed casting extra data workers parameter to int, falling back to '
+                      f'{DEFAULT_EXTRA_DATA_WORKERS} - {e}')
+        extra_data_workers = DEFAULT_EXTRA_DATA_WORKERS
+    try:
+        rate_limit = float(demisto.params().get('rate_limit') or 0) or None
+    except ValueError as e:
+        demisto.debug(f'Failed casting rate limit parameter to float, the API requests are not limited - {e}')
+        rate_limit = None
 
     nonce = "".join([secrets.choice(string.ascii_letters + string.digits) for _ in range(64)])
     timestamp = str(int(datetime.now(timezone.utc).timestamp()) * 1000)
@@ -3597,7 +3705,9 @@ def main():
         proxy=proxy,
         verify=verify_cert,
         headers=headers,
-        timeout=timeout
+        timeout=timeout,
+        extra_data_workers=extra_data_workers,
+        rate_limit=rate_limit
     )
 
     args = demisto.args()
@@ -7,7 +7,7 @@ import pytest
 from freezegun import freeze_time
 
 import demistomock as demisto
-from CommonServerPython import Common
+from CommonServerPython import Common, DemistoException
 
 XDR_URL = 'https://api.xdrurl.com'
 
@@ -44,6 +44,14 @@ def get_incident_extra_data_by_status(incident_id, alerts_limit):
     return incident_extra_data['reply']
 
 
+def get_incidents_extra_data_by_status(incident_ids, alerts_limit):
+    """
+        The function simulate the client.get_incidents_extra_data method for the
+        test_fetch_incidents_filtered_by_status.
+    """
+    return [get_incident_extra_data_by_status(incident_id, alerts_limit) for incident_id in incident_ids]
+
+
 ''' TESTS FUNCTIONS '''
 
 
@@ -147,7 +155,7 @@ def test_fetch_incidents_filtered_by_status(requests_mock, mocker):
     )
 
     mocker.patch.object(client, 'get_incidents', side_effect=get_incident_by_status)
-    mocker.patch.object(client, 'get_incident_extra_data', side_effect=get_incident_extra_data_by_status)
+    mocker.patch.object(client, 'get_incidents_extra_data', side_effect=get_incidents_extra_data_by_status)
 
     statuses_to_fetch = ['under_investigation', 'new']
 
@@ -222,6 +230,96 @@ def test_fetch_incidents_with_rate_limit_error(requests_mock, mocker):
     assert incidents[0]['rawJSON'] == json.dumps(modified_raw_incident)
 
 
+def test_get_incidents_pages(mocker):
+    """
+    Given:
+        - more incidents to fetch than a single page holds
+    When
+        - getting the incidents to fetch
+    Then
+        - pages of 100 incidents are requested until max_fetch incidents are returned, or a page is not full
+    """
+    from CortexXDRIR import get_incidents_pages, Client
+    client = Client(
+        base_url=f'{XDR_URL}/public_api/v1', headers={}
+    )
+    incidents = [{'incident_id': str(incident_id)} for incident_id in range(230)]
+    mocker.patch.object(client, 'get_incidents', side_effect=lambda page_number, limit, **kwargs:
+                        incidents[page_number * limit:(page_number + 1) * limit])
+
+    assert get_incidents_pages(client, 150, sort_by_creation_time='asc') == incidents[:150]
+    assert [call.kwargs['page_number'] for call in client.get_incidents.call_args_list] == [0, 1]
+    assert client.get_incidents.call_args.kwargs['sort_by_creation_time'] == 'asc'
+
+    client.get_incidents.reset_mock()
+    assert get_incidents_pages(client, 500) == incidents
+    assert [call.kwargs['page_number'] for call in client.get_incidents.call_args_list] == [0, 1, 2]
+
+
+@freeze_time("1993-06-17 11:00:00 GMT")
+def test_fetch_incidents_extra_data_cache(requests_mock, mocker):
+    """
+    Given:
+        - incidents to fetch
+    When
+        - running fetch_incidents, and then mirroring in one of the incidents
+    Then
+        - the extra data of the fetched incidents is requested once for each incident
+        - the extra data is not kept in the integration context
+        - the mirroring requests the extra data of the incident
+    """
+    from CortexXDRIR import fetch_incidents, get_remote_data_command, Client
+    get_incidents_list_response = load_test_data('./test_data/get_incidents_list.json')
+    raw_incident = load_test_data('./test_data/get_incident_extra_data.json')
+    requests_mock.post(f'{XDR_URL}/public_api/v1/incidents/get_incidents/', json=get_incidents_list_response)
+    extra_data_mock = requests_mock.post(f'{XDR_URL}/public_api/v1/incidents/get_incident_extra_data/',
+                                         json=raw_incident)
+    mocker.patch.object(demisto, 'params', return_value={"mirror_direction": "Incoming"})
+    mocker.patch('CortexXDRIR.get_last_mirrored_in_time', return_value=0)
+    demisto.setIntegrationContext({})
+
+    _, incidents = fetch_incidents(Client(base_url=f'{XDR_URL}/public_api/v1', headers={}), '3 month', 'MyInstance')
+
+    assert len(incidents) == 2
+    assert extra_data_mock.call_count == 2
+    assert set(demisto.getIntegrationContext()) == {'modified_incidents'}
+
+    demisto.getIntegrationContext()['modified_incidents']['1'] = 1575813875169
+    response = get_remote_data_command(Client(base_url=f'{XDR_URL}/public_api/v1', headers={}),
+                                       {'id': '1', 'lastUpdate': 0})
+    assert extra_data_mock.call_count == 3
+    assert response.mirrored_object['alerts']
+
+
+@freeze_time("1993-06-17 11:00:00 GMT")
+def test_fetch_incidents_with_extra_data_error(mocker):
+    """
+    Given:
+        - a Rate limit error occurs when requesting the extra data of the second incident
+    When
+        - running fetch_incidents command
+    Then
+        - the extra data of the incidents is requested once
+        - the first incident is created and the second incident is saved for the next run
+    """
+    from CortexXDRIR import fetch_incidents, Client
+    client = Client(
+        base_url=f'{XDR_URL}/public_api/v1', headers={}
+    )
+    raw_incident = load_test_data('./test_data/get_incident_extra_data.json')['reply']
+    mocker.patch.object(client, 'get_incidents', side_effect=get_incident_by_status)
+    mocker.patch.object(client, 'save_modified_incidents_to_integration_context')
+    mocker.patch.object(client, 'get_incidents_extra_data',
+                        return_value=[raw_incident, DemistoException('Rate limit exceeded')])
+    mocker.patch.object(client, 'get_incident_extra_data')
+
+    next_run, incidents = fetch_incidents(client, '3 month', 'MyInstance', statuses=['under_investigation', 'new'])
+
+    assert len(incidents) == 1
+    assert [incident.get('incident_id') for incident in next_run['incidents_from_previous_run']] == ['2']
+    assert not client.get_incident_extra_data.called
+
+
 def test_get_incident_extra_data(requests_mock):
     from CortexXDRIR import get_incident_extra_data_command, Client
 
@@ -1577,7 +1675,7 @@ def test_retrieve_files_command_using_general_file_path_without_valid_endpint(re
     assert str(error.value) == "Error: Endpoint aeec6a2cc92e46fab3b6f621722e9916 was not found"
 
 
-def test_retrieve_file_details_command(requests_mock):
+def test_retrieve_file_details_command(requests_mock, monkeypatch, tmp_path):
     """
     Given:
         - action_id
@@ -1590,6 +1688,8 @@ def test_retrieve_file_details_command(requests_mock):
 
     data = load_test_data('./test_data/retrieve_file_details.json')
     data1 = 'test_file'
+    # the file result is written to the working directory
+    monkeypatch.chdir(tmp_path)
     retrieve_expected_hr = {
         'Type': 1,
         'ContentsFormat': 'json',
@@ -2,13 +2,18 @@ import demistomock as demisto
 from CommonServerPython import *
 from CommonServerUserPython import *
 
+import glob
+import os
 import re
+import socket
 
 from base64 import b64decode
+from collections import OrderedDict
 from flask import Flask, Response, request
 from netaddr import IPSet
-from typing import Any, Dict, cast, Iterable
+from typing import Any, Dict, Tuple, cast, Iterable, Iterator
 from math import ceil
+from threading import Lock
 import urllib3
 import dateparser
 import hashlib
@@ -31,6 +36,17 @@ EDL_MISSING_REFRESH_ERR_MSG: str = 'Refresh Rate must be "number date_range_unit
 EDL_FILTER_FIELDS: Optional[str] = "name,type"
 EDL_ON_DEMAND_KEY: str = 'UpdateEDL'
 EDL_ON_DEMAND_CACHE_PATH: str = ''
+EDL_INDEX_PATH_FORMAT: str = 'edl_index_{}.json'
+EDL_LIST_CACHE_PATH_FORMAT: str = 'edl_list_{}.txt'
+EDL_EMPTY_COMMENT: str = '# Empty EDL'
+EDL_INDEX_FULL_REBUILD_ERR_MSG: str = 'Incremental Mode Full Rebuild Interval must be "number date_range_unit", ' \
+                                      'examples: (2 hours, 4 minutes, 6 months, 1 day, etc.)'
+EDL_INDEX_DEFAULT_FULL_REBUILD: str = '1 hour'
+EDL_INDEX_MODIFIED_OVERLAP = timedelta(minutes=1)  # overlap of the delta searches, covering clock skew with the server
+EDL_INDEX_DATE_FORMAT: str = '%Y-%m-%dT%H:%M:%SZ'
+EDL_INDEXES_MAX: int = 20  # maximal number of indexes of different request arguments, in memory and in files
+EDL_INDEXES: 'OrderedDict[str, EDLIndex]' = OrderedDict()  # ordered from the least recently used
+EDL_INDEXES_LOCK: Lock = Lock()
 
 ''' REFORMATTING REGEXES '''
 _PROTOCOL_REMOVAL = re.compile('^(?:[a-z]+:)*//')
@@ -42,6 +58,13 @@ DONT_COLLAPSE = "Don't Collapse"
 COLLAPSE_TO_CIDR = "To CIDRS"
 COLLAPSE_TO_RANGES = "To Ranges"
 
+# groups of the formatted indicators - the IPs of the IPv4 and IPv6 groups are collapsed together
+ENTRIES_GROUP = ''
+IPV4_GROUP = 'ipv4'
+IPV6_GROUP = 'ipv6'
+# the address family and the number of bits of each IP version
+IP_VERSIONS: Dict[int, Tuple[int, int]] = {4: (socket.AF_INET, 32), 6: (socket.AF_INET6, 128)}
+
 '''Request Arguments Class'''
 
 
@@ -82,6 +105,15 @@ class RequestArguments:
             self.CTX_EMPTY_EDL_COMMENT_KEY: self.add_comment_if_empty,
         }
 
+    def signature(self) -> str:
+        """Returns a hash of the arguments, identifying the EDLs created with them"""
+        return hashlib.sha1(  # guardrails-disable-line
+            json.dumps(self.to_context_json(), sort_keys=True).encode()).hexdigest()
+
+    def empty_comment(self) -> str:
+        """Returns the comment to write in an empty EDL"""
+        return EDL_EMPTY_COMMENT if self.add_comment_if_empty else ''
+
     @classmethod
     def from_context_json(cls, ctx_dict):
         """Returns an initiated instance of the class from a json"""
@@ -124,6 +156,33 @@ def create_new_edl(request_args: RequestArguments) -> str:
 
     Returns: Formatted indicators to display in EDL
     """
+    return iterable_to_str(create_new_edl_values(request_args))
+
+
+def create_new_edl_values(request_args: RequestArguments) -> list:
+    """
+    Gets indicators from XSOAR server using IndicatorsSearcher and formats them
+
+    Parameters:
+        request_args: Request arguments
+
+    Returns: Formatted indicators values to display in EDL
+    """
+    limit = request_args.offset + request_args.limit
+    _, formatted_iocs = find_indicators_to_format(request_args)
+    return list(formatted_iocs)[request_args.offset:limit]
+
+
+def find_indicators_to_format(request_args: RequestArguments) -> Tuple[List[dict], set]:
+    """
+    Finds the indicators of the EDL, searching more indicators while formatting drops some of them
+
+    Parameters:
+        request_args: Request arguments
+
+    Returns:
+        (list, set): The found indicators and their formatted values
+    """
     limit = request_args.offset + request_args.limit
     indicator_searcher = IndicatorsSearcher(
         filter_fields=EDL_FILTER_FIELDS,
@@ -131,7 +190,7 @@ def create_new_edl(request_args: RequestArguments) -> str:
         size=PAGE_SIZE,
         limit=limit
     )
-    iocs = []
+    iocs: List[dict] = []
     formatted_iocs: set = set()
     while True:
         current_limit = limit + (limit - len(formatted_iocs))
@@ -142,7 +201,7 @@ def create_new_edl(request_args: RequestArguments) -> str:
         # continue searching iocs if 1) iocs was truncated or 2) got all available iocs
         if len(formatted_iocs) >= len(iocs) or indicator_searcher.total <= current_limit:
             break
-    return iterable_to_str(list(formatted_iocs)[request_args.offset:limit])
+    return iocs, formatted_iocs
 
 
 def find_indicators_to_limit(indicator_searcher: IndicatorsSearcher) -> List[dict]:
@@ -164,52 +223,82 @@ def find_indicators_to_limit(indicator_searcher: IndicatorsSearcher) -> List[dic
     return iocs
 
 
-def ip_groups_to_cidrs(ip_range_groups: Iterable):
-    """Collapse ip groups list to CIDRs
+def parse_ip_interval(ip: str) -> Optional[Tuple[int, int, int]]:
+    """Parses an IP or a CIDR to the integers interval it covers.
+
+    Only the address forms accepted by inet_pton with an optional decimal prefix are parsed, other forms are left
+    for netaddr so the collapsing keeps its exact semantics.
 
     Args:
-        ip_range_groups (Iterable): an Iterable of lists containing connected IPs
+        ip (str): an IP or a CIDR string.
 
     Returns:
-        Set. a set of CIDRs.
+        (int, int, int): The IP version, the first and the last addresses of the interval, None if not parsed.
     """
-    ip_ranges = set()
-    for cidr in ip_range_groups:
-        # handle single ips
-        if len(cidr) == 1:
-            # CIDR with a single IP appears with "/32" suffix so handle them differently
-            ip_ranges.add(str(cidr[0]))
-            continue
+    address, slash, prefix = ip.partition('/')
+    version = 6 if ':' in address else 4
+    family, bits = IP_VERSIONS[version]
+    try:
+        first = int.from_bytes(socket.inet_pton(family, address), 'big')
+    except (OSError, ValueError):
+        return None
+    if not slash:
+        return version, first, first
+    if not prefix.isdigit() or str(int(prefix)) != prefix or int(prefix) > bits:
+        return None
+    host_bits = bits - int(prefix)
+    first = first >> host_bits << host_bits
+    return version, first, first | ((1 << host_bits) - 1)
 
-        ip_ranges.add(str(cidr))
 
-    return ip_ranges
+def ip_int_to_str(address: int, version: int) -> str:
+    """Formats an integer address of the given IP version, the same as netaddr does."""
+    family, bits = IP_VERSIONS[version]
+    return socket.inet_ntop(family, address.to_bytes(bits // 8, 'big'))
 
 
-def ip_groups_to_ranges(ip_range_groups: Iterable):
-    """Collapse ip groups to ranges.
+def merge_ip_intervals(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Merges overlapping and adjacent integer intervals.
 
     Args:
-        ip_range_groups (Iterable): a list of lists containing connected IPs
+        intervals (list): (first, last) intervals.
 
     Returns:
-        Set. a set of Ranges.
+        list. The sorted merged intervals.
     """
-    ip_ranges = set()
-    for group in ip_range_groups:
-        # handle single ips
-        if len(group) == 1:
-            ip_ranges.add(str(group[0]))
-            continue
+    merged: List[Tuple[int, int]] = []
+    for first, last in sorted(intervals):
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1] = (merged[-1][0], last)
+        else:
+            merged.append((first, last))
+    return merged
 
-        ip_ranges.add(str(group))
 
-    return ip_ranges
+def ip_interval_to_cidrs(first: int, last: int, bits: int) -> Iterator[Tuple[int, int]]:
+    """Splits an integer interval to the minimal list of CIDRs covering it.
+
+    Args:
+        first (int): The first address of the interval.
+        last (int): The last address of the interval.
+        bits (int): The number of bits of the addresses of the IP version.
+
+    Returns:
+        Iterator. (network address, prefix length) of the CIDRs.
+    """
+    while first <= last:
+        host_bits = min((first & -first).bit_length() - 1 if first else bits, (last - first + 1).bit_length() - 1)
+        yield first, bits - host_bits
+        first += 1 << host_bits
 
 
 def ips_to_ranges(ips: Iterable, collapse_ips: str):
     """Collapse IPs to Ranges or CIDRs.
 
+    The IPs are parsed to integer intervals which are sorted and merged per IP version, IPs in forms not parsed by
+    parse_ip_interval are collapsed with netaddr and merged into the intervals.
+
     Args:
         ips (Iterable): a group of IP strings.
         collapse_ips (str): Whether to collapse to Ranges or CIDRs.
@@ -217,14 +306,117 @@ def ips_to_ranges(ips: Iterable, collapse_ips: str):
     Returns:
         Set. a list to Ranges or CIDRs.
     """
+    intervals: Dict[int, List[Tuple[int, int]]] = {version: [] for version in IP_VERSIONS}
+    unparsed = []
+    for ip in ips:
+        interval = parse_ip_interval(ip)
+        if interval:
+            intervals[interval[0]].append(interval[1:])
+        else:
+            unparsed.append(ip)
+    if unparsed:
+        for ip_range in IPSet(unparsed).iter_ipranges():
+            intervals[ip_range.version].append((ip_range.first, ip_range.last))
+
+    ip_ranges = set()
+    for version, (_, bits) in IP_VERSIONS.items():
+        for first, last in merge_ip_intervals(intervals[version]):
+            if first == last:
+                # single IPs appear without the range or the "/32" suffix
+                ip_ranges.add(ip_int_to_str(first, version))
+            elif collapse_ips == COLLAPSE_TO_RANGES:
+                ip_ranges.add(f'{ip_int_to_str(first, version)}-{ip_int_to_str(last, version)}')
+            else:
+                for network, prefix in ip_interval_to_cidrs(first, last, bits):
+                    cidr = ip_int_to_str(network, version)
+                    ip_ranges.add(cidr if prefix == bits else f'{cidr}/{prefix}')
+
+    return ip_ranges
+
+
+def format_indicator(ioc: dict, request_args: RequestArguments) -> Tuple[str, List[str]]:
+    """
+    Formats a single indicator, see format_indicators.
+
+    Returns:
+        (str, list): The group of the formatted values (IPs to collapse are grouped by their version) and
+         the formatted values, empty if the indicator is dropped.
+    """
+    indicator = ioc.get('value')
+    if not indicator:
+        return ENTRIES_GROUP, []
+    formatted_indicators = []
+    ioc_type = ioc.get('indicator_type')
+    # the reformatting regexes can only match indicators containing their literal characters, checking for these
+    # first skips the regexes for most of the indicators
+    # protocol stripping
+    if '//' in indicator:
+        indicator = _PROTOCOL_REMOVAL.sub('', indicator)
+
+    if ioc_type not in [FeedIndicatorType.IP, FeedIndicatorType.IPv6,
+                        FeedIndicatorType.CIDR, FeedIndicatorType.IPv6CIDR]:
+        # Port stripping
+        indicator_with_port = indicator
+        # remove port from indicator - from demisto.com:369/rest/of/path -> demisto.com/rest/of/path
+        if ':' in indicator:
+            indicator = _PORT_REMOVAL.sub(_URL_WITHOUT_PORT, indicator)
+        # check if removing the port changed something about the indicator
+        if indicator != indicator_with_port and not request_args.url_port_stripping:
+            # if port was in the indicator and url_port_stripping param not set - ignore the indicator
+            return ENTRIES_GROUP, []
+        # Reformatting to PAN-OS URL format
+        with_invalid_tokens_indicator = indicator
+        # mix of text and wildcard in domain field handling
+        if '*' in indicator:
+            indicator = _INVALID_TOKEN_REMOVAL.sub('*', indicator)
+        # check if the indicator held invalid tokens
+        if request_args.drop_invalids:
+            if with_invalid_tokens_indicator != indicator:
+                # invalid tokens in indicator - ignore the indicator
+                return ENTRIES_GROUP, []
+            if ioc_type == FeedIndicatorType.URL and len(indicator) >= PAN_OS_MAX_URL_LEN:
+                # URL indicator exceeds allowed length - ignore the indicator
+                return ENTRIES_GROUP, []
+
+        # for PAN-OS *.domain.com does not match domain.com
+        # we should provide both
+        # this could generate more than num entries according to PAGE_SIZE
+        if indicator.startswith('*.'):
+            formatted_indicators.append(indicator.lstrip('*.'))
+
+    formatted_indicators.append(indicator)
+    if request_args.collapse_ips != DONT_COLLAPSE and ioc_type in (FeedIndicatorType.IP, FeedIndicatorType.CIDR):
+        return IPV4_GROUP, formatted_indicators
+
+    elif request_args.collapse_ips != DONT_COLLAPSE and ioc_type == FeedIndicatorType.IPv6:
+        return IPV6_GROUP, formatted_indicators
+
+    return ENTRIES_GROUP, formatted_indicators
+
+
+def collapse_formatted_indicators(groups: Iterable[Tuple[str, List[str]]], request_args: RequestArguments) -> set:
+    """
+    Collects the formatted values of the indicators, collapsing the IPs groups.
 
-    if collapse_ips == COLLAPSE_TO_RANGES:
-        ips_range_groups = IPSet(ips).iter_ipranges()
-        return ip_groups_to_ranges(ips_range_groups)
+    Parameters:
+        groups: The group and formatted values of each indicator, as returned by format_indicator
+        request_args: Request arguments
 
-    else:
-        cidrs = IPSet(ips).iter_cidrs()
-        return ip_groups_to_cidrs(cidrs)
+    Returns:
+        (set): The formatted values
+    """
+    formatted_indicators: set = set()
+    ips_formatted_indicators: Dict[str, set] = {IPV4_GROUP: set(), IPV6_GROUP: set()}
+    for group, indicators in groups:
+        if group == ENTRIES_GROUP:
+            formatted_indicators.update(indicators)
+        else:
+            ips_formatted_indicators[group].update(indicators)
+
+    for ips in ips_formatted_indicators.values():
+        if len(ips) > 0:
+            formatted_indicators.update(ips_to_ranges(ips, request_args.collapse_ips))
+    return formatted_indicators
 
 
 def format_indicators(iocs: list, request_args: RequestArguments) -> set:
@@ -240,82 +432,249 @@ def format_indicators(iocs: list, request_args: RequestArguments) -> set:
         1) if drop_invalids, drop invalids (has invalid chars)
         2) if port_stripping, strip ports
     """
-    formatted_indicators = set()
-    ipv4_formatted_indicators = set()
-    ipv6_formatted_indicators = set()
-    for ioc in iocs:
-        indicator = ioc.get('value')
-        if not indicator:
-            continue
-        ioc_type = ioc.get('indicator_type')
-        # protocol stripping
-        indicator = _PROTOCOL_REMOVAL.sub('', indicator)
+    return collapse_formatted_indicators((format_indicator(ioc, request_args) for ioc in iocs), request_args)
 
-        if ioc_type not in [FeedIndicatorType.IP, FeedIndicatorType.IPv6,
-                            FeedIndicatorType.CIDR, FeedIndicatorType.IPv6CIDR]:
-            # Port stripping
-            indicator_with_port = indicator
-            # remove port from indicator - from demisto.com:369/rest/of/path -> demisto.com/rest/of/path
-            indicator = _PORT_REMOVAL.sub(_URL_WITHOUT_PORT, indicator)
-            # check if removing the port changed something about the indicator
-            if indicator != indicator_with_port and not request_args.url_port_stripping:
-                # if port was in the indicator and url_port_stripping param not set - ignore the indicator
+
+class EDLIndex:
+    """
+    Persistent on-disk index of the formatted EDL values, keyed by the indicator value.
+    The index is built from all the EDL indicators once in every full rebuild interval, and in between is
+    refreshed only with the indicators modified since its last build.
+
+    :param request_args: the request arguments of the EDL served from the index.
+    :param full_rebuild_interval: how often to rebuild the index from all the EDL indicators,
+     dropping the deleted indicators (e.g. 1 hour).
+    """
+
+    def __init__(self, request_args: RequestArguments, full_rebuild_interval: str = EDL_INDEX_DEFAULT_FULL_REBUILD):
+        self.request_args = request_args
+        self.full_rebuild_interval = full_rebuild_interval
+        self.signature = request_args.signature()
+        self.path = EDL_INDEX_PATH_FORMAT.format(self.signature)
+        self.entries: Dict[str, List] = {}
+        self.last_build: Optional[datetime] = None
+        self.last_full_build: Optional[datetime] = None
+        self.lock = Lock()
+        self._list_cache: Optional['ListCacheFile'] = None
+
+    def load(self):
+        """Loads the index from its file, if exists"""
+        try:
+            with open(self.path, 'r') as file:
+                index = json.load(file)
+        except (OSError, ValueError) as e:
+            demisto.debug(f'Could not load the EDL index from {self.path}, the index will be rebuilt: {e}')
+            return
+        self.entries = index.get('entries', {})
+        self.last_build = datetime.strptime(index['last_build'], EDL_INDEX_DATE_FORMAT)
+        self.last_full_build = datetime.strptime(index['last_full_build'], EDL_INDEX_DATE_FORMAT)
+        self._list_cache = None
+
+    def save(self):
+        """Saves the index to its file"""
+        with open(self.path, 'w') as file:
+            json.dump({
+                'last_build': self.last_build.strftime(EDL_INDEX_DATE_FORMAT),  # type: ignore[union-attr]
+                'last_full_build': self.last_full_build.strftime(EDL_INDEX_DATE_FORMAT),  # type: ignore[union-attr]
+                'entries': self.entries,
+            }, file)
+
+    def is_full_rebuild_needed(self) -> bool:
+        if not self.last_build or not self.last_full_build:
+            return True
+        rebuild_time, _ = parse_date_range(self.full_rebuild_interval, utc=True)
+        return self.last_full_build <= rebuild_time
+
+    def rebuild(self, now: datetime) -> int:
+        """
+        Rebuilds the index from all the EDL indicators.
+
+        Returns:
+            (int): The number of indexed indicators
+        """
+        iocs, _ = find_indicators_to_format(self.request_args)
+        self.entries = {ioc['value']: list(format_indicator(ioc, self.request_args))
+                        for ioc in iocs if ioc.get('value')}
+        self.last_build = self.last_full_build = now
+        self._list_cache = None
+        return len(self.entries)
+
+    def refresh(self, now: datetime) -> int:
+        """
+        Refreshes the index with the indicators modified since its last build. Modified indicators which
+        no longer match the query are removed from the index. New indicators are added only while the index holds
+        less than offset + limit indicators, as when it is fully built.
+
+        Returns:
+            (int): The number of updated and removed indicators
+        """
+        since = (self.last_build - EDL_INDEX_MODIFIED_OVERLAP).strftime(EDL_INDEX_DATE_FORMAT)  # type: ignore[operator]
+        modified_query = f'modified:>={since}'
+        query = self.request_args.query
+        matching_iocs = find_indicators_to_limit(IndicatorsSearcher(
+            filter_fields=EDL_FILTER_FIELDS,
+            query=f'{modified_query} and ({query})' if query else modified_query,
+            size=PAGE_SIZE,
+        ))
+        delta = 0
+        if query:
+            matching_values = {ioc.get('value') for ioc in matching_iocs}
+            for ioc in find_indicators_to_limit(IndicatorsSearcher(
+                    filter_fields=EDL_FILTER_FIELDS,
+                    query=modified_query,
+                    size=PAGE_SIZE,
+            )):
+                value = ioc.get('value')
+                if value not in matching_values and self.entries.pop(value, None) is not None:
+                    delta += 1
+
+        limit = self.request_args.offset + self.request_args.limit
+        for ioc in matching_iocs:
+            value = ioc.get('value')
+            if not value or (value not in self.entries and len(self.entries) >= limit):
                 continue
-            # Reformatting to PAN-OS URL format
-            with_invalid_tokens_indicator = indicator
-            # mix of text and wildcard in domain field handling
-            indicator = _INVALID_TOKEN_REMOVAL.sub('*', indicator)
-            # check if the indicator held invalid tokens
-            if request_args.drop_invalids:
-                if with_invalid_tokens_indicator != indicator:
-                    # invalid tokens in indicator - ignore the indicator
-                    continue
-                if ioc_type == FeedIndicatorType.URL and len(indicator) >= PAN_OS_MAX_URL_LEN:
-                    # URL indicator exceeds allowed length - ignore the indicator
-                    continue
-
-            # for PAN-OS *.domain.com does not match domain.com
-            # we should provide both
-            # this could generate more than num entries according to PAGE_SIZE
-            if indicator.startswith('*.'):
-                formatted_indicators.add(indicator.lstrip('*.'))
-
-        if request_args.collapse_ips != DONT_COLLAPSE and ioc_type in (FeedIndicatorType.IP, FeedIndicatorType.CIDR):
-            ipv4_formatted_indicators.add(indicator)
-
-        elif request_args.collapse_ips != DONT_COLLAPSE and ioc_type == FeedIndicatorType.IPv6:
-            ipv6_formatted_indicators.add(indicator)
+            entry = list(format_indicator(ioc, self.request_args))
+            if self.entries.get(value) != entry:
+                self.entries[value] = entry
+                delta += 1
+
+        self.last_build = now
+        if delta:
+            self._list_cache = None
+        return delta
+
+    def update(self, now: Optional[datetime] = None) -> Tuple[bool, int]:
+        """
+        Rebuilds the index if its full rebuild interval passed, otherwise refreshes it, and saves it.
+
+        Returns:
+            (bool, int): Whether the index was fully rebuilt, and the number of indexed/refreshed indicators
+        """
+        now = now or datetime.utcnow().replace(microsecond=0)
+        if self.is_full_rebuild_needed():
+            full_build, delta = True, self.rebuild(now)
+        else:
+            full_build, delta = False, self.refresh(now)
+        self.save()
+        return full_build, delta
+
+    def to_values(self) -> list:
+        """Returns the formatted values of the EDL of the index"""
+        limit = self.request_args.offset + self.request_args.limit
+        formatted_iocs = collapse_formatted_indicators(self.entries.values(), self.request_args)
+        return list(formatted_iocs)[self.request_args.offset:limit]
+
+    def to_list_cache_file(self, compress: bool = True) -> 'ListCacheFile':
+        """
+        Returns the EDL of the index, written to a list cache file. The file is written again if the index changed,
+        or if it was evicted by the EDLs of other request arguments.
+        """
+        if self._list_cache is None or not self._list_cache.load():
+            self._list_cache = ListCacheFile(EDL_LIST_CACHE_PATH_FORMAT.format(self.signature)).write(
+                self.to_values(), empty_comment=self.request_args.empty_comment(), compress=compress)
+            ListCacheFile.evict(EDL_LIST_CACHE_PATH_FORMAT)
+        return self._list_cache
+
+
+def evict_edl_indexes():
+    """
+    Drops the least recently used indexes from memory, and deletes the least recently saved index files, keeping up
+    to EDL_INDEXES_MAX indexes of different request arguments. Called while holding EDL_INDEXES_LOCK.
+    """
+    while len(EDL_INDEXES) > EDL_INDEXES_MAX:
+        EDL_INDEXES.popitem(last=False)
+
+    def last_saved(path: str) -> float:
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0.0
 
+    kept_paths = {index.path for index in EDL_INDEXES.values()}
+    index_paths = sorted(glob.glob(EDL_INDEX_PATH_FORMAT.format('*')), key=last_saved, reverse=True)
+    remove_files(*[path for path in index_paths[EDL_INDEXES_MAX:] if path not in kept_paths])
+
+
+def get_edl_index(request_args: RequestArguments, full_rebuild_interval: str) -> EDLIndex:
+    """
+    Returns the index of the request arguments, loaded from its file on first use.
+    """
+    index = EDLIndex(request_args, full_rebuild_interval)
+    with EDL_INDEXES_LOCK:
+        if index.signature in EDL_INDEXES:
+            EDL_INDEXES.move_to_end(index.signature)
         else:
-            formatted_indicators.add(indicator)
+            index.load()
+            EDL_INDEXES[index.signature] = index
+            evict_edl_indexes()
+        index = EDL_INDEXES[index.signature]
+    index.full_rebuild_interval = full_rebuild_interval
+    return index
 
-    if len(ipv4_formatted_indicators) > 0:
-        ipv4_formatted_indicators = ips_to_ranges(ipv4_formatted_indicators, request_args.collapse_ips)
-        formatted_indicators.update(ipv4_formatted_indicators)
 
-    if len(ipv6_formatted_indicators) > 0:
-        ipv6_formatted_indicators = ips_to_ranges(ipv6_formatted_indicators, request_args.collapse_ips)
-        formatted_indicators.update(ipv6_formatted_indicators)
-    return formatted_indicators
+def get_edl_incremental(request_args: RequestArguments, full_rebuild_interval: str,
+                        compress: bool = True) -> Tuple['ListCacheFile', bool, int]:
+    """
+    Updates the persistent index of the request arguments with the modified indicators and returns its EDL.
+    The EDL is written to a list cache file only if the index was changed.
 
+    Parameters:
+        request_args: Request arguments
+        full_rebuild_interval: How often to rebuild the index from all the EDL indicators
+        compress: Whether to write the gzip compressed copy of the list cache file
 
-def get_edl_on_demand():
+    Returns:
+        (ListCacheFile, bool, int): The EDL list cache file, whether the index was fully rebuilt,
+         and the number of indexed/refreshed indicators
     """
-    Use the local file system to store the on-demand result, using a lock to
-    limit access to the file from multiple threads.
+    index = get_edl_index(request_args, full_rebuild_interval)
+    with index.lock:
+        full_build, delta = index.update()
+        return index.to_list_cache_file(compress), full_build, delta
+
+
+def get_edl_on_demand(compress: bool = True) -> 'ListCacheFile':
+    """
+    Use the local file system to store the on-demand result, written to a list cache file when the
+    EDL is updated.
     """
     ctx = get_integration_context()
-    if EDL_ON_DEMAND_KEY in ctx:
+    list_cache = ListCacheFile(EDL_ON_DEMAND_CACHE_PATH)
+    if EDL_ON_DEMAND_KEY in ctx or not list_cache.load():
         ctx.pop(EDL_ON_DEMAND_KEY, None)
         request_args = RequestArguments.from_context_json(ctx)
-        edl = create_new_edl(request_args)
-        with open(EDL_ON_DEMAND_CACHE_PATH, 'w') as file:
-            file.write(edl)
+        list_cache.write(create_new_edl_values(request_args), empty_comment=request_args.empty_comment(),
+                         compress=compress)
         set_integration_context(ctx)
-    else:
-        with open(EDL_ON_DEMAND_CACHE_PATH, 'r') as file:
-            edl = file.read()
-    return edl
+    return list_cache
+
+
+def get_edl_list_cache_file(request_args: RequestArguments, params: dict, max_age: int,
+                            rebuild: bool = False) -> Tuple['ListCacheFile', bool, int]:
+    """
+    Gets the EDL written to a list cache file. The EDL is rebuilt only if it may have changed:
+     * On demand: when the EDL is updated by the edl-update command.
+     * Incremental mode: when the index is changed by the modified indicators.
+     * Otherwise: when the EDL was built more than max_age seconds ago, or rebuild is set.
+    The gzip compressed copy of the list is written only if the response is streamed. The list cache files of the
+    least recently requested arguments are deleted, keeping up to LIST_CACHE_MAX_FILES lists.
+
+    Returns:
+        (ListCacheFile, bool, int): The list cache file, whether the incremental index was fully rebuilt,
+         and the number of indexed/refreshed indicators
+    """
+    compress = bool(params.get('stream_response'))
+    if params.get('on_demand'):
+        return get_edl_on_demand(compress), True, 0
+    if params.get('incremental_mode'):
+        return get_edl_incremental(
+            request_args, params.get('incremental_full_rebuild') or EDL_INDEX_DEFAULT_FULL_REBUILD, compress)
+    list_cache = ListCacheFile(EDL_LIST_CACHE_PATH_FORMAT.format(request_args.signature()))
+    if rebuild or not list_cache.load() or not list_cache.is_built_since(max_age):
+        list_cache.write(create_new_edl_values(request_args), empty_comment=request_args.empty_comment(),
+                         compress=compress)
+        ListCacheFile.evict(EDL_LIST_CACHE_PATH_FORMAT)
+    return list_cache, True, 0
 
 
 def validate_basic_authentication(headers: dict, username: str, password: str) -> bool:
@@ -369,25 +728,30 @@ def route_edl() -> Response:
             ])
 
     request_args = get_request_args(request.args, params)
-    on_demand = params.get('on_demand')
+    incremental_mode = params.get('incremental_mode') and not params.get('on_demand')
     created = datetime.now(timezone.utc)
-    edl = get_edl_on_demand() if on_demand else create_new_edl(request_args)
-    etag = f'"{hashlib.sha1(edl.encode()).hexdigest()}"'  # guardrails-disable-line
-    query_time = (datetime.now(timezone.utc) - created).total_seconds()
-    edl_size = 0
-    if edl.strip():
-        edl_size = edl.count('\n') + 1  # add 1 as last line doesn't have a \n
-    if len(edl) == 0 and request_args.add_comment_if_empty:
-        edl = '# Empty EDL'
     max_age = ceil((datetime.now() - dateparser.parse(cache_refresh_rate)).total_seconds())  # type: ignore[operator]
+    # the EDL is rebuilt when the nginx cache is bypassed
+    list_cache, full_build, delta_size = get_edl_list_cache_file(request_args, params, max_age,
+                                                                 rebuild=bool(request.args.get('nocache')))
+    etag = f'"{list_cache.etag}"'
+    edl_size = list_cache.size
+    query_time = (datetime.now(timezone.utc) - created).total_seconds()
     demisto.debug(f'Returning edl of size: [{edl_size}], created: [{created}], query time seconds: [{query_time}],'
                   f' max age: [{max_age}], etag: [{etag}]')
-    resp = Response(edl, status=200, mimetype='text/plain', headers=[
+    headers = [
         ('X-EDL-Created', created.isoformat()),
         ('X-EDL-Query-Time-Secs', "{:.3f}".format(query_time)),
         ('X-EDL-Size', str(edl_size)),
-        ('ETag', etag),
-    ])
+    ]
+    if incremental_mode:
+        demisto.debug(f'EDL index full build: [{full_build}], delta size: [{delta_size}]')
+        headers.extend([
+            ('X-EDL-Full-Build', str(full_build).lower()),
+            ('X-EDL-Delta-Size', str(delta_size)),
+        ])
+    # the ETag and Last-Modified headers are added by the list cache file, which responds with 304 if they match
+    resp = list_cache.to_response('text/plain', headers, stream=bool(params.get('stream_response')))
     resp.cache_control.max_age = max_age
     resp.cache_control[
         'stale-if-error'] = '600'  # number of seconds we are willing to serve stale content when there is an error
@@ -466,6 +830,11 @@ def test_module(_: Dict, params: Dict):
             raise ValueError(
                 'Invalid time unit for the Refresh Rate. Must be minutes, hours, days, months, or years.')
         parse_date_range(cache_refresh_rate, to_timestamp=True)
+        if params.get('incremental_mode'):
+            full_rebuild_interval = params.get('incremental_full_rebuild') or EDL_INDEX_DEFAULT_FULL_REBUILD
+            if len(full_rebuild_interval.split(' ')) != 2:
+                raise ValueError(EDL_INDEX_FULL_REBUILD_ERR_MSG)
+            parse_date_range(full_rebuild_interval, to_timestamp=True)
     run_long_running(params, is_test=True)
     return 'ok', {}, {}
 
@@ -2,6 +2,7 @@
 import json
 import pytest
 import os
+from collections import OrderedDict
 from tempfile import mkdtemp
 
 IOC_RES_LEN = 38
@@ -67,15 +68,20 @@ class TestHelperFunctions:
         When:
             - calling get_edl_on_demand
         Then:
-            - return the edl from the system file
+            - return the edl from the list cache file, without creating a new edl
         """
         import EDL as edl
-        edl.EDL_ON_DEMAND_CACHE_PATH = 'EDL_test/TestHelperFunctions/iocs_cache_values_text.txt'
+        with open('EDL_test/TestHelperFunctions/iocs_cache_values_text.txt', 'r') as f:
+            expected_edl = f.read()
+        edl.EDL_ON_DEMAND_CACHE_PATH = os.path.join(mkdtemp(), 'cache')
+        expected_list_cache = edl.ListCacheFile(edl.EDL_ON_DEMAND_CACHE_PATH).write(expected_edl.split('\n'))
         mocker.patch.object(edl, 'get_integration_context', return_value={})
-        actual_edl = edl.get_edl_on_demand()
+        create_new_edl_values = mocker.patch.object(edl, 'create_new_edl_values')
+        list_cache = edl.get_edl_on_demand()
         with open(edl.EDL_ON_DEMAND_CACHE_PATH, 'r') as f:
-            expected_edl = f.read()
-            assert actual_edl == expected_edl
+            assert f.read() == expected_edl
+        assert list_cache.etag == expected_list_cache.etag
+        assert create_new_edl_values.call_count == 0
 
     def test_get_edl_on_demand__with_refresh_signal(self, mocker):
         """
@@ -85,7 +91,7 @@ class TestHelperFunctions:
         When:
             - calling get_edl_on_demand
         Then:
-            - save the edl to the system file
+            - save the edl to the list cache file
         """
         import EDL as edl
         expected_edl = "8.8.8.8"
@@ -93,11 +99,14 @@ class TestHelperFunctions:
         tmp_dir = mkdtemp()
         edl.EDL_ON_DEMAND_CACHE_PATH = os.path.join(tmp_dir, 'cache')
         mocker.patch.object(edl, 'get_integration_context', return_value=ctx)
-        mocker.patch.object(edl, 'create_new_edl', return_value=expected_edl)
-        actual_edl = edl.get_edl_on_demand()
+        mocker.patch.object(edl, 'set_integration_context')
+        mocker.patch.object(edl, 'create_new_edl_values', return_value=[expected_edl])
+        list_cache = edl.get_edl_on_demand()
         with open(edl.EDL_ON_DEMAND_CACHE_PATH, 'r') as f:
             cached_edl = f.read()
-            assert actual_edl == expected_edl == cached_edl
+            assert expected_edl == cached_edl
+        assert list_cache.size == 1
+        assert edl.EDL_ON_DEMAND_KEY not in ctx
 
     def test_iterable_to_str_1(self):
         """Test invalid"""
@@ -224,6 +233,226 @@ class TestHelperFunctions:
         assert 'domain.com' in returned_output  # PAN-OS URLs
         assert len(returned_output) == 6
 
+    def test_edl_index_incremental_refresh(self, mocker):
+        """
+        Test the EDL index is refreshed only with the modified indicators
+        Given:
+            - An index built from all the EDL indicators
+        When:
+            - An indicator is added, an indicator is modified and no longer matches the query, and the index is updated
+        Then:
+            - the first update fully builds the index
+            - the second update refreshes only the 2 modified indicators, using modified queries
+            - the index is persisted and loaded from its file
+        """
+        import EDL as edl
+        from datetime import datetime
+        tmp_dir = mkdtemp()
+        mocker.patch.object(edl, 'EDL_INDEX_PATH_FORMAT', os.path.join(tmp_dir, 'index_{}.json'))
+        mocker.patch.object(edl, 'EDL_LIST_CACHE_PATH_FORMAT', os.path.join(tmp_dir, 'list_{}.txt'))
+        mocker.patch.object(edl, 'EDL_INDEXES', OrderedDict())
+        iocs = [
+            {'value': '1.1.1.1', 'indicator_type': 'IP'},
+            {'value': '1.1.1.2', 'indicator_type': 'IP'},
+            {'value': 'https://*.demisto.com', 'indicator_type': 'URL'},
+        ]
+        mocker.patch.object(edl, 'find_indicators_to_format', return_value=(iocs, set()))
+        request_args = edl.RequestArguments(query='type:IP or type:URL', collapse_ips=edl.COLLAPSE_TO_RANGES)
+
+        list_cache, full_build, delta = edl.get_edl_incremental(request_args, '1 hour')
+        assert full_build is True
+        assert delta == 3
+        with open(list_cache.path) as f:
+            assert set(f.read().split('\n')) == {'1.1.1.1-1.1.1.2', '*.demisto.com', 'demisto.com'}
+
+        modified_iocs = {
+            'modified:>=2021-12-31T23:59:00Z and (type:IP or type:URL)': [{'value': '1.1.1.3', 'indicator_type': 'IP'}],
+            'modified:>=2021-12-31T23:59:00Z': [{'value': '1.1.1.3', 'indicator_type': 'IP'},
+                                               {'value': 'https://*.demisto.com', 'indicator_type': 'Domain'}],
+        }
+        search = mocker.patch.object(edl, 'find_indicators_to_limit',
+                                     side_effect=lambda indicator_searcher: modified_iocs[indicator_searcher._query])
+        index = edl.get_edl_index(request_args, '1 hour')
+        index.last_build = datetime(2022, 1, 1)
+        edl.EDL_INDEXES.clear()
+        index.save()
+
+        list_cache, full_build, delta = edl.get_edl_incremental(request_args, '1 hour')
+        assert full_build is False
+        assert delta == 2
+        assert search.call_count == 2
+        with open(list_cache.path) as f:
+            assert f.read() == '1.1.1.1-1.1.1.3'
+
+    def test_edl_index_refresh_limit(self, mocker):
+        """
+        Test the EDL index refresh keeps the size limit of the EDL
+        Given:
+            - An index of limit 2, holding 2 indicators
+        When:
+            - 2 new indicators and a modified indexed indicator match the query, and the index is refreshed
+        Then:
+            - the indexed indicator is updated, and the new indicators are not added
+            - a new indicator is added once an indexed indicator no longer matches the query
+        """
+        import EDL as edl
+        from datetime import datetime
+        request_args = edl.RequestArguments(query='type:IP or type:URL', limit=2)
+        index = edl.EDLIndex(request_args)
+        index.entries = {'1.1.1.1': ['ipv4', ['1.1.1.1']], 'https://*.demisto.com': ['', ['old.demisto.com']]}
+        index.last_build = datetime(2022, 1, 1)
+        modified_iocs = [{'value': 'https://*.demisto.com', 'indicator_type': 'URL'},
+                         {'value': '2.2.2.2', 'indicator_type': 'IP'}, {'value': '3.3.3.3', 'indicator_type': 'IP'}]
+        mocker.patch.object(edl, 'find_indicators_to_limit', side_effect=[modified_iocs, modified_iocs])
+        assert index.refresh(datetime(2022, 1, 2)) == 1
+        assert set(index.entries) == {'1.1.1.1', 'https://*.demisto.com'}
+
+        mocker.patch.object(edl, 'find_indicators_to_limit', side_effect=[
+            modified_iocs[1:], [{'value': '1.1.1.1', 'indicator_type': 'Domain'}] + modified_iocs[1:]])
+        assert index.refresh(datetime(2022, 1, 3)) == 2
+        assert set(index.entries) == {'https://*.demisto.com', '2.2.2.2'}
+
+    def test_get_edl_index_eviction(self, mocker):
+        """
+        Test the EDL indexes of different request arguments are bounded
+        Given:
+            - A bound of 2 indexes, and index files saved by a previous run
+        When:
+            - Getting the indexes of 3 different request arguments, using the first one again before the third
+        Then:
+            - the least recently used index is dropped from memory
+            - only the index files of the kept indexes and the most recently saved files are kept
+        """
+        import EDL as edl
+        tmp_dir = mkdtemp()
+        mocker.patch.object(edl, 'EDL_INDEX_PATH_FORMAT', os.path.join(tmp_dir, 'index_{}.json'))
+        mocker.patch.object(edl, 'EDL_INDEXES', OrderedDict())
+        mocker.patch.object(edl, 'EDL_INDEXES_MAX', 2)
+        for i, name in enumerate(['old1', 'old2']):
+            with open(os.path.join(tmp_dir, f'index_{name}.json'), 'w') as f:
+                f.write('{}')
+            os.utime(os.path.join(tmp_dir, f'index_{name}.json'), (1000 + i, 1000 + i))
+        first, second, third = (edl.RequestArguments(query=f'type:{t}') for t in ('IP', 'URL', 'Domain'))
+
+        first_index = edl.get_edl_index(first, '1 hour')
+        edl.get_edl_index(second, '1 hour')
+        assert edl.get_edl_index(first, '1 hour') is first_index
+        for index in edl.EDL_INDEXES.values():
+            with open(index.path, 'w') as f:
+                f.write('{}')
+        edl.get_edl_index(third, '1 hour')
+
+        assert list(edl.EDL_INDEXES) == [first.signature(), third.signature()]
+        assert sorted(os.listdir(tmp_dir)) == sorted(f'index_{s}.json' for s in (first.signature(),
+                                                                                  second.signature()))
+
+    def test_route_edl__incremental_mode(self, mocker):
+        """
+        Test the incremental mode headers
+        Given:
+            - The incremental mode param
+        When:
+            - calling the EDL route
+        Then:
+            - the EDL is served from the index, with the full build and delta size headers
+        """
+        import EDL as edl
+        mocker.patch.object(edl.demisto, 'params', return_value={'incremental_mode': True,
+                                                                 'cache_refresh_rate': '1 minute'})
+        list_cache = edl.ListCacheFile(os.path.join(mkdtemp(), 'list.txt')).write(['8.8.8.8'])
+        mocker.patch.object(edl, 'get_edl_incremental', return_value=(list_cache, False, 4))
+        with edl.APP.test_client() as client:
+            response = client.get('/')
+        assert response.data == b'8.8.8.8'
+        assert response.headers['X-EDL-Full-Build'] == 'false'
+        assert response.headers['X-EDL-Delta-Size'] == '4'
+
+    @pytest.mark.parametrize('params', [
+        {'stream_response': True},
+        {'stream_response': True, 'incremental_mode': True},
+        {'stream_response': True, 'on_demand': True},
+    ])
+    def test_route_edl__stream_response(self, mocker, params):
+        """
+        Test the EDL is streamed from a list cache file
+        Given:
+            - The stream response param, in the default, incremental and on-demand modes
+        When:
+            - calling the EDL route with and without gzip encoding
+        Then:
+            - the EDL is written once to a list cache file, and streamed with its ETag
+            - the EDL is compressed when the client accepts gzip
+        """
+        import gzip
+        import EDL as edl
+        tmp_dir = mkdtemp()
+        mocker.patch.object(edl, 'EDL_INDEX_PATH_FORMAT', os.path.join(tmp_dir, 'index_{}.json'))
+        mocker.patch.object(edl, 'EDL_LIST_CACHE_PATH_FORMAT', os.path.join(tmp_dir, 'list_{}.txt'))
+        mocker.patch.object(edl, 'EDL_ON_DEMAND_CACHE_PATH', os.path.join(tmp_dir, 'on_demand.txt'))
+        mocker.patch.object(edl, 'EDL_INDEXES', OrderedDict())
+        mocker.patch.object(edl, 'get_integration_context', return_value={
+            edl.EDL_ON_DEMAND_KEY: True,
+            edl.RequestArguments.CTX_QUERY_KEY: '*',
+            edl.RequestArguments.CTX_LIMIT_KEY: 1000,
+        })
+        mocker.patch.object(edl, 'set_integration_context')
+        mocker.patch.object(edl.demisto, 'params', return_value=dict(params, cache_refresh_rate='1 minute'))
+        iocs = [{'value': f'{i}.example.com', 'indicator_type': 'Domain'} for i in range(1000)]
+        mocker.patch.object(edl, 'find_indicators_to_format',
+                            return_value=(iocs, {ioc['value'] for ioc in iocs}))
+
+        with edl.APP.test_client() as client:
+            response = client.get('/')
+            gzip_response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+
+        values = set(response.data.decode().split('\n'))
+        assert values == {ioc['value'] for ioc in iocs}
+        assert response.headers['X-EDL-Size'] == '1000'
+        assert response.headers['ETag'] == gzip_response.headers['ETag']
+        assert gzip_response.headers['Content-Encoding'] == 'gzip'
+        assert set(gzip.decompress(gzip_response.data).decode().split('\n')) == values
+
+    @pytest.mark.parametrize('stream_response', [False, True])
+    def test_route_edl__conditional_request(self, mocker, stream_response):
+        """
+        Test conditional requests of an unchanged EDL
+        Given:
+            - An EDL built in the last refresh rate
+        When:
+            - requesting the EDL with its ETag, and with its Last-Modified time
+            - requesting the EDL with a different ETag
+            - requesting the EDL with the nocache arg
+        Then:
+            - return 304 without rebuilding the EDL
+            - return the EDL when the ETag doesn't match
+            - rebuild the EDL when the nocache arg is given, keeping the Last-Modified time as the EDL didn't change
+        """
+        import EDL as edl
+        mocker.patch.object(edl, 'EDL_LIST_CACHE_PATH_FORMAT', os.path.join(mkdtemp(), 'list_{}.txt'))
+        mocker.patch.object(edl.demisto, 'params', return_value={'stream_response': stream_response,
+                                                                 'cache_refresh_rate': '5 minutes'})
+        create_new_edl_values = mocker.patch.object(edl, 'create_new_edl_values', return_value=['1.1.1.1', '2.2.2.2'])
+
+        with edl.APP.test_client() as client:
+            response = client.get('/')
+            etag, last_modified = response.headers['ETag'], response.headers['Last-Modified']
+            assert response.status_code == 200
+            assert response.data == b'1.1.1.1\n2.2.2.2'
+
+            assert client.get('/', headers={'If-None-Match': etag}).status_code == 304
+            assert client.get('/', headers={'If-Modified-Since': last_modified}).status_code == 304
+            assert create_new_edl_values.call_count == 1
+
+            response = client.get('/', headers={'If-None-Match': '"other"', 'If-Modified-Since': last_modified})
+            assert response.status_code == 200
+            assert response.data == b'1.1.1.1\n2.2.2.2'
+
+            assert client.get('/?nocache=1', headers={'If-None-Match': etag}).status_code == 304
+            assert create_new_edl_values.call_count == 2
+            response = client.get('/?nocache=1')
+            assert response.headers['Last-Modified'] == last_modified
+            assert create_new_edl_values.call_count == 3
+
     def test_validate_basic_authentication(self):
         """Test Authentication"""
         from EDL import validate_basic_authentication
@@ -281,6 +510,38 @@ class TestHelperFunctions:
         assert "25.24.23.22" in ip_range_list
         assert "3.3.3.0/30" in ip_range_list
 
+    @pytest.mark.parametrize('collapse_ips', ['To CIDRS', 'To Ranges'])
+    def test_ips_to_ranges__same_as_netaddr(self, collapse_ips):
+        """
+        Given:
+          - random IPv4 and IPv6 addresses and CIDRs, and IPs in forms which are left for netaddr
+        When:
+          - calling ips_to_ranges
+        Then:
+          - the IPs are collapsed the same as by the netaddr IPSet
+        """
+        import random
+        from netaddr import IPSet, IPNetwork
+        from EDL import ips_to_ranges, COLLAPSE_TO_RANGES
+        rand = random.Random(7)
+        ips = ['0.0.0.0', '255.255.255.255', '12.0.0.0/8', '::', '::1', '::ffff:1.2.3.4', '2001:db8::/127',
+               '10.1.1.1/032', '10.2.0.0/255.255.0.0', '10.3.4.0/ 24']
+        for _ in range(2000):
+            ip = rand.randint(0x0a000000, 0x0a03ffff)
+            prefix = rand.choice([32] * 4 + list(range(22, 32)))
+            ips.append(str(IPNetwork((ip >> (32 - prefix) << (32 - prefix), prefix))))
+        for _ in range(500):
+            ip = rand.randint(0x20010db8 << 96, (0x20010db8 << 96) + 0x2ffff)
+            prefix = rand.choice([128] * 4 + list(range(110, 128)))
+            ips.append(str(IPNetwork((ip >> (128 - prefix) << (128 - prefix), prefix), version=6)))
+
+        ip_set = IPSet(ips)
+        if collapse_ips == COLLAPSE_TO_RANGES:
+            expected = {str(group[0]) if len(group) == 1 else str(group) for group in ip_set.iter_ipranges()}
+        else:
+            expected = {str(cidr[0]) if len(cidr) == 1 else str(cidr) for cidr in ip_set.iter_cidrs()}
+        assert ips_to_ranges(ips, collapse_ips) == expected
+
     def test_get_bool_arg_or_param(self):
         """
         Given:
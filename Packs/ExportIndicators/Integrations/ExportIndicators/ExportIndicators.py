@@ -7,9 +7,10 @@ import re
 from base64 import b64decode
 from flask import Flask, Response, request
 from netaddr import IPAddress, IPSet
-from typing import Callable, Any, cast, Dict, Tuple
+from typing import Callable, Any, cast, Dict, Iterator, Tuple
 from math import ceil
 import dateparser
+import hashlib
 
 ''' GLOBAL VARIABLES '''
 INTEGRATION_NAME: str = 'Export Indicators Service'
@@ -17,6 +18,7 @@ PAGE_SIZE: int = 200
 APP: Flask = Flask('demisto-export_iocs')
 CTX_VALUES_KEY: str = 'dmst_export_iocs_values'
 CTX_MIMETYPE_KEY: str = 'dmst_export_iocs_mimetype'
+LIST_CACHE_PATH_FORMAT: str = 'export_iocs_list_{}.txt'
 
 FORMAT_CSV: str = 'csv'
 FORMAT_TEXT: str = 'text'
@@ -522,6 +524,80 @@ def create_values_for_returned_dict(iocs: list, request_args: RequestArguments)
     return {CTX_VALUES_KEY: list_to_str(formatted_indicators, '\n')}, len(formatted_indicators)
 
 
+def iter_lines(values: str) -> Iterator[str]:
+    """
+    Iterates over the lines of the values, without splitting them to a list
+    """
+    start = 0
+    while True:
+        end = values.find('\n', start)
+        if end == -1:
+            yield values[start:]
+            return
+        yield values[start:end]
+        start = end + 1
+
+
+def get_list_values(params: dict, request_args: RequestArguments, ctx: dict) -> str:
+    """
+    Gets the exported list values, with the strings to add to text lists
+    """
+    values = get_outbound_ioc_values(
+        on_demand=params.get('on_demand'),
+        last_update_data=ctx,
+        cache_refresh_rate=params.get('cache_refresh_rate'),
+        request_args=request_args
+    )
+
+    if not ctx and params.get('on_demand'):
+        values = 'You are running in On-Demand mode - please run !eis-update command to initialize the ' \
+                 'export process'
+
+    elif not values:
+        values = "No Results Found For the Query"
+
+    # if the case there are strings to add to the EDL, add them if the output type is text
+    if request_args.out_format == FORMAT_TEXT:
+        append_str = params.get("append_string")
+        prepend_str = params.get("prepend_string")
+        if append_str:
+            append_str = append_str.replace("\\n", "\n")
+            values = f"{values}{append_str}"
+        if prepend_str:
+            prepend_str = prepend_str.replace("\\n", "\n")
+            values = f"{prepend_str}\n{values}"
+    return values
+
+
+def get_list_cache_file(params: dict, request_args: RequestArguments, max_age: int,
+                        rebuild: bool = False) -> 'ListCacheFile':
+    """
+    Gets the exported list written to a list cache file of the request arguments. The list is rebuilt only if it
+    may have changed:
+     * On demand: when the list is updated by the eis-update command.
+     * Otherwise: when the list was built more than max_age seconds ago, or rebuild is set.
+    The gzip compressed copy of the list is written only if the response is streamed. The list cache files of the
+    least recently requested arguments are deleted, keeping up to LIST_CACHE_MAX_FILES lists.
+    """
+    signature = hashlib.sha1(  # guardrails-disable-line
+        json.dumps([vars(request_args), params.get('append_string'), params.get('prepend_string')],
+                   sort_keys=True).encode()).hexdigest()
+    list_cache = ListCacheFile(LIST_CACHE_PATH_FORMAT.format(signature))
+    on_demand = params.get('on_demand')
+    ctx = get_integration_context() if on_demand else None
+    # the list is updated on demand with a new last run
+    key = f'on_demand:{ctx.get("last_run", "")}' if ctx is not None else ''
+    if not rebuild and list_cache.load() and list_cache.key == key and \
+            (on_demand or list_cache.is_built_since(max_age)):
+        return list_cache
+
+    values = get_list_values(params, request_args, get_integration_context() if ctx is None else ctx)
+    list_cache.write(iter_lines(values), key=key, mimetype=get_outbound_mimetype(),
+                     compress=bool(params.get('stream_response')))
+    ListCacheFile.evict(LIST_CACHE_PATH_FORMAT)
+    return list_cache
+
+
 def get_outbound_mimetype() -> str:
     """Returns the mimetype of the export_iocs"""
     ctx = get_integration_context().get('last_output', {})
@@ -717,46 +793,21 @@ def route_list_values() -> Response:
         request_args = get_request_args(params)
         created = datetime.now(timezone.utc)
         cache_refresh_rate = params.get('cache_refresh_rate')
-
-        values = get_outbound_ioc_values(
-            on_demand=params.get('on_demand'),
-            last_update_data=get_integration_context(),
-            cache_refresh_rate=cache_refresh_rate,
-            request_args=request_args
-        )
+        max_age = ceil((datetime.now() - dateparser.parse(cache_refresh_rate)).total_seconds())  # type: ignore[operator]
+        # the list is rebuilt when the nginx cache is bypassed
+        list_cache = get_list_cache_file(params, request_args, max_age, rebuild=bool(request.args.get('nocache')))
         query_time = (datetime.now(timezone.utc) - created).total_seconds()
 
-        if not get_integration_context() and params.get('on_demand'):
-            values = 'You are running in On-Demand mode - please run !eis-update command to initialize the ' \
-                     'export process'
-
-        elif not values:
-            values = "No Results Found For the Query"
-
-        # if the case there are strings to add to the EDL, add them if the output type is text
-        if request_args.out_format == FORMAT_TEXT:
-            append_str = params.get("append_string")
-            prepend_str = params.get("prepend_string")
-            if append_str:
-                append_str = append_str.replace("\\n", "\n")
-                values = f"{values}{append_str}"
-            if prepend_str:
-                prepend_str = prepend_str.replace("\\n", "\n")
-                values = f"{prepend_str}\n{values}"
-
-        mimetype = get_outbound_mimetype()
-
-        list_size = 0
-        if values.strip():
-            list_size = values.count('\n') + 1  # add 1 as last line doesn't have a \n
-        max_age = ceil((datetime.now() - dateparser.parse(cache_refresh_rate)).total_seconds())  # type: ignore[operator]
+        list_size = list_cache.size
         demisto.debug(f'Returning exported indicators list of size: [{list_size}], created: [{created}], '
                       f'query time seconds: [{query_time}], max age: [{max_age}]')
-        resp = Response(values, status=200, mimetype=mimetype, headers=[
+        headers = [
             ('X-ExportIndicators-Created', created.isoformat()),
             ('X-ExportIndicators-Query-Time-Secs', "{:.3f}".format(query_time)),
             ('X-ExportIndicators-Size', str(list_size))
-        ])
+        ]
+        # the ETag and Last-Modified headers are added by the list cache file, which responds with 304 if they match
+        resp = list_cache.to_response(headers=headers, stream=bool(params.get('stream_response')))
         resp.cache_control.max_age = max_age
         resp.cache_control[
             'stale-if-error'] = '600'  # number of seconds we are willing to serve stale content when there is an error
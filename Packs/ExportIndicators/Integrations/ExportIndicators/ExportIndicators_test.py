@@ -551,3 +551,71 @@ class TestHelperFunctions:
             debug_list = [call[0][0] for call in demisto.debug.call_args_list]
             assert 'ExportIndicators - Could not sort IoCs, please verify that you entered the correct field name.\n' \
                    'Field used: invalid_field_name' in debug_list
+
+    def test_route_list_values__stream_response(self, mocker, tmp_path):
+        """
+        Given
+        - The stream response param.
+
+        When
+        - Requesting the exported list twice, the second time with gzip encoding.
+
+        Then
+        - Ensure the list is streamed, and written to the list cache file only once.
+        - Ensure the list is compressed when the client accepts gzip.
+        """
+        import gzip
+        import ExportIndicators as ei
+        values = '\n'.join(f'{i}.example.com' for i in range(1000))
+        mocker.patch.object(ei, 'LIST_CACHE_PATH_FORMAT', str(tmp_path / 'list_{}.txt'))
+        mocker.patch.object(demisto, 'params', return_value={'stream_response': True, 'format': 'text',
+                                                             'indicators_query': '', 'cache_refresh_rate': '1 minute'})
+        mocker.patch.object(ei, 'get_outbound_ioc_values', return_value=values)
+        write = mocker.spy(ei.ListCacheFile, 'write')
+
+        with ei.APP.test_client() as client:
+            response = client.get('/')
+            gzip_response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+
+        assert response.data.decode() == values
+        assert response.headers['X-ExportIndicators-Size'] == '1000'
+        assert gzip.decompress(gzip_response.data).decode() == values
+        assert response.headers['ETag'] == gzip_response.headers['ETag']
+        assert write.call_count == 1
+
+    def test_route_list_values__conditional_request(self, mocker, tmp_path):
+        """
+        Given
+        - An exported list updated on demand.
+
+        When
+        - Requesting the list with its ETag and with its Last-Modified time.
+        - Requesting the list after it is updated by the eis-update command.
+
+        Then
+        - Ensure 304 is returned without rebuilding the list.
+        - Ensure the updated list is returned after the update.
+        """
+        import ExportIndicators as ei
+        mocker.patch.object(ei, 'LIST_CACHE_PATH_FORMAT', str(tmp_path / 'list_{}.txt'))
+        mocker.patch.object(demisto, 'params', return_value={'on_demand': True, 'format': 'text',
+                                                             'indicators_query': '', 'cache_refresh_rate': '1 minute'})
+        ctx = {'last_run': 1, 'last_output': {ei.CTX_VALUES_KEY: '1.1.1.1', ei.CTX_MIMETYPE_KEY: 'text/plain'}}
+        mocker.patch.object(ei, 'get_integration_context', return_value=ctx)
+        get_outbound_ioc_values = mocker.patch.object(
+            ei, 'get_outbound_ioc_values', side_effect=lambda **kwargs: ctx['last_output'][ei.CTX_VALUES_KEY])
+
+        with ei.APP.test_client() as client:
+            response = client.get('/')
+            assert response.data == b'1.1.1.1'
+            etag, last_modified = response.headers['ETag'], response.headers['Last-Modified']
+            assert client.get('/', headers={'If-None-Match': etag}).status_code == 304
+            assert client.get('/', headers={'If-Modified-Since': last_modified}).status_code == 304
+            assert get_outbound_ioc_values.call_count == 1
+
+            ctx.update({'last_run': 2,
+                        'last_output': {ei.CTX_VALUES_KEY: '2.2.2.2', ei.CTX_MIMETYPE_KEY: 'text/plain'}})
+            response = client.get('/', headers={'If-None-Match': etag})
+            assert response.status_code == 200
+            assert response.data == b'2.2.2.2'
+            assert get_outbound_ioc_values.call_count == 2
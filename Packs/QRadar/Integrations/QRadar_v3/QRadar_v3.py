@@ -29,6 +29,7 @@ RULES_ENRCH_FLG = 'true'  # when set to true, will try to enrich offense with ru
 MAX_FETCH_EVENT_RETIRES = 3  # max iteration to try search the events of an offense
 SLEEP_FETCH_EVENT_RETIRES = 10  # sleep between iteration to try search the events of an offense
 MAX_NUMBER_OF_OFFENSES_TO_CHECK_SEARCH = 5  # Number of offenses to check during mirroring if search was completed.
+LOOKUP_CACHE_TTL_SECS = 60 * 60  # time to cache offense types, closing reasons, domain names and rule names
 
 ADVANCED_PARAMETERS_STRING_NAMES = [
     'DOMAIN_ENRCH_FLG',
@@ -44,7 +45,8 @@ ADVANCED_PARAMETER_INT_NAMES = [
     'LOCK_WAIT_TIME',
     'MAX_WORKERS',
     'MAX_FETCH_EVENT_RETIRES',
-    'SLEEP_FETCH_EVENT_RETIRES'
+    'SLEEP_FETCH_EVENT_RETIRES',
+    'LOOKUP_CACHE_TTL_SECS'
 ]
 
 ''' CONSTANTS '''
@@ -70,11 +72,21 @@ MIRROR_DIRECTION: Dict[str, Optional[str]] = {
 MIRRORED_OFFENSES_CTX_KEY = 'mirrored_offenses'
 UPDATED_MIRRORED_OFFENSES_CTX_KEY = 'updated_mirrored_offenses'
 RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY = 'resubmitted_mirrored_offenses'
+# the mirroring lists hold one record per offense, and changes to them are merged by the offense id
+MIRRORING_OBJECT_KEYS = {
+    MIRRORED_OFFENSES_CTX_KEY: 'id',
+    UPDATED_MIRRORED_OFFENSES_CTX_KEY: 'id',
+    RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY: 'id'
+}
+LOOKUP_CACHE_CTX_KEY = 'lookup_cache'
 UTC_TIMEZONE = pytz.timezone('utc')
 ID_QUERY_REGEX = re.compile(r'(?:\s+|^)id((\s)*)>(=?)((\s)*)((\d)+)(?:\s+|$)')
 ASCENDING_ID_ORDER = '+id'
 EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS)
 lock = Lock()
+# in memory copy of the lookup cache, {table: {'expiry': expiry epoch, 'names': {id: name}}}
+lookup_cache: Dict[str, Dict] = {}
+updated_lookup_tables: Set[str] = set()
 
 ''' OUTPUT FIELDS REPLACEMENT MAPS '''
 OFFENSE_OLD_NEW_NAMES_MAP = {
@@ -663,51 +675,6 @@ class Client(BaseClient):
 ''' HELPER FUNCTIONS '''
 
 
-def safely_update_context_data(func: Callable):
-    """Decorator for updating context data using versions.
-    In case of a race condition, preform func with the new context_data and try updating again.
-
-    Args:
-        func: The function to preform with the new context data before updating.
-
-    raise ValueError if context_data or version are not in the kwargs for the function.
-    raise DemistoException if reached maximum of retries.
-    """
-    def wrapper(*args, **kwargs):
-        context_was_set = False
-        retries = 0
-        max_retries = 5
-        return_value = None
-        while not context_was_set and retries < max_retries:
-            context_data, version, return_value = func(*args, **kwargs)
-            print_debug_msg(f'Attempting to update context data after version {version} with retry {retries}')
-            new_context_data, new_version = get_integration_context_with_version()
-            if new_version == version:
-                try:
-                    set_to_integration_context_with_retries(context_data, max_retry_times=1)
-                    context_was_set = True
-                    print_debug_msg(f'Updated integration context after version {version} in retry {retries}.')
-                except Exception as e:
-                    if 'Max retry attempts exceeded' in str(e):
-                        continue
-                    else:
-                        raise e
-            else:
-                if 'context_data' not in kwargs or 'version' not in kwargs:
-                    raise ValueError('context_data and version must be in the func kwargs if '
-                                     'safely_update_context_data decorator is used but were not found.')
-                else:
-                    kwargs['context_data'] = extract_context_data(new_context_data)
-                    kwargs['version'] = new_version
-                    print_debug_msg(f'Could not update context data after version {version} due to new '
-                                    f'version {new_version} in retry {retries}')
-                    retries = retries + 1
-        if retries == max_retries:
-            raise DemistoException(f'Reached maximum retries, could not update context data for function {func}.')
-        return return_value
-    return wrapper
-
-
 def add_iso_entries_to_dict(dicts: List[Dict]) -> List[Dict]:
     """
     Takes list of dicts, for each dict:
@@ -810,6 +777,67 @@ def is_valid_ip(ip: str) -> bool:
         return False
 
 
+def get_lookup_names(table: str, ids: Set, fetch_names: Callable[[Set], Dict]) -> Dict:
+    """
+    Receives IDs of a reference table (offense types, closing reasons, domains or rules), and returns their names.
+    Names are cached for LOOKUP_CACHE_TTL_SECS in memory and in the integration context (see 'load_lookup_cache' and
+    'store_lookup_cache'), so only IDs which are missing from the cache are fetched from QRadar service.
+    Called from the enrichment threads, so it only accesses the in memory cache.
+    Args:
+        table (str): Name of the reference table.
+        ids (Set): The IDs to get the names of.
+        fetch_names (Callable[[Set], Dict]): Performs API call to QRadar service to retrieve {id: name} of the IDs.
+
+    Returns:
+        (Dict): Dictionary of {id: name}
+    """
+    now = time.time()
+    table_cache = lookup_cache.get(table)
+    if not table_cache or table_cache['expiry'] <= now:
+        table_cache = {'expiry': now + LOOKUP_CACHE_TTL_SECS, 'names': {}}
+        lookup_cache[table] = table_cache
+
+    names = table_cache['names']
+    missing_ids = {id_ for id_ in ids if str(id_) not in names}
+    if missing_ids:
+        names.update({str(id_): name for id_, name in fetch_names(missing_ids).items()})
+        updated_lookup_tables.add(table)
+    return {id_: names[str(id_)] for id_ in ids if str(id_) in names}
+
+
+def load_lookup_cache():
+    """
+    Loads the reference tables cached by other executions in the integration context into the in memory lookup cache.
+    Called before the enrichment threads look up names, so they do not access the integration context.
+    """
+    now = time.time()
+    ctx_lookup_cache = json.loads(get_integration_context().get(LOOKUP_CACHE_CTX_KEY) or '{}')
+    for table, ctx_table_cache in ctx_lookup_cache.items():
+        if ctx_table_cache['expiry'] <= now:
+            continue
+        table_cache = lookup_cache.get(table)
+        if table_cache and table_cache['expiry'] > now:
+            ctx_table_cache = dict(ctx_table_cache, names=dict(ctx_table_cache['names'], **table_cache['names']))
+        lookup_cache[table] = ctx_table_cache
+
+
+def store_lookup_cache():
+    """
+    Stores the reference tables which were updated in the in memory lookup cache in the integration context,
+    so they are used by other executions as well. Expired tables are removed.
+    """
+    if not updated_lookup_tables:
+        return
+    now = time.time()
+    ctx_lookup_cache = json.loads(get_integration_context().get(LOOKUP_CACHE_CTX_KEY) or '{}')
+    ctx_lookup_cache = {table: table_cache for table, table_cache in ctx_lookup_cache.items()
+                        if table_cache['expiry'] > now}
+    ctx_lookup_cache.update({table: lookup_cache[table] for table in updated_lookup_tables})
+    updated_lookup_tables.clear()
+    print_debug_msg(f'Storing lookup cache of tables: {list(ctx_lookup_cache.keys())}')
+    set_to_integration_context_with_retries({LOOKUP_CACHE_CTX_KEY: ctx_lookup_cache})
+
+
 def get_offense_types(client: Client, offenses: List[Dict]) -> Dict:
     """
     Receives list of offenses, and performs API call to QRadar service to retrieve the offense type names
@@ -824,9 +852,12 @@ def get_offense_types(client: Client, offenses: List[Dict]) -> Dict:
     offense_types_ids = {offense.get('offense_type') for offense in offenses if offense.get('offense_type') is not None}
     if not offense_types_ids:
         return dict()
-    offense_types = client.offense_types(filter_=f'''id in ({','.join(map(str, offense_types_ids))})''',
-                                         fields='id,name')
-    return {offense_type.get('id'): offense_type.get('name') for offense_type in offense_types}
+
+    def fetch_offense_types(ids: Set) -> Dict:
+        offense_types = client.offense_types(filter_=f'''id in ({','.join(map(str, ids))})''', fields='id,name')
+        return {offense_type.get('id'): offense_type.get('name') for offense_type in offense_types}
+
+    return get_lookup_names('offense_types', offense_types_ids, fetch_offense_types)
 
 
 def get_offense_closing_reasons(client: Client, offenses: List[Dict]) -> Dict:
@@ -844,9 +875,13 @@ def get_offense_closing_reasons(client: Client, offenses: List[Dict]) -> Dict:
                           if offense.get('closing_reason_id') is not None}
     if not closing_reason_ids:
         return dict()
-    closing_reasons = client.closing_reasons_list(filter_=f'''id in ({','.join(map(str, closing_reason_ids))})''',
-                                                  fields='id,text')
-    return {closing_reason.get('id'): closing_reason.get('text') for closing_reason in closing_reasons}
+
+    def fetch_closing_reasons(ids: Set) -> Dict:
+        closing_reasons = client.closing_reasons_list(filter_=f'''id in ({','.join(map(str, ids))})''',
+                                                      fields='id,text')
+        return {closing_reason.get('id'): closing_reason.get('text') for closing_reason in closing_reasons}
+
+    return get_lookup_names('closing_reasons', closing_reason_ids, fetch_closing_reasons)
 
 
 def get_domain_names(client: Client, outputs: List[Dict]) -> Dict:
@@ -863,8 +898,12 @@ def get_domain_names(client: Client, outputs: List[Dict]) -> Dict:
     domain_ids = {offense.get('domain_id') for offense in outputs if offense.get('domain_id') is not None}
     if not domain_ids:
         return dict()
-    domains_info = client.domains_list(filter_=f'''id in ({','.join(map(str, domain_ids))})''', fields='id,name')
-    return {domain_info.get('id'): domain_info.get('name') for domain_info in domains_info}
+
+    def fetch_domain_names(ids: Set) -> Dict:
+        domains_info = client.domains_list(filter_=f'''id in ({','.join(map(str, ids))})''', fields='id,name')
+        return {domain_info.get('id'): domain_info.get('name') for domain_info in domains_info}
+
+    return get_lookup_names('domains', domain_ids, fetch_domain_names)
 
 
 def get_rules_names(client: Client, offenses: List[Dict]) -> Dict:
@@ -881,8 +920,12 @@ def get_rules_names(client: Client, offenses: List[Dict]) -> Dict:
     rules_ids = {rule.get('id') for offense in offenses for rule in offense.get('rules', [])}
     if not rules_ids:
         return dict()
-    rules = client.rules_list(None, None, f'''id in ({','.join(map(str, rules_ids))})''', 'id,name')
-    return {rule.get('id'): rule.get('name') for rule in rules}
+
+    def fetch_rules_names(ids: Set) -> Dict:
+        rules = client.rules_list(None, None, f'''id in ({','.join(map(str, ids))})''', 'id,name')
+        return {rule.get('id'): rule.get('name') for rule in rules}
+
+    return get_lookup_names('rules', rules_ids, fetch_rules_names)
 
 
 def get_offense_addresses(client: Client, offenses: List[Dict], is_destination_addresses: bool) -> Dict:
@@ -974,6 +1017,7 @@ def enrich_offenses_result(client: Client, offenses: Any, enrich_ip_addresses: b
     - Adds to each rule of the offense its name.
     - Adds enrichment to each source/destination IP ID to its address (if enrich_ip_addresses is true).
     - Adds enrichment of assets to each offense (if enrich_assets is true).
+    The independent enrichment API calls are performed concurrently.
     Args:
         client (Client): Client to perform the API calls.
         offenses (Any): List of all of the offenses to enrich.
@@ -987,12 +1031,23 @@ def enrich_offenses_result(client: Client, offenses: Any, enrich_ip_addresses: b
         offenses = [offenses]
 
     print_debug_msg('Enriching offenses')
-    offense_types_id_name_dict = get_offense_types(client, offenses)
-    closing_reasons_id_name_dict = get_offense_closing_reasons(client, offenses)
-    domain_id_name_dict = get_domain_names(client, offenses) if DOMAIN_ENRCH_FLG.lower() == 'true' else dict()
-    rules_id_name_dict = get_rules_names(client, offenses) if RULES_ENRCH_FLG.lower() == 'true' else dict()
-    source_addresses_id_ip_dict = get_offense_addresses(client, offenses, False) if enrich_ip_addresses else dict()
-    destination_addresses_id_ip_dict = get_offense_addresses(client, offenses, True) if enrich_ip_addresses else dict()
+
+    def submit_enrichment(should_enrich: bool, enrich_func: Callable, *args) -> Optional[concurrent.futures.Future]:
+        return EXECUTOR.submit(enrich_func, client, offenses, *args) if should_enrich else None
+
+    load_lookup_cache()
+    enrichment_futures = [
+        submit_enrichment(True, get_offense_types),
+        submit_enrichment(True, get_offense_closing_reasons),
+        submit_enrichment(DOMAIN_ENRCH_FLG.lower() == 'true', get_domain_names),
+        submit_enrichment(RULES_ENRCH_FLG.lower() == 'true', get_rules_names),
+        submit_enrichment(enrich_ip_addresses, get_offense_addresses, False),
+        submit_enrichment(enrich_ip_addresses, get_offense_addresses, True)
+    ]
+    offense_types_id_name_dict, closing_reasons_id_name_dict, domain_id_name_dict, rules_id_name_dict, \
+        source_addresses_id_ip_dict, destination_addresses_id_ip_dict = \
+        [future.result() if future else dict() for future in enrichment_futures]
+    store_lookup_cache()
 
     def create_enriched_offense(offense: Dict) -> Dict:
         link_to_offense_suffix = '/console/do/sem/offensesummary?appName=Sem&pageId=OffenseSummary&summaryId' \
@@ -1026,18 +1081,19 @@ def enrich_offenses_result(client: Client, offenses: Any, enrich_ip_addresses: b
                                               offense.get('local_destination_address_ids', [])]
         } if enrich_ip_addresses else dict()
 
-        if enrich_assets:
-            source_ips: List = source_addresses_enrich.get('source_address_ids', [])
-            destination_ips: List = destination_addresses_enrich.get('local_destination_address_ids', [])
-            all_ips: List = source_ips + destination_ips
-            asset_enrich = {'assets': enrich_offense_with_assets(client, all_ips)}
-        else:
-            asset_enrich = dict()
-
         return dict(offense, **basic_enriches, **domain_enrich, **rules_enrich, **source_addresses_enrich,
-                    **destination_addresses_enrich, **asset_enrich)
+                    **destination_addresses_enrich)
 
     result = [create_enriched_offense(offense) for offense in offenses]
+    if enrich_assets:
+        # the address IDs of the offenses are replaced with the IPs only if enrich_ip_addresses is true
+        assets_futures = [EXECUTOR.submit(enrich_offense_with_assets, client,
+                                          offense.get('source_address_ids', [])
+                                          + offense.get('local_destination_address_ids', [])
+                                          if enrich_ip_addresses else [])
+                          for offense in result]
+        result = [dict(offense, assets=assets_future.result())
+                  for offense, assets_future in zip(result, assets_futures)]
     print_debug_msg('Enriched offenses successfully.')
     return result
 
@@ -1109,6 +1165,7 @@ def enrich_assets_results(client: Client, assets: Any, full_enrichment: bool) ->
         (List[Dict]) List of new assets with enrichment.
     """
     domain_id_name_dict = get_domain_names(client, assets) if full_enrichment else dict()
+    store_lookup_cache()
 
     def enrich_single_asset(asset: Dict) -> Dict:
         updated_asset = add_iso_entries_to_asset(asset)
@@ -1225,9 +1282,11 @@ def reset_mirroring_events_variables(mirror_options: str):
         ctx[UPDATED_MIRRORED_OFFENSES_CTX_KEY] = []
         ctx[MIRRORED_OFFENSES_CTX_KEY] = []
         ctx[RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY] = []
+        set_to_integration_context_with_retries({UPDATED_MIRRORED_OFFENSES_CTX_KEY: [],
+                                                 MIRRORED_OFFENSES_CTX_KEY: [],
+                                                 RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY: []})
 
     print_mirror_events_stats(ctx, "New Long Running Container - After Mirroring Variables Reset")
-    set_to_integration_context_with_retries(encode_context_data(ctx))
 
 
 def is_reset_triggered(handle_reset: bool = False):
@@ -1495,6 +1554,108 @@ def enrich_offense_with_events(client: Client, offense: Dict, fetch_mode: str, e
     return offense
 
 
+def get_search_events(client: Client, search_id: str) -> Optional[List[Dict]]:
+    """
+    Gets the events returned by a search, if the search status is within 'TERMINATING_SEARCH_STATUSES'.
+    Args:
+        client (Client): Client to perform the API calls.
+        search_id (str): ID of the search.
+
+    Returns:
+        (List[Dict]): List of events returned by the search.
+        None: If the search has not terminated yet.
+    """
+    query_status = client.search_status_get(search_id).get('status')
+    if query_status not in TERMINATING_SEARCH_STATUSES:
+        return None
+    search_results_response = client.search_results_get(search_id)
+    print_debug_msg(f'Http response: {search_results_response.get("http_response", "Not specified - ok")}')
+    return sanitize_outputs(search_results_response.get('events', []))
+
+
+def enrich_offenses_with_events(client: Client, offenses: List[Dict], fetch_mode: str, events_columns: str,
+                                events_limit: int, max_retries: int = MAX_FETCH_EVENT_RETIRES) -> List[Dict]:
+    """
+    Enriches offenses given with events, the same as 'enrich_offense_with_events' does for a single offense, but
+    pipelined across the offenses: the searches of all offenses are created up front, and all running searches are
+    polled together every EVENTS_INTERVAL_SECS, rather than each search being polled in a loop of its own worker.
+    Searches which returned less events than expected are created again, up to 'max_retries' searches per offense.
+    Args:
+        client (Client): Client to perform the API calls.
+        offenses (List[Dict]): Offenses to enrich with events.
+        fetch_mode (str): Which enrichment mode was requested.
+                          Can be 'Fetch With All Events', 'Fetch Correlation Events Only'
+        events_columns (str): Columns of the events to be extracted from query.
+        events_limit (int): Maximum number of events to enrich each offense.
+        max_retries (int): Number of searches per offense.
+
+    Returns:
+        (List[Dict]): The offenses enriched with events, in the order given.
+    """
+    searches = [{'offense': offense, 'min_events_size': min(offense.get('event_count', 0), events_limit),
+                 'search_id': None, 'num_of_searches': 0, 'num_of_failures': 0, 'polled': False,
+                 'events': [], 'failure_message': ''} for offense in offenses]
+
+    def is_done(search: Dict) -> bool:
+        return not search['search_id'] and (search['num_of_searches'] >= max_retries or (
+            search['polled'] and len(search['events']) >= search['min_events_size']))
+
+    def poll_search(search: Dict) -> Tuple[Optional[List[Dict]], Optional[Exception]]:
+        try:
+            return get_search_events(client, search['search_id']), None
+        except Exception as e:
+            return None, e
+
+    pending_searches = searches
+    while pending_searches:
+        if is_reset_triggered():
+            for search in pending_searches:
+                search['failure_message'] = 'Reset was triggered for integration.'
+            break
+
+        searches_to_create = [search for search in pending_searches if not search['search_id']]
+        search_responses = EXECUTOR.map(lambda search: create_search_with_retry(
+            client, fetch_mode, search['offense'], events_columns, events_limit), searches_to_create)
+        for search, search_response in zip(searches_to_create, search_responses):
+            search['num_of_searches'] += 1
+            if search_response:
+                search['search_id'] = search_response['search_id']
+
+        searches_to_poll = [search for search in pending_searches if search['search_id']]
+        for search, (events, error) in zip(searches_to_poll, EXECUTOR.map(poll_search, searches_to_poll)):
+            offense_id = search['offense']['id']
+            if error:
+                print_debug_msg(f'Error while fetching offense {offense_id} events, search_id: {search["search_id"]}. '
+                                f'Error details: {str(error)}')
+                # failures are relevant only when consecutive
+                search['num_of_failures'] += 1
+                if search['num_of_failures'] < EVENTS_FAILURE_LIMIT:
+                    continue
+                search['failure_message'] = f'{repr(error)} \nSee logs for further details.'
+                events = []
+            elif events is None:
+                search['num_of_failures'] = 0
+                continue
+            else:
+                print_debug_msg(f'Fetched {len(events)}/{search["min_events_size"]} events for offense {offense_id}.')
+                search['failure_message'] = ''
+            search.update(search_id=None, num_of_failures=0, polled=True, events=events)
+
+        pending_searches = [search for search in pending_searches if not is_done(search)]
+        if pending_searches:
+            print_debug_msg(f'Still fetching events of offenses: {[s["offense"]["id"] for s in pending_searches]}')
+            time.sleep(EVENTS_INTERVAL_SECS)
+
+    enriched_offenses = []
+    for search in searches:
+        events, failure_message = search['events'], search['failure_message']
+        if failure_message == '' and len(events) < search['min_events_size']:
+            failure_message = 'Events were probably not indexed in QRadar at the time of the mirror.'
+        offense = dict(search['offense'], mirroring_events_message=failure_message)
+        enriched_offenses.append(dict(offense, events=events) if events else offense)
+    return enriched_offenses
+
+
 def get_incidents_long_running_execution(client: Client, offenses_per_fetch: int, user_query: str, fetch_mode: str,
                                          events_columns: str, events_limit: int, ip_enrich: bool, asset_enrich: bool,
                                          last_highest_id: int, incident_type: Optional[str],
@@ -1535,17 +1696,7 @@ def get_incidents_long_running_execution(client: Client, offenses_per_fetch: int
     print_debug_msg(f'New highest ID returned from QRadar offenses: {new_highest_offense_id}')
 
     if fetch_mode != FetchMode.no_events.value:
-        futures = []
-        for offense in offenses:
-            futures.append(EXECUTOR.submit(
-                enrich_offense_with_events,
-                client=client,
-                offense=offense,
-                fetch_mode=fetch_mode,
-                events_columns=events_columns,
-                events_limit=events_limit,
-            ))
-        offenses = [future.result() for future in futures]
+        offenses = enrich_offenses_with_events(client, offenses, fetch_mode, events_columns, events_limit)
 
     if is_reset_triggered(handle_reset=True):
         return None, None
@@ -1558,20 +1709,6 @@ def get_incidents_long_running_execution(client: Client, offenses_per_fetch: int
     return incidents, new_highest_offense_id
 
 
-def exclude_lists(original: List[dict], exclude: List[dict], key: str):
-    """Exclude nodes of exclude list from the original list by key
-
-    Args:
-        original: The original list to exclude from
-        exclude: The list of nodes to exclude
-        key: The key to exclude by
-
-    Returns: A list with the original nodes that were not excluded.
-    """
-    exclude_keys = [excluded_node.get(key) for excluded_node in exclude]
-    return [element.copy() for element in original if element.get(key) not in exclude_keys]
-
-
 def update_mirrored_events(client: Client,
                            fetch_mode: str,
                            events_columns: str,
@@ -1668,41 +1805,45 @@ def print_mirror_events_stats(context_data: dict, stage: str) -> Set[str]:
     return set(not_updated_ids + updated_ids + resubmitted_ids)
 
 
-@safely_update_context_data
-def move_updated_offenses(context_data: dict, version: Any, include_context_data: dict,
-                          updated_list: list) -> Tuple[dict, Any, Any]:
+def update_mirroring_context(changes: dict) -> None:
+    """Write changes to the integration context. The mirroring lists in the changes hold only the changed offense
+    records (records with 'remove': True are deleted), and are merged by the offense id with the latest context data.
+    Other keys are replaced, and keys which are not in the changes are kept as they are.
+
+    Args:
+        changes: The context data keys to update, in their partially json encoded form.
+
+    Returns: None
+    """
+    set_to_integration_context_with_retries(changes, object_keys=MIRRORING_OBJECT_KEYS)
+
+
+def removed_records(offense_ids: list) -> List[dict]:
+    """Create the records removing the given offense ids from a mirroring list, see 'update_mirroring_context'.
+
+    Args:
+        offense_ids: The ids of the offenses to remove.
+
+    Returns: The records to merge into the mirroring list.
+    """
+    return [{'id': offense_id, 'remove': True} for offense_id in offense_ids]
+
+
+def move_updated_offenses(include_context_data: dict, updated_list: Optional[list]) -> None:
     """Move updated offenses from MIRRORED_OFFENSES_CTX_KEY to UPDATED_MIRRORED_OFFENSES_CTX_KEY.
 
     Args:
-        context_data: The context data to update
-        version: The version of the context data
         include_context_data: The context data changes to include
         updated_list: The list of updated offenses
 
-    Returns: (The new context data, the context data version the changes were based on, The new context_data)
+    Returns: None
     """
-    new_context_data = include_context_data.copy()
+    changes = include_context_data.copy()
     if updated_list:
-        all_updated_mirrored_offenses = merge_lists(original_list=context_data.get(UPDATED_MIRRORED_OFFENSES_CTX_KEY, []),
-                                                    updated_list=updated_list, key='id')
-        not_updated_list = exclude_lists(original=context_data.get(MIRRORED_OFFENSES_CTX_KEY, []),
-                                         exclude=updated_list, key="id")
-        new_context_data.update({UPDATED_MIRRORED_OFFENSES_CTX_KEY: all_updated_mirrored_offenses,
-                                 MIRRORED_OFFENSES_CTX_KEY: not_updated_list,
-                                 RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY:
-                                     context_data.get(RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY, [])})  # type: ignore
-    else:
-        new_context_data.update({UPDATED_MIRRORED_OFFENSES_CTX_KEY: context_data.get(UPDATED_MIRRORED_OFFENSES_CTX_KEY, []),
-                                 MIRRORED_OFFENSES_CTX_KEY: context_data.get(MIRRORED_OFFENSES_CTX_KEY, []),
-                                 RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY:
-                                     context_data.get(RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY, [])})
-
-    if not new_context_data.get('samples'):
-        new_context_data.update({'samples': context_data.get('samples')})
-    if not new_context_data.get('last_mirror_update'):
-        new_context_data.update({'last_mirror_update': str(context_data.get('last_mirror_update', 0))})
-
-    return encode_context_data(new_context_data, include_id=True), version, new_context_data
+        changes.update({UPDATED_MIRRORED_OFFENSES_CTX_KEY: updated_list,
+                        MIRRORED_OFFENSES_CTX_KEY: removed_records([offense.get('id') for offense in updated_list])})
+    if changes:
+        update_mirroring_context(changes)
 
 
 def long_running_execution_command(client: Client, params: Dict):
@@ -1742,7 +1883,7 @@ def long_running_execution_command(client: Client, params: Dict):
     while True:
         try:
             is_reset_triggered(handle_reset=True)
-            ctx, ctx_version = get_integration_context_with_version()
+            ctx = extract_context_data(get_integration_context(), include_id=True)
             print_debug_msg(f'Starting fetch loop. Fetch mode: {fetch_mode}, Mirror option: {mirror_options}.')
             incidents, new_highest_id = get_incidents_long_running_execution(
                 client=client,
@@ -1753,16 +1894,13 @@ def long_running_execution_command(client: Client, params: Dict):
                 events_limit=events_limit,
                 ip_enrich=ip_enrich,
                 asset_enrich=asset_enrich,
-                last_highest_id=int(json.loads(ctx.get(LAST_FETCH_KEY, '0'))),
+                last_highest_id=ctx.get(LAST_FETCH_KEY, 0),
                 incident_type=incident_type,
                 mirror_direction=mirror_direction
             )
 
-            orig_context_data = extract_context_data(ctx.copy(), include_id=True)
-            context_data = {LAST_FETCH_KEY: orig_context_data.get(LAST_FETCH_KEY, 0)}
-
+            context_data: Dict[str, Any] = {}
             updated_mirrored_offenses = None
-            ctx = extract_context_data(ctx)
             if mirror_options == MIRROR_OFFENSE_AND_EVENTS:
                 print_mirror_events_stats(ctx, "Long Running Command - Before Update")
                 updated_mirrored_offenses = update_mirrored_events(client=client,
@@ -1773,18 +1911,15 @@ def long_running_execution_command(client: Client, params: Dict):
                                                                    offenses_per_fetch=offenses_per_fetch)
 
             if incidents and new_highest_id:
-                incident_batch_for_sample = incidents[:SAMPLE_SIZE] if incidents else ctx.get('samples', [])
-                if incident_batch_for_sample:
-                    print_debug_msg(f'Saving New Highest ID: {new_highest_id}')
-                    context_data.update({'samples': incident_batch_for_sample, LAST_FETCH_KEY: int(new_highest_id)})
+                print_debug_msg(f'Saving New Highest ID: {new_highest_id}')
+                context_data.update({'samples': json_dumps_inner(incidents[:SAMPLE_SIZE]),
+                                     LAST_FETCH_KEY: int(new_highest_id)})
 
                 demisto.createIncidents(incidents)
 
-            new_context_data = move_updated_offenses(context_data=ctx, version=ctx_version,
-                                                     include_context_data=context_data,
-                                                     updated_list=updated_mirrored_offenses)
-
-            print_mirror_events_stats(new_context_data, "Long Running Command - After Update")
+            move_updated_offenses(include_context_data=context_data, updated_list=updated_mirrored_offenses)
+            print_debug_msg(f'Long Running Command - After Update: moved '
+                            f'{len(updated_mirrored_offenses or [])} updated offenses.')
 
         except Exception:
             demisto.error('Error occurred during long running loop')
@@ -3058,6 +3193,39 @@ def json_dumps_inner(listed_objects: list) -> List[str]:
     return listed_json_dumps
 
 
+def load_mirroring_records(json_records: str) -> List[dict]:
+    """Json load a mirroring list of the context data.
+    Lists set by previous versions of the integration hold json dumps of the records (ids for
+    RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY), these are loaded to records as well.
+
+    Args:
+        json_records: The json encoded list.
+
+    Returns: The offense records of the list.
+    """
+    records = json.loads(json_records)
+    if records and not isinstance(records[0], dict):
+        records = [json.loads(record) if isinstance(record, str) else record for record in records]
+        records = [record if isinstance(record, dict) else {'id': str(record)} for record in records]
+    return records
+
+
+def is_legacy_mirroring_format(context_data: dict) -> bool:
+    """Whether the mirroring lists of the context data were set by a previous version of the integration,
+    and can not be merged by the offense id.
+
+    Args:
+        context_data: The context data.
+
+    Returns: True if any of the mirroring lists holds json dumps rather than records.
+    """
+    for key in MIRRORING_OBJECT_KEYS:
+        records = json.loads(context_data.get(key) or '[]')
+        if records and not isinstance(records[0], dict):
+            return True
+    return False
+
+
 def extract_context_data(context_data: dict, include_id: bool = False) -> dict:
     """Transform the context data from partially json encoded to fully decoded.
 
@@ -3069,14 +3237,16 @@ def extract_context_data(context_data: dict, include_id: bool = False) -> dict:
     """
     new_context_data = context_data.copy()
     new_context_data.pop(LAST_FETCH_KEY, None)
+    # the lookup cache is updated separately (see 'store_lookup_cache'), and is kept when the context data is set
+    new_context_data.pop(LOOKUP_CACHE_CTX_KEY, None)
     if not new_context_data:
         new_context_data = {}
     new_context_data.update({
-        UPDATED_MIRRORED_OFFENSES_CTX_KEY: json_loads_inner(json.loads(
-            context_data.get(UPDATED_MIRRORED_OFFENSES_CTX_KEY, '[]'))),
-        MIRRORED_OFFENSES_CTX_KEY: json_loads_inner(json.loads(context_data.get(MIRRORED_OFFENSES_CTX_KEY, '[]'))),
-        RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY: json_loads_inner(json.loads(
-            context_data.get(RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY, '[]'))),
+        UPDATED_MIRRORED_OFFENSES_CTX_KEY: load_mirroring_records(
+            context_data.get(UPDATED_MIRRORED_OFFENSES_CTX_KEY, '[]')),
+        MIRRORED_OFFENSES_CTX_KEY: load_mirroring_records(context_data.get(MIRRORED_OFFENSES_CTX_KEY, '[]')),
+        RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY: [record.get('id') for record in load_mirroring_records(
+            context_data.get(RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY, '[]'))],
         'samples': json_loads_inner(json.loads(context_data.get('samples', '[]'))),
         'last_mirror_update': json.loads(context_data.get('last_mirror_update', '0'))
     })
@@ -3101,10 +3271,10 @@ def encode_context_data(context_data: dict, include_id: bool = False) -> dict:
     new_context_data.pop(LAST_FETCH_KEY, None)
     new_context_data.pop(RESET_KEY, None)
     new_context_data.update({
-        UPDATED_MIRRORED_OFFENSES_CTX_KEY: json_dumps_inner(context_data.get(UPDATED_MIRRORED_OFFENSES_CTX_KEY, [])),
-        MIRRORED_OFFENSES_CTX_KEY: json_dumps_inner(context_data.get(MIRRORED_OFFENSES_CTX_KEY, [])),
-        RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY: json_dumps_inner(context_data.get(RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY,
-                                                                                 [])),
+        UPDATED_MIRRORED_OFFENSES_CTX_KEY: list(context_data.get(UPDATED_MIRRORED_OFFENSES_CTX_KEY, [])),
+        MIRRORED_OFFENSES_CTX_KEY: list(context_data.get(MIRRORED_OFFENSES_CTX_KEY, [])),
+        RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY: [{'id': str(offense_id)} for offense_id in
+                                                context_data.get(RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY, [])],
         'samples': json_dumps_inner(context_data.get('samples', [])),
         'last_mirror_update': str(context_data.get('last_mirror_update', 0))
     })
@@ -3114,31 +3284,24 @@ def encode_context_data(context_data: dict, include_id: bool = False) -> dict:
     return new_context_data
 
 
-@safely_update_context_data
-def remove_offense_from_context_data(context_data: dict, version: Any, offense_id: str,
-                                     offense_to_remove: str) -> Tuple[dict, Any, dict]:
+def remove_offense_from_context_data(offense_id: str, offense_to_remove: Optional[dict],
+                                     resubmitted: bool) -> None:
     """Remove an offense from context data UPDATED_MIRRORED_OFFENSES_CTX_KEY and RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY.
 
     Args:
-        context_data: The context data to update.
-        version: The version of the context data to update.
         offense_id: The offense id to remove from RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY.
         offense_to_remove: The offense to remove from UPDATED_MIRRORED_OFFENSES_CTX_KEY.
+        resubmitted: Whether the offense id is in RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY.
 
-    Returns: (The new context_data, The context_data version the change was based on, The new context_data)
+    Returns: None
     """
-    updated = context_data.get(UPDATED_MIRRORED_OFFENSES_CTX_KEY, [])
-    resubmitted = context_data.get(RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY, [])
-
-    if offense_to_remove and offense_to_remove in updated:
-        updated.remove(offense_to_remove)
-    if offense_id in resubmitted:
-        resubmitted.remove(offense_id)
-
-    context_data[RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY] = resubmitted
-    context_data[UPDATED_MIRRORED_OFFENSES_CTX_KEY] = updated
-
-    return encode_context_data(context_data), version, context_data
+    changes: Dict[str, list] = {}
+    if offense_to_remove:
+        changes[UPDATED_MIRRORED_OFFENSES_CTX_KEY] = removed_records([offense_to_remove.get('id')])
+    if resubmitted:
+        changes[RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY] = removed_records([str(offense_id)])
+    if changes:
+        update_mirroring_context(changes)
 
 
 def get_remote_data_command(client: Client, params: Dict[str, Any], args: Dict) -> GetRemoteDataResponse:
@@ -3163,8 +3326,7 @@ def get_remote_data_command(client: Client, params: Dict[str, Any], args: Dict)
     offense = client.offenses_list(offense_id=offense_id)
     offense_last_update = get_time_parameter(offense.get('last_persisted_time'))
     mirror_options = params.get('mirror_options')
-    raw_context, context_version = get_integration_context_with_version()
-    context_data = extract_context_data(raw_context.copy())
+    context_data = extract_context_data(get_integration_context())
     events_limit = int(params.get('events_limit') or DEFAULT_EVENTS_LIMIT)
     processed_offenses = print_mirror_events_stats(context_data, f"Starting Get Remote Data For "
                                                                  f"Offense {str(offense.get('id'))}")
@@ -3208,43 +3370,37 @@ def get_remote_data_command(client: Client, params: Dict[str, Any], args: Dict)
     if mirror_options == MIRROR_OFFENSE_AND_EVENTS:
         offenses_waiting_for_update = context_data.get(MIRRORED_OFFENSES_CTX_KEY, [])
         max_retries = min(MAX_FETCH_EVENT_RETIRES * (len(offenses_waiting_for_update) + 3), 20)
-        offense_to_remove = None
         is_waiting_to_be_updated = True
         evented_offense = None
         retries = 0
         while ((not evented_offense) or is_waiting_to_be_updated) and retries < max_retries:
             if retries != 0:
+                # the context data of the first retry was just read
                 time.sleep(FAILURE_SLEEP)
-            raw_context, context_version = get_integration_context_with_version()
-            context_data = extract_context_data(raw_context.copy())
-            print_mirror_events_stats(context_data, f"Get Remote Data Loop for id {offense.get('id')}, retry {retries}")
+                context_data = extract_context_data(get_integration_context())
+                print_mirror_events_stats(context_data,
+                                          f"Get Remote Data Loop for id {offense.get('id')}, retry {retries}")
             retries += 1
-            offenses_with_updated_events = context_data.get(UPDATED_MIRRORED_OFFENSES_CTX_KEY, [])
-            offenses_waiting_for_update = context_data.get(MIRRORED_OFFENSES_CTX_KEY, [])
-            evented_offense = [evented_offense for evented_offense in offenses_with_updated_events
-                               if str(evented_offense.get('id')) == str(offense.get("id"))]
-
-            is_waiting_to_be_updated = any([True for waiting_offense in offenses_waiting_for_update
-                                            if str(waiting_offense.get('id')) == str(offense.get("id"))])
+            evented_offense = next((updated_offense for updated_offense
+                                    in context_data.get(UPDATED_MIRRORED_OFFENSES_CTX_KEY, [])
+                                    if str(updated_offense.get('id')) == str(offense.get("id"))), None)
+            is_waiting_to_be_updated = any(str(waiting_offense.get('id')) == str(offense.get("id"))
+                                           for waiting_offense in context_data.get(MIRRORED_OFFENSES_CTX_KEY, []))
 
         if evented_offense:
             demisto.debug(f"Mirror Events: Offense {offense.get('id')} events were updated, updating incident.")
-            if evented_offense[0].get('events'):
-                offense['events'] = evented_offense[0].get('events')
-                failure_message = evented_offense[0].get('mirroring_events_message', '')
+            if evented_offense.get('events'):
+                offense['events'] = evented_offense.get('events')
+                failure_message = evented_offense.get('mirroring_events_message', '')
                 demisto.debug(f"Mirror Events: Offense {offense.get('id')} now has {len(offense.get('events'))} "
                               f"fetched events. Mirror message: {failure_message}")
 
-            offense_to_remove = evented_offense[0]
-
         elif is_waiting_to_be_updated:
             failure_message = 'In queue.'
 
-        new_context_data = remove_offense_from_context_data(offense_id=offense_id, offense_to_remove=offense_to_remove,
-                                                            version=context_version,
-                                                            context_data=context_data)
-
-        print_mirror_events_stats(new_context_data, f"Get Remote Data End for id {offense.get('id')}")
+        remove_offense_from_context_data(
+            offense_id=offense_id, offense_to_remove=evented_offense,
+            resubmitted=str(offense_id) in context_data.get(RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY, []))
 
     enriched_offense = enrich_offenses_result(client, offense, ip_enrich, asset_enrich)
 
@@ -3261,51 +3417,50 @@ def get_remote_data_command(client: Client, params: Dict[str, Any], args: Dict)
     return GetRemoteDataResponse(final_offense_data, entries)
 
 
-@safely_update_context_data
-def add_modified_remote_offenses(context_data: dict, version: str, mirror_options: str, new_modified_records_ids: list,
-                                 current_last_update: str, offenses: list) -> Tuple[dict, str, list]:
+def add_modified_remote_offenses(context_data: dict, mirror_options: str, new_modified_records_ids: list,
+                                 current_last_update: str, offenses: list) -> list:
     """Add modified remote offenses to context_data and handle exhausted offenses.
 
     Args:
-        context_data: The context data to update.
-        version: The version of the context data to update.
+        context_data: The current context data.
         mirror_options: The mirror options for the integration.
         new_modified_records_ids: The new modified offenses ids.
         current_last_update: The current last mirror update.
         offenses: The offenses to update.
 
-    Returns: (The new context data, The context_data version the changes were based on, The new modified records ids)
+    Returns: The new modified records ids
     """
-    new_context_data = context_data.copy()
-    print_debug_msg(f'Saving New Highest ID: {context_data.get(LAST_FETCH_KEY, 0)}')
-    new_context_data.update({'last_mirror_update': current_last_update})
+    changes: Dict[str, Any] = {'last_mirror_update': str(current_last_update)}
 
     if mirror_options == MIRROR_OFFENSE_AND_EVENTS:
-        print_mirror_events_stats(new_context_data, "Get Modified Remote Data - Before update")
-        mirrored_offenses = merge_lists(original_list=context_data.get(MIRRORED_OFFENSES_CTX_KEY, []),
-                                        updated_list=offenses,
-                                        key='id')
-        new_context_data.update({MIRRORED_OFFENSES_CTX_KEY: mirrored_offenses})
-        remaining_resubmitted_offenses = context_data.get(RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY, []).copy()
-        updated_mirrored_offenses = context_data.get(UPDATED_MIRRORED_OFFENSES_CTX_KEY, [])
-        clean_updates_mirrored_offenses = updated_mirrored_offenses.copy()
-        if remaining_resubmitted_offenses:
-            for offense in updated_mirrored_offenses:
-                if str(offense.get("id")) in remaining_resubmitted_offenses:
-                    print_debug_msg(f"Removing Offense id {offense.get('id')} from processing Mirrored Events "
-                                    f"since its incident is not responding. (It is probably closed)")
-                    clean_updates_mirrored_offenses.remove(offense)
-
-            new_context_data.update({UPDATED_MIRRORED_OFFENSES_CTX_KEY: clean_updates_mirrored_offenses})
-            new_context_data.update({RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY: []})
-
-        clean_updates_mirrored_offenses_ids = [str(offense.get('id')) for offense in clean_updates_mirrored_offenses]
+        print_mirror_events_stats(context_data, "Get Modified Remote Data - Before update")
+        if offenses:
+            changes[MIRRORED_OFFENSES_CTX_KEY] = offenses
+        remaining_resubmitted_offenses = set(context_data.get(RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY, []))
+        exhausted_offenses_ids = []
+        clean_updates_mirrored_offenses_ids = []
+        for offense in context_data.get(UPDATED_MIRRORED_OFFENSES_CTX_KEY, []):
+            if str(offense.get("id")) in remaining_resubmitted_offenses:
+                print_debug_msg(f"Removing Offense id {offense.get('id')} from processing Mirrored Events "
+                                f"since its incident is not responding. (It is probably closed)")
+                exhausted_offenses_ids.append(offense.get('id'))
+            else:
+                clean_updates_mirrored_offenses_ids.append(str(offense.get('id')))
+
+        if exhausted_offenses_ids:
+            changes[UPDATED_MIRRORED_OFFENSES_CTX_KEY] = removed_records(exhausted_offenses_ids)
+        # the clean updated offenses are resubmitted instead of the remaining ones
+        resubmitted_changes = removed_records(list(remaining_resubmitted_offenses))
+        resubmitted_changes += [{'id': offense_id} for offense_id in clean_updates_mirrored_offenses_ids]
+        if resubmitted_changes:
+            changes[RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY] = resubmitted_changes
         if clean_updates_mirrored_offenses_ids:
             new_modified_records_ids = list(set(new_modified_records_ids + clean_updates_mirrored_offenses_ids))
-            new_context_data.update({RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY: clean_updates_mirrored_offenses_ids})
 
-    print_mirror_events_stats(new_context_data, "Get Modified Remote Data - After update")
-    return encode_context_data(new_context_data, include_id=False), version, new_modified_records_ids
+    update_mirroring_context(changes)
+    print_debug_msg(f"Get Modified Remote Data - After update: {len(offenses)} offenses waiting for update, "
+                    f"resubmitted offenses: {changes.get(RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY, [])}")
+    return new_modified_records_ids
 
 
 def get_modified_remote_data_command(client: Client, params: Dict[str, str],
@@ -3321,8 +3476,7 @@ def get_modified_remote_data_command(client: Client, params: Dict[str, str],
     Returns:
         (GetModifiedRemoteDataResponse): IDs of the offenses that have been modified in QRadar.
     """
-    raw_ctx, ctx_version = get_integration_context_with_version()
-    ctx = extract_context_data(raw_ctx, include_id=True)
+    ctx = extract_context_data(get_integration_context(), include_id=True)
     remote_args = GetModifiedRemoteDataArgs(args)
     highest_fetched_id = ctx.get(LAST_FETCH_KEY, 0)
     limit: int = int(params.get('mirror_limit', MAXIMUM_MIRROR_LIMIT))
@@ -3337,7 +3491,7 @@ def get_modified_remote_data_command(client: Client, params: Dict[str, str],
                                     fields='id,start_time,event_count,last_persisted_time')
     new_modified_records_ids = [str(offense.get('id')) for offense in offenses if 'id' in offense]
     current_last_update = last_update if not offenses else offenses[-1].get('last_persisted_time')
-    new_modified_records_ids = add_modified_remote_offenses(context_data=ctx, version=ctx_version,
+    new_modified_records_ids = add_modified_remote_offenses(context_data=ctx,
                                                             mirror_options=params.get('mirror_options'),
                                                             new_modified_records_ids=new_modified_records_ids,
                                                             current_last_update=current_last_update,
@@ -3392,6 +3546,8 @@ def change_ctx_to_be_compatible_with_retry() -> None:
 
     Because some customers already have instances running where fields are not JSON fields, this function is needed
     to make them be compatible with new changes.
+    Mirroring lists holding json dumps of the offenses are changed to lists of offense records, so changes to them can
+    be merged by the offense id (see 'update_mirroring_context').
     Returns:
         (None): Modifies context to be compatible.
     """
@@ -3410,6 +3566,10 @@ def change_ctx_to_be_compatible_with_retry() -> None:
         cleared_ctx = clear_integration_ctx(new_ctx)
         set_integration_context(cleared_ctx)
         print_debug_msg(f"Change ctx context data was cleared and changed to {cleared_ctx}")
+    elif is_legacy_mirroring_format(ctx):
+        encoded_ctx = encode_context_data(extracted_ctx)
+        set_to_integration_context_with_retries({key: encoded_ctx[key] for key in MIRRORING_OBJECT_KEYS})
+        print_debug_msg("Mirroring lists were changed to offense records")
 
 
 ''' MAIN FUNCTION '''
@@ -3452,6 +3612,8 @@ def main() -> None:
     credentials = params.get('credentials')
 
     try:
+        # the enrichments and the events searches run on worker threads, which log and call the server
+        support_multithreading()
 
         client = Client(
             server=server,
@@ -4,12 +4,14 @@
 import io
 import json
 import concurrent.futures
+import time
 from datetime import datetime
 from typing import Dict, Callable
 
 import pytest
 import pytz
 
+import CommonServerPython
 import QRadar_v3  # import module separately for mocker
 from CommonServerPython import DemistoException, set_integration_context, CommandResults, \
     GetModifiedRemoteDataResponse, GetRemoteDataResponse
@@ -32,7 +34,8 @@ from QRadar_v3 import get_time_parameter, add_iso_entries_to_dict, build_final_o
     qradar_log_sources_list_command, qradar_get_custom_properties_command, enrich_asset_properties, \
     flatten_nested_geolocation_values, get_modified_remote_data_command, get_remote_data_command, is_valid_ip, \
     qradar_ips_source_get_command, qradar_ips_local_destination_get_command, update_mirrored_events, \
-    encode_context_data, extract_context_data, change_ctx_to_be_compatible_with_retry, clear_integration_ctx
+    encode_context_data, extract_context_data, change_ctx_to_be_compatible_with_retry, clear_integration_ctx, \
+    move_updated_offenses
 
 client = Client(
     server='https://192.168.0.1',
@@ -525,6 +528,117 @@ def test_enrich_offense_with_events(mocker, offense: Dict, fetch_mode, mock_sear
     assert enriched_offense == expected_offense
 
 
+def test_enrich_offenses_with_events(mocker):
+    """
+    Given:
+     - Offenses to enrich with events, whose searches terminate in different poll rounds.
+
+    When:
+     - Enriching the offenses with events.
+
+    Then:
+     - Ensure the searches of all offenses are polled together, with a sleep between poll rounds.
+     - Ensure a search which returned less events than expected is created again.
+     - Ensure the offenses are returned in the given order with their events.
+    """
+    offenses = [{'id': 1, 'start_time': 60000, 'event_count': 1},
+                {'id': 2, 'start_time': 60000, 'event_count': 2},
+                {'id': 3, 'start_time': 60000, 'event_count': 1}]
+    search_ids = iter(['s1', 's2', 's3', 's2-retry'])
+    statuses = {'s1': ['COMPLETED'], 's2': ['EXECUTE', 'COMPLETED'], 's3': ['EXECUTE', 'EXECUTE', 'COMPLETED'],
+                's2-retry': ['COMPLETED']}
+    events = {'s1': [{'e': 1}], 's2': [{'e': 2}], 's3': [{'e': 3}], 's2-retry': [{'e': 2}, {'e': 22}]}
+    mocker.patch.object(client, 'search_create', side_effect=lambda **kwargs: {'search_id': next(search_ids)})
+    mocker.patch.object(client, 'search_status_get',
+                        side_effect=lambda search_id: {'status': statuses[search_id].pop(0)})
+    mocker.patch.object(client, 'search_results_get', side_effect=lambda search_id: {'events': events[search_id]})
+    sleep_mock = mocker.patch.object(QRadar_v3.time, 'sleep')
+
+    enriched_offenses = QRadar_v3.enrich_offenses_with_events(client, offenses, FetchMode.all_events.value, 'col',
+                                                              events_limit=5, max_retries=2)
+
+    assert sleep_mock.call_count == 2
+    assert enriched_offenses == [
+        dict(offenses[0], events=[{'e': 1}], mirroring_events_message=''),
+        dict(offenses[1], events=[{'e': 2}, {'e': 22}], mirroring_events_message=''),
+        dict(offenses[2], events=[{'e': 3}], mirroring_events_message='')
+    ]
+
+
+def test_get_lookup_names(mocker):
+    """
+    Given:
+     - Offense types to get the names of.
+
+    When:
+     - Getting the names again in the same execution, in a new execution which loaded the cache,
+       and after the cache expired.
+
+    Then:
+     - Ensure only missing offense types are fetched from QRadar service.
+     - Ensure the names are shared with new executions through the integration context.
+     - Ensure the names are fetched again after the cache expired.
+    """
+    set_integration_context({})
+    QRadar_v3.lookup_cache.clear()
+    names = {1: 'type1', 2: 'type2', 3: 'type3'}
+    fetch_names = mocker.Mock(side_effect=lambda ids: {id_: names[id_] for id_ in ids})
+
+    assert QRadar_v3.get_lookup_names('offense_types', {1, 2}, fetch_names) == {1: 'type1', 2: 'type2'}
+    assert QRadar_v3.get_lookup_names('offense_types', {2, 3}, fetch_names) == {2: 'type2', 3: 'type3'}
+    assert [call[0][0] for call in fetch_names.call_args_list] == [{1, 2}, {3}]
+    QRadar_v3.store_lookup_cache()
+
+    QRadar_v3.lookup_cache.clear()
+    QRadar_v3.load_lookup_cache()
+    assert QRadar_v3.get_lookup_names('offense_types', {1, 2, 3}, fetch_names) == names
+    assert fetch_names.call_count == 2
+
+    mocker.patch.object(QRadar_v3.time, 'time', return_value=time.time() + QRadar_v3.LOOKUP_CACHE_TTL_SECS)
+    assert QRadar_v3.get_lookup_names('offense_types', {1}, fetch_names) == {1: 'type1'}
+    assert fetch_names.call_count == 3
+    set_integration_context({})
+    QRadar_v3.lookup_cache.clear()
+
+
+def test_enrich_offenses_result_lookup_cache_threads(mocker):
+    """
+    Given:
+     - Offenses whose offense types and closing reasons are enriched concurrently.
+
+    When:
+     - Enriching the offenses.
+
+    Then:
+     - Ensure the integration context is only accessed by the main thread, once to load the lookup cache
+       and once to store it.
+    """
+    import threading
+    set_integration_context({})
+    QRadar_v3.lookup_cache.clear()
+    context_threads = []
+
+    def get_context_spy(*args, **kwargs):
+        context_threads.append(threading.current_thread())
+        return {}
+
+    mocker.patch.object(QRadar_v3, 'get_integration_context', side_effect=get_context_spy)
+    mocker.patch.object(QRadar_v3, 'set_to_integration_context_with_retries')
+    mocker.patch.object(client, 'offense_types', return_value=[{'id': 1, 'name': 'type1'}])
+    mocker.patch.object(client, 'closing_reasons_list', return_value=[{'id': 2, 'text': 'reason2'}])
+    mocker.patch.object(QRadar_v3, 'DOMAIN_ENRCH_FLG', 'false')
+    mocker.patch.object(QRadar_v3, 'RULES_ENRCH_FLG', 'false')
+
+    enriched = QRadar_v3.enrich_offenses_result(client, [{'id': 1, 'offense_type': 1, 'closing_reason_id': 2}],
+                                                False, False)
+
+    assert enriched[0]['offense_type'] == 'type1'
+    assert enriched[0]['closing_reason_id'] == 'reason2'
+    assert context_threads == [threading.main_thread()] * 2
+    QRadar_v3.set_to_integration_context_with_retries.assert_called_once()
+    QRadar_v3.lookup_cache.clear()
+
+
 @pytest.mark.parametrize('func, args, expected',
                          [(create_search_with_retry,
                            {'client': client, 'offense': command_test_data['offenses_list']['response'][0],
@@ -1216,12 +1330,9 @@ def test_mirroring_offenses_with_events(mocker, offenses, context_data):
     """
     # Get a list of offenses to update their events
     mocker.patch.object(client, 'offenses_list', return_value=offenses.get('ids'))
-    mocker.patch.object(QRadar_v3, 'get_integration_context_with_version', return_value=(set_context_data_as_json(
-        context_data.get('before_offenses_ids')), 666))
-    mocker.patch.object(QRadar_v3, 'set_to_integration_context_with_retries')
+    raw_context = mock_integration_context(mocker, context_data.get('before_offenses_ids'))
     get_modified_remote_data_command(client, {'mirror_options': MIRROR_OFFENSE_AND_EVENTS}, {"lastUpdate": "0"})
-    QRadar_v3.set_to_integration_context_with_retries.assert_called_once_with(encode_context_data(
-        context_data.get('with_offenses_ids')), max_retry_times=1)
+    assert_context_data(raw_context, context_data.get('with_offenses_ids'))
 
     # Transfer that list to the long running docker and update the events.
     mocker.patch.object(concurrent.futures.ThreadPoolExecutor, 'submit', side_effect=offenses.get('as_results'))
@@ -1236,17 +1347,14 @@ def test_mirroring_offenses_with_events(mocker, offenses, context_data):
 
     # Update an incident's events accordingly.
     for offense_index, offense in enumerate(offenses.get('ids')):
-        mocker.patch.object(QRadar_v3, 'get_integration_context_with_version', return_value=(set_context_data_as_json(
-            context_data.get('with_events')[offense_index]), 666))
+        raw_context = mock_integration_context(mocker, context_data.get('with_events')[offense_index])
         mocker.patch.object(client, 'offenses_list', return_value=offense)
         mocker.patch.object(QRadar_v3, 'enrich_offenses_result', return_value=offense)
-        mocker.patch.object(QRadar_v3, 'set_to_integration_context_with_retries')
         result = get_remote_data_command(client, {'mirror_options': MIRROR_OFFENSE_AND_EVENTS},
                                          {'id': offense.get('id'), 'lastUpdate': 1})
 
         # Make sure the final offense has it's updated events
-        QRadar_v3.set_to_integration_context_with_retries.assert_called_once_with(
-            encode_context_data(context_data.get('with_updated_removed')[offense_index]), max_retry_times=1)
+        assert_context_data(raw_context, context_data.get('with_updated_removed')[offense_index])
         assert result.mirrored_object.get('events', '')
 
         updated_result_events = result.mirrored_object.get('events')
@@ -1262,6 +1370,20 @@ def set_context_data_as_json(context_data, include_id=False):
     return new_context_data
 
 
+def mock_integration_context(mocker, context_data):
+    """Keep the integration context in memory, with the changes written by set_to_integration_context_with_retries
+    merged into it."""
+    raw_context = set_context_data_as_json(context_data, include_id=True)
+    mocker.patch.object(QRadar_v3, 'get_integration_context', return_value=raw_context)
+    mocker.patch.object(CommonServerPython, 'get_integration_context_with_version', return_value=(raw_context, 666))
+    mocker.patch.object(CommonServerPython, 'set_integration_context')
+    return raw_context
+
+
+def assert_context_data(raw_context, expected_context_data):
+    assert extract_context_data(raw_context) == extract_context_data(set_context_data_as_json(expected_context_data))
+
+
 @pytest.mark.parametrize('offenses, context_data',
                          # No new offenses, just one exhausted offense
                          [({'new_offenses': [], 'to_update': ['1']},
@@ -1388,15 +1510,12 @@ def test_mirroring_with_events_resubmit_exhausted_offenses(mocker, offenses, con
         Ensure get_remote_data updated incident and updated the context data accordingly.
     """
     mocker.patch.object(client, 'offenses_list', return_value=offenses.get('new_offenses'))
-    mocker.patch.object(QRadar_v3, 'get_integration_context_with_version', return_value=(set_context_data_as_json(
-        context_data.get('get_modified_input')), 666))
-    mocker.patch.object(QRadar_v3, 'set_to_integration_context_with_retries')
+    raw_context = mock_integration_context(mocker, context_data.get('get_modified_input'))
     mocker.patch.object(QRadar_v3, 'GetModifiedRemoteDataResponse')
 
     get_modified_remote_data_command(client, {'mirror_options': MIRROR_OFFENSE_AND_EVENTS}, {"lastUpdate": "0"})
 
-    QRadar_v3.set_to_integration_context_with_retries.assert_called_once_with(encode_context_data(
-        context_data.get('get_modified_output')), max_retry_times=1)
+    assert_context_data(raw_context, context_data.get('get_modified_output'))
     assert set(QRadar_v3.GetModifiedRemoteDataResponse.call_args.args[0]) == set(offenses.get('to_update'))
     assert len(QRadar_v3.GetModifiedRemoteDataResponse.call_args.args[0]) == len(offenses.get('to_update'))
 
@@ -1405,17 +1524,14 @@ def test_mirroring_with_events_resubmit_exhausted_offenses(mocker, offenses, con
 
     # Update an incident's events accordingly.
     for offense_index, offense in enumerate(updated_offenses):
-        mocker.patch.object(QRadar_v3, 'get_integration_context_with_version', return_value=(set_context_data_as_json(
-            context_input_for_get_remote_data), 666))
+        raw_context = mock_integration_context(mocker, context_input_for_get_remote_data)
         mocker.patch.object(client, 'offenses_list', return_value=offense)
         mocker.patch.object(QRadar_v3, 'enrich_offenses_result', return_value=offense)
-        mocker.patch.object(QRadar_v3, 'set_to_integration_context_with_retries')
         get_remote_data_command(client, {'mirror_options': MIRROR_OFFENSE_AND_EVENTS},
                                 {'id': offense.get('id'), 'lastUpdate': 1})
 
         # Make sure the final offense has it's updated events
-        QRadar_v3.set_to_integration_context_with_retries.assert_called_once_with(
-            encode_context_data(context_data.get('after_get_remote_data')[offense_index]), max_retry_times=1)
+        assert_context_data(raw_context, context_data.get('after_get_remote_data')[offense_index])
 
         context_input_for_get_remote_data = context_data.get('after_get_remote_data')[offense_index]
 
@@ -1530,32 +1646,72 @@ def test_mirroring_with_events_remove_resubmitted_offenses(mocker, offenses, con
         Ensure get_modified_remote_data deletes relevant offense from mirror processing.
     """
     mocker.patch.object(client, 'offenses_list', return_value=offenses.get('new_offenses'))
-    mocker.patch.object(QRadar_v3, 'get_integration_context_with_version',
-                        return_value=(set_context_data_as_json(context_data.get('get_modified_input')), 666))
-    mocker.patch.object(QRadar_v3, 'set_to_integration_context_with_retries')
+    raw_context = mock_integration_context(mocker, context_data.get('get_modified_input'))
     mocker.patch.object(QRadar_v3, 'GetModifiedRemoteDataResponse')
 
     get_modified_remote_data_command(client, {'mirror_options': MIRROR_OFFENSE_AND_EVENTS}, {"lastUpdate": "0"})
 
-    QRadar_v3.set_to_integration_context_with_retries.assert_called_once_with(encode_context_data(
-        context_data.get('get_modified_output')), max_retry_times=1)
+    assert_context_data(raw_context, context_data.get('get_modified_output'))
     assert set(QRadar_v3.GetModifiedRemoteDataResponse.call_args.args[0]) == set(offenses.get('to_update'))
     assert len(QRadar_v3.GetModifiedRemoteDataResponse.call_args.args[0]) == len(offenses.get('to_update'))
 
     mocker.patch.object(client, 'offenses_list', return_value=offenses.get('newer_offenses'))
-    mocker.patch.object(QRadar_v3, 'get_integration_context_with_version', return_value=(set_context_data_as_json(
-        context_data.get('get_modified_output')), 666))
-    mocker.patch.object(QRadar_v3, 'set_to_integration_context_with_retries')
+    raw_context = mock_integration_context(mocker, context_data.get('get_modified_output'))
     mocker.patch.object(QRadar_v3, 'GetModifiedRemoteDataResponse')
 
     get_modified_remote_data_command(client, {'mirror_options': MIRROR_OFFENSE_AND_EVENTS}, {"lastUpdate": "0"})
 
-    QRadar_v3.set_to_integration_context_with_retries.assert_called_once_with(encode_context_data(
-        context_data.get('clean_get_modified_output')), max_retry_times=1)
+    assert_context_data(raw_context, context_data.get('clean_get_modified_output'))
     assert set(QRadar_v3.GetModifiedRemoteDataResponse.call_args.args[0]) == set(offenses.get('clean_to_update'))
     assert len(QRadar_v3.GetModifiedRemoteDataResponse.call_args.args[0]) == len(offenses.get('clean_to_update'))
 
 
+def test_mirroring_context_changes_with_many_offenses(mocker):
+    """Test mirroring with events: changes of a few offenses out of many mirrored offenses
+
+    Given:
+        Context data with 10k offenses waiting for their events to be updated.
+
+    When:
+        Getting remote modified data, moving the updated offenses and getting the remote data of an updated offense.
+
+    Then:
+        Ensure only the records of the changed offenses are written to the context data.
+        Ensure the context data is updated accordingly.
+    """
+    waiting_offenses = [{'id': offense_id, 'last_persisted_time': offense_id} for offense_id in range(10000)]
+    raw_context = mock_integration_context(mocker, {LAST_FETCH_KEY: 10000, 'last_mirror_update': '0',
+                                                    MIRRORED_OFFENSES_CTX_KEY: waiting_offenses})
+    mocker.spy(QRadar_v3, 'set_to_integration_context_with_retries')
+    modified_offense = {'id': 5, 'last_persisted_time': 10005}
+    mocker.patch.object(client, 'offenses_list', return_value=[modified_offense])
+
+    get_modified_remote_data_command(client, {'mirror_options': MIRROR_OFFENSE_AND_EVENTS}, {"lastUpdate": "0"})
+    assert QRadar_v3.set_to_integration_context_with_retries.call_args.args[0][MIRRORED_OFFENSES_CTX_KEY] == \
+        [modified_offense]
+
+    updated_offenses = [dict(waiting_offenses[1], events=[{'event_id': '1'}]),
+                        dict(modified_offense, events=[{'event_id': '2'}])]
+    move_updated_offenses(include_context_data={}, updated_list=updated_offenses)
+    assert QRadar_v3.set_to_integration_context_with_retries.call_args.args[0] == {
+        UPDATED_MIRRORED_OFFENSES_CTX_KEY: updated_offenses,
+        MIRRORED_OFFENSES_CTX_KEY: [{'id': 1, 'remove': True}, {'id': 5, 'remove': True}]}
+
+    mocker.patch.object(client, 'offenses_list', return_value=modified_offense)
+    mocker.patch.object(QRadar_v3, 'enrich_offenses_result', return_value=modified_offense)
+    result = get_remote_data_command(client, {'mirror_options': MIRROR_OFFENSE_AND_EVENTS}, {'id': '5', 'lastUpdate': 1})
+    assert result.mirrored_object.get('events') == [{'event_id': '2'}]
+    assert QRadar_v3.set_to_integration_context_with_retries.call_args.args[0] == {
+        UPDATED_MIRRORED_OFFENSES_CTX_KEY: [{'id': 5, 'remove': True}]}
+
+    context_data = extract_context_data(raw_context, include_id=True)
+    assert context_data[LAST_FETCH_KEY] == 10000
+    assert context_data['last_mirror_update'] == '10005'
+    assert len(context_data[MIRRORED_OFFENSES_CTX_KEY]) == 9998
+    assert context_data[UPDATED_MIRRORED_OFFENSES_CTX_KEY] == updated_offenses[:1]
+    assert context_data[RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY] == []
+
+
 @pytest.mark.parametrize('context_data', [
     {'samples': [], 'last_mirror_update': '0',
      LAST_FETCH_KEY: 5,
@@ -1737,9 +1893,11 @@ def test_change_ctx_to_be_compatible(mocker, context_data, retry_compatible):
 
     Then:
         Ensure the context_data is transformed to the new format if needed.
+        Ensure mirroring lists of json dumps are changed to offense records.
     """
     mocker.patch.object(QRadar_v3, 'get_integration_context', return_value=context_data)
     mocker.patch.object(QRadar_v3, 'set_integration_context')
+    mocker.patch.object(QRadar_v3, 'set_to_integration_context_with_retries')
 
     change_ctx_to_be_compatible_with_retry()
 
@@ -1747,8 +1905,16 @@ def test_change_ctx_to_be_compatible(mocker, context_data, retry_compatible):
 
     if not retry_compatible:
         QRadar_v3.set_integration_context.assert_called_once_with(clear_integration_ctx(extracted_ctx))
+        assert not QRadar_v3.set_to_integration_context_with_retries.called
     else:
         assert not QRadar_v3.set_integration_context.called
+        QRadar_v3.set_to_integration_context_with_retries.assert_called_once_with({
+            UPDATED_MIRRORED_OFFENSES_CTX_KEY: [{'id': '1', 'last_persisted_time': 2,
+                                                 'events': [{'event_id': '2'}, {'event_id': '3'}]},
+                                                {'id': '11', 'last_persisted_time': 3,
+                                                 'events': [{'event_id': '22'}, {'event_id': '33'}]}],
+            MIRRORED_OFFENSES_CTX_KEY: [],
+            RESUBMITTED_MIRRORED_OFFENSES_CTX_KEY: [{'id': '1'}, {'id': '11'}]})
 
 
 @pytest.mark.parametrize('context_data', [
@@ -17,6 +17,9 @@ import requests
 import urllib3
 import io
 import re
+import csv
+import tempfile
+from multiprocessing.pool import ThreadPool
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -33,6 +36,8 @@ REPLACE_WITH = '_'
 REPLACE_FLAG = params.get('replaceKeys', False)
 FETCH_TIME = demisto.params().get('fetch_time')
 PROXIES = handle_proxy()
+SEARCH_RESULTS_CONCURRENCY = 4  # max concurrent requests of search result batches
+SEARCH_RESULTS_FILE_FORMATS = ('ndjson', 'csv')
 TIME_UNIT_TO_MINUTES = {'minute': 1, 'hour': 60, 'day': 24 * 60, 'week': 7 * 24 * 60, 'month': 30 * 24 * 60,
                         'year': 365 * 24 * 60}
 
@@ -62,9 +67,12 @@ INCIDENTS = 'incidents'
 DUMMY = 'dummy'
 NOTABLE = 'notable'
 ENRICHMENTS = 'enrichments'
-MAX_HANDLE_NOTABLES = 20
+MAX_HANDLE_NOTABLES = 50  # max notables with open enrichments, all of them are polled on each fetch
 MAX_SUBMIT_NOTABLES = 30
+ENRICHMENT_CONCURRENCY = 10  # max concurrent Splunk requests of the enrichment mechanism
 CACHE = 'cache'
+NOT_YET_SUBMITTED_PREFIX = 'N'
+SUBMITTED_PREFIX = 'S'
 STATUS = 'status'
 DATA = 'data'
 TYPE = 'type'
@@ -234,6 +242,20 @@ class Enrichment:
             creation_time=enrichment_dict.get(CREATION_TIME)
         )
 
+    def to_json(self):
+        """ Serialization method, empty fields are omitted.
+
+        Returns:
+            The enrichment dict in JSON format.
+
+        """
+        enrichment_dict = {TYPE: self.type, STATUS: self.status, CREATION_TIME: self.creation_time}
+        if self.id:
+            enrichment_dict[ID] = self.id
+        if self.data:
+            enrichment_dict[DATA] = self.data
+        return enrichment_dict
+
 
 class Notable:
     """ A class to represent a notable.
@@ -336,20 +358,6 @@ class Notable:
         return all(enrichment.status in Enrichment.HANDLED for enrichment in self.enrichments) or \
             any(enrichment.status == Enrichment.EXCEEDED_TIMEOUT for enrichment in self.enrichments)
 
-    def get_submitted_enrichments(self):
-        """ Returns indicators on whether each enrichment was submitted/failed or not initiated """
-        submitted_drilldown, submitted_asset, submitted_identity = False, False, False
-
-        for enrichment in self.enrichments:
-            if enrichment.type == DRILLDOWN_ENRICHMENT:
-                submitted_drilldown = True
-            elif enrichment.type == ASSET_ENRICHMENT:
-                submitted_asset = True
-            elif enrichment.type == IDENTITY_ENRICHMENT:
-                submitted_identity = True
-
-        return submitted_drilldown, submitted_asset, submitted_identity
-
     def get_occurred(self):
         """ Returns the occurred time, if not exists in data, returns the current fetch time """
         if '_time' in self.data:
@@ -421,26 +429,55 @@ class Notable:
             incident_created=notable_dict.get(INCIDENT_CREATED)
         )
 
+    def to_json(self):
+        """ Serialization method, empty fields are omitted as they are restored to the same values by from_json.
+
+        Returns:
+            The notable dict in JSON format.
+
+        """
+        notable_dict = {
+            DATA: self.data,
+            ENRICHMENTS: [enrichment.to_json() for enrichment in self.enrichments],
+            OCCURRED: self.occurred,
+            CUSTOM_ID: self.custom_id
+        }
+        for key, value in ((ID, self.id), (INDEX_TIME, self.index_time), (TIME_IS_MISSING, self.time_is_missing),
+                           (INCIDENT_CREATED, self.incident_created)):
+            if value:
+                notable_dict[key] = value
+        return notable_dict
+
 
 class Cache:
     """ A class to represent the cache for the enriching fetch mechanism.
 
+    The cache is stored in the integration context as a string with a line per notable, which is the notable
+    compact JSON prefixed by its state. Only the notables which are handled in the current run are deserialized,
+    the rest of the not yet submitted notables are kept as serialized lines (the backlog) and stored back as is.
+
     Attributes:
         not_yet_submitted_notables (list): The list of all notables that were fetched but not yet submitted.
         submitted_notables (list): The list of all submitted notables that needs to be handled.
+        not_yet_submitted_backlog (list): The serialized lines of the not yet submitted notables that come after
+         not_yet_submitted_notables.
 
     """
 
-    def __init__(self, not_yet_submitted_notables=None, submitted_notables=None):
+    def __init__(self, not_yet_submitted_notables=None, submitted_notables=None, not_yet_submitted_backlog=None):
         self.not_yet_submitted_notables = not_yet_submitted_notables if not_yet_submitted_notables else []
         self.submitted_notables = submitted_notables if submitted_notables else []
+        self.not_yet_submitted_backlog = not_yet_submitted_backlog if not_yet_submitted_backlog else []
 
     def done_submitting(self):
-        return not self.not_yet_submitted_notables
+        return not self.not_yet_submitted_notables and not self.not_yet_submitted_backlog
 
     def done_handling(self):
         return not self.submitted_notables
 
+    def has_room_to_submit(self):
+        return len(self.submitted_notables) < MAX_HANDLE_NOTABLES
+
     def organize(self):
         """ This function is designated to handle unexpected behaviors in the enrichment mechanism.
          E.g. Connection error, instance disabling, etc...
@@ -479,7 +516,7 @@ class Cache:
 
     @classmethod
     def from_json(cls, cache_dict):
-        """ Deserialization method.
+        """ Deserialization method of the cache format of previous versions.
 
         Args:
             cache_dict: The cache dict in JSON format.
@@ -493,12 +530,51 @@ class Cache:
             submitted_notables=list(map(Notable.from_json, cache_dict.get(SUBMITTED_NOTABLES, [])))
         )
 
+    @classmethod
+    def from_lines(cls, cache_string):
+        """ Deserialization method. All the submitted notables and the first MAX_SUBMIT_NOTABLES not yet submitted
+        notables are deserialized, the rest are kept in the backlog.
+
+        Args:
+            cache_string (str): The cache string, a line per notable.
+
+        Returns:
+            An instance of the Cache class.
+
+        """
+        cache_object = cls()
+        for line in cache_string.splitlines():
+            if line.startswith(SUBMITTED_PREFIX):
+                cache_object.submitted_notables.append(Notable.from_json(json.loads(line[1:])))
+            elif len(cache_object.not_yet_submitted_notables) < MAX_SUBMIT_NOTABLES:
+                cache_object.not_yet_submitted_notables.append(Notable.from_json(json.loads(line[1:])))
+            else:
+                cache_object.not_yet_submitted_backlog.append(line)
+        return cache_object
+
+    def to_lines(self):
+        """ Serialization method, the lines of the backlog are reused as is.
+
+        Returns:
+            The cache string, a line per notable.
+
+        """
+        lines = [prefix + json.dumps(notable.to_json(), separators=(',', ':'))
+                 for prefix, notables in ((SUBMITTED_PREFIX, self.submitted_notables),
+                                          (NOT_YET_SUBMITTED_PREFIX, self.not_yet_submitted_notables))
+                 for notable in notables]
+        return '\n'.join(lines + self.not_yet_submitted_backlog)
+
     @classmethod
     def load_from_integration_context(cls, integration_context):
-        return Cache.from_json(json.loads(integration_context.get(CACHE, "{}")))
+        cache_string = integration_context.get(CACHE, '')
+        if cache_string.startswith('{'):
+            # the cache format of previous versions
+            return Cache.from_json(json.loads(cache_string))
+        return Cache.from_lines(cache_string)
 
     def dump_to_integration_context(self, integration_context):
-        integration_context[CACHE] = json.dumps(self, default=lambda obj: obj.__dict__)
+        integration_context[CACHE] = self.to_lines()
         set_integration_context(integration_context)
 
 
@@ -625,18 +701,15 @@ def get_drilldown_timeframe(notable_data, raw):
     return task_status, earliest_offset, latest_offset
 
 
-def drilldown_enrichment(service, notable_data, num_enrichment_events):
-    """ Performs a drilldown enrichment.
+def get_drilldown_query(notable_data):
+    """ Builds the search query of a drilldown enrichment.
 
     Args:
-        service (splunklib.client.Service): Splunk service object.
         notable_data (dict): The notable data
-        num_enrichment_events (int): The maximal number of events to return per enrichment type.
 
-    Returns: The Splunk Job
+    Returns: The search query, None if it could not be built
 
     """
-    job = None
     search = notable_data.get("drilldown_search", "")
 
     if search:
@@ -649,13 +722,9 @@ def drilldown_enrichment(service, notable_data, num_enrichment_events):
                     searchable_query = "latest={} ".format(latest_offset) + searchable_query
                 if "earliest" not in searchable_query:
                     searchable_query = "earliest={} ".format(earliest_offset) + searchable_query
-                kwargs = {"count": num_enrichment_events, "exec_mode": "normal"}
                 query = build_search_query({"query": searchable_query})
                 demisto.debug("Drilldown query for notable {}: {}".format(notable_data[EVENT_ID], query))
-                try:
-                    job = service.jobs.create(query, **kwargs)
-                except Exception as e:
-                    demisto.error("Caught an exception in drilldown_enrichment function: {}".format(str(e)))
+                return query
             else:
                 demisto.debug('Failed getting the drilldown timeframe for notable {}'.format(notable_data[EVENT_ID]))
         else:
@@ -664,146 +733,159 @@ def drilldown_enrichment(service, notable_data, num_enrichment_events):
     else:
         demisto.debug("drill-down was not configured for notable {}".format(notable_data[EVENT_ID]))
 
-    return job
+    return None
 
 
-def identity_enrichment(service, notable_data, num_enrichment_events):
-    """ Performs an identity enrichment.
+def get_identity_query(notable_data):
+    """ Builds the search query of an identity enrichment.
 
     Args:
-        service (splunklib.client.Service): Splunk service object
         notable_data (dict): The notable data
-        num_enrichment_events (int): The maximal number of events to return per enrichment type.
 
-    Returns: The Splunk Job
+    Returns: The search query, None if it could not be built
 
     """
-    job = None
-    error_msg = "Failed submitting identity enrichment request to Splunk for notable {}".format(notable_data[EVENT_ID])
     users = get_fields_query_part(
         notable_data=notable_data, prefix="identity", fields=["user", "src_user"], add_backslash=True
     )
 
     if users:
-        kwargs = {"count": num_enrichment_events, "exec_mode": "normal"}
         query = '| inputlookup identity_lookup_expanded where {}'.format(users)
         demisto.debug("Identity query for notable {}: {}".format(notable_data[EVENT_ID], query))
-        try:
-            job = service.jobs.create(query, **kwargs)
-        except Exception as e:
-            demisto.error("Caught an exception in drilldown_enrichment function: {}".format(str(e)))
-    else:
-        demisto.debug('No users were found in notable. {}'.format(error_msg))
+        return query
 
-    return job
+    demisto.debug('No users were found in notable. Failed submitting identity enrichment request to Splunk for '
+                  'notable {}'.format(notable_data[EVENT_ID]))
+    return None
 
 
-def asset_enrichment(service, notable_data, num_enrichment_events):
-    """ Performs an asset enrichment.
+def get_asset_query(notable_data):
+    """ Builds the search query of an asset enrichment.
 
     Args:
-        service (splunklib.client.Service): Splunk service object
         notable_data (dict): The notable data
-        num_enrichment_events (int): The maximal number of events to return per enrichment type.
 
-    Returns: The Splunk Job
+    Returns: The search query, None if it could not be built
 
     """
-    job = None
-    error_msg = "Failed submitting asset enrichment request to Splunk for notable {}".format(notable_data[EVENT_ID])
     assets = get_fields_query_part(
         notable_data=notable_data, prefix="asset", fields=["src", "dest", "src_ip", "dst_ip"]
     )
 
     if assets:
-        kwargs = {"count": num_enrichment_events, "exec_mode": "normal"}
         query = '| inputlookup append=T asset_lookup_by_str where {} | inputlookup append=t asset_lookup_by_cidr ' \
                 'where {} | rename _key as asset_id | stats values(*) as * by asset_id'.format(assets, assets)
         demisto.debug("Asset query for notable {}: {}".format(notable_data[EVENT_ID], query))
-        try:
-            job = service.jobs.create(query, **kwargs)
-        except Exception as e:
-            demisto.error("Caught an exception in asset_enrichment function: {}".format(str(e)))
-    else:
-        demisto.debug('No assets were found in notable. {}'.format(error_msg))
+        return query
 
-    return job
+    demisto.debug('No assets were found in notable. Failed submitting asset enrichment request to Splunk for '
+                  'notable {}'.format(notable_data[EVENT_ID]))
+    return None
 
 
-def handle_submitted_notables(service, incidents, cache_object):
-    """ Handles submitted notables. For each submitted notable, tries to retrieve its results, if results aren't ready,
-     it moves to the next submitted notable.
+ENRICHMENT_TYPE_TO_QUERY_BUILDER = {
+    DRILLDOWN_ENRICHMENT: get_drilldown_query,
+    ASSET_ENRICHMENT: get_asset_query,
+    IDENTITY_ENRICHMENT: get_identity_query
+}
 
-    Args:
-        service (splunklib.client.Service): Splunk service object.
-        incidents (list): The incident to be submitted at the end of the run.
-        cache_object (Cache): The enrichment mechanism cache object
 
-    """
-    handled_notables = []
-    enrichment_timeout = arg_to_number(str(demisto.params().get('enrichment_timeout', '5')))
-    notables = cache_object.submitted_notables
-    total = len(notables)
-    demisto.debug("Trying to handle {}/{} open enrichments".format(len(notables[:MAX_HANDLE_NOTABLES]), total))
+def map_concurrently(func, items):
+    """ Calls func on each of the items in a pool of up to ENRICHMENT_CONCURRENCY threads.
+    func must not call the demisto object, as calls to the server are not thread safe.
 
-    for notable in notables[:MAX_HANDLE_NOTABLES]:
-        task_status = handle_submitted_notable(service, notable, enrichment_timeout)
-        if task_status:
-            incidents.append(notable.to_incident())
-            handled_notables.append(notable)
+    Args:
+        func (function): The function to call.
+        items (list): The items to call the function on.
 
-    cache_object.submitted_notables = [n for n in notables if n not in handled_notables]
+    Returns:
+        list. A (result, exception) tuple per item, in the order of the items.
 
-    if handled_notables:
-        demisto.debug("Handled {}/{} notables.".format(len(handled_notables), total))
+    """
+    def call(item):
+        try:
+            return func(item), None
+        except Exception as e:
+            return None, e
+
+    if not items:
+        return []
+    pool = ThreadPool(min(ENRICHMENT_CONCURRENCY, len(items)))
+    try:
+        return pool.map(call, items)
+    finally:
+        pool.close()
 
 
-def handle_submitted_notable(service, notable, enrichment_timeout):
-    """ Handles submitted notable. If enrichment process timeout has reached, creates an incident.
+def get_enrichment_results(service, enrichment_id):
+    """ Gets the results of an enrichment job.
 
     Args:
         service (splunklib.client.Service): Splunk service object
-        notable (Notable): The notable
-        enrichment_timeout (int): The timeout for the enrichment process
+        enrichment_id (str): The enrichment's job id
 
     Returns:
-        notable_status (str): The status of the notable
+        list. The results of the job, None if the job is not ready yet.
 
     """
-    task_status = False
+    job = client.Job(service=service, sid=enrichment_id)
+    if not job.is_ready():
+        return None
+    _, items = read_results_batch(job.results(output_mode='json'))
+    return items
 
-    if not notable.is_enrichment_process_exceeding_timeout(enrichment_timeout):
-        demisto.debug("Trying to handle open enrichment {}".format(notable.id))
-        for enrichment in notable.enrichments:
-            if enrichment.status == Enrichment.IN_PROGRESS:
-                try:
-                    job = client.Job(service=service, sid=enrichment.id)
-                    if job.is_ready():
-                        demisto.debug('Handling open {} enrichment for notable {}'.format(enrichment.type, notable.id))
-                        for item in results.ResultsReader(job.results()):
-                            enrichment.data.append(item)
-                        enrichment.status = Enrichment.SUCCESSFUL
-                except Exception as e:
-                    demisto.error("Caught an exception while retrieving {} enrichment results for notable {}: "
-                                  "{}".format(enrichment.type, notable.id, str(e)))
-                    enrichment.status = Enrichment.FAILED
-
-        if notable.handled():
-            task_status = True
-            demisto.debug("Handled open enrichment for notable {}.".format(notable.id))
-        else:
-            demisto.debug("Did not finish handling open enrichment for notable {}".format(notable.id))
 
-    else:
-        task_status = True
-        demisto.debug("Open enrichment {} has exceeded the enrichment timeout of {}. Submitting the notable without "
-                      "the enrichment.".format(notable.id, enrichment_timeout))
+def handle_submitted_notables(service, incidents, cache_object):
+    """ Handles submitted notables. The open enrichments of all submitted notables are polled concurrently, and the
+     notables whose enrichments are all handled (or exceeded the enrichment timeout) are turned into incidents.
 
-    return task_status
+    Args:
+        service (splunklib.client.Service): Splunk service object.
+        incidents (list): The incident to be submitted at the end of the run.
+        cache_object (Cache): The enrichment mechanism cache object
+
+    """
+    enrichment_timeout = arg_to_number(str(demisto.params().get('enrichment_timeout', '5')))
+    notables = cache_object.submitted_notables
+    open_enrichments = []  # type: list
+
+    for notable in notables:
+        if notable.is_enrichment_process_exceeding_timeout(enrichment_timeout):
+            demisto.debug("Open enrichment {} has exceeded the enrichment timeout of {}. Submitting the notable "
+                          "without the enrichment.".format(notable.id, enrichment_timeout))
+        else:
+            open_enrichments += [(notable, enrichment) for enrichment in notable.enrichments
+                                 if enrichment.status == Enrichment.IN_PROGRESS]
+
+    if open_enrichments:
+        demisto.debug("Trying to handle {} open enrichments of {} notables".format(len(open_enrichments),
+                                                                                   len(notables)))
+    enrichments_results = map_concurrently(lambda notable_enrichment: get_enrichment_results(
+        service, notable_enrichment[1].id), open_enrichments)
+
+    for (notable, enrichment), (items, error) in zip(open_enrichments, enrichments_results):
+        if error:
+            demisto.error("Caught an exception while retrieving {} enrichment results for notable {}: "
+                          "{}".format(enrichment.type, notable.id, str(error)))
+            enrichment.status = Enrichment.FAILED
+        elif items is not None:
+            demisto.debug('Handled open {} enrichment for notable {}'.format(enrichment.type, notable.id))
+            enrichment.data.extend(items)
+            enrichment.status = Enrichment.SUCCESSFUL
+
+    handled_notables = [notable for notable in notables if notable.handled()]
+    incidents.extend(notable.to_incident() for notable in handled_notables)
+    cache_object.submitted_notables = [n for n in notables if n not in handled_notables]
+
+    if handled_notables:
+        demisto.debug("Handled {}/{} notables.".format(len(handled_notables), len(notables)))
 
 
 def submit_notables(service, incidents, cache_object):
-    """ Submits fetched notables to Splunk for an enrichment.
+    """ Submits fetched notables to Splunk for an enrichment. Three enrichments possible: Drilldown, Asset & Identity.
+     The notables are submitted up to MAX_HANDLE_NOTABLES submitted notables, their enrichment jobs are created
+     concurrently. If all enrichment type executions of a notable were unsuccessful, creates a regular incident,
+     otherwise the submitted notable is handled in the next fetches.
 
     Args:
         service (splunklib.client.Service): Splunk service object
@@ -814,13 +896,32 @@ def submit_notables(service, incidents, cache_object):
     failed_notables, submitted_notables = [], []
     num_enrichment_events = arg_to_number(str(demisto.params().get('num_enrichment_events', '20')))
     notables = cache_object.not_yet_submitted_notables
-    total = len(notables)
-    if notables:
-        demisto.debug('Enriching {}/{} fetched notables'.format(len(notables[:MAX_SUBMIT_NOTABLES]), total))
+    num_to_submit = max(min(MAX_SUBMIT_NOTABLES, MAX_HANDLE_NOTABLES - len(cache_object.submitted_notables)), 0)
+    if notables and num_to_submit:
+        demisto.debug('Enriching {}/{} fetched notables'.format(len(notables[:num_to_submit]), len(notables)))
+
+    enrichment_queries = []  # type: list
+    for notable in notables[:num_to_submit]:
+        submitted_types = [enrichment.type for enrichment in notable.enrichments]
+        for enrichment_type in (DRILLDOWN_ENRICHMENT, ASSET_ENRICHMENT, IDENTITY_ENRICHMENT):
+            if enrichment_type in ENABLED_ENRICHMENTS and enrichment_type not in submitted_types:
+                query = ENRICHMENT_TYPE_TO_QUERY_BUILDER[enrichment_type](notable.data)
+                if query:
+                    enrichment_queries.append((notable, enrichment_type, query))
+                else:
+                    notable.enrichments.append(Enrichment(enrichment_type, status=Enrichment.FAILED))
+
+    jobs = map_concurrently(lambda enrichment_query: service.jobs.create(
+        enrichment_query[2], count=num_enrichment_events, exec_mode="normal"), enrichment_queries)
+
+    for (notable, enrichment_type, _), (job, error) in zip(enrichment_queries, jobs):
+        if error:
+            demisto.error("Caught an exception while submitting {} enrichment for notable {}: {}".format(
+                enrichment_type, notable.id, str(error)))
+        notable.enrichments.append(Enrichment.from_job(enrichment_type, job))
 
-    for notable in notables[:MAX_SUBMIT_NOTABLES]:
-        task_status = submit_notable(service, notable, num_enrichment_events)
-        if task_status:
+    for notable in notables[:num_to_submit]:
+        if notable.submitted():
             cache_object.submitted_notables.append(notable)
             submitted_notables.append(notable)
             demisto.debug('Submitted enrichment request to Splunk for notable {}'.format(notable.id))
@@ -829,49 +930,22 @@ def submit_notables(service, incidents, cache_object):
             failed_notables.append(notable)
             demisto.debug('Created incident from notable {} as each enrichment submission failed'.format(notable.id))
 
-    cache_object.not_yet_submitted_notables = [n for n in notables if n not in submitted_notables + failed_notables]
+    cache_object.not_yet_submitted_notables = notables[num_to_submit:]
 
     if submitted_notables:
-        demisto.debug('Submitted {}/{} notables successfully.'.format(len(submitted_notables), total))
+        demisto.debug('Submitted {}/{} notables successfully.'.format(len(submitted_notables), len(notables)))
 
     if failed_notables:
         demisto.debug('The following {} notables failed the enrichment process: {}, creating incidents without '
                       'enrichment.'.format(len(failed_notables), [notable.id for notable in failed_notables]))
 
 
-def submit_notable(service, notable, num_enrichment_events):
-    """ Submits fetched notable to Splunk for an Enrichment. Three enrichments possible: Drilldown, Asset & Identity.
-     If all enrichment type executions were unsuccessful, creates a regular incident, Otherwise updates the
-     integration context for the next fetch to handle the submitted notable.
-
-    Args:
-        service (splunklib.client.Service): Splunk service object
-        notable (Notable): The notable.
-        num_enrichment_events (int): The maximal number of events to return per enrichment type.
-
-    Returns:
-        task_status (bool): True if any of the enrichment's succeeded to be submitted to Splunk, False otherwise
-
-    """
-    submitted_drilldown, submitted_asset, submitted_identity = notable.get_submitted_enrichments()
-
-    if DRILLDOWN_ENRICHMENT in ENABLED_ENRICHMENTS and not submitted_drilldown:
-        job = drilldown_enrichment(service, notable.data, num_enrichment_events)
-        notable.enrichments.append(Enrichment.from_job(DRILLDOWN_ENRICHMENT, job))
-    if ASSET_ENRICHMENT in ENABLED_ENRICHMENTS and not submitted_asset:
-        job = asset_enrichment(service, notable.data, num_enrichment_events)
-        notable.enrichments.append(Enrichment.from_job(ASSET_ENRICHMENT, job))
-    if IDENTITY_ENRICHMENT in ENABLED_ENRICHMENTS and not submitted_identity:
-        job = identity_enrichment(service, notable.data, num_enrichment_events)
-        notable.enrichments.append(Enrichment.from_job(IDENTITY_ENRICHMENT, job))
-
-    return notable.submitted()
-
-
 def run_enrichment_mechanism(service, integration_context):
     """ Execute the enriching fetch mechanism
-    1. We first handle submitted notables that have not been handled in the last fetch run
-    2. If we finished handling and submitting all fetched notables, we fetch new notables
+    1. We first handle submitted notables that have not been handled in the last fetch run, notables whose
+       enrichments are all done are released as incidents
+    2. If we finished submitting all fetched notables and there is room for more submitted notables, we fetch new
+       notables, so slow enrichments of submitted notables do not hold back the new ones
     3. After we finish to fetch new notables or if we have left notables that have not been submitted, we submit
        them for an enrichment to Splunk
     4. Finally and in case of an Exception, we store the current cache object state in the integration context
@@ -886,7 +960,7 @@ def run_enrichment_mechanism(service, integration_context):
 
     try:
         handle_submitted_notables(service, incidents, cache_object)
-        if cache_object.done_submitting() and cache_object.done_handling():
+        if cache_object.done_submitting() and cache_object.has_room_to_submit():
             fetch_notables(service=service, cache_object=cache_object, enrich_notables=True)
         submit_notables(service, incidents, cache_object)
 
@@ -1340,31 +1414,6 @@ def get_cim_mapping_field_command():
 
 # =========== Integration Functions & Classes ===========
 
-class ResponseReaderWrapper(io.RawIOBase):
-    """ This class was supplied as a solution for a bug in Splunk causing the search to run slowly.
-    """
-
-    def __init__(self, responseReader):
-        self.responseReader = responseReader
-
-    def readable(self):
-        return True
-
-    def close(self):
-        self.responseReader.close()
-
-    def read(self, n):
-        return self.responseReader.read(n)
-
-    def readinto(self, b):
-        sz = len(b)
-        data = self.responseReader.read(sz)
-        for idx, ch in enumerate(data):
-            b[idx] = ch
-
-        return len(data)
-
-
 def get_current_splunk_time(splunk_service):
     t = datetime.utcnow() - timedelta(days=3)
     time = t.strftime(SPLUNK_TIME_FORMAT)
@@ -1652,64 +1701,191 @@ def update_headers_from_field_names(search_result, chosen_fields):
 def get_current_results_batch(search_job, batch_size, results_offset):
     current_batch_kwargs = {
         "count": batch_size,
-        "offset": results_offset
+        "offset": results_offset,
+        "output_mode": "json"
     }
 
     results_batch = search_job.results(**current_batch_kwargs)
     return results_batch
 
 
+def iter_search_results_batches(search_job, num_of_results, results_limit, batch_size):
+    """Yields the result batches of a done search job in order. The batches are requested by their offsets, up to
+    SEARCH_RESULTS_CONCURRENCY batches at a time, so at most SEARCH_RESULTS_CONCURRENCY batches are held in memory.
+
+    Args:
+        search_job (splunklib.client.Job): The done search job.
+        num_of_results (int): The number of results of the search job.
+        results_limit (float): The max number of results to get.
+        batch_size (int): The number of results in a batch.
+
+    Returns:
+        generator. The JSON results batches responses.
+    """
+    offsets = range(0, int(min(num_of_results, results_limit)), batch_size)
+    if not offsets:
+        return
+    pool = ThreadPool(min(SEARCH_RESULTS_CONCURRENCY, len(offsets)))
+    try:
+        for i in range(0, len(offsets), SEARCH_RESULTS_CONCURRENCY):
+            batches = pool.map(lambda offset: get_current_results_batch(search_job, batch_size, offset),
+                               offsets[i:i + SEARCH_RESULTS_CONCURRENCY])
+            for batch in batches:
+                yield batch
+    finally:
+        pool.close()
+
+
+def read_results_batch(current_batch_of_results):
+    """Reads a JSON results batch response.
+
+    Args:
+        current_batch_of_results (splunklib.binding.ResponseReader): The JSON results batch response.
+
+    Returns:
+        (list, list). The messages and the results of the batch.
+    """
+    data = current_batch_of_results.read()
+    if not data.strip():
+        # a search without results has an empty response
+        return [], []
+    batch = json.loads(data)
+    return batch.get('messages') or [], batch.get('results') or []
+
+
 def parse_batch_of_results(current_batch_of_results, max_results_to_add, app):
     parsed_batch_results = []
     batch_dbot_scores = []
-    results_reader = results.ResultsReader(io.BufferedReader(ResponseReaderWrapper(current_batch_of_results)))
-    for item in results_reader:
-        if isinstance(item, results.Message):
-            if "Error in" in item.message:
-                raise ValueError(item.message)
-            parsed_batch_results.append(convert_to_str(item.message))
-
-        elif isinstance(item, dict):
-            if demisto.get(item, 'host'):
-                batch_dbot_scores.append({'Indicator': item['host'], 'Type': 'hostname',
-                                          'Vendor': 'Splunk', 'Score': 0, 'isTypedIndicator': True})
-            if app:
-                item['app'] = app
-            # Normal events are returned as dicts
-            parsed_batch_results.append(item)
-
+    messages, batch_results = read_results_batch(current_batch_of_results)
+    for message in messages:
+        text = message.get('text', '')
+        if "Error in" in text:
+            raise ValueError(text)
+        parsed_batch_results.append(convert_to_str(text))
+
+    for item in batch_results:
         if len(parsed_batch_results) >= max_results_to_add:
             break
+        if demisto.get(item, 'host'):
+            batch_dbot_scores.append({'Indicator': item['host'], 'Type': 'hostname',
+                                      'Vendor': 'Splunk', 'Score': 0, 'isTypedIndicator': True})
+        if app:
+            item['app'] = app
+        # Normal events are returned as dicts
+        parsed_batch_results.append(item)
+
     return parsed_batch_results, batch_dbot_scores
 
 
+def to_csv_value(value):
+    if isinstance(value, list):
+        # multivalue fields are separated by new lines, the same as in the Splunk CSV output
+        value = '\n'.join(value)
+    return value.encode('utf-8') if isinstance(value, unicode) else value  # noqa: F821
+
+
+def write_search_results_file(batches, results_limit, app, results_file_format, results_file):
+    """Writes the search results to a file, batch by batch.
+
+    Args:
+        batches (generator): The JSON results batches responses.
+        results_limit (float): The max number of results to write.
+        app (str): The application namespace of the search, added to the results.
+        results_file_format (str): The file format - ndjson (a JSON result per line) or csv.
+        results_file (file): The file to write to.
+
+    Returns:
+        int. The number of results written.
+    """
+    num_of_results = 0
+    # the CSV columns are known only after all the results are read, so the results are buffered as NDJSON
+    ndjson_file = tempfile.TemporaryFile() if results_file_format == 'csv' else results_file
+    fields = []  # type: List[str]
+    known_fields = set()  # type: Set[str]
+    try:
+        for current_batch_of_results in batches:
+            messages, batch_results = read_results_batch(current_batch_of_results)
+            for message in messages:
+                if "Error in" in message.get('text', ''):
+                    raise ValueError(message['text'])
+            for item in batch_results[:int(min(len(batch_results), results_limit - num_of_results))]:
+                if app:
+                    item['app'] = app
+                ndjson_file.write(json.dumps(item) + '\n')
+                for field in item:
+                    if field not in known_fields:
+                        known_fields.add(field)
+                        fields.append(field)
+                num_of_results += 1
+            if num_of_results >= results_limit:
+                break
+
+        if results_file_format == 'csv':
+            writer = csv.writer(results_file)
+            writer.writerow([to_csv_value(field) for field in fields])
+            ndjson_file.seek(0)
+            for line in ndjson_file:
+                item = json.loads(line)
+                writer.writerow([to_csv_value(item.get(field, '')) for field in fields])
+    finally:
+        if ndjson_file is not results_file:
+            ndjson_file.close()
+    return num_of_results
+
+
 def splunk_search_command(service):
     args = demisto.args()
 
     query = build_search_query(args)
     search_kwargs = build_search_kwargs(args)
     search_job = service.jobs.create(query, **search_kwargs)  # type: ignore
-    num_of_results_from_query = search_job["resultCount"]
+    num_of_results_from_query = int(search_job["resultCount"])
 
     results_limit = float(demisto.args().get("event_limit", 100))
     if results_limit == 0.0:
         # In Splunk, a result limit of 0 means no limit.
         results_limit = float("inf")
     batch_size = int(demisto.args().get("batch_limit", 25000))
+    app = search_kwargs.get('app', '')
+    results_file_format = args.get('results_file_format')
+    if results_file_format and results_file_format not in SEARCH_RESULTS_FILE_FORMATS:
+        raise ValueError('results_file_format must be one of: {}'.format(', '.join(SEARCH_RESULTS_FILE_FORMATS)))
+
+    # the search job is done (a blocking search), so its result batches can be requested concurrently
+    batches = iter_search_results_batches(search_job, num_of_results_from_query, results_limit, batch_size)
+
+    if results_file_format:
+        file_name = 'splunk_search_results_{}.{}'.format(search_job.sid, results_file_format)
+        file_id = demisto.uniqueFile()
+        with open(demisto.investigation()['id'] + '_' + file_id, 'wb') as results_file:
+            num_of_results = write_search_results_file(batches, results_limit, app, results_file_format, results_file)
+        demisto.results({
+            'Contents': '',
+            'ContentsFormat': formats['text'],
+            'Type': entryTypes['file'],
+            'File': file_name,
+            'FileID': file_id
+        })
+        demisto.results({
+            'Type': entryTypes['note'],
+            'Contents': {'sid': search_job.sid, 'results': num_of_results},
+            'ContentsFormat': formats['json'],
+            'HumanReadable': 'Splunk Search for query: {} returned {} results, written to {}'.format(
+                args['query'], num_of_results, file_name)
+        })
+        return
 
-    results_offset = 0
     total_parsed_results = []  # type: List[Dict[str,Any]]
     dbot_scores = []  # type: List[Dict[str,Any]]
 
-    while len(total_parsed_results) < int(num_of_results_from_query) and len(total_parsed_results) < results_limit:
-        current_batch_of_results = get_current_results_batch(search_job, batch_size, results_offset)
+    for current_batch_of_results in batches:
         max_results_to_add = results_limit - len(total_parsed_results)
         parsed_batch_results, batch_dbot_scores = parse_batch_of_results(current_batch_of_results, max_results_to_add,
-                                                                         search_kwargs.get('app', ''))
+                                                                         app)
         total_parsed_results.extend(parsed_batch_results)
         dbot_scores.extend(batch_dbot_scores)
-
-        results_offset += batch_size
+        if len(total_parsed_results) >= results_limit:
+            break
 
     entry_context = create_entry_context(args, total_parsed_results, dbot_scores)
     human_readable = build_search_human_readable(args, total_parsed_results)
@@ -708,6 +708,143 @@ def test_get_fields_query_part(notable_data, prefix, fields, query_part):
     assert splunk.get_fields_query_part(notable_data, prefix, fields) == query_part
 
 
+def test_cache_lines(mocker):
+    """
+    Scenario: The enrichment mechanism cache is stored as a line per notable, and only the notables which are handled
+     in the current run are deserialized.
+
+    Given:
+    - A cache with a submitted notable and more not yet submitted notables than MAX_SUBMIT_NOTABLES
+
+    When:
+    - The cache is dumped to the integration context and loaded back
+
+    Then:
+    - The submitted notable and the first MAX_SUBMIT_NOTABLES not yet submitted notables are deserialized
+    - The rest of the notables are kept in the backlog and dumped back as is
+    """
+    mocker.patch.object(splunk, 'MAX_SUBMIT_NOTABLES', 2)
+    mocker.patch('SplunkPy.set_integration_context')
+    splunk.ENABLED_ENRICHMENTS = [splunk.DRILLDOWN_ENRICHMENT]
+    submitted = splunk.Notable({splunk.EVENT_ID: 's', '_time': 'time'},
+                               enrichments=[splunk.Enrichment(splunk.DRILLDOWN_ENRICHMENT, enrichment_id='sid')])
+    cache_object = splunk.Cache(
+        not_yet_submitted_notables=[splunk.Notable({splunk.EVENT_ID: str(i), '_time': 'time'}) for i in range(4)],
+        submitted_notables=[submitted]
+    )
+    integration_context = {}
+    cache_object.dump_to_integration_context(integration_context)
+
+    loaded_cache = splunk.Cache.load_from_integration_context(integration_context)
+
+    assert [n.id for n in loaded_cache.submitted_notables] == ['s']
+    assert loaded_cache.submitted_notables[0].enrichments[0].id == 'sid'
+    assert loaded_cache.submitted_notables[0].submitted()
+    assert [n.id for n in loaded_cache.not_yet_submitted_notables] == ['0', '1']
+    assert len(loaded_cache.not_yet_submitted_backlog) == 2
+    assert loaded_cache.to_lines() == integration_context[splunk.CACHE]
+
+
+def test_cache_previous_format():
+    """
+    Given:
+    - An integration context with the cache in the JSON format of previous versions
+
+    When:
+    - The cache is loaded
+
+    Then:
+    - The notables are loaded
+    """
+    cache_object = splunk.Cache(not_yet_submitted_notables=[splunk.Notable({splunk.EVENT_ID: '1', '_time': 'time'})])
+    integration_context = {splunk.CACHE: json.dumps(cache_object, default=lambda obj: obj.__dict__)}
+
+    loaded_cache = splunk.Cache.load_from_integration_context(integration_context)
+
+    assert [n.id for n in loaded_cache.not_yet_submitted_notables] == ['1']
+    assert loaded_cache.done_handling()
+
+
+def test_submit_notables(mocker):
+    """
+    Scenario: Fetched notables are submitted for enrichments, up to MAX_HANDLE_NOTABLES submitted notables.
+
+    Given:
+    - Three not yet submitted notables with room for two more submitted notables
+    - The asset enrichment job creation fails for the second notable, the identity query cannot be built
+
+    When:
+    - submit_notables is called
+
+    Then:
+    - The two first notables are submitted, the third one is left for the next run
+    """
+    mocker.patch.object(splunk, 'MAX_HANDLE_NOTABLES', 3)
+    mocker.patch.object(demisto, 'error')
+    splunk.ENABLED_ENRICHMENTS = [splunk.ASSET_ENRICHMENT, splunk.IDENTITY_ENRICHMENT]
+
+    def create(query, **kwargs):
+        if '"bad"' in query:
+            raise Exception('error')
+        return {'sid': query}
+
+    service = mocker.Mock()
+    service.jobs.create.side_effect = create
+    notables = [splunk.Notable({splunk.EVENT_ID: str(i), 'dest': dest}) for i, dest in enumerate(['1', 'bad', '3'])]
+    cache_object = splunk.Cache(not_yet_submitted_notables=notables,
+                                submitted_notables=[splunk.Notable({splunk.EVENT_ID: 's'})])
+    incidents = []
+
+    splunk.submit_notables(service, incidents, cache_object)
+
+    assert [n.id for n in cache_object.submitted_notables] == ['s', '0']
+    assert [n.id for n in cache_object.not_yet_submitted_notables] == ['2']
+    assert len(incidents) == 1
+    enrichments = {e.type: e for e in notables[0].enrichments}
+    assert enrichments[splunk.ASSET_ENRICHMENT].status == splunk.Enrichment.IN_PROGRESS
+    assert 'asset="1"' in enrichments[splunk.ASSET_ENRICHMENT].id
+    assert enrichments[splunk.IDENTITY_ENRICHMENT].status == splunk.Enrichment.FAILED
+
+
+def test_handle_submitted_notables(mocker):
+    """
+    Scenario: The open enrichments of the submitted notables are polled, and handled notables become incidents.
+
+    Given:
+    - A notable with a done enrichment job and a notable with a running enrichment job
+
+    When:
+    - handle_submitted_notables is called
+
+    Then:
+    - An incident is created from the first notable with the enrichment results, the second notable stays submitted
+    """
+    import io
+
+    class Job:
+        def __init__(self, service, sid):
+            self.sid = sid
+
+        def is_ready(self):
+            return self.sid == 'done'
+
+        def results(self, output_mode):
+            return io.BytesIO(json.dumps({'results': [{'asset': 'a'}]}))
+
+    mocker.patch('splunklib.client.Job', Job)
+    splunk.ENABLED_ENRICHMENTS = [splunk.ASSET_ENRICHMENT]
+    notables = [splunk.Notable({splunk.EVENT_ID: sid}, enrichments=[
+        splunk.Enrichment(splunk.ASSET_ENRICHMENT, enrichment_id=sid)]) for sid in ('done', 'running')]
+    cache_object = splunk.Cache(submitted_notables=notables)
+    incidents = []
+
+    splunk.handle_submitted_notables(None, incidents, cache_object)
+
+    assert len(incidents) == 1
+    assert json.loads(incidents[0]['rawJSON'])[splunk.ASSET_ENRICHMENT] == [{'asset': 'a'}]
+    assert [n.id for n in cache_object.submitted_notables] == ['running']
+
+
 """ ========== Mirroring Mechanism Tests ========== """
 
 
@@ -1070,3 +1207,126 @@ def test_build_search_human_readable(mocker):
     splunk.build_search_human_readable(args, results)
     headers = func_patch.call_args[0][1]
     assert headers == expected_headers
+
+
+class SearchJob:
+    sid = '123.45'
+
+    def __init__(self, results):
+        self._results = results
+        self.offsets = []
+
+    def __getitem__(self, key):
+        return str(len(self._results))
+
+    def results(self, count, offset, output_mode):
+        import io
+        assert output_mode == 'json'
+        self.offsets.append(offset)
+        batch = {'messages': [{'type': 'INFO', 'text': 'message'}] if offset == 0 else [],
+                 'results': self._results[offset:offset + count]}
+        return io.BytesIO(json.dumps(batch))
+
+
+def test_iter_search_results_batches(mocker):
+    """
+    Given:
+        a done search job with 10 results
+
+    When:
+        iterating over its results batches of 3 results with a limit of 8 results and a concurrency of 2
+
+    Then:
+        the batches which have results to the limit are requested, and yielded by the order of their offsets
+    """
+    mocker.patch.object(splunk, 'SEARCH_RESULTS_CONCURRENCY', 2)
+    search_job = SearchJob([{'id': str(i)} for i in range(10)])
+
+    batches = list(splunk.iter_search_results_batches(search_job, 10, 8, 3))
+
+    assert sorted(search_job.offsets) == [0, 3, 6]
+    assert [[item['id'] for item in splunk.read_results_batch(batch)[1]] for batch in batches] == \
+        [['0', '1', '2'], ['3', '4', '5'], ['6', '7', '8']]
+
+
+def test_parse_batch_of_results():
+    """
+    Given:
+        a JSON results batch with a message and results with a host
+
+    When:
+        parsing the batch with a limit of 2 results
+
+    Then:
+        the message and the first result are returned, with the app and the host DBot score
+    """
+    import io
+    batch = io.BytesIO(json.dumps({'messages': [{'type': 'INFO', 'text': 'message'}],
+                                   'results': [{'host': 'host1'}, {'host': 'host2'}]}))
+
+    parsed_results, dbot_scores = splunk.parse_batch_of_results(batch, 2, 'search')
+
+    assert parsed_results == ['message', {'host': 'host1', 'app': 'search'}]
+    assert [score['Indicator'] for score in dbot_scores] == ['host1']
+
+    with pytest.raises(ValueError, match='Error in search'):
+        splunk.parse_batch_of_results(io.BytesIO(json.dumps({'messages': [{'text': 'Error in search'}]})), 2, '')
+    assert splunk.parse_batch_of_results(io.BytesIO(''), 2, '') == ([], [])
+
+
+@pytest.mark.parametrize('results_file_format, expected', [
+    ('ndjson', '{"a": "1"}\n{"a": "2", "b": ["x", "y"]}\n'),
+    ('csv', 'a,b\r\n1,\r\n2,"x\ny"\r\n'),
+])
+def test_splunk_search_command_results_file(mocker, results_file_format, expected):
+    """
+    Given:
+        a search with 3 results and an event limit of 2
+
+    When:
+        running splunk-search with results_file_format
+
+    Then:
+        the results are written to a file entry rather than returned to the context
+    """
+    mocker.patch.object(demisto, 'args', return_value={'query': 'index=main', 'event_limit': '2', 'batch_limit': '1',
+                                                       'results_file_format': results_file_format})
+    mocker.patch.object(demisto, 'uniqueFile', return_value='results_file')
+    mocker.patch.object(demisto, 'investigation', return_value={'id': 'test'})
+    results = mocker.patch.object(demisto, 'results')
+    search_job = SearchJob([{'a': '1'}, {'a': '2', 'b': ['x', 'y']}, {'a': '3'}])
+    service = mocker.Mock()
+    service.jobs.create.return_value = search_job
+
+    try:
+        splunk.splunk_search_command(service)
+        with open('test_results_file', 'rb') as f:
+            assert f.read() == expected
+    finally:
+        os.remove('test_results_file')
+
+    file_entry, summary_entry = [call[0][0] for call in results.call_args_list]
+    assert file_entry['File'] == 'splunk_search_results_123.45.{}'.format(results_file_format)
+    assert file_entry['FileID'] == 'results_file'
+    assert summary_entry['Contents'] == {'sid': '123.45', 'results': 2}
+
+
+def test_splunk_search_command(mocker):
+    """
+    Given:
+        a search with 5 results and an event limit of 4
+
+    When:
+        running splunk-search with batches of 2 results
+
+    Then:
+        the message and the first 3 results are returned to the context, by their order
+    """
+    mocker.patch.object(demisto, 'args', return_value={'query': 'index=main', 'event_limit': '4', 'batch_limit': '2'})
+    results = mocker.patch.object(demisto, 'results')
+    service = mocker.Mock()
+    service.jobs.create.return_value = SearchJob([{'a': str(i)} for i in range(5)])
+
+    splunk.splunk_search_command(service)
+
+    assert results.call_args[0][0]['EntryContext']['Splunk.Result'] == ['message', {'a': '0'}, {'a': '1'}, {'a': '2'}]
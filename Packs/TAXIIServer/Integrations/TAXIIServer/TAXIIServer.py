@@ -5,7 +5,7 @@ from gevent.pywsgi import WSGIServer
 from urllib.parse import urlparse, ParseResult
 from tempfile import NamedTemporaryFile
 from base64 import b64decode
-from typing import Callable, List, Generator
+from typing import Callable, List, Generator, Iterator
 from ssl import SSLContext, SSLError, PROTOCOL_TLSv1_2
 from multiprocessing import Process
 from werkzeug.datastructures import Headers
@@ -36,6 +36,8 @@ from cybox.core import Observable
 from requests.utils import requote_uri
 
 import functools
+import hashlib
+import sqlite3
 import stix.core
 import stix.indicator
 import stix.extensions.marking.ais
@@ -59,6 +61,7 @@ PAGE_SIZE = 200
 APP: Flask = Flask('demisto-taxii')
 NAMESPACE_URI = 'https://www.paloaltonetworks.com/cortex'
 NAMESPACE = 'cortex'
+STIX_CACHE_PATH_FORMAT = 'taxii_stix_cache_{}.sqlite'
 
 
 ''' Log Handler '''
@@ -262,18 +265,14 @@ class TAXIIServer:
             # yield the content blocks
             indicator_query = self.collections[str(collection_name)]
 
-            for indicator in find_indicators_by_time_frame(indicator_query, exclusive_begin_time, inclusive_end_time):
-                try:
-                    stix_xml_indicator = get_stix_indicator(indicator).to_xml(ns_dict={NAMESPACE_URI: NAMESPACE})
-                    content_block = ContentBlock(
-                        content_binding=CB_STIX_XML_11,
-                        content=stix_xml_indicator
-                    )
-
-                    content_xml = content_block.to_xml().decode('utf-8')
-                    yield f'{content_xml}\n'
-                except Exception as e:
-                    handle_long_running_error(f'Failed parsing indicator to STIX: {e}')
+            with STIXCache(str(collection_name), indicator_query) as stix_cache:
+                for indicator in find_indicators_by_time_frame(indicator_query, exclusive_begin_time,
+                                                               inclusive_end_time):
+                    try:
+                        content_xml = stix_cache.get_content_block(indicator)
+                        yield f'{content_xml}\n'
+                    except Exception as e:
+                        handle_long_running_error(f'Failed parsing indicator to STIX: {e}')
 
             # yield the closing tag
 
@@ -311,6 +310,81 @@ class TAXIIServer:
         return f'{self.url_scheme}://{self.host}{endpoint}'
 
 
+class STIXCache:
+    """
+    On-disk cache of the STIX content blocks of a collection, keyed by the indicator value and modification time.
+    Indicators which were not modified since they were cached are not converted to STIX again.
+    """
+
+    def __init__(self, collection_name: str, indicator_query: str):
+        """
+        Args:
+            collection_name: The collection name.
+            indicator_query: The indicator query of the collection, a changed query uses a new cache.
+        """
+        self.path = STIX_CACHE_PATH_FORMAT.format(get_stix_cache_key(collection_name, indicator_query))
+        self._connection: Optional[sqlite3.Connection] = None
+        self._uncommitted = 0
+
+    def __enter__(self) -> 'STIXCache':
+        try:
+            # concurrent polls of the collection read the cache while one of them writes to it, a poll which can't
+            # write to the cache right away streams without caching rather than blocking the server
+            self._connection = sqlite3.connect(self.path, timeout=0)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS content_blocks '
+                                     '(value TEXT PRIMARY KEY, modified TEXT NOT NULL, content TEXT NOT NULL)')
+        except sqlite3.Error as e:
+            demisto.error(f'Failed opening the STIX cache {self.path}, converting all indicators to STIX: {e}')
+            self._connection = None
+        return self
+
+    def __exit__(self, *_):
+        if self._connection:
+            try:
+                self._connection.commit()
+            except sqlite3.Error as e:
+                demisto.error(f'Failed saving the STIX cache {self.path}: {e}')
+            finally:
+                self._connection.close()
+                self._connection = None
+
+    def get_content_block(self, indicator: dict) -> str:
+        """
+        Gets the content block XML of an indicator, from the cache if the indicator was not modified since cached.
+        Args:
+            indicator: The Demisto indicator.
+
+        Returns:
+            The content block XML string.
+        """
+        value = indicator.get('value', '')
+        modified = indicator.get('modified', '')
+        if not (self._connection and value and modified):
+            return get_stix_content_block(indicator)
+
+        try:
+            row = self._connection.execute('SELECT content FROM content_blocks WHERE value = ? AND modified = ?',
+                                           (value, modified)).fetchone()
+        except sqlite3.Error as e:
+            demisto.debug(f'Failed reading the STIX content block of {value} from the cache: {e}')
+            row = None
+        if row:
+            return row[0]
+
+        content_xml = get_stix_content_block(indicator)
+        try:
+            self._connection.execute('INSERT OR REPLACE INTO content_blocks (value, modified, content) '
+                                     'VALUES (?, ?, ?)', (value, modified, content_xml))
+            self._uncommitted += 1
+            if self._uncommitted >= PAGE_SIZE:
+                self._connection.commit()
+                self._uncommitted = 0
+        except sqlite3.Error as e:
+            demisto.debug(f'Failed caching the STIX content block of {value}: {e}')
+        return content_xml
+
+
 SERVER: TAXIIServer
 DEMISTO_LOGGER: Handler = Handler()
 
@@ -611,6 +685,23 @@ def get_stix_indicator(indicator: dict) -> stix.core.STIXPackage:
     return stix_package
 
 
+def get_stix_content_block(indicator: dict) -> str:
+    """
+    Convert a Demisto indicator to a STIX content block.
+    Args:
+        indicator: The Demisto indicator.
+
+    Returns:
+        The content block as XML string.
+    """
+    stix_xml_indicator = get_stix_indicator(indicator).to_xml(ns_dict={NAMESPACE_URI: NAMESPACE})
+    content_block = ContentBlock(
+        content_binding=CB_STIX_XML_11,
+        content=stix_xml_indicator
+    )
+    return content_block.to_xml().decode('utf-8')
+
+
 ''' HELPER FUNCTIONS '''
 
 
@@ -722,7 +813,31 @@ def get_collections(params: dict = demisto.params()) -> dict:
     return collections
 
 
-def find_indicators_by_time_frame(indicator_query: str, begin_time: datetime, end_time: datetime) -> list:
+def get_stix_cache_key(collection_name: str, indicator_query: str) -> str:
+    """
+    Gets the key of the STIX cache of a collection.
+    """
+    return hashlib.sha1(f'{collection_name}\n{indicator_query}'.encode('utf-8')).hexdigest()
+
+
+def remove_stale_stix_caches(collections: dict):
+    """
+    Removes the STIX caches of removed collections and of changed collection queries.
+    Args:
+        collections: The indicator query collections.
+    """
+    cache_paths = {STIX_CACHE_PATH_FORMAT.format(get_stix_cache_key(name, query))
+                   for name, query in collections.items()}
+    prefix, suffix = STIX_CACHE_PATH_FORMAT.split('{}')
+    for path in os.listdir('.'):
+        if path.startswith(prefix) and path.endswith(suffix) and path not in cache_paths:
+            try:
+                os.remove(path)
+            except OSError as e:
+                demisto.debug(f'Failed removing the STIX cache {path}: {e}')
+
+
+def find_indicators_by_time_frame(indicator_query: str, begin_time: datetime, end_time: datetime) -> Iterator[dict]:
     """
     Find indicators according to a query and begin time/end time.
     Args:
@@ -752,26 +867,23 @@ def find_indicators_by_time_frame(indicator_query: str, begin_time: datetime, en
     return find_indicators_loop(indicator_query)
 
 
-def find_indicators_loop(indicator_query: str):
+def find_indicators_loop(indicator_query: str) -> Iterator[dict]:
     """
-    Find indicators in a loop according to a query.
+    Find indicators in a loop according to a query, fetching the next page only after the current one is consumed.
     Args:
         indicator_query: The indicator query.
 
     Returns:
         Indicator query results from Demisto.
     """
-    iocs: List[dict] = []
-    total_fetched = 0
     last_found_len = PAGE_SIZE
     search_indicators = IndicatorsSearcher()
 
     while last_found_len == PAGE_SIZE:
-        fetched_iocs = search_indicators.search_indicators_by_version(query=indicator_query, size=PAGE_SIZE).get('iocs')
-        iocs.extend(fetched_iocs)
+        fetched_iocs = search_indicators.search_indicators_by_version(query=indicator_query,
+                                                                      size=PAGE_SIZE).get('iocs') or []
+        yield from fetched_iocs
         last_found_len = len(fetched_iocs)
-        total_fetched += last_found_len
-    return iocs
 
 
 def taxii_make_response(taxii_message: TAXIIMessage):
@@ -897,6 +1009,7 @@ def run_server(taxii_server: TAXIIServer, is_test=False):
             time.sleep(5)
             server_process.terminate()
         else:
+            remove_stale_stix_caches(taxii_server.collections)
             demisto.updateModuleHealth('')
             wsgi_server.serve_forever()
     except SSLError as e:
@@ -398,7 +398,7 @@ def test_find_indicators_loop(mocker):
     mocker.patch.object(demisto, 'searchIndicators', return_value=json.loads(IP_INDICATORS))
 
     # Arrange
-    indicators = find_indicators_loop('q')
+    indicators = list(find_indicators_loop('q'))
 
     # Assert
     assert len(indicators) == 1
@@ -451,3 +451,70 @@ def test_get_url(mocker, request_headers, url_scheme, expected):
     if request_headers:
         mocker.patch('TAXIIServer.get_calling_context', return_value={'IntegrationInstance': 'eyy'})
     assert taxii_server.get_url(request_headers) == expected
+
+
+def test_stix_cache(mocker, tmp_path):
+    """
+    Given:
+        - An IP indicator
+    When:
+        - Getting the content block of the indicator through the STIX cache, before and after it's modified
+    Then:
+        - Ensure the indicator is converted to STIX only when it's not cached or it was modified since cached
+        - Ensure the cache persists between polls
+    """
+    import TAXIIServer
+    mocker.patch.object(TAXIIServer, 'STIX_CACHE_PATH_FORMAT', str(tmp_path / 'cache_{}.sqlite'))
+    get_stix_content_block = mocker.patch.object(TAXIIServer, 'get_stix_content_block',
+                                                 side_effect=lambda ioc: f'<block>{ioc["modified"]}</block>')
+    indicator = json.loads(IP_INDICATORS)['iocs'][0]
+
+    with TAXIIServer.STIXCache('feed', 'type:IP') as stix_cache:
+        assert stix_cache.get_content_block(indicator) == '<block>2020-02-13T18:45:38.997926+02:00</block>'
+    with TAXIIServer.STIXCache('feed', 'type:IP') as stix_cache:
+        assert stix_cache.get_content_block(indicator) == '<block>2020-02-13T18:45:38.997926+02:00</block>'
+    assert get_stix_content_block.call_count == 1
+
+    indicator['modified'] = '2020-02-14T18:45:38.997926+02:00'
+    with TAXIIServer.STIXCache('feed', 'type:IP') as stix_cache:
+        assert stix_cache.get_content_block(indicator) == '<block>2020-02-14T18:45:38.997926+02:00</block>'
+    assert get_stix_content_block.call_count == 2
+
+    TAXIIServer.remove_stale_stix_caches({'feed': 'type:IP'})
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_stream_stix_data_feed(mocker, tmp_path):
+    """
+    Given:
+        - A collection of indicators
+    When:
+        - Streaming a poll response twice
+    Then:
+        - Ensure the indicators are fetched page by page and each one is converted to STIX only once
+        - Ensure both responses contain the same content blocks
+    """
+    import TAXIIServer
+    mocker.patch.object(TAXIIServer, 'STIX_CACHE_PATH_FORMAT', str(tmp_path / 'cache_{}.sqlite'))
+    mocker.patch.object(TAXIIServer, 'PAGE_SIZE', 2)
+    indicator = json.loads(IP_INDICATORS)['iocs'][0]
+    pages = [{'iocs': [dict(indicator, value=f'1.1.1.{i}'), dict(indicator, value=f'1.1.2.{i}')]} for i in range(2)]
+    mocker.patch.object(demisto, 'searchIndicators', side_effect=pages + [{'iocs': []}] + pages + [{'iocs': []}])
+    mocker.patch.object(demisto, 'info')
+    get_stix_indicator = mocker.patch.object(TAXIIServer, 'get_stix_indicator',
+                                             wraps=TAXIIServer.get_stix_indicator)
+    taxii_server = TAXIIServer.TAXIIServer(
+        url_scheme='http', host='host', port=9000, collections={'feed': 'type:IP'},
+        certificate='', private_key='', http_server=False, credentials={}
+    )
+
+    responses = []
+    for _ in range(2):
+        with TAXIIServer.APP.test_request_context():
+            response = taxii_server.stream_stix_data_feed(['feed'], '1', 'feed', None, None)
+            responses.append(list(response.response))
+
+    assert get_stix_indicator.call_count == 4
+    assert responses[0][1:-1] == responses[1][1:-1]
+    assert len(responses[0]) == 6
+    assert '1.1.2.1' in responses[1][4]
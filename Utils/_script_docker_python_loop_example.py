@@ -16,7 +16,9 @@ import os
 import threading
 import sys
 import json
+import hashlib
 import traceback
+from collections import OrderedDict
 
 if sys.version_info[0] < 3:
     import Queue as queue
@@ -26,6 +28,14 @@ else:
 __read_thread = None
 __input_queue = None
 
+# compiled scripts by content hash - a script executed again (e.g. a transformer in a playbook loop) is not re-compiled
+CODE_CACHE_SIZE = 64
+_code_cache = OrderedDict()
+
+# heavy third-party modules imported by CommonServerPython, imported in the background while waiting for the first
+# script so that its first execution does not pay for them (they stay in sys.modules for the next executions)
+PREWARM_MODULES = ['requests', 'urllib3', 'dateparser', 'concurrent.futures', 'xml.etree.cElementTree', 'typing']
+
 win = sys.platform.startswith('win')
 if win:
     __input_queue = queue.Queue()
@@ -60,6 +70,142 @@ def __readWhileAvailable():
         return buff
 
 
+def get_json_codec():
+    try:
+        import orjson
+
+        def dumps(message):
+            try:
+                return orjson.dumps(message)
+            except TypeError:
+                # e.g. non string keys
+                return json.dumps(message).encode('utf-8')
+
+        return dumps, orjson.loads
+    except ImportError:
+        return (lambda message: json.dumps(message).encode('utf-8')), json.loads
+
+
+def get_msgpack_codec():
+    import msgpack
+    return (lambda message: msgpack.packb(message, use_bin_type=True)), (lambda data: msgpack.unpackb(data, raw=False))
+
+
+RPC_CODECS = {'json': get_json_codec, 'msgpack': get_msgpack_codec}
+__rpc_capabilities = None
+
+
+def get_rpc_capabilities():
+    """
+    Server channel options supported by this process, sent to the server in the pong. The server enables the options
+    of its choice in the 'rpc' key of the context of the next script.
+    """
+    global __rpc_capabilities
+    if __rpc_capabilities is None:
+        encodings = ['json']
+        try:
+            get_msgpack_codec()
+            encodings.append('msgpack')
+        except ImportError:
+            pass
+        framings = ['line']
+        if not win and hasattr(sys.stdin, 'buffer'):
+            framings.append('length')
+        __rpc_capabilities = {'pipelining': True, 'framing': framings, 'encoding': encodings}
+    return __rpc_capabilities
+
+
+class RpcChannel(object):
+    """
+    Server calls tagged with a request id, so that calls made by several threads can be in flight at once. Requests are
+    written under a lock, and one of the waiting calls reads the replies (without the lock) and routes each of them to
+    its call by the id, so a single threaded script does not pay for a reader thread.
+    With the 'length' framing each message is a '#<length>' line followed by the encoded message, so that large
+    payloads can use a binary encoding, the other messages of the server stay json lines.
+    """
+
+    def __init__(self, framing='line', encoding='json'):
+        self.framing = framing
+        self.dumps, self.loads = RPC_CODECS[encoding]()
+        self.condition = threading.Condition()
+        self.last_request_id = 0
+        self.pending = set()
+        self.replies = {}
+        self.reading = False
+
+    def send(self, message):
+        with self.condition:
+            self.write(message)
+
+    def call(self, cmd):
+        with self.condition:
+            self.last_request_id += 1
+            request_id = self.last_request_id
+            message = dict(cmd)
+            message['requestId'] = request_id
+            self.pending.add(request_id)
+            self.write(message)
+            while request_id not in self.replies:
+                if self.reading:
+                    self.condition.wait()
+                else:
+                    self.read_reply()
+            self.pending.discard(request_id)
+            reply = self.replies.pop(request_id)
+        if 'error' in reply:
+            raise ValueError(reply['error'])
+        return reply.get('response')
+
+    def read_reply(self):
+        # called with the lock held, released while blocking on the read
+        self.reading = True
+        self.condition.release()
+        try:
+            reply = self.read()
+        except Exception as e:
+            reply = e
+        finally:
+            self.condition.acquire()
+            self.reading = False
+        if isinstance(reply, Exception):
+            for request_id in self.pending:
+                self.replies[request_id] = {'error': str(reply)}
+        elif reply.get('requestId') in self.pending:
+            self.replies[reply['requestId']] = reply
+        self.condition.notify_all()
+
+    def write(self, message):
+        if self.framing == 'length':
+            payload = self.dumps(message)
+            sys.stdout.flush()
+            sys.stdout.buffer.write(('#%d\n' % len(payload)).encode('ascii') + payload)
+            sys.stdout.buffer.flush()
+        else:
+            sys.stdout.write(self.dumps(message).decode('utf-8') + '\n')
+            sys.stdout.flush()
+
+    def read(self):
+        if self.framing == 'length':
+            data = sys.stdin.buffer.readline()
+            if data.startswith(b'#'):
+                return self.loads(sys.stdin.buffer.read(int(data[1:])))
+            data = data.decode('utf-8')
+        else:
+            data = globals()['__readWhileAvailable']()
+        if not data:
+            raise EOFError('server channel closed')
+        if data.find('$$##') > -1:
+            raise ValueError(data[4:])
+        return json.loads(data)
+
+
+def create_rpc_channel(context):
+    rpc = context.get('rpc') or {}
+    if not rpc.get('pipelining'):
+        return None
+    return RpcChannel(rpc.get('framing', 'line'), rpc.get('encoding', 'json'))
+
+
 """Demisto instance for scripts only"""
 
 template_code = '''
@@ -79,9 +225,7 @@ class Demisto:
             os.environ['DEMISTO_MACHINE_LEARNING_MAGIC_KEY'] = args['demisto_machine_learning_magic_key']
 
     def log(self, msg):
-        json.dump({'type': 'entryLog', 'args': {'message': msg}}, sys.stdout)
-        sys.stdout.write('\\n')
-        sys.stdout.flush()
+        self.__send({'type': 'entryLog', 'args': {'message': msg}})
 
     def investigation(self):
         return self.callingContext[u'context'][u'Inv']
@@ -162,8 +306,24 @@ class Demisto:
     def dt(self, data, q):
         return self.__do({'type': 'dt', 'name': q, 'value': data})['result']
 
+    def supportsConcurrentCalls(self):
+        return globals()['__rpcChannel'] is not None
+
+    def __send(self, message):
+        channel = globals()['__rpcChannel']
+        if channel:
+            channel.send(message)
+        else:
+            json.dump(message, sys.stdout)
+            sys.stdout.write('\\n')
+            sys.stdout.flush()
+
     def __do(self, cmd):
         # Watch out there is another defintion like this
+        channel = globals()['__rpcChannel']
+        if channel:
+            return channel.call(cmd)
+
         # prepare command to send to server
         json.dump(cmd, sys.stdout)
         sys.stdout.write('\\n')
@@ -203,9 +363,7 @@ class Demisto:
         else:
             res.append(converted)
 
-        json.dump({'type': 'result', 'results': res}, sys.stdout)
-        sys.stdout.write('\\n')
-        sys.stdout.flush()
+        self.__send({'type': 'result', 'results': res})
 
 demisto = Demisto(context)
 
@@ -248,9 +406,7 @@ class Demisto:
             os.environ['DEMISTO_MACHINE_LEARNING_MAGIC_KEY'] = args['demisto_machine_learning_magic_key']
 
     def log(self, msg):
-        json.dump({'type': 'entryLog', 'args': {'message': 'Integration log: ' + msg}}, sys.stdout)
-        sys.stdout.write('\\n')
-        sys.stdout.flush()
+        self.__send({'type': 'entryLog', 'args': {'message': 'Integration log: ' + msg}})
 
     def investigation(self):
         return self.callingContext[u'context'][u'Inv']
@@ -337,8 +493,23 @@ class Demisto:
     def dt(self, data, q):
         return self.__do({'type': 'dt', 'name': q, 'value': data})['result']
 
+    def supportsConcurrentCalls(self):
+        return globals()['__rpcChannel'] is not None
+
+    def __send(self, message):
+        channel = globals()['__rpcChannel']
+        if channel:
+            channel.send(message)
+        else:
+            json.dump(message, sys.stdout)
+            sys.stdout.write('\\n')
+            sys.stdout.flush()
+
     def __do(self, cmd):
         # Watch out there is another defintion like this
+        channel = globals()['__rpcChannel']
+        if channel:
+            return channel.call(cmd)
         json.dump(cmd, sys.stdout)
         sys.stdout.write('\\n')
         sys.stdout.flush()
@@ -370,9 +541,7 @@ class Demisto:
             res = converted
         else:
             res.append(converted)
-        json.dump({'type': 'result', 'results': res}, sys.stdout)
-        sys.stdout.write('\\n')
-        sys.stdout.flush()
+        self.__send({'type': 'result', 'results': res})
 
     def incidents(self, incidents):
         self.results({'Type': 1, 'Contents': json.dumps(incidents), 'ContentsFormat': 'json'})
@@ -402,6 +571,29 @@ print = demisto_print
 ###CODE_HERE###
 '''
 
+def get_compiled_code(code_string, is_integ_script):
+    key = hashlib.sha256(code_string.encode('utf-8')).hexdigest() + ('i' if is_integ_script else 's')
+    code = _code_cache.pop(key, None)
+    if code is None:
+        if is_integ_script:
+            complete_code = integ_template_code.replace('###CODE_HERE###', code_string)
+        else:
+            complete_code = template_code.replace('###CODE_HERE###', code_string)
+        code = compile(complete_code, '<string>', 'exec')
+    _code_cache[key] = code
+    while len(_code_cache) > CODE_CACHE_SIZE:
+        _code_cache.popitem(last=False)
+    return code
+
+
+def prewarm_modules():
+    for module in PREWARM_MODULES:
+        try:
+            __import__(module)
+        except Exception:
+            pass
+
+
 # rollback file system to its previous state
 # delete home dir and tmp dir
 
@@ -425,7 +617,7 @@ def send_script_exception(exc_type, exc_value, exc_traceback):
 
 
 def send_pong():
-    json.dump({'type': 'pong'}, sys.stdout)
+    json.dump({'type': 'pong', 'rpc': get_rpc_capabilities()}, sys.stdout)
     sys.stdout.write('\n')
     sys.stdout.flush()
 
@@ -452,52 +644,56 @@ def rollback_system():
         os.environ[key] = backup_env_vars[key]
 
 
-while True:
-    contextString = do_ping_pong()
-    if contextString == '':
-        # finish executing python
-        break
+def main():
+    prewarm_thread = threading.Thread(target=prewarm_modules)
+    prewarm_thread.daemon = True
+    prewarm_thread.start()
 
-    contextJSON = json.loads(contextString)
+    while True:
+        contextString = do_ping_pong()
+        if contextString == '':
+            # finish executing python
+            break
 
-    code_string = contextJSON['script']
-    contextJSON.pop('script', None)
+        contextJSON = json.loads(contextString)
 
-    is_integ_script = contextJSON['integration']
-    complete_code = ''
-    if is_integ_script:
-        complete_code = integ_template_code.replace('###CODE_HERE###', code_string)
-    else:
-        complete_code = template_code.replace('###CODE_HERE###', code_string)
+        code_string = contextJSON['script']
+        contextJSON.pop('script', None)
 
-    try:
-        code = compile(complete_code, '<string>', 'exec')
+        is_integ_script = contextJSON['integration']
+
+        try:
+            code = get_compiled_code(code_string, is_integ_script)
 
-        sub_globals = {
-            '__readWhileAvailable': __readWhileAvailable,
-            'context': contextJSON,
-            'win': win
-        }
+            sub_globals = {
+                '__readWhileAvailable': __readWhileAvailable,
+                '__rpcChannel': create_rpc_channel(contextJSON),
+                'context': contextJSON,
+                'win': win
+            }
 
-        exec(code, sub_globals, sub_globals)  # guardrails-disable-line
+            exec(code, sub_globals, sub_globals)  # guardrails-disable-line
 
-    except Exception:
-        exc_type, exc_value, exc_traceback = sys.exc_info()
-        send_script_exception(exc_type, exc_value, exc_traceback)
-    except SystemExit:
-        # print 'Will not stop on sys.exit(0)'
-        pass
+        except Exception:
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            send_script_exception(exc_type, exc_value, exc_traceback)
+        except SystemExit:
+            # print 'Will not stop on sys.exit(0)'
+            pass
 
-    rollback_system()
+        rollback_system()
 
-    # ping back to Demisto server that script is completed
-    send_script_completed()
+        # ping back to Demisto server that script is completed
+        send_script_completed()
+
+        # if the script running on native python then terminate the process after finished the script
+        is_python_native = contextJSON['native']
+        if is_python_native:
+            break
 
-    # if the script running on native python then terminate the process after finished the script
-    is_python_native = contextJSON['native']
-    if is_python_native:
-        break
+    if __read_thread:
+        __read_thread.join(timeout=1)
 
 
-if __read_thread:
-    __read_thread.join(timeout=1)
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from Utils import _script_docker_python_loop_example as loop
+
+LOOP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         '_script_docker_python_loop_example.py')
+
+
+def test_get_compiled_code_cache(mocker):
+    mocker.patch.object(loop, 'CODE_CACHE_SIZE', 2)
+    mocker.patch.object(loop, '_code_cache', loop.OrderedDict())
+    script_code = loop.get_compiled_code('demisto.results(1)', False)
+    assert loop.get_compiled_code('demisto.results(1)', False) is script_code
+    integration_code = loop.get_compiled_code('demisto.results(1)', True)
+    assert integration_code is not script_code
+    loop.get_compiled_code('demisto.results(2)', False)
+    assert loop.get_compiled_code('demisto.results(1)', False) is not script_code
+    assert len(loop._code_cache) == 2
+
+
+def test_loop_runs_cached_script_with_each_context():
+    """
+    Given: the same script executed twice by the loop with different arguments
+    When: the second execution uses the cached compiled code
+    Then: each execution gets its own context and globals
+    """
+    script = "counter = globals().get('counter', 0) + 1\ndemisto.results('%s %d' % (demisto.args()['value'], counter))"
+    contexts = [{'script': script, 'integration': False, 'native': False, 'args': {'value': value}}
+                for value in ['first', 'second']]
+    stdin = ''.join(json.dumps(context) + '\n' for context in contexts)
+    output = subprocess.run([sys.executable, LOOP_PATH], input=stdin, stdout=subprocess.PIPE,
+                            universal_newlines=True, timeout=60).stdout
+    messages = [json.loads(line) for line in output.splitlines() if line]
+    results = [message['results'][0]['Contents'] for message in messages if message['type'] == 'result']
+    assert results == ['first 1', 'second 1']
+    assert [message['type'] for message in messages].count('completed') == 2
+
+
+CONCURRENT_CALLS_SCRIPT = '''
+import threading
+responses = {}
+
+def call(i):
+    responses[i] = demisto.executeCommand('command', {'i': i})
+
+threads = [threading.Thread(target=call, args=(i,)) for i in range(3)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+demisto.results(str(sorted(responses.items())))
+'''
+
+
+class StandInServer(object):
+    """
+    Stand-in for the server side of the loop protocol, reading the messages of the loop process from its stdout
+    """
+
+    def __init__(self, framing):
+        self.framing = framing
+        self.process = subprocess.Popen([sys.executable, LOOP_PATH], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def send(self, message):
+        payload = json.dumps(message).encode('utf-8')
+        if self.framing == 'length':
+            self.process.stdin.write(('#%d\n' % len(payload)).encode('ascii') + payload)
+        else:
+            self.process.stdin.write(payload + b'\n')
+        self.process.stdin.flush()
+
+    def receive(self):
+        line = self.process.stdout.readline()
+        if line.startswith(b'#'):
+            line = self.process.stdout.read(int(line[1:]))
+        return json.loads(line)
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait(timeout=10)
+
+
+@pytest.mark.parametrize('framing', ['line', 'length'])
+def test_loop_pipelined_calls(framing):
+    """
+    Given: a server which enabled the pipelining in the context of the script
+    When: the script calls the server from several threads
+    Then: all the calls are in flight at once and the replies are routed to their calls by request id
+    """
+    server = StandInServer(framing)
+    try:
+        server.process.stdin.write(b'ping\n')
+        server.process.stdin.flush()
+        capabilities = server.receive()['rpc']
+        assert capabilities['pipelining'] and framing in capabilities['framing']
+
+        context = {'script': CONCURRENT_CALLS_SCRIPT, 'integration': False, 'native': False,
+                   'rpc': {'pipelining': True, 'framing': framing, 'encoding': 'json'}}
+        server.process.stdin.write((json.dumps(context) + '\n').encode('utf-8'))
+        server.process.stdin.flush()
+
+        requests = [server.receive() for _ in range(3)]
+        assert sorted(request['args']['i'] for request in requests) == [0, 1, 2]
+        for request in reversed(requests):
+            server.send({'requestId': request['requestId'], 'response': request['args']['i'] * 10})
+
+        result = server.receive()
+        assert result['results'][0]['Contents'] == str([(0, 0), (1, 10), (2, 20)])
+        assert server.receive() == {'type': 'completed'}
+    finally:
+        server.close()
+
+
+def test_loop_pipelined_call_error():
+    """
+    Given: a server which enabled the pipelining in the context of the script
+    When: the server replies to a call with an error
+    Then: the call raises the error
+    """
+    server = StandInServer('line')
+    try:
+        script = "try:\n    demisto.executeCommand('command', {})\nexcept ValueError as e:\n    demisto.results(str(e))"
+        context = {'script': script, 'integration': False, 'native': False, 'rpc': {'pipelining': True}}
+        server.process.stdin.write((json.dumps(context) + '\n').encode('utf-8'))
+        server.process.stdin.flush()
+
+        request = server.receive()
+        server.send({'requestId': request['requestId'], 'error': 'command failed'})
+
+        assert server.receive()['results'][0]['Contents'] == 'command failed'
+        assert server.receive() == {'type': 'completed'}
+    finally:
+        server.close()